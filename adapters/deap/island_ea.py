@@ -0,0 +1,236 @@
+import multiprocessing as mp
+import queue
+import random
+
+from contextlib import ExitStack
+from dataclasses import dataclass, field
+from multiprocessing.connection import wait
+from types import TracebackType
+from typing import Any, Callable, List, Mapping, Optional, Tuple, Type
+
+import numpy as np
+
+from deap import base
+
+from adapters.deap.simple_ea import EvalMode, Individual, InfoSource, SimpleEA
+from adapters.parallel_sink import ParallelSink
+from adapters.unique_id import StridedUID
+from domain.data_sink import DataSink, DataSinkUser
+from domain.interfaces import PopulationInit, Representation, UniqueID
+from domain.model import Chromosome, OutputData
+from domain.use_cases import MeasureFitness
+
+@dataclass(frozen=True)
+class Migrant:
+	"""Individual sent from one island to another"""
+	chromo: Chromosome
+	fitness: Tuple[float, ...]
+	island: int
+	generation: int
+
+@dataclass
+class IslandSetup:
+	"""Components of a single island, created in the process of the island"""
+	rep: Representation
+	measure_fit_uc: MeasureFitness
+	pop_init: PopulationInit
+	prep: Callable[[OutputData], OutputData] = lambda x: x
+	checkpoint_src: InfoSource = field(default_factory=InfoSource)
+
+# creates the setup of an island from island index, seed, UniqueID, DataSink and an ExitStack for the resources of the
+# measurement setup; has to be picklable, e.g. a module level function
+IslandFactory = Callable[[int, int, UniqueID, DataSink, ExitStack], IslandSetup]
+
+class IslandSink(DataSink):
+	"""Add the index of the island to every write to a shared DataSink"""
+	def __init__(self, sink: DataSink, island: int) -> None:
+		self._sink = sink
+		self._island = island
+	
+	def write(self, source: str, data_dict: Mapping[str, Any]) -> None:
+		self._sink.write(source, {**data_dict, "island": self._island})
+	
+	def __exit__(self,
+		exc_type: Optional[Type[BaseException]],
+		exc_value: Optional[BaseException],
+		exc_traceback: Optional[TracebackType]
+	) -> bool:
+		return False
+
+class IslandEA(SimpleEA):
+	"""SimpleEA that exchanges its best individuals with other islands
+	
+	Every migration_interval generations the migrant_count best individuals are put in the outbox and the
+	individuals received in the inbox replace the worst individuals of the population. Immigrants keep the fitness
+	value measured on their original island. In synchronous mode the island waits for the migrants of the same
+	generation, so runs with the same seeds are reproducible; else only the migrants already received are used.
+	"""
+	def __init__(self, rep: Representation, measure_fit_uc: MeasureFitness, uid_gen: UniqueID,
+		pop_init: PopulationInit, data_sink: DataSink, island: int, inbox: queue.Queue, outbox: queue.Queue,
+		migration_interval: int, migrant_count: int, synchronous: bool=False,
+		prep: Callable[[OutputData], OutputData]=lambda x: x, checkpoint_src: InfoSource=InfoSource()) -> None:
+		super().__init__(rep, measure_fit_uc, uid_gen, pop_init, data_sink, prep, checkpoint_src)
+		self._island = island
+		self._inbox = inbox
+		self._outbox = outbox
+		self._migration_interval = migration_interval
+		self._migrant_count = migrant_count
+		self._synchronous = synchronous
+	
+	def migrate(self, pop: List[Individual], toolbox: base.Toolbox, gen: int) -> List[Individual]:
+		if self._migration_interval < 1 or gen % self._migration_interval != 0:
+			return pop
+		
+		ranked = sorted(pop, key=lambda x: x.fitness, reverse=True)
+		emigrants = [Migrant(i.chromo, i.fitness.values, self._island, gen) for i in ranked[:self._migrant_count]]
+		self._outbox.put(emigrants)
+		
+		received = self.receive()
+		
+		# keep the best migrants that are not already part of the population
+		known = {i.chromo.identifier for i in pop}
+		immigrants = []
+		origin = []
+		for mig in sorted(received, key=lambda m: m.fitness, reverse=True):
+			if len(immigrants) >= min(self._migrant_count, len(pop)-1):
+				break
+			if mig.chromo.identifier in known:
+				continue
+			known.add(mig.chromo.identifier)
+			indi = Individual(mig.chromo)
+			indi.fitness.values = mig.fitness
+			immigrants.append(indi)
+			origin.append(mig.island)
+		
+		self.write_to_sink("migrate", {
+			"generation": gen,
+			"sent": [m.chromo.identifier for m in emigrants],
+			"received": [i.chromo.identifier for i in immigrants],
+			"origin": origin,
+		})
+		
+		return ranked[:len(pop)-len(immigrants)] + immigrants
+	
+	def receive(self) -> List[Migrant]:
+		if self._synchronous:
+			# the neighbour sends exactly one batch per migration
+			return list(self._inbox.get())
+		
+		received = []
+		while True:
+			try:
+				received.extend(self._inbox.get_nowait())
+			except queue.Empty:
+				return received
+
+@dataclass
+class IslandParams:
+	"""Everything an island process requires; has to be picklable"""
+	factory: IslandFactory
+	island: int
+	island_count: int
+	seed: int
+	sink: DataSink
+	inbox: queue.Queue
+	outbox: queue.Queue
+	migration_interval: int
+	migrant_count: int
+	synchronous: bool
+	pop_size: int
+	gen_count: int
+	crossover_prob: float
+	mutation_prob: float
+	eval_mode: EvalMode
+
+def run_island(params: IslandParams) -> None:
+	# DEAP uses random directly
+	random.seed(params.seed)
+	np.random.seed(params.seed)
+	
+	uid_gen = StridedUID(params.island, params.island_count)
+	sink = IslandSink(params.sink, params.island)
+	with ExitStack() as stack:
+		setup = params.factory(params.island, params.seed, uid_gen, sink, stack)
+		ea = IslandEA(setup.rep, setup.measure_fit_uc, uid_gen, setup.pop_init, sink, params.island, params.inbox,
+			params.outbox, params.migration_interval, params.migrant_count, params.synchronous, setup.prep,
+			setup.checkpoint_src)
+		ea.run(params.pop_size, params.gen_count, params.crossover_prob, params.mutation_prob, params.eval_mode)
+
+class IslandModel(DataSinkUser):
+	"""Run one IslandEA per measurement setup, each in its own process
+	
+	The islands are connected in a ring, i.e. island i sends its migrants to island (i+1) mod island_count. All
+	islands write to the same ParallelSink, every write contains the index of the island. Chromosome identifiers are
+	unique across all islands.
+	"""
+	def __init__(self, factory: IslandFactory, island_count: int, data_sink: ParallelSink, migration_interval: int=5,
+		migrant_count: int=1, synchronous: bool=False) -> None:
+		if island_count < 1:
+			raise ValueError("at least one island is required")
+		
+		self._factory = factory
+		self._island_count = island_count
+		self._data_sink = data_sink
+		self._migration_interval = migration_interval
+		self._migrant_count = migrant_count
+		self._synchronous = synchronous
+	
+	@property
+	def data_sink(self) -> DataSink:
+		return self._data_sink
+	
+	@staticmethod
+	def island_seeds(seed: int, island_count: int) -> List[int]:
+		"""Derive independent seeds for the islands from a single seed"""
+		return [int(s.generate_state(1)[0]) for s in np.random.SeedSequence(seed).spawn(island_count)]
+	
+	def run(self, pop_size: int, gen_count: int, crossover_prob: float, mutation_prob: float, eval_mode: EvalMode,
+		seed: int) -> None:
+		"""Run all islands and wait for them to finish
+		
+		The ParallelSink has to be entered before.
+		"""
+		if self._migrant_count >= pop_size:
+			raise ValueError(f"migrant_count has to be less than pop_size {pop_size}, got {self._migrant_count}")
+		
+		seeds = self.island_seeds(seed, self._island_count)
+		self.write_to_sink("params", {
+			"island_count": self._island_count,
+			"seed": seed,
+			"island_seeds": seeds,
+			"migration_interval": self._migration_interval,
+			"migrant_count": self._migrant_count,
+			"synchronous": self._synchronous,
+		})
+		
+		ctx = mp.get_context("spawn")
+		# managed queues don't block the exit of a process when the receiving island already finished
+		with ctx.Manager() as manager:
+			boxes = [manager.Queue() for _ in range(self._island_count)]
+			processes = []
+			for island, island_seed in enumerate(seeds):
+				params = IslandParams(self._factory, island, self._island_count, island_seed, self._data_sink.get_sub(),
+					boxes[island], boxes[(island+1)%self._island_count], self._migration_interval, self._migrant_count,
+					self._synchronous, pop_size, gen_count, crossover_prob, mutation_prob, eval_mode)
+				proc = ctx.Process(target=run_island, args=(params, ))
+				proc.start()
+				processes.append(proc)
+			
+			self.join_all(processes)
+		
+		failed = [i for i, p in enumerate(processes) if p.exitcode != 0]
+		if len(failed) > 0:
+			raise RuntimeError(f"islands {failed} failed")
+	
+	@staticmethod
+	def join_all(processes: List[mp.Process]) -> None:
+		"""Wait for all processes; if one fails, the others are terminated as they may wait for its migrants"""
+		pending = list(processes)
+		while len(pending) > 0:
+			wait([p.sentinel for p in pending])
+			for proc in [p for p in pending if not p.is_alive()]:
+				proc.join()
+				pending.remove(proc)
+				if proc.exitcode != 0:
+					for other in pending:
+						other.terminate()
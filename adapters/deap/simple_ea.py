@@ -1,11 +1,12 @@
 import datetime
+import math
 import random
 import time
 
 from dataclasses import dataclass, field
 from enum import auto, Enum
 from functools import partial
-from typing import Any, Callable, Iterable, List, Mapping, Optional, Tuple
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
 
 import numpy as np
 
@@ -14,11 +15,15 @@ from deap import creator
 from deap import base
 from deap import algorithms
 
+from adapters.deap import vector_ops
 from adapters.input_gen import RandIntGen
+from adapters.lineage import LineageRecorder
+from adapters.surrogate import RidgeSurrogate
 from applications.discern_frequency.s_t_comb import lexicographic_combinations
 from domain.data_sink import DataSink, DataSinkUser
-from domain.interfaces import EvoAlgo, FitnessFunction, InputData, PopulationInit, Representation, UniqueID
+from domain.interfaces import EvoAlgo, FitnessFunction, InputData, PopulationInit, PRNG, Representation, UniqueID
 from domain.model import Chromosome, OutputData
+from domain.profiling import PROFILER, SECTIONS, format_profile
 from domain.request_model import RequestObject
 from domain.use_cases import DecTarget, GenChromo, Measure, MeasureFitness, RandomChromo
 
@@ -26,6 +31,7 @@ class EvalMode(Enum):
 	NEW = auto()
 	ELITE = auto()
 	ALL = auto()
+	ADAPTIVE = auto()
 
 creator.create("SimpleFit", base.Fitness, weights=(1.0, ))
 
@@ -40,6 +46,33 @@ class GenSource(InfoSource):
 	def get_info(self) -> Mapping[str, Any]:
 		return {"generation": self.gen}
 
+@dataclass
+class PRNGSource(InfoSource):
+	"""Provide the state of a PRNG, e.g. to be able to resume a run at a checkpoint"""
+	prng: PRNG
+	
+	def get_info(self) -> Mapping[str, Any]:
+		return {"prng_state": self.prng.get_state()}
+
+@dataclass
+class FitnessStats:
+	"""Running mean and variance of the fitness values measured for a chromosome"""
+	count: int = 0
+	mean: float = 0.0
+	m2: float = 0.0
+	
+	@property
+	def variance(self) -> float:
+		if self.count < 2:
+			return math.nan
+		return self.m2/(self.count-1)
+	
+	def add(self, value: float) -> None:
+		self.count += 1
+		delta = value - self.mean
+		self.mean += delta/self.count
+		self.m2 += delta*(value - self.mean)
+
 @dataclass
 class Individual:
 	chromo: Chromosome
@@ -61,75 +94,157 @@ class Individual:
 			
 			res = func(*[list(i.chromo.allele_indices) for i in in_indis], *args[in_count:], **kwargs)
 			
-			out_indis = []
-			req = RequestObject()
-			for allele_indices in res:
-				allele_indices_tup = tuple(allele_indices)
-				new_indi = None
-				# found in input?
-				for old in in_indis:
-					if old.chromo.allele_indices == allele_indices_tup:
-						new_indi = old
-						break
-				if new_indi is None:
-					# create new chromosome
-					req["allele_indices"] = allele_indices_tup
-					chromo = chromo_gen(req).chromosome
-					new_indi = Individual(chromo)
-				out_indis.append(new_indi)
-			
-			if data_sink is not None:
-				sink_data = {
-					"in": [i.chromo.identifier for i in in_indis],
-					"out": [i.chromo.identifier for i in out_indis]
-				}
-				sink_data.update(info_src.get_info())
-				data_sink.write(f"{cls.__name__}.wrap.{func.__name__}", sink_data)
-			
-			return tuple(out_indis)
+			return cls.from_alteration(func.__name__, in_indis, res, chromo_gen, data_sink, info_src)
 		
 		return wrapped_func
+	
+	@classmethod
+	def from_alteration(cls, func_name: str, in_indis: Sequence["Individual"], res: Iterable[Sequence[int]],
+		chromo_gen: GenChromo, data_sink: DataSink, info_src: InfoSource) -> Tuple["Individual", ...]:
+		"""Create the individuals for the allele indices resulting from altering in_indis
+		
+		Allele indices equal to those of an input keep the input individual, for all others a new chromosome is
+		generated. The alteration is written to the data sink.
+		"""
+		out_indis = []
+		req = RequestObject()
+		for allele_indices in res:
+			allele_indices_tup = tuple(allele_indices)
+			new_indi = None
+			# found in input?
+			for old in in_indis:
+				if old.chromo.allele_indices == allele_indices_tup:
+					new_indi = old
+					break
+			if new_indi is None:
+				# create new chromosome
+				req["allele_indices"] = allele_indices_tup
+				chromo = chromo_gen(req).chromosome
+				new_indi = Individual(chromo)
+			out_indis.append(new_indi)
+			
+		if data_sink is not None:
+			sink_data = {
+				"in": [i.chromo.identifier for i in in_indis],
+				"out": [i.chromo.identifier for i in out_indis]
+			}
+			sink_data.update(info_src.get_info())
+			data_sink.write(f"{cls.__name__}.wrap.{func_name}", sink_data)
+			
+		return tuple(out_indis)
 
 class SimpleEA(EvoAlgo, DataSinkUser):
 	def __init__(self, rep: Representation, measure_fit_uc: MeasureFitness, uid_gen: UniqueID, pop_init: PopulationInit,
-		data_sink: DataSink, prep: Callable[[OutputData], OutputData]=lambda x: x) -> None:
+		data_sink: DataSink, prep: Callable[[OutputData], OutputData]=lambda x: x,
+		checkpoint_src: InfoSource=InfoSource(), vectorized: bool=False, surrogate: Optional[RidgeSurrogate]=None,
+		screen_ratio: float=1.0, reeval_budget: int=2, confidence_z: float=1.96, phenotype_reuse: bool=False,
+		profile: bool=False, print_profile: bool=False, lineage: bool=False, delta_chromos: bool=False) -> None:
+		"""
+		checkpoint_src: provides additional data for the checkpoint written after each generation
+		vectorized: apply selection, crossover and mutation to the whole population with NumPy instead of the DEAP
+			operators; the random numbers are drawn from a generator seeded by random in each generation
+		surrogate: model trained on the measured fitness values; once it is fitted, only the screen_ratio fraction of
+			new individuals with the highest predicted fitness is evaluated
+		reeval_budget: maximum number of repeated evaluations per generation in EvalMode.ADAPTIVE
+		confidence_z: width of the confidence intervals of the fitness in standard errors for EvalMode.ADAPTIVE
+		phenotype_reuse: don't measure new chromosomes with the same phenotype digest as an already measured one, but
+			share the fitness values with it; repeated evaluations are still measured; see Representation.phenotype_digest
+			for which chromosomes share a digest
+		profile: write the time spent in the profiled sections of each generation, see domain.profiling
+		print_profile: also print the times of each generation as table
+		lineage: write the new chromosomes and the alterations creating them as one block per generation instead of
+			one write per chromosome and alteration, see LineageRecorder
+		delta_chromos: write new chromosomes as the genes they differ in from a parent in the population, with periodic
+			full snapshots; implies lineage
+		"""
+		
+		if not 0 < screen_ratio <= 1:
+			raise ValueError(f"screen_ratio has to be in (0, 1], got {screen_ratio}")
 		
 		self._rep = rep
 		self._measure_fit_uc = measure_fit_uc
 		self._pop_init = pop_init
-		self._chromo_gen = GenChromo(uid_gen, data_sink)
 		self._data_sink = data_sink
+		self._delta_chromos = delta_chromos
+		self._lineage = None
+		if (lineage or delta_chromos) and data_sink is not None:
+			self._lineage = LineageRecorder(data_sink, delta=delta_chromos)
+		# sink for the chromosomes and alterations created by variation
+		self._var_sink = data_sink if self._lineage is None else self._lineage
+		self._chromo_gen = GenChromo(uid_gen, self._var_sink)
 		self._prep = prep
+		self._checkpoint_src = checkpoint_src
+		self._vectorized = vectorized
+		# upper bounds of the allele indices and rows of the last progeny for the vectorized operators
+		self._up = None
+		self._allele_rows = {}
+		self._surrogate = surrogate
+		self._screen_ratio = screen_ratio
+		# screened individuals of the current generation with their predicted fitness and if they are evaluated
+		self._predictions = []
+		self._reeval_budget = reeval_budget
+		self._confidence_z = confidence_z
+		# all fitness values measured for a chromosome, by chromosome identifier
+		self._fit_stats: Dict[int, FitnessStats] = {}
+		# identifiers of the chromosomes whose statistics changed since the last checkpoint
+		self._stats_changed: Dict[int, None] = {}
+		# write the statistics with the checkpoints; only required if they are used, see run
+		self._record_stats = False
+		# state was restored from a checkpoint, so the initial population was already evaluated
+		self._restored = False
+		self._phenotype_reuse = phenotype_reuse
+		# phenotype digest -> identifier of the first chromosome measured with that phenotype
+		self._phenotypes: Dict[bytes, int] = {}
+		self._profile = profile or print_profile
+		self._print_profile = print_profile
 	
 	@property
 	def data_sink(self) -> DataSink:
 		return self._data_sink
 	
-	def run(self, pop_size: int, gen_count: int, crossover_prob: float, mutation_prob: float, eval_mode: EvalMode) -> None:
+	def run(self, pop_size: int, gen_count: int, crossover_prob: float, mutation_prob: float, eval_mode: EvalMode,
+		init_fitness: Mapping[int, float]={}) -> None:
+		"""
+		init_fitness: known fitness values of chromosomes of the initial population, e.g. when resuming a run; mapping
+			from chromosome identifier to fitness value
+		"""
 		self.write_to_sink("ea_params", {
 			"pop_size": pop_size,
 			"gen_count": gen_count,
 			"crossover_prob": crossover_prob,
 			"mutation_prob": mutation_prob,
 			"eval_mode": eval_mode,
+			"vectorized": self._vectorized,
+			"screen_ratio": None if self._surrogate is None else self._screen_ratio,
+			"reeval_budget": self._reeval_budget,
+			"phenotype_reuse": self._phenotype_reuse,
+			"lineage": self._lineage is not None,
+			"delta_chromos": self._delta_chromos,
 		})
 		# DEAP uses random directly, so store it's inital state
 		self.write_to_sink("random_initial", {"state": random.getstate()})
 		
+		self._record_stats = eval_mode == EvalMode.ADAPTIVE or self._phenotype_reuse
+		
 		# create toolbox
 		gen_src = GenSource(0)
 		toolbox = self.create_toolbox(mutation_prob, gen_src)
 		
 		# create population
-		pop = self._init_pop(pop_size)
+		pop = self._init_pop(pop_size, init_fitness)
 		
 		# run
 		#algorithms.eaSimple(pop, toolbox, cxpb=crossover_prob, mutpb=mutation_prob, ngen=gen_count)
-		self.org_ea(pop, toolbox, crossover_prob, mutation_prob, gen_count, eval_mode, gen_src)
+		prev_enabled = PROFILER.enabled
+		PROFILER.enabled = prev_enabled or self._profile
+		try:
+			self.org_ea(pop, toolbox, crossover_prob, mutation_prob, gen_count, eval_mode, gen_src)
+		finally:
+			PROFILER.enabled = prev_enabled
 		
 		# DEAP uses random directly, so store it's inital state
 		self.write_to_sink("random_final", {"state": random.getstate()})
-		
+	
 	
 	@staticmethod
 	def evaluate_invalid(pop: List[Individual], toolbox: base.Toolbox, gen: int) -> None:
@@ -148,81 +263,358 @@ class SimpleEA(EvoAlgo, DataSinkUser):
 		eval_mode: EvalMode, gen_src: GenSource) -> None:
 		
 		pop_size = len(pop)
-		# prepare rank probabilities
-		s = 2.0
-		prob_list = [(2-s)/pop_size+2*i*(s-1)/(pop_size*(pop_size-1)) for i in range(pop_size)]
+		prob_list = self.rank_probabilities(pop_size)
 		
 		# initial evaluation
 		prev_time = time.perf_counter()
+		# discard times from before the run
+		PROFILER.collect()
 		self.evaluate_invalid(pop, toolbox, 0)
+		# a restored population completed its generation before the checkpoint, including the re-evaluation and the
+		# training of the surrogate
+		if not self._restored:
+			if eval_mode == EvalMode.ADAPTIVE:
+				self.reevaluate(pop, toolbox, 0)
+			self.update_surrogate(pop, 0)
+		self._restored = False
 		best = max([p.fitness.values for p in pop])
 		self.write_to_sink("gen", {"pop": [p.chromo.identifier for p in pop]})
+		self.write_checkpoint(0)
 		cur_time = time.perf_counter()
 		print(f"Initial evaluation took {cur_time-prev_time:.1f} s")
+		self.write_profile(0, cur_time-prev_time)
 		
 		start_time = time.perf_counter()
 		prev_time = start_time
 		for gen_nr in range(1, ngen+1):
 			gen_src.gen = gen_nr
 			
-			# find probability based on rank
-			ranked = sorted(pop, key=lambda x:x.fitness)
-			for indi, rp in zip(ranked, prob_list):
-				indi.rank_prob.values = (rp, )
+			ranked = self.rank(pop, prob_list)
 			
 			elite = ranked[-1:]
 			best = elite[0].fitness.values
-			progeny = toolbox.select(pop, pop_size-1, fit_attr="rank_prob")
-			# no need to invalidate fitness explicitly as the Individual.wrap_alteration already creates new 
-			# Individual instances for altered chromosomes
-			
-			# algorithms.varAnd mutates the population in place and invalidates the fitness values accordingly
-			# but that is not necessary as Individual.wrap_alteration already creates new individuals (and chromosomes)
-			# without fitness if the allele_indices were altered
-			# -> implement own version here to avoid superfluous evaluations
-			
-			# crossover
-			for i in range(1, len(progeny), 2):
-				# use random to be consistent with DEAP
-				if random.random() < cxpb:
-					progeny[i-1], progeny[i] = toolbox.mate(progeny[i-1], progeny[i])
-			# mutation
-			#print(f"before_mut: {[p.chromo.identifier for p in progeny]}")
-			progeny = [r[0] for r in map(toolbox.mutate, progeny)]
-			#print(f"after_mut: {[p.chromo.identifier for p in progeny]}")
+			if self._lineage is not None:
+				# the parents of the progeny are in the current population
+				self._lineage.track(p.chromo for p in pop)
+			with PROFILER.section("variation"):
+				if self._vectorized:
+					progeny = self.vary_vectorized(ranked, prob_list, cxpb, mutpb, gen_src)
+				else:
+					progeny = toolbox.select(pop, pop_size-1, fit_attr="rank_prob")
+					# no need to invalidate fitness explicitly as the Individual.wrap_alteration already creates new 
+					# Individual instances for altered chromosomes
+			
+					# algorithms.varAnd mutates the population in place and invalidates the fitness values accordingly
+					# but that is not necessary as Individual.wrap_alteration already creates new individuals (and chromosomes)
+					# without fitness if the allele_indices were altered
+					# -> implement own version here to avoid superfluous evaluations
+			
+					# crossover
+					for i in range(1, len(progeny), 2):
+						# use random to be consistent with DEAP
+						if random.random() < cxpb:
+							progeny[i-1], progeny[i] = toolbox.mate(progeny[i-1], progeny[i])
+					# mutation
+					#print(f"before_mut: {[p.chromo.identifier for p in progeny]}")
+					progeny = [r[0] for r in map(toolbox.mutate, progeny)]
+					#print(f"after_mut: {[p.chromo.identifier for p in progeny]}")
+			
+				if self._surrogate is not None:
+					progeny = self.screen(pop, progeny, toolbox)
+			
+			if self._lineage is not None:
+				self._lineage.flush()
 			
 			pop = elite + progeny
 			if eval_mode == EvalMode.ELITE:
 				self.invalidate(elite)
 			elif eval_mode == EvalMode.ALL:
 				self.invalidate(pop)
-			# nothing to do for EvalMode.NEW as the new individuals have no valid fitness value
+			# nothing to do for EvalMode.NEW and EvalMode.ADAPTIVE as the new individuals have no valid fitness value
 			
 			self.evaluate_invalid(pop, toolbox, gen_nr)
+			if eval_mode == EvalMode.ADAPTIVE:
+				self.reevaluate(pop, toolbox, gen_nr)
+			pop = self.migrate(pop, toolbox, gen_nr)
+			self.update_surrogate(pop, gen_nr)
 			
 			self.write_to_sink("gen", {"pop": [p.chromo.identifier for p in pop]})
+			self.write_checkpoint(gen_nr)
 			
 			cur_time = time.perf_counter()
 			eta = (cur_time - start_time) * (ngen/gen_nr - 1)
 			print(f"Generation {gen_nr} took {cur_time-prev_time:.1f} s, eta : {eta:.1f} s; highest fitness: {best} for"
 				f" {elite[0].chromo.identifier}")
+			self.write_profile(gen_nr, cur_time-prev_time)
 			prev_time = cur_time
 		
 		cur_time = time.perf_counter()
 		print(f"{ngen} generations took {cur_time-start_time:.2f} s")
+	
+	
+	def vary_vectorized(self, ranked: List[Individual], prob_list: List[float], cxpb: float, mutpb: float,
+		info_src: InfoSource) -> List[Individual]:
+		"""Select len(ranked)-1 individuals and apply crossover and mutation on the whole population at once
+		
+		Equivalent to the DEAP operators in org_ea, including the records written to the data sink.
+		"""
+		# seed from random, so the checkpoints are still sufficient to resume a run
+		rng = np.random.default_rng(random.getrandbits(64))
+		
+		chosen = vector_ops.sel_roulette(np.array(prob_list), len(ranked)-1, rng)
+		progeny = [ranked[i] for i in chosen]
+		if len(progeny) == 0:
+			return progeny
+		# reuse the rows of the previous generation instead of converting the tuples again
+		rows = self._allele_rows
+		alleles = np.stack([rows[p.chromo.identifier] if p.chromo.identifier in rows else
+			np.array(p.chromo.allele_indices, dtype=np.int64) for p in progeny])
+		
+		mated = vector_ops.cx_one_point(alleles, cxpb, rng)
+		for i in 2*np.flatnonzero(mated):
+			progeny[i:i+2] = Individual.from_alteration("cxOnePoint", progeny[i:i+2],
+				[alleles[i].tolist(), alleles[i+1].tolist()], self._chromo_gen, self._var_sink, info_src)
+		
+		if self._up is None:
+			self._up = np.array([len(g.alleles)-1 for g in self._rep.iter_genes()], dtype=np.int64)
+		changed = vector_ops.mut_uniform_int(alleles, 0, self._up, mutpb, rng)
+		for i, indi in enumerate(progeny):
+			res = alleles[i].tolist() if changed[i] else indi.chromo.allele_indices
+			progeny[i] = Individual.from_alteration("mutUniformInt", [indi], [res], self._chromo_gen, self._var_sink,
+				info_src)[0]
+		
+		self._allele_rows = {p.chromo.identifier: alleles[i] for i, p in enumerate(progeny)}
+		return progeny
+	
+	def reevaluate(self, pop: List[Individual], toolbox: base.Toolbox, gen: int) -> None:
+		"""Spend the re-evaluation budget on individuals that may be on the wrong side of the elite boundary
+		
+		The boundary lies between the best and the second best mean fitness. An individual is a candidate if the
+		confidence interval of its mean fitness contains the boundary; individuals with a single measurement use the
+		pooled variance of all chromosomes measured more than once. The most ambiguous candidate is evaluated again
+		until the budget is spent or no candidate is left. Afterwards the fitness of all individuals is the mean of all
+		their measurements.
+		"""
+		seen = set()
+		unique = [p for p in pop if not (p.chromo.identifier in seen or seen.add(p.chromo.identifier))]
+		
+		for _ in range(self._reeval_budget if len(unique) > 1 else 0):
+			stats = [self.fitness_stats(i) for i in unique]
+			means = np.array([s.mean for s in stats])
+			best_two = np.partition(means, -2)[-2:]
+			threshold = best_two.mean()
+			
+			multi = [s.variance for s in self._fit_stats.values() if s.count > 1]
+			pooled = np.mean(multi) if len(multi) > 0 else math.inf
+			variances = np.array([pooled if s.count < 2 else s.variance for s in stats])
+			counts = np.array([s.count for s in stats])
+			half_width = self._confidence_z*np.sqrt(variances/counts)
+			
+			# distance to the boundary in half widths of the confidence interval; < 1 -> boundary inside the interval
+			with np.errstate(divide="ignore", invalid="ignore"):
+				ambiguity = np.where(np.isinf(half_width), 0, np.abs(means-threshold)/half_width)
+			ambiguity[np.isnan(ambiguity)] = math.inf
+			if np.min(ambiguity) >= 1:
+				break
+			
+			# prefer individuals with fewer measurements on ties
+			index = min(range(len(unique)), key=lambda i: (ambiguity[i], counts[i]))
+			indi = unique[index]
+			fit = toolbox.evaluate(indi, info={"generation": gen})
+			cur_stats = self.fitness_stats(indi)
+			self.write_to_sink("reeval", {
+				"generation": gen,
+				"chromo_id": indi.chromo.identifier,
+				"fitness": fit[0],
+				"mean": cur_stats.mean,
+				"count": cur_stats.count,
+				"threshold": threshold,
+			})
 		
+		for indi in unique:
+			indi.fitness.values = (self.fitness_stats(indi).mean, )
 	
-	def _init_pop(self, count) -> List[Individual]:
+	def fitness_stats(self, indi: Individual) -> FitnessStats:
+		"""Statistics of the fitness values measured for an individual
+		
+		A fitness value that was not measured by this instance, e.g. from init_fitness, counts as single measurement.
+		"""
+		try:
+			return self._fit_stats[indi.chromo.identifier]
+		except KeyError:
+			stats = FitnessStats()
+			stats.add(indi.fitness.values[0])
+			self._fit_stats[indi.chromo.identifier] = stats
+			self._stats_changed[indi.chromo.identifier] = None
+			return stats
+	
+	def screen(self, pop: List[Individual], progeny: List[Individual], toolbox: base.Toolbox) -> List[Individual]:
+		"""Keep only the new individuals of the progeny with the highest predicted fitness
+		
+		The rejected individuals are replaced by individuals selected from the current population, so they don't
+		require an evaluation. Nothing is rejected before the surrogate is fitted.
+		"""
+		if not self._surrogate.ready:
+			return progeny
+		
+		seen = set()
+		new = [
+			p for p in progeny if not p.fitness.valid and not (p.chromo.identifier in seen or seen.add(p.chromo.identifier))
+		]
+		if len(new) == 0:
+			return progeny
+		
+		predicted = self._surrogate.predict(np.array([p.chromo.allele_indices for p in new], dtype=np.int64))
+		keep_count = math.ceil(self._screen_ratio*len(new))
+		order = np.argsort(-predicted, kind="stable")
+		keep = {new[i].chromo.identifier for i in order[:keep_count]}
+		self._predictions = [(p, float(f), p.chromo.identifier in keep) for p, f in zip(new, predicted)]
+		
+		rejected = [i for i, p in enumerate(progeny) if not p.fitness.valid and p.chromo.identifier not in keep]
+		res = list(progeny)
+		for i, indi in zip(rejected, toolbox.select(pop, len(rejected), fit_attr="rank_prob")):
+			res[i] = indi
+		
+		return res
+	
+	def update_surrogate(self, pop: List[Individual], gen: int) -> None:
+		"""Record the predictions of the generation and train the surrogate with the evaluated individuals"""
+		if self._surrogate is None:
+			return
+		
+		for indi, predicted, evaluated in self._predictions:
+			self.write_to_sink("surrogate", {
+				"generation": gen,
+				"chromo_id": indi.chromo.identifier,
+				"predicted": predicted,
+				"measured": indi.fitness.values[0] if evaluated else float("nan"),
+				"evaluated": evaluated,
+			})
+		self._predictions = []
+		
+		for indi in pop:
+			self._surrogate.add(indi.chromo, indi.fitness.values[0])
+		self._surrogate.fit()
+	
+	def migrate(self, pop: List[Individual], toolbox: base.Toolbox, gen: int) -> List[Individual]:
+		"""Exchange individuals with other populations after the evaluation of a generation
+		
+		Hook for island models; SimpleEA has a single population and returns it unchanged.
+		"""
+		return pop
+	
+	@staticmethod
+	def rank_probabilities(pop_size: int, s: float=2.0) -> List[float]:
+		"""Selection probabilities of linear ranking, from the lowest to the highest rank"""
+		if pop_size < 2:
+			return [1.0]*pop_size
+		return [(2-s)/pop_size+2*i*(s-1)/(pop_size*(pop_size-1)) for i in range(pop_size)]
+	
+	@staticmethod
+	def rank(pop: List[Individual], prob_list: List[float]) -> List[Individual]:
+		"""Set the probability based on rank and return the individuals sorted by fitness"""
+		ranked = sorted(pop, key=lambda x:x.fitness)
+		for indi, rp in zip(ranked, prob_list):
+			indi.rank_prob.values = (rp, )
+		return ranked
+	
+	def restore(self, fit_stats: Mapping[int, FitnessStats], phenotype_origins: Iterable[Chromosome]=()) -> None:
+		"""Restore the state of an interrupted run before run is called with the population of its checkpoint
+		
+		fit_stats: statistics of the fitness values by chromosome identifier; chromosomes sharing a phenotype share the
+			instance
+		phenotype_origins: measured chromosomes whose fitness values can be reused, in order of their first measurement
+		"""
+		self._fit_stats = dict(fit_stats)
+		# the statistics are part of the first checkpoint, so the new run can be resumed, too
+		self._stats_changed = dict.fromkeys(self._fit_stats)
+		self._phenotypes = {}
+		if self._phenotype_reuse:
+			for chromo in phenotype_origins:
+				self._phenotypes.setdefault(self._rep.phenotype_digest(chromo), chromo.identifier)
+		self._restored = True
+	
+	def write_checkpoint(self, gen: int) -> None:
+		"""Write everything required to continue the run after a complete generation"""
+		if self._record_stats:
+			for chromo_id in self._stats_changed:
+				stats = self._fit_stats[chromo_id]
+				self.write_to_sink("fit_stats", {
+					"generation": gen,
+					"chromo_id": chromo_id,
+					"count": stats.count,
+					"mean": stats.mean,
+					"m2": stats.m2,
+				})
+		self._stats_changed = {}
+		
+		data = {"generation": gen, "state": random.getstate()}
+		data.update(self._checkpoint_src.get_info())
+		self.write_to_sink("checkpoint", data)
+	
+	def write_profile(self, gen: int, wall: float) -> None:
+		"""Write the time spent in the profiled sections since the last call
+		
+		wall: elapsed time of the generation
+		"""
+		if not self._profile:
+			return
+		
+		stats = PROFILER.collect()
+		data = {"generation": gen, "wall": wall}
+		# sections that didn't run in this generation took no time
+		data.update({n: 0.0 for n in SECTIONS})
+		data.update({n: s.total for n, s in stats.items()})
+		self.write_to_sink("profile", data)
+		
+		if self._print_profile:
+			print(format_profile(stats, wall))
+	
+	def _init_pop(self, count: int, init_fitness: Mapping[int, float]={}) -> List[Individual]:
 		chromo_list = self._pop_init.init_pop(count)
-		return [Individual(c) for c in chromo_list]
+		pop = [Individual(c) for c in chromo_list]
+		for indi in pop:
+			try:
+				indi.fitness.values = (init_fitness[indi.chromo.identifier], )
+			except KeyError:
+				pass
+		
+		return pop
 	
 	def _evaluate(self, indi: Individual, info: Mapping[str, Any]={}) -> Tuple[int]:
+		digest = None
+		if self._phenotype_reuse and indi.chromo.identifier not in self._fit_stats:
+			digest = self._rep.phenotype_digest(indi.chromo)
+			try:
+				org_id = self._phenotypes[digest]
+			except KeyError:
+				pass
+			else:
+				return self._reuse_fitness(indi, org_id, info)
+		
 		mes_req = RequestObject(chromosome=indi.chromo)
 		mes_req.update(info)
 		mes_res = self._measure_fit_uc(mes_req)
+		self._fit_stats.setdefault(indi.chromo.identifier, FitnessStats()).add(mes_res.fitness)
+		self._stats_changed[indi.chromo.identifier] = None
+		if digest is not None:
+			self._phenotypes[digest] = indi.chromo.identifier
 		
 		return (mes_res.fitness, )
 	
+	def _reuse_fitness(self, indi: Individual, org_id: int, info: Mapping[str, Any]) -> Tuple[int]:
+		"""Share the fitness values of an already measured chromosome with the same phenotype"""
+		# same instance, so later measurements of either chromosome count for both
+		stats = self._fit_stats[org_id]
+		self._fit_stats[indi.chromo.identifier] = stats
+		self._stats_changed[indi.chromo.identifier] = None
+		
+		data = {"chromo_id": indi.chromo.identifier, "phenotype_of": org_id, "fitness": stats.mean}
+		data.update(info)
+		self.write_to_sink("reuse", data)
+		
+		return (stats.mean, )
+	
 	def create_toolbox(self, mutation_prob: float, info_src: InfoSource) -> base.Toolbox:
 		#creator.create("TestFit", base.Fitness, weights=(1.0,))
 		#creator.create("Chromo", list, fitness=creator.TestFit)
@@ -233,11 +625,11 @@ class SimpleEA(EvoAlgo, DataSinkUser):
 		#toolbox.register("init_individual", tools.initRepeat, creator.Chromo, toolbox.rand_bool, 20)
 		#toolbox.register("init_pop", tools.initRepeat, list, toolbox.init_individual)
 		
-		toolbox.register("mate", Individual.wrap_alteration(tools.cxOnePoint, 2, self._chromo_gen, self._data_sink, 
+		toolbox.register("mate", Individual.wrap_alteration(tools.cxOnePoint, 2, self._chromo_gen, self._var_sink, 
 			info_src))
 		toolbox.register(
 			"mutate",
-			Individual.wrap_alteration(tools.mutUniformInt, 1, self._chromo_gen, self._data_sink, info_src),
+			Individual.wrap_alteration(tools.mutUniformInt, 1, self._chromo_gen, self._var_sink, info_src),
 			low=0, up=[len(g.alleles)-1 for g in self._rep.iter_genes()], indpb=mutation_prob)
 		toolbox.register("select", tools.selRoulette)
 		toolbox.register("evaluate", self._evaluate)
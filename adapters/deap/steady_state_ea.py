@@ -0,0 +1,191 @@
+import random
+import time
+
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence, Tuple
+
+from deap import base
+
+from adapters.deap.simple_ea import InfoSource, Individual, SimpleEA
+from domain.data_sink import DataSink
+from domain.interfaces import PopulationInit, Representation, UniqueID
+from domain.model import OutputData
+from domain.request_model import RequestObject
+from domain.use_cases import MeasureFitness
+
+@dataclass
+class EvalCountSource(InfoSource):
+	count: int
+	
+	def get_info(self) -> Mapping[str, Any]:
+		return {"evaluation": self.count}
+
+@dataclass
+class StationResult:
+	"""Result of a single evaluation on a measurement station"""
+	station: int
+	fitness: float
+	start: float
+	end: float
+
+class SteadyStateEA(SimpleEA):
+	"""Asynchronous steady-state variant of SimpleEA for multiple measurement stations
+	
+	Each station is a MeasureFitness use case with its own hardware and evaluates one individual at a time in a
+	separate thread. As soon as a station is free, a child is created by rank based selection, crossover and mutation
+	and evaluated on that station. A finished child replaces the individual with the lowest fitness, so no station
+	waits for the slowest measurement of a generation.
+	
+	Variation and the data sink of the EA are only used from the thread calling run; the use cases of the stations
+	are called from the station threads.
+	"""
+	def __init__(self, rep: Representation, stations: Sequence[MeasureFitness], uid_gen: UniqueID,
+		pop_init: PopulationInit, data_sink: DataSink, prep: Callable[[OutputData], OutputData]=lambda x: x,
+		checkpoint_src: InfoSource=InfoSource()) -> None:
+		if len(stations) == 0:
+			raise ValueError("at least one station is required")
+		
+		super().__init__(rep, stations[0], uid_gen, pop_init, data_sink, prep, checkpoint_src)
+		self._stations = list(stations)
+	
+	def run(self, pop_size: int, eval_count: int, crossover_prob: float, mutation_prob: float,
+		init_fitness: Mapping[int, float]={}) -> None:
+		"""
+		eval_count: number of children evaluated after the initial population
+		init_fitness: known fitness values of chromosomes of the initial population; mapping from chromosome
+			identifier to fitness value
+		"""
+		self.write_to_sink("ea_params", {
+			"pop_size": pop_size,
+			"eval_count": eval_count,
+			"crossover_prob": crossover_prob,
+			"mutation_prob": mutation_prob,
+			"stations": len(self._stations),
+		})
+		# DEAP uses random directly, so store it's inital state
+		self.write_to_sink("random_initial", {"state": random.getstate()})
+		
+		eval_src = EvalCountSource(0)
+		toolbox = self.create_toolbox(mutation_prob, eval_src)
+		pop = self._init_pop(pop_size, init_fitness)
+		
+		self.steady_state_ea(pop, toolbox, crossover_prob, eval_count, eval_src)
+		
+		self.write_to_sink("random_final", {"state": random.getstate()})
+	
+	def steady_state_ea(self, pop: List[Individual], toolbox: base.Toolbox, cxpb: float, eval_count: int,
+		eval_src: EvalCountSource) -> None:
+		
+		prob_list = self.rank_probabilities(len(pop))
+		free = list(range(len(self._stations)))
+		pending: Dict[Future, Tuple[Individual, float]] = {}
+		busy = [0.0]*len(self._stations)
+		
+		def submit(indi: Individual) -> None:
+			station = free.pop(0)
+			submit_time = time.time()
+			future = executor.submit(self._evaluate_on, station, indi, eval_src.get_info())
+			pending[future] = (indi, submit_time)
+		
+		def collect() -> List[Tuple[Individual, float, StationResult]]:
+			done, _ = wait(pending, return_when=FIRST_COMPLETED)
+			finished = []
+			# handle completed evaluations in submission order
+			for future in [f for f in pending if f in done]:
+				indi, submit_time = pending.pop(future)
+				res = future.result()
+				indi.fitness.values = (res.fitness, )
+				free.append(res.station)
+				busy[res.station] += res.end - res.start
+				finished.append((indi, submit_time, res))
+			return finished
+		
+		start_time = time.time()
+		with ThreadPoolExecutor(len(self._stations)) as executor:
+			# initial evaluation
+			seen = set()
+			todo = [
+				i for i in pop if not i.fitness.valid and not (i.chromo.identifier in seen or seen.add(i.chromo.identifier))
+			]
+			while len(todo) > 0 or len(pending) > 0:
+				while len(todo) > 0 and len(free) > 0:
+					submit(todo.pop(0))
+				for indi, submit_time, res in collect():
+					self.write_eval(indi, submit_time, res, None, pop)
+			self.write_to_sink("init", {"pop": [p.chromo.identifier for p in pop]})
+			print(f"Initial evaluation took {time.time()-start_time:.1f} s")
+			
+			submitted = 0
+			while eval_src.count < eval_count:
+				while len(free) > 0 and submitted < eval_count:
+					submit(self.create_child(pop, toolbox, cxpb, prob_list))
+					submitted += 1
+				
+				for indi, submit_time, res in collect():
+					replaced = self.insert(pop, indi)
+					eval_src.count += 1
+					self.write_eval(indi, submit_time, res, replaced, pop)
+		
+		wall = time.time() - start_time
+		self.write_to_sink("utilization", {"busy": busy, "wall": wall})
+		best = max(pop, key=lambda x: x.fitness)
+		print(f"{eval_count} evaluations took {wall:.2f} s, station utilization "
+			f"{[f'{b/wall:.0%}' for b in busy]}; highest fitness: {best.fitness.values} for {best.chromo.identifier}")
+	
+	def create_child(self, pop: List[Individual], toolbox: base.Toolbox, cxpb: float, prob_list: List[float]
+		) -> Individual:
+		"""Create a child by rank based selection of two parents, crossover and mutation
+		
+		A child without changes is a copy of its parent, so the fitness of the parent stays untouched while the child
+		is evaluated.
+		"""
+		self.rank(pop, prob_list)
+		parents = toolbox.select(pop, 2, fit_attr="rank_prob")
+		# use random to be consistent with DEAP
+		if random.random() < cxpb:
+			parents = toolbox.mate(*parents)
+		
+		child = toolbox.mutate(parents[0])[0]
+		if any(p is child for p in pop):
+			child = toolbox.clone(child)
+			del child.fitness.values
+		return child
+	
+	@staticmethod
+	def insert(pop: List[Individual], indi: Individual) -> Optional[Individual]:
+		"""Replace the individual with the lowest fitness by indi and return the replaced individual
+		
+		Unchanged copies of a parent are measured again; if the parent is still part of the population, only its
+		fitness is updated and None is returned.
+		"""
+		for member in pop:
+			if member.chromo.identifier == indi.chromo.identifier:
+				member.fitness.values = indi.fitness.values
+				return None
+		
+		worst_index = min(range(len(pop)), key=lambda i: pop[i].fitness)
+		replaced = pop[worst_index]
+		pop[worst_index] = indi
+		return replaced
+	
+	def write_eval(self, indi: Individual, submit_time: float, res: StationResult, replaced: Optional[Individual],
+		pop: List[Individual]) -> None:
+		self.write_to_sink("eval", {
+			"chromo_id": indi.chromo.identifier,
+			"fitness": res.fitness,
+			"station": res.station,
+			"submit_time": submit_time,
+			"start_time": res.start,
+			"end_time": res.end,
+			"replaced": None if replaced is None else replaced.chromo.identifier,
+			"pop": [p.chromo.identifier for p in pop],
+		})
+	
+	def _evaluate_on(self, station: int, indi: Individual, info: Mapping[str, Any]) -> StationResult:
+		start = time.time()
+		mes_req = RequestObject(chromosome=indi.chromo)
+		mes_req.update(info)
+		mes_res = self._stations[station](mes_req)
+		
+		return StationResult(station, mes_res.fitness, start, time.time())
@@ -0,0 +1,56 @@
+"""NumPy versions of the DEAP operators used by SimpleEA
+
+The operators work on the whole population at once: a population is a 2D integer array with one row of allele
+indices per individual. The statistical behavior matches the corresponding DEAP operators, but the random numbers
+come from a numpy.random.Generator instead of the random module.
+"""
+
+import numpy as np
+
+def sel_roulette(weights: np.ndarray, k: int, rng: np.random.Generator) -> np.ndarray:
+	"""Select k indices with probability proportional to the weights, like tools.selRoulette"""
+	order = np.argsort(-weights, kind="stable")
+	cum = np.cumsum(weights[order])
+	picks = np.searchsorted(cum, rng.random(k)*cum[-1], side="right")
+	# guard against rounding at the upper end
+	return order[np.minimum(picks, len(order)-1)]
+
+def cx_one_point(pop: np.ndarray, cxpb: float, rng: np.random.Generator) -> np.ndarray:
+	"""Mate consecutive pairs of rows with probability cxpb like tools.cxOnePoint, in place
+	
+	Returns a boolean array that indicates for each pair if the crossover took place.
+	"""
+	pair_count = len(pop)//2
+	mated = rng.random(pair_count) < cxpb
+	size = pop.shape[1]
+	if size < 2:
+		return mated
+	
+	first = np.flatnonzero(mated)*2
+	cx_points = rng.integers(1, size, size=len(first))
+	tail = np.arange(size)[np.newaxis, :] >= cx_points[:, np.newaxis]
+	
+	a = pop[first]
+	b = pop[first+1]
+	pop[first] = np.where(tail, b, a)
+	pop[first+1] = np.where(tail, a, b)
+	
+	return mated
+
+def mut_uniform_int(pop: np.ndarray, low: np.ndarray, up: np.ndarray, indpb: float, rng: np.random.Generator
+	) -> np.ndarray:
+	"""Replace each allele index with probability indpb by a random integer in [low, up] like tools.mutUniformInt
+	
+	low and up are either scalars or hold one value per column. The population is changed in place. Returns a boolean
+	array that indicates for each row if it was altered.
+	"""
+	rows, cols = np.nonzero(rng.random(pop.shape) < indpb)
+	# only draw new values for the selected positions
+	new_values = rng.integers(np.broadcast_to(low, pop.shape[1:])[cols], np.broadcast_to(up, pop.shape[1:])[cols],
+		endpoint=True)
+	changed = new_values != pop[rows, cols]
+	pop[rows[changed], cols[changed]] = new_values[changed]
+	
+	altered = np.zeros(len(pop), dtype=bool)
+	altered[rows[changed]] = True
+	return altered
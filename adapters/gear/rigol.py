@@ -11,6 +11,7 @@ import pyvisa
 
 from domain.interfaces import IdentifiableHW, MeasureTimeout, Meter
 from domain.model import OutputData
+from domain.profiling import PROFILER
 from domain.request_model import Parameter, ResponseObject, RequestObject
 
 @dataclass
@@ -241,16 +242,18 @@ class OsciDS1102E(Meter, IdentifiableHW):
 		return ResponseObject()
 	
 	def measure(self, request: RequestObject) -> ResponseObject:
-		start_time = time.perf_counter()
-		while self.get_status() not in ("T'D", "STOP"):
-			if request.measure_timeout is not None and time.perf_counter() - start_time > request.measure_timeout:
-				raise MeasureTimeout()
-			time.sleep(self._delay)
-		
-		while self.get_status() != "STOP":
-			time.sleep(self._delay)
-		
-		raw_data = self._read_data(self._data_chan)
+		with PROFILER.section("osci_wait"):
+			start_time = time.perf_counter()
+			while self.get_status() not in ("T'D", "STOP"):
+				if request.measure_timeout is not None and time.perf_counter() - start_time > request.measure_timeout:
+					raise MeasureTimeout()
+				time.sleep(self._delay)
+		
+			while self.get_status() != "STOP":
+				time.sleep(self._delay)
+		
+		with PROFILER.section("transfer"):
+			raw_data = self._read_data(self._data_chan)
 
 		return ResponseObject(measurement=self._prep(raw_data))
 
@@ -1,11 +1,14 @@
 import datetime
+import os
+import posixpath
 import re
+import time
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from functools import partial
 from operator import attrgetter, itemgetter, methodcaller
 from types import TracebackType
-from typing import Any, Callable, Iterable, List, Mapping, NewType, Optional, Sequence, Tuple, Type
+from typing import Any, Callable, Dict, Iterable, List, Mapping, NewType, Optional, Sequence, Tuple, Type
 
 import h5py
 import numpy as np
@@ -77,6 +80,32 @@ class ParamAim:
 	compress: str = "gzip"
 	comp_opt: int = 7
 	shuffle: bool = False
+	# for datasets: maximum number of entries per sidecar file; None stores all entries in the main file
+	shard_len: Optional[int] = None
+
+def aim_path(pa: ParamAim) -> str:
+	"""Full path of the entity described by a ParamAim"""
+	return posixpath.join(pa.h5_path, pa.h5_name)
+
+def virtual_source_files(ds: h5py.Dataset) -> List[str]:
+	"""Names of the source files of a virtual dataset in mapping order
+	
+	Unlike h5py.Dataset.virtual_sources, this also works for mappings with unlimited selections.
+	"""
+	dcpl = ds.id.get_create_plist()
+	return [dcpl.get_virtual_filename(i) for i in range(dcpl.get_virtual_count())]
+
+@dataclass
+class ShardState:
+	"""Bookkeeping for a dataset whose entries are distributed over sidecar files"""
+	aim: ParamAim
+	filenames: List[str] = field(default_factory=list)
+	counts: List[int] = field(default_factory=list)
+	current: Optional[h5py.File] = None
+	
+	@property
+	def ds_path(self) -> str:
+		return aim_path(self.aim)
 
 MetaEntryMap = NewType("MetaEntryMap", Mapping[str, List[MetaEntry]])
 ParamAimMap = NewType("ParamAimMap", Mapping[str, List[ParamAim]])
@@ -86,10 +115,21 @@ class HDF5Sink(DataSink):
 		write_map: ParamAimMap,
 		metadata: MetaEntryMap={},
 		filename: Optional[str]=None,
-		mode: str="x"
+		mode: str="x",
+		checkpoint_sources: Iterable[str]=tuple(),
+		swmr: bool=False,
+		flush_interval: float=1.0,
 	) -> None:
 		"""
 		mode: mode for opening the file (r, r+, w, w-, x, a)
+		checkpoint_sources: after writing data of these sources, all data is flushed to the file; if the writing
+			process dies, the file is left in the state of the last checkpoint
+		swmr: write the file in single writer multiple reader mode, i.e. other processes can read the file while it
+			is written; if there are checkpoint sources, SWMR mode starts after the first checkpoint, else at opening;
+			as no attributes can be created in SWMR mode, attributes from the write map written after the start are
+			only written when the sink is closed
+		flush_interval: in SWMR mode, the datasets are flushed at least every flush_interval seconds to make new
+			entries visible to readers
 		"""
 		if filename is None:
 			cur_date = datetime.datetime.now(datetime.timezone.utc)
@@ -102,6 +142,18 @@ class HDF5Sink(DataSink):
 		# (source, data_dict) -> (group, data_type, multiple, dataset_or_attrs)
 		self._write_map = write_map
 		self._metadata = metadata
+		self._checkpoint_sources = set(checkpoint_sources)
+		# datasets distributed over sidecar files; key is the path of the dataset
+		self._shards: Dict[str, ShardState] = {}
+		self._swmr = swmr
+		self._swmr_started = False
+		self._flush_interval = flush_interval
+		self._last_flush = 0
+		# attributes written while in SWMR mode: (h5_path, name, value, data_type)
+		self._deferred_attrs: List[Tuple[str, str, Any, Optional[type]]] = []
+		
+		if swmr and any(pa.shard_len is not None for pa_list in write_map.values() for pa in pa_list):
+			raise ValueError("sharded datasets are not supported in SWMR mode")
 	
 	def prepare_structure(self) -> None:
 		"""Prepare groups and datasets"""
@@ -140,21 +192,160 @@ class HDF5Sink(DataSink):
 							)
 						
 					except KeyError:
-						ds = grp.create_dataset(
-							pa.h5_name,
-							shape=(0, *pa.shape),
-							dtype=pa.data_type,
-							maxshape=(None, *pa.shape),
-							compression = pa.compress,
-							compression_opts = pa.comp_opt,
-							shuffle = pa.shuffle,
-						)
+						if pa.shard_len is None:
+							ds = self.create_dataset(grp, pa)
+						else:
+							ds = self._create_virtual_dataset(grp, pa, [])
+					
+					if pa.shard_len is not None:
+						self._register_shards(pa, ds)
 		
 		for entity_path in implied_entities:
 			if entity_path not in self._hdf5_file:
 				# every entity that is not yet created has to be a group
 				self._hdf5_file.create_group(entity_path)
 	
+	@staticmethod
+	def create_dataset(grp: h5py.Group, pa: ParamAim) -> h5py.Dataset:
+		"""Create an empty, resizable dataset as described by a ParamAim"""
+		return grp.create_dataset(
+			pa.h5_name,
+			shape=(0, *pa.shape),
+			dtype=pa.data_type,
+			maxshape=(None, *pa.shape),
+			compression = pa.compress,
+			compression_opts = pa.comp_opt,
+			shuffle = pa.shuffle,
+		)
+	
+	@staticmethod
+	def _create_virtual_dataset(grp: h5py.Group, pa: ParamAim, sources: List[Tuple[str, int]]) -> h5py.Dataset:
+		"""Create a virtual dataset that concatenates the entries of the sidecar files
+		
+		sources: file name and number of entries for each sidecar file; the last sidecar file is mapped without upper
+			bound, i.e. the virtual dataset grows with it
+		"""
+		ds_path = aim_path(pa)
+		total = sum(c for _, c in sources)
+		layout = h5py.VirtualLayout(shape=(total, *pa.shape), dtype=pa.data_type, maxshape=(None, *pa.shape))
+		start = 0
+		for filename, count in sources[:-1]:
+			if count == 0:
+				continue
+			layout[start:start+count] = h5py.VirtualSource(filename, ds_path, shape=(count, *pa.shape))
+			start += count
+		
+		if len(sources) > 0:
+			# the high level interface can't select unlimited ranges of empty datasets
+			filename, count = sources[-1]
+			zeros = (0, )*len(pa.shape)
+			unlimited = (h5py.h5s.UNLIMITED, *(1, )*len(pa.shape))
+			block = (1, *pa.shape)
+			v_space = h5py.h5s.create_simple((total, *pa.shape), (h5py.h5s.UNLIMITED, *pa.shape))
+			v_space.select_hyperslab((start, *zeros), unlimited, block=block)
+			src_space = h5py.h5s.create_simple((count, *pa.shape), (h5py.h5s.UNLIMITED, *pa.shape))
+			src_space.select_hyperslab((0, *zeros), unlimited, block=block)
+			layout.dcpl.set_virtual(v_space, filename.encode("utf-8"), ds_path.encode("utf-8"), src_space)
+		
+		return grp.create_virtual_dataset(pa.h5_name, layout)
+	
+	def _register_shards(self, pa: ParamAim, ds: h5py.Dataset) -> None:
+		"""Set up the bookkeeping for a sharded dataset, including already existing sidecar files"""
+		state = ShardState(pa)
+		if state.ds_path in self._shards:
+			return
+		
+		if not ds.is_virtual:
+			raise InvalidStructure(f"sharded dataset '{pa.h5_name}' has to be a virtual dataset")
+		
+		for filename in virtual_source_files(ds):
+			state.filenames.append(filename)
+			with h5py.File(self._sidecar_path(filename), "r") as sidecar:
+				state.counts.append(sidecar[state.ds_path].shape[0])
+		
+		self._shards[state.ds_path] = state
+	
+	def _sidecar_path(self, filename: str) -> str:
+		"""Path of a sidecar file; sidecar files are placed next to the main file"""
+		return os.path.join(os.path.dirname(self._hdf5_filename), filename)
+	
+	def sidecar_name(self, ds_path: str, index: int) -> str:
+		"""File name of the sidecar file with a specific index for a dataset"""
+		base = os.path.splitext(os.path.basename(self._hdf5_filename))[0]
+		ds_part = ds_path.strip("/").replace("/", ".")
+		return f"{base}.{ds_part}.{index:04d}.h5"
+	
+	def _current_shard(self, state: ShardState) -> h5py.Dataset:
+		"""Return the dataset in the sidecar file that takes the next entry
+		
+		If the current sidecar file is full, it is closed and a new one is created.
+		"""
+		if state.current is None and len(state.filenames) > 0 and state.counts[-1] < state.aim.shard_len:
+			# continue last sidecar file of an existing file; remap it as older files may have mapped it with a fixed
+			# size
+			state.current = h5py.File(self._sidecar_path(state.filenames[-1]), "a")
+			self._update_virtual(state)
+		
+		if state.current is not None:
+			ds = state.current[state.ds_path]
+			if ds.shape[0] < state.aim.shard_len:
+				return ds
+			
+			state.current.close()
+			state.current = None
+		
+		filename = self.sidecar_name(state.ds_path, len(state.filenames))
+		state.current = h5py.File(self._sidecar_path(filename), "x" if self._mode in ("x", "w-") else "w")
+		state.filenames.append(filename)
+		state.counts.append(0)
+		grp = state.current.require_group(state.aim.h5_path)
+		ds = self.create_dataset(grp, state.aim)
+		# fix the size of the completed sidecar file and map the new one
+		self._update_virtual(state)
+		return ds
+	
+	def _update_virtual(self, state: ShardState) -> None:
+		"""Recreate the virtual dataset in the main file with the current list of sidecar files
+		
+		Only required when a sidecar file is added; new entries of the last sidecar file become visible without it.
+		"""
+		grp = self._hdf5_file[state.aim.h5_path]
+		old_ds = grp[state.aim.h5_name]
+		attrs = [(n, old_ds.attrs[n], old_ds.attrs.get_id(n).dtype) for n in old_ds.attrs]
+		del grp[state.aim.h5_name]
+		
+		new_ds = self._create_virtual_dataset(grp, state.aim, list(zip(state.filenames, state.counts)))
+		for name, value, dtype in attrs:
+			new_ds.attrs.create(name, value, dtype=dtype)
+	
+	def _write_sharded(self, state: ShardState, value: Any) -> None:
+		multiple = len(state.aim.shape) + 1 == len(np.shape(value))
+		count = len(value) if multiple else 1
+		done = 0
+		while done < count:
+			ds = self._current_shard(state)
+			part = min(state.aim.shard_len - ds.shape[0], count - done)
+			if multiple:
+				self.append_to_dataset(ds, value[done:done+part])
+			else:
+				self.append_to_dataset(ds, value)
+			done += part
+			state.counts[-1] = ds.shape[0]
+	
+	@staticmethod
+	def append_to_dataset(dataset: h5py.Dataset, value: Any) -> None:
+		"""Append a single or multiple entries to a resizable dataset"""
+		if len(dataset.shape) == len(np.shape(value)):
+			# multiple values
+			new_count = len(value)
+			new_shape = (dataset.shape[0]+new_count, *dataset.shape[1:])
+			dataset.resize(new_shape)
+			dataset[-new_count:] = value
+		else:
+			new_shape = (dataset.shape[0]+1, *dataset.shape[1:])
+			dataset.resize(new_shape)
+			dataset[-1] = value
+	
 	def _write_metadata(self) -> None:
 		for h5_path, meta_list in self._metadata.items():
 			entity = self._hdf5_file[h5_path]
@@ -165,20 +356,57 @@ class HDF5Sink(DataSink):
 		if self._hdf5_file is not None:
 			return
 		
-		self._hdf5_file = h5py.File(self._hdf5_filename, self._mode)
+		if self._swmr:
+			self._hdf5_file = h5py.File(self._hdf5_filename, self._mode, libver="latest")
+		else:
+			self._hdf5_file = h5py.File(self._hdf5_filename, self._mode)
+	
+	def flush(self) -> None:
+		"""Write all buffered data to the file(s)"""
+		for state in self._shards.values():
+			if state.current is None:
+				continue
+			state.current.flush()
+		
+		self._hdf5_file.flush()
+		self._last_flush = time.perf_counter()
 	
 	def close(self) -> None:
 		if self._hdf5_file is None:
 			return
+		
+		for state in self._shards.values():
+			if state.current is None:
+				continue
+			state.current.close()
+			state.current = None
+		self._shards = {}
+		
 		self._hdf5_file.close()
 		self._hdf5_file = None
+		self._swmr_started = False
+	
+		if len(self._deferred_attrs) > 0:
+			# SWMR mode ended -> attributes can be created again
+			with h5py.File(self._hdf5_filename, "r+", libver="latest") as hdf5_file:
+				for h5_path, name, value, data_type in self._deferred_attrs:
+					self.set_attr(hdf5_file[h5_path], name, value, data_type)
+			self._deferred_attrs = []
 	
 	def __enter__(self) -> "HDF5Sink":
 		self.open()
 		self.prepare_structure()
 		self._write_metadata()
+		if self._swmr and len(self._checkpoint_sources) == 0:
+			self._start_swmr()
 		return self
 	
+	def _start_swmr(self) -> None:
+		# all groups and datasets have to exist before SWMR mode is started
+		self._hdf5_file.swmr_mode = True
+		self._swmr_started = True
+		self.flush()
+	
 	def __exit__(self,
 		exc_type: Optional[Type[BaseException]],
 		exc_value: Optional[BaseException],
@@ -189,12 +417,7 @@ class HDF5Sink(DataSink):
 		return False
 	
 	def write(self, source: str, data_dict: Mapping[str, Any]) -> None:
-		try:
-			aim_list = self._write_map[source]
-		except KeyError:
-			return
-		
-		for pa in aim_list:
+		for pa in self._write_map.get(source, []):
 			try:
 				value = pa.alter([data_dict[n] for n in pa.names])
 			except IgnoreValue:
@@ -203,21 +426,22 @@ class HDF5Sink(DataSink):
 			
 			entity = self._hdf5_file[pa.h5_path]
 			
-			if pa.as_attr:
+			if pa.as_attr and self._swmr_started:
+				self._deferred_attrs.append((pa.h5_path, pa.h5_name, value, pa.data_type))
+			elif pa.as_attr:
 				self.set_attr(entity, pa.h5_name, value, pa.data_type)
+			elif pa.shard_len is not None:
+				self._write_sharded(self._shards[aim_path(pa)], value)
 			else:
-				dataset = entity[pa.h5_name]
-				if len(dataset.shape) == len(np.shape(value)):
-					# multiple values
-					new_count = len(value)
-					new_shape = (dataset.shape[0]+new_count, *dataset.shape[1:])
-					dataset.resize(new_shape)
-					dataset[-new_count:] = value
-				else:
-					new_shape = (dataset.shape[0]+1, *dataset.shape[1:])
-					dataset.resize(new_shape)
-					dataset[-1] = value
-				
+				self.append_to_dataset(entity[pa.h5_name], value)
+		
+		if source in self._checkpoint_sources and self._swmr and not self._swmr_started:
+			# attributes written up to the first checkpoint, e.g. the parameters of an EA, are already in the file
+			self._start_swmr()
+		elif source in self._checkpoint_sources or\
+			(self._swmr_started and time.perf_counter() - self._last_flush >= self._flush_interval):
+			self.flush()
+	
 	
 	@staticmethod
 	def set_attr(entity: h5py.HLObject, name: str, value: Any, data_type: Optional[type]=None) -> None:
@@ -331,8 +555,11 @@ class HDF5Sink(DataSink):
 		return meta_map
 	
 	@staticmethod
-	def extract_genes(grp: h5py.Group, bit_cls: Type[BitPos], h5_base_name: str="gene") -> List[Gene]:
-		"""Create genes based on data in HDF5 group that was stored according to create_gene_aims"""
+	def extract_genes(grp: h5py.Group, bit_cls: Callable[..., BitPos], h5_base_name: str="gene") -> List[Gene]:
+		"""Create genes based on data in HDF5 group that was stored according to create_gene_aims
+		
+		bit_cls is called with the integers of a bit, so it can also be a factory like IcecraftBitPosition.interned.
+		"""
 		gene_list = []
 		
 		for gene_name in sorted(grp):
@@ -346,7 +573,8 @@ class HDF5Sink(DataSink):
 			
 			gene_grp = grp[gene_name]
 			
-			bits = tuple(bit_cls(*b) for b in gene_grp.attrs["bits"])
+			# plain ints are faster to create and hash than numpy integers
+			bits = tuple(bit_cls(*b) for b in gene_grp.attrs["bits"].tolist())
 			
 			allele_type = gene_grp.attrs["allele_type"]
 			if allele_type == "AlleleList":
@@ -7,5 +7,5 @@ from .target import IcecraftDevice, HX8K_BOARD, IcecraftManager, MultiIcecraftMa
 from .inter_rep import PartConf
 from .meter import IcecraftEmbedMeter
 from .position_transformation import IcecraftPosTransLibrary
-from .representation import CarryData, CarryDataMap, IcecraftRep, IcecraftRepGen
+from .representation import CarryData, CarryDataMap, IcecraftRep, IcecraftRepGen, PruneStats
 from .xc6200 import XC6200Cell, XC6200Direction, XC6200Port, XC6200RepGen
@@ -1,10 +1,15 @@
 # module to provide access to chip database
 
-from dataclasses import dataclass, astuple
-from typing import Iterable, List, Dict, Union, Tuple, NewType
+import hashlib
+import importlib
+import importlib.util
+import os
 
-from adapters.icecraft.chip_data_utils import TileType, SegType, BitType, DriverType, NetData, ElementInterface, get_net_data_for_tile, seg_from_seg_kind
-from adapters.icecraft.chip_database import seg_kinds, drv_kinds, seg_tile_map, config_kinds, config_tile_map, colbufctrl_tile_map, lut_io_kinds, lut_io_tiles
+from dataclasses import dataclass, astuple, replace
+from functools import lru_cache
+from typing import Any, Callable, Iterable, List, Dict, Optional, Union, Tuple, NewType
+
+from adapters.icecraft.chip_data_utils import TileType, SegType, BitType, DriverType, NetData, ElementInterface, get_net_data_for_tile, seg_from_seg_kind, CHIP_DB_SECTIONS, DIGEST_SECTION, read_compact_chip_data, SOURCE_DIGEST_SECTION, text_digest
 from adapters.icecraft.misc import IcecraftPosition, IcecraftBitPosition
 from adapters.icecraft.config_item import ConfigItem, IndexedItem, ConnectionItem, NamedItem
 
@@ -27,23 +32,123 @@ class ConfigAssemblage:
 	ram_cascade: Tuple[NamedItem, ...] = tuple()
 	lut_io: Tuple[ElementInterface, ...] = tuple()
 
-# tile -> config_kind
-tile_to_config_kind_index = {IcecraftPosition(*t): k for k, tl in config_tile_map.items() for t in tl}
-# tile -> colbufctrl tile
-tile_to_colbufctrl = {IcecraftPosition(*t): IcecraftPosition(*c) for c, tl in colbufctrl_tile_map.items() for t in tl}
-# tile -> LUT IO kind
-tile_to_lut_io_kind_index = {IcecraftPosition(*t): i for i, tl in enumerate(lut_io_tiles) for t in tl}
+# the chip database is loaded section by section on first access; the compact database written by chip_data_gen is
+# preferred over the Python module chip_database unless it was generated from another version of the module
+COMPACT_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "chip_database.npz")
+
+_chip_db = {}
+
+DERIVED_SECTIONS: Dict[str, Callable[[], Any]] = {
+	# tile -> config_kind
+	"tile_to_config_kind_index": lambda: {
+		IcecraftPosition(*t): k for k, tl in chip_db("config_tile_map").items() for t in tl
+	},
+	# tile -> colbufctrl tile
+	"tile_to_colbufctrl": lambda: {
+		IcecraftPosition(*t): IcecraftPosition(*c) for c, tl in chip_db("colbufctrl_tile_map").items() for t in tl
+	},
+	# tile -> LUT IO kind
+	"tile_to_lut_io_kind_index": lambda: {
+		IcecraftPosition(*t): i for i, tl in enumerate(chip_db("lut_io_tiles")) for t in tl
+	},
+}
+
+def chip_db(name: str) -> Any:
+	"""Section of the chip database or a map derived from it; loaded on first access"""
+	try:
+		return _chip_db[name]
+	except KeyError:
+		pass
+	
+	if name in DERIVED_SECTIONS:
+		value = DERIVED_SECTIONS[name]()
+	elif name not in CHIP_DB_SECTIONS:
+		raise KeyError(f"Unknown section {name}")
+	elif use_compact_db():
+		value = read_compact_chip_data(COMPACT_DB_PATH, name)
+	else:
+		value = getattr(importlib.import_module("adapters.icecraft.chip_database"), name)
+	
+	_chip_db[name] = value
+	return value
+
+def chip_db_module_path() -> Optional[str]:
+	spec = importlib.util.find_spec("adapters.icecraft.chip_database")
+	if spec is None:
+		return None
+	return spec.origin
+
+@lru_cache(maxsize=None)
+def use_compact_db() -> bool:
+	"""Check if the compact database exists and matches the chip_database module
+	
+	The module is only hashed if it was modified after the compact database was written.
+	"""
+	if not os.path.exists(COMPACT_DB_PATH):
+		return False
+	
+	module_path = chip_db_module_path()
+	if module_path is None or os.path.getmtime(module_path) <= os.path.getmtime(COMPACT_DB_PATH):
+		return True
+	
+	try:
+		stored = read_compact_chip_data(COMPACT_DB_PATH, SOURCE_DIGEST_SECTION)
+	except KeyError:
+		stored = None
+	with open(module_path, "r") as module_file:
+		if stored == text_digest(module_file.read()):
+			return True
+	
+	print(f"Warning: {COMPACT_DB_PATH} is outdated, using chip_database instead; regenerate both with chip_data_gen")
+	return False
+
+@lru_cache(maxsize=None)
+def chip_db_digest() -> str:
+	"""Digest of the chip database in use
+	
+	The compact database stores its digest, so only the Python module or an old compact database without digest has
+	to be hashed completely.
+	"""
+	if use_compact_db():
+		try:
+			return read_compact_chip_data(COMPACT_DB_PATH, DIGEST_SECTION)
+		except KeyError:
+			path = COMPACT_DB_PATH
+	else:
+		path = chip_db_module_path()
+	
+	sha = hashlib.sha256()
+	with open(path, "rb") as db_file:
+		for block in iter(lambda: db_file.read(1<<20), b""):
+			sha.update(block)
+	return sha.hexdigest()
+
+def __getattr__(name: str) -> Any:
+	# keep the sections accessible as module attributes, e.g. chip_data.seg_kinds
+	if name in CHIP_DB_SECTIONS or name in DERIVED_SECTIONS:
+		return chip_db(name)
+	raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# tiles of the same kind are generated for this tile and then relocated
+KIND_ORIGIN = IcecraftPosition(0, 0)
+
+@lru_cache(maxsize=None)
+def get_tile_net_data(tile_pos: IcecraftPosition) -> Tuple[NetData, ...]:
+	"""Nets of a single tile; cached, as the NetData instances are immutable"""
+	return tuple(get_net_data_for_tile(chip_db("seg_kinds"), chip_db("drv_kinds"), astuple(tile_pos), chip_db("seg_tile_map")[astuple(tile_pos)]))
 
 def get_net_data(tiles: Iterable[IcecraftPosition]) -> List[NetData]:
 	nets = set()
 	for tile_pos in tiles:
-		tile_nets = get_net_data_for_tile(seg_kinds, drv_kinds, astuple(tile_pos), seg_tile_map[astuple(tile_pos)])
-		nets.update(tile_nets)
+		nets.update(get_tile_net_data(tile_pos))
 	
 	return sorted(nets)
 
 def get_seg_kind_examples() -> List[Tuple[SegType, TileType, DriverType]]:
 	"""get an example segment for every segment kind"""
+	seg_kinds = chip_db("seg_kinds")
+	drv_kinds = chip_db("drv_kinds")
+	seg_tile_map = chip_db("seg_tile_map")
 	seg_kind_to_tile = [[] for _ in range(len(seg_kinds))]
 	for tile in sorted(seg_tile_map):
 		for seg_ref in sorted(seg_tile_map[tile]):
@@ -63,28 +168,56 @@ def get_seg_kind_examples() -> List[Tuple[SegType, TileType, DriverType]]:
 	return examples
 
 def get_raw_config_data(tile: IcecraftPosition) -> Dict[str, Union[Tuple[NamedBitsType, ...], Tuple[MultiBitsType, ...], Tuple[RawLUTType, ...], ConDictType]]:
-	config_kind_index = tile_to_config_kind_index[tile]
-	return config_kinds[config_kind_index]
+	config_kind_index = chip_db("tile_to_config_kind_index")[tile]
+	return chip_db("config_kinds")[config_kind_index]
 
 def get_lut_io(tile: IcecraftPosition) -> Tuple[ElementInterface, ...]:
 	try:
-		kind_index = tile_to_lut_io_kind_index[tile]
+		kind_index = chip_db("tile_to_lut_io_kind_index")[tile]
 	except KeyError:
 		# no LUT IO for this tile
 		return tuple()
 	
 	raw_tile = astuple(tile)
-	kind = lut_io_kinds[kind_index]
+	kind = chip_db("lut_io_kinds")[kind_index]
 	lut_io = tuple(
 		ElementInterface(tuple((*raw_tile, name) for name in single_lut[0]), tuple((*raw_tile, name) for name in single_lut[1])) for single_lut in kind
 	)
 	return lut_io
 
 def bits_to_bit_positions(tile_pos: IcecraftPosition, bits: Iterable[BitType]) -> Tuple[IcecraftBitPosition, ...]:
-	return tuple(IcecraftBitPosition.from_tile(tile_pos, *b) for b in bits)
+	return tuple(IcecraftBitPosition.interned(tile_pos.x, tile_pos.y, *b) for b in bits)
 
 def get_config_items(tile: IcecraftPosition) -> ConfigAssemblage:
-	raw_groups = get_raw_config_data(tile)
+	"""Config items of a tile
+	
+	A new ConfigAssemblage is returned on every call, but the config items are cached and shared between calls.
+	"""
+	return replace(get_tile_config_items(tile))
+
+@lru_cache(maxsize=None)
+def get_tile_config_items(tile: IcecraftPosition) -> ConfigAssemblage:
+	"""Config items of a tile relocated from the cached items of its config kind"""
+	kind_items = get_kind_config_items(chip_db("tile_to_config_kind_index")[tile])
+	
+	def relocate(item):
+		return replace(item, bits=tuple(IcecraftBitPosition.interned(tile.x, tile.y, b.group, b.index) for b in item.bits))
+	
+	return ConfigAssemblage(
+		connection=tuple(relocate(i) for i in kind_items.connection),
+		tile=tuple(relocate(i) for i in kind_items.tile),
+		col_buf_ctrl=tuple(relocate(i) for i in kind_items.col_buf_ctrl),
+		lut=tuple(tuple(relocate(i) for i in l) for l in kind_items.lut),
+		ram_config=tuple(relocate(i) for i in kind_items.ram_config),
+		ram_cascade=tuple(relocate(i) for i in kind_items.ram_cascade),
+		lut_io=get_lut_io(tile),
+	)
+
+@lru_cache(maxsize=None)
+def get_kind_config_items(config_kind_index: int) -> ConfigAssemblage:
+	"""Config items of a config kind with the bit positions located in KIND_ORIGIN; without LUT IO"""
+	tile = KIND_ORIGIN
+	raw_groups = chip_db("config_kinds")[config_kind_index]
 	item_dict = ConfigAssemblage()
 	for grp_name, grp_data in raw_groups.items():
 		if grp_name == "connection":
@@ -122,14 +255,12 @@ def get_config_items(tile: IcecraftPosition) -> ConfigAssemblage:
 		else:
 			raise ValueError(f"Unkown group {grp_name}")
 	
-	item_dict.lut_io = get_lut_io(tile)
-	
 	return item_dict
 
 def get_colbufctrl(tiles: Iterable[IcecraftPosition]) -> List[IcecraftPosition]:
 	colbufctrl_set = set()
 	for tile in tiles:
-		cbc = tile_to_colbufctrl[tile]
+		cbc = chip_db("tile_to_colbufctrl")[tile]
 		colbufctrl_set.add(cbc)
 	
 	return sorted(colbufctrl_set)
@@ -1,5 +1,5 @@
 #!/usr/bin/env python3
-"""Script to generate chip_database.py
+"""Script to generate chip_database.py and its compact form chip_database.npz
 
 The main function extracts the architecture information of iCE40 8k chips
 from icebox and converts them to Python data structures. At the moment
@@ -11,10 +11,15 @@ pattern and a map from the concrete element to the corresponding kind
 have to be stored.
 """
 
+import io
 import sys
+import argparse
 import re
+import pickle
+import hashlib
 import functools
-from typing import Iterable, Set, Tuple, List, Iterable, Mapping, Any, TextIO, Dict
+import multiprocessing as mp
+from typing import Iterable, Set, Tuple, List, Iterable, Mapping, Any, Optional, TextIO, Dict, Callable, Sequence
 from dataclasses import dataclass, field
 
 sys.path.append("/usr/local/bin")
@@ -22,10 +27,134 @@ import icebox
 
 try:
 	# execution as script
-	from adapters.icecraft.chip_data_utils import TileType, SegType, SegRefType, ConfigKindType, ConfigEntryType, DriverType, InterfaceType, UNCONNECTED_NAME
+	from adapters.icecraft.chip_data_utils import TileType, SegType, SegRefType, ConfigKindType, ConfigEntryType, DriverType, InterfaceType, UNCONNECTED_NAME, CHIP_DB_SECTIONS, text_digest, write_compact_chip_data
 except ModuleNotFoundError:
 	# import as module in tests
-	from adapters.icecraft.chip_data_utils import TileType, SegType, SegRefType, ConfigKindType, ConfigEntryType, DriverType, InterfaceType, UNCONNECTED_NAME
+	from adapters.icecraft.chip_data_utils import TileType, SegType, SegRefType, ConfigKindType, ConfigEntryType, DriverType, InterfaceType, UNCONNECTED_NAME, CHIP_DB_SECTIONS, text_digest, write_compact_chip_data
+
+# function and iceconfig of the current map_tiles call; inherited by the forked worker processes
+_TILE_JOB: Optional[Tuple[Callable[..., Any], icebox.iceconfig]] = None
+
+def _tile_worker(job: Tuple[TileType, tuple]) -> Any:
+	func, ic = _TILE_JOB
+	tile_pos, args = job
+	return func(ic, tile_pos, *args)
+
+def extractor_version() -> str:
+	"""Hash of the icebox version and of the code extracting the chip data
+	
+	The icebox module itself is hashed, as icebox has no version number. The
+	tile database of icebox is in a separate module, so updates of it are
+	not covered.
+	"""
+	sha = hashlib.sha256()
+	sha.update(repr(getattr(icebox, "__version__", None)).encode("utf-8"))
+	for module in [icebox, sys.modules[__name__], sys.modules[write_compact_chip_data.__module__]]:
+		path = getattr(module, "__file__", None)
+		if not isinstance(path, str):
+			continue
+		with open(path, "rb") as src_file:
+			sha.update(src_file.read())
+	
+	return sha.hexdigest()
+
+class TileCache:
+	"""Results of the per tile extraction phases of a previous run.
+	
+	A result is reused as long as the icebox entries of the tile, the
+	additional arguments and the version, i.e. the icebox code and the
+	extraction code, are unchanged. After an update of the icebox database
+	only the tiles with changed entries have to be processed again.
+	"""
+	def __init__(self, filename: Optional[str]=None, version: Optional[str]=None) -> None:
+		"""version: defaults to extractor_version()"""
+		self._filename = filename
+		self._version = extractor_version() if version is None else version
+		self._entries = {}
+		self.hits = 0
+		self.misses = 0
+		
+		if filename is not None:
+			try:
+				with open(filename, "rb") as cache_file:
+					self._entries = pickle.load(cache_file)
+			except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+				pass
+	
+	def digest(self, ic: icebox.iceconfig, tile_pos: TileType, args: tuple) -> str:
+		"""Hash of the icebox entries of a tile, the additional arguments and the version"""
+		text = repr((self._version, ic.tile_db(*tile_pos), args))
+		return hashlib.sha256(text.encode("utf-8")).hexdigest()
+	
+	def lookup(self, phase: str, tile_pos: TileType, digest: str) -> Tuple[bool, Any]:
+		try:
+			prev_digest, result = self._entries[(phase, tile_pos)]
+		except KeyError:
+			prev_digest, result = None, None
+		
+		if prev_digest != digest:
+			self.misses += 1
+			return False, None
+		
+		self.hits += 1
+		return True, result
+	
+	def store(self, phase: str, tile_pos: TileType, digest: str, result: Any) -> None:
+		self._entries[(phase, tile_pos)] = (digest, result)
+	
+	def save(self) -> None:
+		if self._filename is None:
+			return
+		
+		with open(self._filename, "wb") as cache_file:
+			pickle.dump(self._entries, cache_file, protocol=pickle.HIGHEST_PROTOCOL)
+
+def map_tiles(
+	func: Callable[..., Any],
+	ic: icebox.iceconfig,
+	jobs: Sequence[Tuple[TileType, tuple]],
+	processes: int=1,
+	tile_cache: Optional[TileCache]=None
+) -> List[Any]:
+	"""Call func(ic, tile_pos, *args) for every job (tile_pos, args).
+	
+	The results are returned in the order of the jobs, independent of the
+	number of processes, so merging them in order is deterministic.
+	
+	Results of tiles with unchanged icebox entries are taken from the
+	tile_cache.
+	"""
+	global _TILE_JOB
+	phase = func.__name__
+	results = [None]*len(jobs)
+	todo = []
+	digests = []
+	for index, (tile_pos, args) in enumerate(jobs):
+		if tile_cache is not None:
+			digest = tile_cache.digest(ic, tile_pos, args)
+			found, results[index] = tile_cache.lookup(phase, tile_pos, digest)
+			if found:
+				continue
+			digests.append(digest)
+		todo.append(index)
+	
+	todo_jobs = [jobs[i] for i in todo]
+	if processes <= 1 or len(todo_jobs) <= 1 or "fork" not in mp.get_all_start_methods():
+		computed = [func(ic, t, *a) for t, a in todo_jobs]
+	else:
+		_TILE_JOB = (func, ic)
+		try:
+			with mp.get_context("fork").Pool(processes) as pool:
+				computed = pool.map(_tile_worker, todo_jobs, chunksize=max(1, len(todo_jobs)//(4*processes)))
+		finally:
+			_TILE_JOB = None
+	
+	for pos, (index, result) in enumerate(zip(todo, computed)):
+		results[index] = result
+		if tile_cache is not None:
+			tile_cache.store(phase, jobs[index][0], digests[pos], result)
+	
+	return results
 
 def get_inner_tiles(ic: icebox.iceconfig) -> Set[TileType]:
 	"""Get set of inner tiles for an iceconfig."""
@@ -125,10 +254,15 @@ def get_destination_names(ic: icebox.iceconfig, x: int, y: int) -> Set[str]:
 	
 	return dst_names
 
-def get_driver_indices(ic: icebox.iceconfig, segment: SegType) -> DriverType:
+def get_tile_destination_names(ic: icebox.iceconfig, tile_pos: TileType) -> Set[str]:
+	"""Per tile version of get_destination_names for map_tiles."""
+	return get_destination_names(ic, *tile_pos)
+
+def get_driver_indices(ic: icebox.iceconfig, segment: SegType, dst_map: Optional[Mapping[TileType, Set[str]]]=None) -> DriverType:
 	"""Collect information regarding the potential drivers of a net.
 	
-	The net is represented by its segment.
+	The net is represented by its segment. If given, the destination names
+	are taken from dst_map instead of being extracted from ic.
 	"""
 	hard_drivers = []
 	config_drivers = []
@@ -140,7 +274,11 @@ def get_driver_indices(ic: icebox.iceconfig, segment: SegType) -> DriverType:
 		
 		# check configurable driver
 		# current net is destination
-		if net_name in get_destination_names(ic, x, y):
+		if dst_map is None:
+			dst_names = get_destination_names(ic, x, y)
+		else:
+			dst_names = dst_map[(x, y)]
+		if net_name in dst_names:
 			config_drivers.append(i)
 		
 		# padin is configured by extra bits, even so this tile is the driver in the end
@@ -156,7 +294,12 @@ def get_driver_indices(ic: icebox.iceconfig, segment: SegType) -> DriverType:
 	
 	return len(hard_drivers)>0, tuple(hard_drivers + config_drivers)
 
-def get_seg_kinds_and_drivers(ic: icebox.iceconfig, all_segments: Iterable[SegType]) -> Tuple[Iterable[SegType], Mapping[TileType, Set[SegRefType]], Iterable[DriverType]]:
+def get_seg_kinds_and_drivers(
+	ic: icebox.iceconfig,
+	all_segments: Iterable[SegType],
+	processes: int=1,
+	tile_cache: Optional[TileCache]=None
+) -> Tuple[Iterable[SegType], Mapping[TileType, Set[SegRefType]], Iterable[DriverType]]:
 	"""Generate segement kind, tile to segment kind map and driver kind for a group of segments.
 	
 	The map assigns every tile a set of tuples of segment kind index and
@@ -188,7 +331,15 @@ def get_seg_kinds_and_drivers(ic: icebox.iceconfig, all_segments: Iterable[SegTy
 		(1, 2): {(0, 0)}, (2, 2): {(0, 1)},
 		(2, 3): {(0, 0)}, (3, 3): {(0, 1)},
 	}
+	
+	The destination names of the tiles are extracted by processes worker
+	processes.
 	"""
+	all_segments = list(all_segments)
+	tiles = sorted({(x, y) for s in all_segments for x, y, _ in s})
+	dst_lists = map_tiles(get_tile_destination_names, ic, [(t, ()) for t in tiles], processes, tile_cache)
+	dst_map = dict(zip(tiles, dst_lists))
+	
 	# kinds of segments
 	seg_kinds = []
 	# drv of segment kinds
@@ -204,7 +355,7 @@ def get_seg_kinds_and_drivers(ic: icebox.iceconfig, all_segments: Iterable[SegTy
 		base = sorted_seg_group[0]
 		
 		seg_kind = tuple([(x-base[0], y-base[1], r) for x, y, r in sorted_seg_group])
-		drivers = get_driver_indices(ic, sorted_seg_group)
+		drivers = get_driver_indices(ic, sorted_seg_group, dst_map)
 		
 		try:
 			seg_kind_index = seg_kind_map[seg_kind]
@@ -247,38 +398,72 @@ def add_config_set(
 	
 	config_tile_map.setdefault(config_kind_index, list()).append(tile_pos)
 
-def get_config_data(ic: icebox.iceconfig, tiles: Iterable[TileType]) -> Tuple[List[ConfigKindType], Mapping[int, List[TileType]]]:
+def get_tile_config_set(ic: icebox.iceconfig, tile_pos: TileType) -> Set[ConfigEntryType]:
+	"""Get the config entries of a tile."""
+	config_set = set()
+	for entry in ic.tile_db(*tile_pos):
+		if not ic.tile_has_entry(*tile_pos, entry):
+			print("Tile ({},{}) has no entry {}".format(*tile_pos, entry))
+			continue
+			
+		config_set.add((tuple(entry[0]), *entry[1:]))
+	
+	return config_set
+
+def get_config_data(
+	ic: icebox.iceconfig,
+	tiles: Iterable[TileType],
+	processes: int=1,
+	tile_cache: Optional[TileCache]=None
+) -> Tuple[List[ConfigKindType], Mapping[int, List[TileType]]]:
 	"""Generate the config kinds and the mapping from config kind to
 	tile for a group of tiles.
 	
 	The map assigns every config kind index a list of tiles that comply
 	to that config kind.
+	
+	The config entries of the tiles are extracted by processes worker
+	processes and merged in the order of the tiles.
 	"""
 	config_kind_list = []
 	config_kind_map = {}
 	config_tile_map = {}
 	
-	for tile_pos in sorted(tiles):
-		tile_db = ic.tile_db(*tile_pos)
-		
-		config_set = set()
-		for entry in tile_db:
-			if not ic.tile_has_entry(*tile_pos, entry):
-				print("Tile ({},{}) has no entry {}".format(*tile_pos, entry))
-				continue
-			
-			config_set.add((tuple(entry[0]), *entry[1:]))
-		
+	tiles = sorted(tiles)
+	config_sets = map_tiles(get_tile_config_set, ic, [(t, ()) for t in tiles], processes, tile_cache)
+	for tile_pos, config_set in zip(tiles, config_sets):
 		add_config_set(config_kind_list, config_kind_map, config_tile_map, tile_pos, config_set)
 	
 	return config_kind_list, config_tile_map
 
+def get_tile_net_config_set(ic: icebox.iceconfig, tile_pos: TileType, nets: Tuple[str, ...]) -> Set[ConfigEntryType]:
+	"""Get the buffer and routing entries of a tile that drive one of the nets."""
+	net_set = set(nets)
+	config_set = set()
+	for entry in ic.tile_db(*tile_pos):
+		# important for io tiles as the spans differ between left/right and top/bottom
+		if not ic.tile_has_entry(*tile_pos, entry):
+			#print(f"Tile {tile_pos} has no entry {entry}")
+			continue
+		
+		if entry[1] not in ("buffer", "routing"):
+			continue
+		
+		if entry[3] not in net_set:
+			continue
+		
+		config_set.add((tuple(entry[0]), *entry[1:]))
+	
+	return config_set
+
 def get_net_config_data(
 	ic: icebox.iceconfig,
 	seg_tile_map: Mapping[TileType, SegRefType],
 	seg_kinds: List[SegType],
 	config_kind_list: List[ConfigKindType],
-	config_tile_map: Mapping[int, List[TileType]]
+	config_tile_map: Mapping[int, List[TileType]],
+	processes: int=1,
+	tile_cache: Optional[TileCache]=None
 ) -> None:
 	"""
 	Update config_tile_map and if necessary config_kind_list with 
@@ -293,27 +478,11 @@ def get_net_config_data(
 	configuration.
 	"""
 	config_kind_map = {c: i for i, c in enumerate(config_kind_list)}
-	for tile_pos in sorted(seg_tile_map):
-		# get requested nets
-		nets = set(seg_kinds[s][r][2] for s, r in seg_tile_map[tile_pos])
-		#print(f"{tile_pos} ({len(nets)}): {list(nets)[:5]}")
-		tile_db = ic.tile_db(*tile_pos)
-		
-		config_set = set()
-		for entry in tile_db:
-			# important for io tiles as the spans differ between left/right and top/bottom
-			if not ic.tile_has_entry(*tile_pos, entry):
-				#print(f"Tile {tile_pos} has no entry {entry}")
-				continue
-			
-			if entry[1] not in ("buffer", "routing"):
-				continue
-			
-			if entry[3] not in nets:
-				continue
-			
-			config_set.add((tuple(entry[0]), *entry[1:]))
-		
+	tiles = sorted(seg_tile_map)
+	# requested nets
+	jobs = [(t, (tuple(sorted(set(seg_kinds[s][r][2] for s, r in seg_tile_map[t]))), )) for t in tiles]
+	config_sets = map_tiles(get_tile_net_config_set, ic, jobs, processes, tile_cache)
+	for tile_pos, config_set in zip(tiles, config_sets):
 		add_config_set(config_kind_list, config_kind_map, config_tile_map, tile_pos, config_set)
 
 def sort_net_data(seg_kinds: List[SegType], seg_tile_map: Mapping[TileType, SegRefType], drv_kinds: List[DriverType]) -> Tuple[List[SegType], Mapping[TileType, SegRefType], List[DriverType]]:
@@ -465,10 +634,36 @@ def write_dict_iterable(chip_file: TextIO, dict_iterable: Dict[Any, Iterable[Any
 	
 	chip_file.write(f"{indent*level}}}")
 
-def write_chip_data(chip_file: TextIO) -> None:
-	"""Write chip data of iCE40 8k to a text IO stream."""
+def write_chip_data(
+	chip_file: TextIO,
+	compact_filename: Optional[str]=None,
+	processes: int=1,
+	cache_filename: Optional[str]=None
+) -> None:
+	"""Write chip data of iCE40 8k to a text IO stream.
+	
+	If compact_filename is given, the data is also written as compact database that can be loaded section by section.
+	
+	The per tile extraction runs in processes worker processes. If cache_filename is given, the per tile results are
+	stored in that file and only tiles with changed icebox entries are processed in the next run.
+	"""
+	if compact_filename is not None:
+		text_io = io.StringIO()
+		write_chip_data(text_io, processes=processes, cache_filename=cache_filename)
+		text = text_io.getvalue()
+		chip_file.write(text)
+		# the compact database has to be newer, else the module is hashed to check it on loading
+		chip_file.flush()
+		
+		# evaluate the module to get exactly the data of the Python version
+		module_data = {}
+		exec(text, module_data)
+		write_compact_chip_data(compact_filename, {n: module_data[n] for n in CHIP_DB_SECTIONS}, text_digest(text))
+		return
+	
 	ic = icebox.iceconfig()
 	ic.setup_empty_8k()
+	tile_cache = TileCache(cache_filename)
 	
 	inner_tiles = get_inner_tiles(ic)
 	inner_segs = get_segments(ic, inner_tiles)
@@ -479,7 +674,7 @@ def write_chip_data(chip_file: TextIO) -> None:
 	
 	inner_segs = fix_known_issues(ic, inner_segs)
 	
-	seg_kinds, seg_tile_map, drv_kinds = get_seg_kinds_and_drivers(ic, inner_segs)
+	seg_kinds, seg_tile_map, drv_kinds = get_seg_kinds_and_drivers(ic, inner_segs, processes, tile_cache)
 	seg_kinds, seg_tile_map, drv_kinds = sort_net_data(seg_kinds, seg_tile_map, drv_kinds)
 	#for tile_pos in seg_tile_map:
 	#	if tile_pos[0] in (0, 33) or tile_pos[1] in (0, 33):
@@ -490,12 +685,13 @@ def write_chip_data(chip_file: TextIO) -> None:
 	name_list = sorted(name_set)
 	name_map = {n: i for i, n in enumerate(name_list)}
 	
-	config_kind_list, config_tile_map = get_config_data(ic, inner_tiles)
+	config_kind_list, config_tile_map = get_config_data(ic, inner_tiles, processes, tile_cache)
 	
 	# find routing info in outer tiles
 	io_tile_map = {k: v for k, v in seg_tile_map.items() if k[0] in (0, 33) or k[1] in (0, 33)}
 	o = len(config_kind_list)
-	get_net_config_data(ic, io_tile_map, seg_kinds, config_kind_list, config_tile_map)
+	get_net_config_data(ic, io_tile_map, seg_kinds, config_kind_list, config_tile_map, processes, tile_cache)
+	tile_cache.save()
 	#print(f"new: {o}-{len(config_kind_list)-1}:\n{config_kind_list[o:]}")
 	
 	config_data_list = []
@@ -610,5 +806,10 @@ def write_chip_data(chip_file: TextIO) -> None:
 	chip_file.write("\n\n")
 
 if __name__ == "__main__":
+	arg_parser = argparse.ArgumentParser(description="Generate chip_database.py and chip_database.npz")
+	arg_parser.add_argument("-p", "--processes", type=int, default=mp.cpu_count(), help="number of worker processes")
+	arg_parser.add_argument("-c", "--cache", help="file with per tile results of the previous run")
+	args = arg_parser.parse_args()
+	
 	with open("chip_database.py", "w") as chip_file:
-		write_chip_data(chip_file)
+		write_chip_data(chip_file, "chip_database.npz", args.processes, args.cache)
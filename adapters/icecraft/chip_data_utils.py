@@ -1,11 +1,27 @@
 # basic functions used for handling the chip data
 # does not depend on other data classes (e.g. IcecraftPosition)
 
-from typing import Iterable, Set, Tuple, List, Iterable, Mapping, Any, NewType, TextIO, Dict
+import hashlib
+import pickle
+
+from typing import Iterable, Set, Tuple, List, Iterable, Mapping, Any, NewType, Optional, TextIO, Dict
 from dataclasses import dataclass
 
+import numpy as np
+
 UNCONNECTED_NAME = "UNCONNECTED"
 
+# sections of the chip database
+CHIP_DB_SECTIONS = (
+	"seg_kinds", "drv_kinds", "seg_tile_map", "config_kinds", "config_tile_map", "colbufctrl_tile_map", "lut_io_kinds",
+	"lut_io_tiles"
+)
+
+# section of the compact chip database holding a digest of the other sections
+DIGEST_SECTION = "digest"
+# section of the compact chip database holding the digest of the chip_database module it was generated with
+SOURCE_DIGEST_SECTION = "source_digest"
+
 SegEntryType = NewType("SegEntryType", Tuple[int, int, str])
 SegType = NewType("SegType", Tuple[SegEntryType, ...])
 TileType = NewType("TileType", Tuple[int, int])
@@ -55,3 +71,30 @@ def get_net_data_for_tile(seg_kinds: List[SegType], drv_kinds: List[DriverType],
 		nets.append(net)
 	
 	return nets
+
+def text_digest(text: str) -> str:
+	return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def write_compact_chip_data(filename: str, sections: Mapping[str, Any], source_digest: Optional[str]=None) -> None:
+	"""Write the sections of the chip database to a compressed NumPy .npz file
+	
+	Each section is stored as separate array of pickled bytes, so single sections can be loaded without reading the
+	others. A digest of all sections is stored as additional section.
+	
+	source_digest: text_digest of the chip_database module with the same data; allows to detect an outdated compact
+		database
+	"""
+	arrays = {n: np.frombuffer(pickle.dumps(v, protocol=pickle.HIGHEST_PROTOCOL), dtype=np.uint8) for n, v in sections.items()}
+	sha = hashlib.sha256()
+	for name in sorted(arrays):
+		sha.update(name.encode("utf-8"))
+		sha.update(arrays[name].tobytes())
+	arrays[DIGEST_SECTION] = np.frombuffer(pickle.dumps(sha.hexdigest()), dtype=np.uint8)
+	if source_digest is not None:
+		arrays[SOURCE_DIGEST_SECTION] = np.frombuffer(pickle.dumps(source_digest), dtype=np.uint8)
+	np.savez_compressed(filename, **arrays)
+
+def read_compact_chip_data(filename: str, name: str) -> Any:
+	"""Read a single section of a chip database written by write_compact_chip_data"""
+	with np.load(filename) as npz_file:
+		return pickle.loads(npz_file[name].tobytes())
@@ -19,9 +19,14 @@ Multiedges are possible, if a net has two different names that both can
 drive the same net.
 """
 
+import re
+
+from bisect import bisect_left
 from dataclasses import dataclass, field
 from functools import total_ordering
-from typing import Iterable, Union, Any, Mapping, Tuple, List, Dict, Callable, NewType, ClassVar
+from typing import Iterable, Union, Any, Mapping, Tuple, List, Dict, Callable, NewType, ClassVar, Optional
+
+import numpy as np
 
 from domain.allele_sequence import Allele, AlleleList, AlleleAll, AllelePow
 from domain.model import Gene
@@ -35,12 +40,109 @@ VertexPosition = NewType("VertexPosition", Union[IcecraftNetPosition, IcecraftLU
 
 SEPARATOR = "#"
 
+REGEX_SPECIAL = set(".^$*+?{}[]|()\\")
+
+def literal_prefix(regex_str: str) -> Optional[Tuple[str, bool]]:
+	"""Literal text a regular expression matches at the start of a string
+	
+	Returns the literal and whether the regular expression ends with '$', i.e. the name has to be equal to the
+	literal. Besides literal characters, only escaped non-alphanumeric characters, a leading '^' and a trailing '$'
+	are supported; for other regular expressions None is returned.
+	"""
+	chars = []
+	exact = False
+	i = 0
+	if regex_str.startswith("^"):
+		i = 1
+	while i < len(regex_str):
+		c = regex_str[i]
+		if c == "\\":
+			if i+1 == len(regex_str) or (regex_str[i+1].isascii() and regex_str[i+1].isalnum()):
+				return None
+			chars.append(regex_str[i+1])
+			i += 2
+			continue
+		if c == "$" and i == len(regex_str)-1:
+			exact = True
+		elif c in REGEX_SPECIAL:
+			return None
+		else:
+			chars.append(c)
+		i += 1
+	
+	return "".join(chars), exact
+
+def name_matcher(regex_str: str) -> Callable[[str], bool]:
+	"""Function equivalent to re.match with the regular expression, but without regex for literal patterns"""
+	lit = literal_prefix(regex_str)
+	if lit is None:
+		pat = re.compile(regex_str)
+		return lambda n: pat.match(n) is not None
+	
+	prefix, exact = lit
+	if exact:
+		return lambda n: n == prefix
+	return lambda n: n.startswith(prefix)
+
+class NameIndex:
+	"""Maps names to items and finds the items of all names a regular expression matches
+	
+	Literal patterns are resolved by a lookup, literal prefixes by bisecting the sorted names. Only other regular
+	expressions are applied to every name.
+	"""
+	def __init__(self) -> None:
+		self._item_map = {}
+		self._names = []
+		self._sorted = True
+	
+	def add(self, name: str, item: Any) -> None:
+		try:
+			self._item_map[name].append(item)
+		except KeyError:
+			self._item_map[name] = [item]
+			self._names.append(name)
+			self._sorted = False
+	
+	def iter_names(self, regex_str: str) -> Iterable[str]:
+		"""Iterate over all names the regular expression matches at the start, like re.match"""
+		lit = literal_prefix(regex_str)
+		if lit is None:
+			pat = re.compile(regex_str)
+			yield from (n for n in self._item_map if pat.match(n))
+			return
+		
+		prefix, exact = lit
+		if exact:
+			if prefix in self._item_map:
+				yield prefix
+			return
+		
+		if not self._sorted:
+			self._names.sort()
+			self._sorted = True
+		
+		for index in range(bisect_left(self._names, prefix), len(self._names)):
+			name = self._names[index]
+			if not name.startswith(prefix):
+				break
+			yield name
+	
+	def find(self, regex_str: str) -> List[Any]:
+		"""Items of all names the regular expression matches"""
+		return [i for n in self.iter_names(regex_str) for i in self._item_map[n]]
+
 @dataclass(frozen=True, order=True)
 class VertexDesig:
 	"""Wrapper to make IcecraftNetPosition and IcecraftLUTPosition comparable"""
+	__slots__ = ("tile", "name")
+	
 	tile: IcecraftPosition
 	name: str
 	
+	def __reduce__(self) -> Tuple[Any, ...]:
+		# frozen instances with __slots__ can't be restored by setting the attributes
+		return (self.__class__, (self.tile, self.name))
+	
 	@staticmethod
 	def canonical_net_name(net_name: str) -> str:
 		return f"NET{SEPARATOR}{net_name}"
@@ -80,12 +182,17 @@ class VertexDesig:
 
 @dataclass(frozen=True, order=True)
 class EdgeDesig:
+	__slots__ = ("src", "dst")
+	
 	src: VertexDesig
 	dst: VertexDesig
 	
 	def __post_init__(self):
 		assert self.src.tile == self.dst.tile, "src and dst are not in the same tile"
 	
+	def __reduce__(self) -> Tuple[Any, ...]:
+		return (self.__class__, (self.src, self.dst))
+	
 	@classmethod
 	def net_to_net(cls, tile: IcecraftPosition, src_name: str, dst_name: str) -> "EdgeDesig":
 		src = VertexDesig.from_net_name(tile, src_name)
@@ -126,6 +233,8 @@ class SourceGroup:
 @dataclass
 class Edge(InterElement):
 	desig: EdgeDesig
+	# position in InterRep.iter_edges and in the arrays of InterRep.adjacency
+	index: int = field(default=-1, init=False, repr=False, compare=False)
 	
 	@property
 	def src(self) -> "Vertex":
@@ -137,6 +246,8 @@ class Edge(InterElement):
 
 @dataclass
 class Vertex(InterElement):
+	# position in InterRep.iter_vertices and in the arrays of InterRep.adjacency
+	index: int = field(default=-1, init=False, repr=False, compare=False)
 	in_edges: List[Edge] = field(default_factory=list, init=False)
 	out_edges: List[Edge] = field(default_factory=list, init=False)
 	ext_src: bool = field(default=False, init=False)
@@ -246,6 +357,36 @@ class ConVertex(Vertex):
 			
 		raise ValueError(f"Edge {edge_desig} not foun in {self.desigs[0]}")
 	
+	def source_of_values(self, values: Tuple[bool, ...]) -> Optional["Vertex"]:
+		"""get the source vertex selected by values for all bits of the source groups
+		
+		None is returned if no source is connected. Raises ValueError if the values don't select at most one source.
+		"""
+		uncon_name = VertexDesig.canonical_net_name(UNCONNECTED_NAME)
+		selected = []
+		start = 0
+		for src_grp in self.src_grps:
+			end = start + len(src_grp.bits)
+			grp_vals = tuple(values[start:end])
+			start = end
+			
+			for edge_desig, vals in src_grp.srcs.items():
+				if tuple(vals) == grp_vals:
+					break
+			else:
+				raise ValueError(f"Values {grp_vals} select no source of {src_grp.dst}")
+			
+			if edge_desig.src.name != uncon_name:
+				selected.append(edge_desig)
+		
+		if len(selected) > 1:
+			raise ValueError(f"Values select {len(selected)} sources of {self.desigs[0]}")
+		
+		if len(selected) == 0:
+			return None
+		
+		return self.rep.get_edge(selected[0]).src
+	
 	def get_genes(self, desc: str="") -> List[Gene]:
 		if not self.available:
 			return []
@@ -521,6 +662,74 @@ class LUTVertex(Vertex):
 		carry_enable = [i.bits for i in config_items if i.kind=="CarryEnable"][0]
 		return cls(rep, (desig, ), lut_index, lut_bits, carry_enable)
 
+@dataclass(frozen=True)
+class Adjacency:
+	"""Compressed sparse row (CSR) form of the graph of an InterRep
+	
+	The Vertex and Edge objects remain the primary storage; the arrays are derived from them for traversals of the
+	whole graph. Vertices and edges are identified by their index, i.e. their position in InterRep.iter_vertices and
+	InterRep.iter_edges. The out edges of vertex v are out_edges[out_ptr[v]:out_ptr[v+1]], the in edges
+	in_edges[in_ptr[v]:in_ptr[v+1]]. The flags are a snapshot of available and used at the time of creation.
+	"""
+	edge_src: np.ndarray
+	edge_dst: np.ndarray
+	out_ptr: np.ndarray
+	out_edges: np.ndarray
+	in_ptr: np.ndarray
+	in_edges: np.ndarray
+	vertex_available: np.ndarray
+	vertex_used: np.ndarray
+	edge_available: np.ndarray
+	edge_used: np.ndarray
+	
+	@property
+	def vertex_count(self) -> int:
+		return len(self.out_ptr) - 1
+	
+	@property
+	def edge_count(self) -> int:
+		return len(self.edge_src)
+	
+	def out_edges_of(self, vertex: int) -> np.ndarray:
+		return self.out_edges[self.out_ptr[vertex]:self.out_ptr[vertex+1]]
+	
+	def in_edges_of(self, vertex: int) -> np.ndarray:
+		return self.in_edges[self.in_ptr[vertex]:self.in_ptr[vertex+1]]
+	
+	def reachable(self, seeds: np.ndarray, edge_mask: np.ndarray, forward: bool=True) -> np.ndarray:
+		"""Boolean array of the vertices reachable from the seed vertices only via edges in edge_mask
+		
+		For forward == False the edges are followed in reverse direction. Every vertex is expanded at most once, so
+		the run time is linear in the number of vertices and edges.
+		"""
+		if forward:
+			ptr, adj_edges, targets = self.out_ptr, self.out_edges, self.edge_dst
+		else:
+			ptr, adj_edges, targets = self.in_ptr, self.in_edges, self.edge_src
+		
+		reached = np.zeros(self.vertex_count, dtype=bool)
+		reached[seeds] = True
+		frontier = np.flatnonzero(reached)
+		while len(frontier) > 0:
+			# positions of the edges of all frontier vertices in adj_edges
+			starts = ptr[frontier]
+			counts = ptr[frontier+1] - starts
+			offsets = np.repeat(starts - np.cumsum(counts) + counts, counts)
+			edges = adj_edges[offsets + np.arange(len(offsets))]
+			
+			nxt = np.unique(targets[edges[edge_mask[edges]]])
+			frontier = nxt[~reached[nxt]]
+			reached[frontier] = True
+		
+		return reached
+	
+	@staticmethod
+	def compress(keys: np.ndarray, count: int) -> Tuple[np.ndarray, np.ndarray]:
+		"""Index pointer and edges sorted by key; the order of edges with the same key is kept"""
+		ptr = np.zeros(count+1, dtype=np.int64)
+		np.cumsum(np.bincount(keys, minlength=count), out=ptr[1:])
+		return ptr, np.argsort(keys, kind="stable")
+
 class InterRep:
 	def __init__(self, net_data_iter: Iterable[NetData], config_map: Mapping[IcecraftPosition, ConfigAssemblage]) -> None:
 		self._vertices = []
@@ -529,6 +738,11 @@ class InterRep:
 		self._edge_map = {}
 		self._tile_edge_map = {}
 		self._bit_map = {}
+		# tile -> NameIndex of the vertices by name and of the edges by name of the destination
+		self._tile_vertex_index = {}
+		self._tile_edge_index = {}
+		# arrays of the graph structure for adjacency, created on demand
+		self._structure = None
 		
 		for raw_net in net_data_iter:
 			self._add_con_vertex(raw_net)
@@ -553,11 +767,14 @@ class InterRep:
 		
 	
 	def _add_vertex(self, vertex: Vertex) -> None:
+		vertex.index = len(self._vertices)
 		self._vertices.append(vertex)
+		self._structure = None
 		tiles = set()
 		for des in vertex.desigs:
 			assert des not in self._vertex_map
 			self._vertex_map[des] = vertex
+			self._tile_vertex_index.setdefault(des.tile, NameIndex()).add(des.name, vertex)
 			tiles.add(des.tile)
 		
 		for tile in tiles:
@@ -580,9 +797,12 @@ class InterRep:
 		edge.dst.add_edge(edge, True)
 		
 		assert not self.has_edge(desig)
+		edge.index = len(self._edge_map)
 		self._edge_map[desig] = edge
+		self._structure = None
 		
 		self._tile_edge_map.setdefault(desig.dst.tile, []).append(edge)
+		self._tile_edge_index.setdefault(desig.dst.tile, NameIndex()).add(desig.dst.name, edge)
 		
 		return edge
 	
@@ -614,6 +834,48 @@ class InterRep:
 			# no edges for this tile -> no entry
 			return []
 	
+	def find_vertices(self, tile: IcecraftPosition, regex_str: str) -> List[Vertex]:
+		"""Vertices with a designation in the tile whose name the regular expression matches
+		
+		A vertex is returned once for each matching designation.
+		"""
+		try:
+			return self._tile_vertex_index[tile].find(regex_str)
+		except KeyError:
+			return []
+	
+	def find_edges(self, tile: IcecraftPosition, dst_regex: str) -> List[Edge]:
+		"""Edges with the destination in the tile whose name the regular expression matches"""
+		try:
+			return self._tile_edge_index[tile].find(dst_regex)
+		except KeyError:
+			return []
+	
+	def adjacency(self) -> Adjacency:
+		"""Graph in CSR form with the current available and used flags"""
+		vertex_count = len(self._vertices)
+		edge_count = len(self._edge_map)
+		if self._structure is None:
+			edge_src = np.fromiter((e.src.index for e in self._edge_map.values()), dtype=np.int64, count=edge_count)
+			edge_dst = np.fromiter((e.dst.index for e in self._edge_map.values()), dtype=np.int64, count=edge_count)
+			self._structure = (
+				edge_src,
+				edge_dst,
+				*Adjacency.compress(edge_src, vertex_count),
+				*Adjacency.compress(edge_dst, vertex_count),
+			)
+		
+		def flags(elements, name, count):
+			return np.fromiter((getattr(e, name) for e in elements), dtype=bool, count=count)
+		
+		return Adjacency(
+			*self._structure,
+			flags(self._vertices, "available", vertex_count),
+			flags(self._vertices, "used", vertex_count),
+			flags(self._edge_map.values(), "available", edge_count),
+			flags(self._edge_map.values(), "used", edge_count),
+		)
+	
 	def has_edge(self, desig: EdgeDesig) -> bool:
 		return desig in self._edge_map
 	
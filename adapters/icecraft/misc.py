@@ -1,6 +1,8 @@
+import weakref
+
 from enum import Enum, IntEnum, auto
 from dataclasses import dataclass
-from typing import Tuple, Iterable
+from typing import Any, Iterable, MutableMapping, Tuple
 
 from domain.base_structures import BitPos
 from domain.model import Gene
@@ -33,9 +35,19 @@ class LUTFunction(Enum):
 
 @dataclass(frozen=True, order=True)
 class IcecraftPosition(ElementPosition):
+	"""Position of a tile
+	
+	The positions and their subclasses are created in large numbers, so they use __slots__ instead of an instance dict.
+	"""
+	__slots__ = ("x", "y")
+	
 	x: int
 	y: int
 	
+	def __reduce__(self) -> Tuple[Any, ...]:
+		# frozen instances with __slots__ can't be restored by setting the attributes
+		return (self.__class__, tuple(getattr(self, n) for n in self.__dataclass_fields__))
+	
 	@property
 	def tile(self) -> "IcecraftPosition":
 		return IcecraftPosition(self.x, self.y)
@@ -44,24 +56,56 @@ class IcecraftPosition(ElementPosition):
 	def from_tile(cls, tile: "IcecraftPosition", *args, **kwargs):
 		return cls(tile.x, tile.y, *args, **kwargs)
 
+# interned bit positions, see IcecraftBitPosition.interned; positions no longer used elsewhere are dropped
+_BIT_POSITIONS: MutableMapping[Tuple[type, int, int, int, int], "IcecraftBitPosition"] = weakref.WeakValueDictionary()
+
 @dataclass(frozen=True, order=True)
 class IcecraftBitPosition(BitPos, IcecraftPosition):
+	# weak references for the interned instances
+	__slots__ = ("group", "index", "__weakref__")
+	
 	group: int
 	index: int
 	
+	def __reduce__(self) -> Tuple[Any, ...]:
+		# intern on unpickling, e.g. for genes created by worker processes or loaded from a cache
+		return (self.__class__.interned, self.to_ints())
+	
 	def to_ints(self) -> Tuple[int, ...]:
 		return (self.x, self.y, self.group, self.index)
+	
+	@classmethod
+	def interned(cls, x: int, y: int, group: int, index: int) -> "IcecraftBitPosition":
+		"""Get the shared instance for a bit position
+		
+		Bit positions are immutable, so all equal positions can be the same instance. This saves memory and speeds up
+		dict and set lookups, as they compare identical keys without calling __eq__. The instance is only kept as long
+		as it is referenced elsewhere.
+		"""
+		key = (cls, x, y, group, index)
+		try:
+			return _BIT_POSITIONS[key]
+		except KeyError:
+			pass
+		
+		bit = cls(int(x), int(y), int(group), int(index))
+		_BIT_POSITIONS[key] = bit
+		return bit
 
 @dataclass(frozen=True, order=True)
 class IcecraftLUTPosition(IcecraftPosition):
+	__slots__ = ("z", )
+	
 	z: int
 
 class IcecraftColBufCtrl(IcecraftLUTPosition):
 	"""Describes a column buffer control"""
-	pass
+	__slots__ = ()
 
 @dataclass(frozen=True, order=True)
 class IcecraftNetPosition(IcecraftPosition):
+	__slots__ = ("name", )
+	
 	name: str
 
 class IcecraftResource(IcecraftNetPosition):
@@ -69,10 +113,12 @@ class IcecraftResource(IcecraftNetPosition):
 	
 	Resource can be a net or a LUT
 	"""
-	pass
+	__slots__ = ()
 
 @dataclass(frozen=True, order=True)
 class IcecraftConnection(IcecraftPosition):
+	__slots__ = ("src_name", "dst_name")
+	
 	src_name: str
 	dst_name: str
 	
@@ -86,7 +132,7 @@ class IcecraftConnection(IcecraftPosition):
 
 class IcecraftResCon(IcecraftConnection):
 	"""Connection between ressources"""
-	pass
+	__slots__ = ()
 
 @dataclass(frozen=True, order=True)
 class IcecraftGeneConstraint:
@@ -1,8 +1,13 @@
+import hashlib
+import multiprocessing as mp
 import re
-from typing import Sequence, Mapping, List, Tuple, Iterable, Callable, Union, Set, NamedTuple, NewType
-from dataclasses import dataclass, field
+from multiprocessing.pool import Pool
+from typing import Sequence, Mapping, List, Optional, Tuple, Iterable, Callable, Union, Set, NamedTuple, NewType
+from dataclasses import dataclass, field, replace
 from collections import defaultdict
 
+import numpy as np
+
 from domain.interfaces import Representation, RepresentationGenerator, TargetConfiguration
 from domain.model import Gene, Chromosome
 from domain.request_model import Parameter, ResponseObject, RequestObject, set_req_defaults
@@ -12,16 +17,30 @@ from .misc import IcecraftPosition, IcecraftLUTPosition, IcecraftColBufCtrl, \
 	IcecraftNetPosition, LUTFunction, IcecraftBitPosition, \
 	IcecraftResource, IcecraftResCon, TILE_ALL, TILE_ALL_LOGIC, \
 	IcecraftInputError, IcecraftGeneConstraint
-from .chip_data import get_config_items, get_net_data, get_colbufctrl, ConfigAssemblage
+from .chip_data import get_config_items, get_net_data, get_colbufctrl, get_tile_config_items, ConfigAssemblage
 from .chip_data_utils import NetData, SegEntryType, SegType, UNCONNECTED_NAME
 from .config_item import ConfigItem, ConnectionItem, IndexedItem
-from .inter_rep import InterRep, Vertex, Edge, VertexDesig, EdgeDesig, PartConf
+from .inter_rep import InterRep, Vertex, LUTVertex, Edge, VertexDesig, EdgeDesig, PartConf, name_matcher
 
 NetId = SegEntryType
 
 # name of the dummy net representing CarryInSet
 CARRY_ONE_IN = "carry_one_in"
 
+# vertices and config items per tile for the worker processes of IcecraftRepGen.create_tile_genes; the vertices are
+# part of the whole InterRep, so they are inherited by forking instead of being pickled
+_TILE_JOB: Optional[Tuple[Mapping[IcecraftPosition, List[Vertex]], Mapping[IcecraftPosition, ConfigAssemblage]]] = None
+
+def _tile_genes_worker(tile: IcecraftPosition) -> List[Gene]:
+	single_tile_map, config_map = _TILE_JOB
+	return IcecraftRepGen.genes_for_tile(tile, single_tile_map.get(tile, []), config_map[tile])
+
+def fork_pool(processes: int) -> Optional[Pool]:
+	"""Create a pool of forked processes; None if forking is not available or only one process is requested"""
+	if processes <= 1 or "fork" not in mp.get_all_start_methods():
+		return None
+	return mp.get_context("fork").Pool(processes)
+
 @dataclass
 class CarryData:
 	"""data regarding carry of a single LUT"""
@@ -29,8 +48,63 @@ class CarryData:
 	carry_enable: Tuple[IcecraftBitPosition, ...]
 	carry_use: List[PartConf] = field(default_factory=list)
 
+@dataclass(frozen=True)
+class PruneStats:
+	"""Resources marked as unused by pruning"""
+	vertices: int
+	edges: int
+	# genes and bits of the pruned vertices; their genes are constant
+	genes: int
+	bits: int
+
 CarryDataMap = NewType("CarryDataMap", Mapping[IcecraftPosition, Mapping[int, CarryData]])
 
+@dataclass(frozen=True)
+class DigestGraph:
+	"""Structure needed to find the genes that can't influence the output of a configuration
+	
+	Vertices are identified by their position in InterRep.iter_vertices, genes by their position in IcecraftRep.genes.
+	A vertex is live if it is a seed or a source of a live vertex. The sources of a vertex are its fixed sources, the
+	source selected by the allele of its multiplexer gene (allele_sources, -1 for unconnected) and, for LUTs, the
+	inputs the truth table depends on (lut_inputs, -1 for unusable inputs). Genes of vertices that aren't live are
+	masked; free genes are never masked.
+	"""
+	seeds: Tuple[int, ...]
+	free_genes: Tuple[int, ...]
+	vertex_genes: Mapping[int, Tuple[int, ...]]
+	fixed_sources: Mapping[int, Tuple[int, ...]]
+	allele_sources: Mapping[int, Tuple[int, ...]]
+	lut_inputs: Mapping[int, Tuple[int, ...]]
+	
+	def live_genes(self, genes: Sequence[Gene], allele_indices: Sequence[int]) -> List[int]:
+		"""Sorted indices of the genes that are not masked"""
+		live = set(self.seeds)
+		stack = list(self.seeds)
+		while len(stack) > 0:
+			vtx_index = stack.pop()
+			srcs = list(self.fixed_sources.get(vtx_index, ()))
+			for gene_index in self.vertex_genes.get(vtx_index, ()):
+				allele_index = allele_indices[gene_index]
+				if gene_index in self.allele_sources:
+					srcs.append(self.allele_sources[gene_index][allele_index])
+				elif gene_index in self.lut_inputs:
+					values = genes[gene_index].alleles[allele_index].values
+					srcs.extend(s for i, s in enumerate(self.lut_inputs[gene_index]) if self.depends_on(values, i))
+			
+			for src in srcs:
+				if src < 0 or src in live:
+					continue
+				live.add(src)
+				stack.append(src)
+		
+		return sorted(self.free_genes + tuple(g for v in live for g in self.vertex_genes.get(v, ())))
+	
+	@staticmethod
+	def depends_on(truth_table: Sequence[bool], input_index: int) -> bool:
+		"""Check if the output of a truth table changes with an input"""
+		mask = 1 << input_index
+		return any(truth_table[i] != truth_table[i|mask] for i in range(len(truth_table)) if not i & mask)
+
 @dataclass
 class IcecraftRep(Representation):
 	genes: Sequence[Gene]
@@ -43,6 +117,8 @@ class IcecraftRep(Representation):
 	# carry enable
 	# map: tile_pos -> (map: lut_index -> CarryData)
 	carry_data: CarryDataMap
+	# structure for phenotype_digest; without it no bits are masked
+	digest_graph: Optional[DigestGraph] = field(default=None, compare=False)
 	
 	def prepare_config(self, config: TargetConfiguration) -> None:
 		# set constant bits
@@ -68,6 +144,25 @@ class IcecraftRep(Representation):
 	def iter_genes(self) -> Iterable[Gene]:
 		yield from self.genes
 	
+	def phenotype_digest(self, chromo: Chromosome) -> bytes:
+		"""Digest of the phenotype of a chromosome; genes masked according to digest_graph are left out
+		
+		The genes of multiplexers that drive nothing live and of LUTs that don't reach an output are masked, as are
+		the multiplexers of LUT inputs the truth table doesn't depend on.
+		"""
+		if self.digest_graph is None:
+			return super().phenotype_digest(chromo)
+		
+		if len(self.genes) != len(chromo.allele_indices):
+			raise ValueError(f"Length mismatch: {len(self.genes)} genes, but {len(chromo.allele_indices)} alleles")
+		
+		digest = hashlib.blake2b(digest_size=16)
+		for gene_index in self.digest_graph.live_genes(self.genes, chromo.allele_indices):
+			allele_index = chromo.allele_indices[gene_index]
+			digest.update(gene_index.to_bytes(4, "little"))
+			digest.update(bytes(self.genes[gene_index].alleles[allele_index].values))
+		return digest.digest()
+	
 	def iter_carry_bits(self) -> Iterable[IcecraftBitPosition]:
 		for cd in self.iter_carry_data():
 			yield from cd.carry_enable
@@ -77,6 +172,94 @@ class IcecraftRep(Representation):
 			for lut_index in sorted(self.carry_data[tile]):
 				yield self.carry_data[tile][lut_index]
 	
+	def iter_bits(self) -> Iterable[IcecraftBitPosition]:
+		"""All bits of genes, constant genes, ColBufCtrl and carry data; bits can occur multiple times"""
+		for gene in self.genes:
+			yield from gene.bit_positions
+		for gene in self.constant:
+			yield from gene.bit_positions
+		for cbc in self.colbufctrl:
+			yield from cbc.bits
+		for cd in self.iter_carry_data():
+			yield from cd.carry_enable
+			for part in cd.carry_use:
+				yield from part.bits
+	
+	def relocate(
+		self,
+		x_offset: int,
+		y_offset: int,
+		tile_type: Optional[Callable[[IcecraftPosition], object]]=None
+	) -> "IcecraftRep":
+		"""Create a copy of the representation moved by an offset
+		
+		The coordinates of all distinct bits are shifted in one step. Allele sequences and values are immutable and
+		therefore shared with the original.
+		
+		If tile_type is given, every tile has to keep its type. ColBufCtrl items are moved together with the tiles
+		they control, so the moved items have to control the moved tiles.
+		"""
+		bit_list = list(set(self.iter_bits()))
+		tiles = {b.tile for b in bit_list}
+		tiles.update(l.tile for l in self.output)
+		tiles.update(self.carry_data)
+		tile_map = {t: IcecraftPosition(t.x+x_offset, t.y+y_offset) for t in tiles}
+		
+		if tile_type is not None:
+			for org_tile, new_tile in tile_map.items():
+				org_type = tile_type(org_tile)
+				new_type = tile_type(new_tile)
+				if org_type != new_type:
+					raise ValueError(f"Can't move {org_type} at {org_tile} to {new_type} at {new_tile}")
+		
+		self.check_colbufctrl_relocation(tile_map)
+		
+		coords = np.array([b.to_ints() for b in bit_list], dtype=int).reshape(-1, 4)
+		coords[:, :2] += (x_offset, y_offset)
+		bit_map = {o: IcecraftBitPosition.interned(*c) for o, c in zip(bit_list, coords.tolist())}
+		
+		def move_bits(org_bits: Iterable[IcecraftBitPosition]) -> Tuple[IcecraftBitPosition, ...]:
+			return tuple(bit_map[b] for b in org_bits)
+		
+		def move_gene(org_gene: Gene) -> Gene:
+			return Gene(move_bits(org_gene.bit_positions), org_gene.alleles, org_gene.description)
+		
+		def move_carry_data(org_cd: CarryData) -> CarryData:
+			carry_use = [PartConf(move_bits(p.bits), p.values) for p in org_cd.carry_use]
+			return CarryData(org_cd.lut_index, move_bits(org_cd.carry_enable), carry_use)
+		
+		return IcecraftRep(
+			[move_gene(g) for g in self.genes],
+			[move_gene(g) for g in self.constant],
+			[replace(c, bits=move_bits(c.bits)) for c in self.colbufctrl],
+			[IcecraftLUTPosition.from_tile(tile_map[l.tile], l.z) for l in self.output],
+			{tile_map[t]: {i: move_carry_data(c) for i, c in m.items()} for t, m in self.carry_data.items()},
+			self.digest_graph,
+		)
+	
+	def check_colbufctrl_relocation(self, tile_map: Mapping[IcecraftPosition, IcecraftPosition]) -> None:
+		"""Check that the moved ColBufCtrl tiles control the moved tiles"""
+		cbc_tiles = {c.bits[0].tile for c in self.colbufctrl}
+		if len(cbc_tiles) == 0:
+			return
+		
+		for org_tile, new_tile in tile_map.items():
+			try:
+				org_cbc = get_colbufctrl([org_tile])[0]
+			except KeyError:
+				continue
+			
+			if org_cbc not in cbc_tiles:
+				continue
+			
+			try:
+				new_cbc = get_colbufctrl([new_tile])[0]
+			except KeyError:
+				new_cbc = None
+			
+			if new_cbc != tile_map[org_cbc]:
+				raise ValueError(f"Can't move ColBufCtrl of {org_tile} from {org_cbc} to {tile_map[org_cbc]}, {new_tile} is controlled by {new_cbc}")
+	
 	@staticmethod
 	def set_carry_enable(config: TargetConfiguration, carry_data: CarryDataMap) -> None:
 		for tile_carry in carry_data.values():
@@ -116,8 +299,12 @@ class IcecraftRepGen(RepresentationGenerator):
 	- unused -> ressource will not be used have a fixed, neutral genotype and phenotype, e.g bits 
 	will be constantly set to neutral (as a general rule to 0); described by (the negation of) 
 	a used function constructed from the request
+	
+	With processes > 1, the work that is independent for each tile is distributed over a pool of forked processes.
+	The result is identical to the sequential generation.
 	"""
-	def __init__(self) -> None:
+	def __init__(self, processes: int=1) -> None:
+		self._processes = processes
 		p_choose_res = [
 			Parameter("exclude_resources", IcecraftResource, default=[], multiple=True),
 			Parameter("include_resources", IcecraftResource, default=[], multiple=True),
@@ -132,6 +319,7 @@ class IcecraftRepGen(RepresentationGenerator):
 			Parameter("lut_functions", LUTFunction, default=[], multiple=True),
 			Parameter("gene_constraints", IcecraftGeneConstraint, default=[], multiple=True),
 			Parameter("prune_no_viable_src", bool, default=False),
+			Parameter("prune_no_viable_dst", bool, default=False),
 		]
 		p_call = self.meld_parameters(p_call, p_choose_res)
 		p_call = self.meld_parameters(p_call, p_choose_con)
@@ -146,7 +334,12 @@ class IcecraftRepGen(RepresentationGenerator):
 	def __call__(self, request: RequestObject) -> ResponseObject:
 		tiles = request.tiles
 		
-		config_map = {t: get_config_items(t) for t in tiles}
+		pool = fork_pool(self._processes)
+		if pool is None:
+			config_map = {t: get_config_items(t) for t in tiles}
+		else:
+			with pool:
+				config_map = dict(zip(tiles, pool.map(get_config_items, tiles)))
 		
 		raw_nets = get_net_data(tiles)
 		self.carry_in_set_net(config_map, raw_nets)
@@ -161,11 +354,17 @@ class IcecraftRepGen(RepresentationGenerator):
 		
 		self.set_lut_functions(rep, request.lut_functions)
 		
-		#TODO: set used flag
+		prune_stats = None
+		if request.prune_no_viable_src or request.prune_no_viable_dst:
+			prune_stats = self.prune_unreachable(
+				rep,
+				request.prune_no_viable_src,
+				request.output_lutffs if request.prune_no_viable_dst else None
+			)
 		
 		carry_data = self.get_carry_data(rep)
 		
-		all_genes = self.create_genes(rep, config_map)
+		all_genes = self.create_genes(rep, config_map, self._processes)
 		self.apply_gene_constraints(all_genes, request.gene_constraints, special_map)
 		
 		const_genes, genes, sec_len = self.sort_genes(all_genes)
@@ -173,8 +372,13 @@ class IcecraftRepGen(RepresentationGenerator):
 		cbc_coords = self.get_colbufctrl_coordinates(rep)
 		cbc_conf = self.get_colbufctrl_config(cbc_coords)
 
-		rep = IcecraftRep(genes, const_genes, cbc_conf, tuple(sorted(request.output_lutffs)), carry_data)
-		return ResponseObject(representation=rep)
+		digest_graph = self.get_digest_graph(rep, genes, request.output_lutffs)
+		
+		rep = IcecraftRep(genes, const_genes, cbc_conf, tuple(sorted(request.output_lutffs)), carry_data, digest_graph)
+		res = ResponseObject(representation=rep)
+		if prune_stats is not None:
+			res["prune_stats"] = prune_stats
+		return res
 	
 	@staticmethod
 	def carry_in_set_net(config_map: Mapping[IcecraftPosition, ConfigAssemblage], raw_nets: List[NetData]) -> None:
@@ -215,6 +419,53 @@ class IcecraftRepGen(RepresentationGenerator):
 			drv_tiles = [vtx.desigs[i].tile for i in vtx.drivers]
 			vtx.ext_src = any(t not in tiles for t in drv_tiles)
 	
+	@staticmethod
+	def prune_unreachable(
+		rep: InterRep,
+		no_viable_src: bool,
+		output_lutffs: Optional[Iterable[IcecraftLUTPosition]]=None
+	) -> PruneStats:
+		"""Mark vertices and edges as unused if they can't contribute to the output
+		
+		With no_viable_src, vertices that can't be driven are pruned. Drivers are LUTs, vertices with external source
+		and vertices without input edges, e.g. hard wired nets. If output_lutffs are given, vertices that can't reach
+		one of them are pruned. Only available and used vertices and edges are considered.
+		"""
+		adj = rep.adjacency()
+		active = adj.vertex_available & adj.vertex_used
+		edge_mask = adj.edge_available & adj.edge_used & active[adj.edge_src] & active[adj.edge_dst]
+		vertices = list(rep.iter_vertices())
+		
+		viable = active.copy()
+		if no_viable_src:
+			seeds = np.array([
+				isinstance(v, LUTVertex) or v.ext_src or len(v.in_edges) == 0 for v in vertices
+			], dtype=bool) & active
+			viable &= adj.reachable(seeds, edge_mask, True)
+		
+		if output_lutffs is not None:
+			out_indices = [rep.get_vertex(VertexDesig.from_lut_position(p)).index for p in output_lutffs]
+			seeds = np.zeros(adj.vertex_count, dtype=bool)
+			seeds[out_indices] = True
+			viable &= adj.reachable(seeds & active, edge_mask, False)
+		
+		pruned_vertices = [vertices[i] for i in np.flatnonzero(active & ~viable)]
+		pruned_edges = np.flatnonzero(edge_mask & ~(viable[adj.edge_src] & viable[adj.edge_dst]))
+		
+		for vtx in pruned_vertices:
+			vtx.used = False
+		
+		edges = list(rep.iter_edges())
+		for index in pruned_edges:
+			edges[index].used = False
+		
+		return PruneStats(
+			len(pruned_vertices),
+			len(pruned_edges),
+			sum(len(v.get_genes()) for v in pruned_vertices),
+			sum(v.bit_count for v in pruned_vertices),
+		)
+	
 	@staticmethod
 	def tiles_from_resource_tile(resc_tile: IcecraftPosition, special_map: Mapping[int, List[IcecraftPosition]]) -> List[IcecraftPosition]:
 		"""Get tiles that match the tile of a resource
@@ -240,10 +491,11 @@ class IcecraftRepGen(RepresentationGenerator):
 	) -> None:
 		for resc in resources:
 			possible_tiles = cls.tiles_from_resource_tile(resc.tile, special_map)
-			cond_func = cls.create_regex_condition_vertex(resc.name, possible_tiles)
 			
+			# the name index resolves literal names and prefixes without applying the regex to every vertex
 			for tile in possible_tiles:
-				cls.set_available_vertex(rep.get_vertices_of_tile(tile), cond_func, value)
+				for vertex in rep.find_vertices(tile, resc.name):
+					vertex.available = value
 	
 	@classmethod
 	def set_edge_resources(
@@ -255,10 +507,13 @@ class IcecraftRepGen(RepresentationGenerator):
 	) -> None:
 		for resccon in resccons:
 			possible_tiles = cls.tiles_from_resource_tile(resccon.tile, special_map)
-			cond_func = cls.create_regex_condition_edge(resccon.src_name, resccon.dst_name, possible_tiles)
+			tile_set = set(possible_tiles)
+			src_match = name_matcher(resccon.src_name)
 			
 			for tile in possible_tiles:
-				cls.set_available_edge(rep.get_edges_of_tile(tile), cond_func, value)
+				for edge in rep.find_edges(tile, resccon.dst_name):
+					if edge.desig.src.tile in tile_set and src_match(edge.desig.src.name):
+						edge.available = value
 	
 	@staticmethod
 	def create_special_map(tiles: Iterable[IcecraftPosition]) -> Mapping[int, List[IcecraftPosition]]:
@@ -373,7 +628,7 @@ class IcecraftRepGen(RepresentationGenerator):
 					raise IcecraftInputError(f"Inconsistent special value: {cstr.bits}")
 				
 				constraints.extend([IcecraftGeneConstraint(
-					tuple(IcecraftBitPosition.from_tile(t, b.group, b.index) for b in cstr.bits),
+					tuple(IcecraftBitPosition.interned(t.x, t.y, b.group, b.index) for b in cstr.bits),
 					cstr.values
 				) for t in special_map[special_val]])
 			else:
@@ -492,8 +747,80 @@ class IcecraftRepGen(RepresentationGenerator):
 				
 		return tile_to_carry
 	
+	@staticmethod
+	def get_digest_graph(
+		rep: InterRep,
+		genes: Sequence[Gene],
+		output_lutffs: Iterable[IcecraftLUTPosition]
+	) -> DigestGraph:
+		"""Structure to mask the genes that can't influence the output
+		
+		Only genes with exactly the bits of a vertex are bound to it. The sources of vertices without such a gene are
+		fixed, as are the inputs of LUTs with a used carry output. Seeds are the output LUTs, LUTs with a used carry
+		output and vertices that don't drive a used vertex of the representation, e.g. the global nets of the LUTs.
+		"""
+		def usable(edge: Edge) -> bool:
+			return all((
+				edge.available, edge.used, edge.src.available, edge.src.used, edge.dst.available, edge.dst.used
+			))
+		
+		free_genes = []
+		vertex_genes = defaultdict(list)
+		allele_sources = {}
+		lut_inputs = {}
+		for gene_index, gene in enumerate(genes):
+			try:
+				vtx = rep.get_vertex_for_bit(gene.bit_positions[0])
+			except KeyError:
+				free_genes.append(gene_index)
+				continue
+			
+			if gene.bit_positions not in vtx.get_bit_tuples():
+				free_genes.append(gene_index)
+				continue
+			
+			vertex_genes[vtx.index].append(gene_index)
+			if isinstance(vtx, LUTVertex):
+				if gene.bit_positions == vtx.lut_bits.truth_table:
+					lut_inputs[gene_index] = tuple(e.src.index if usable(e) else -1 for e in vtx.in_edges)
+			else:
+				try:
+					srcs = [vtx.source_of_values(a.values) for a in gene.alleles]
+				except ValueError:
+					continue
+				allele_sources[gene_index] = tuple(-1 if s is None else s.index for s in srcs)
+		
+		seeds = {rep.get_vertex(VertexDesig.from_lut_position(p)).index for p in output_lutffs}
+		fixed_sources = {}
+		for vtx in rep.iter_vertices():
+			if not (vtx.available and vtx.used):
+				continue
+			
+			out_edges = [e for e in vtx.out_edges if usable(e)]
+			carry = isinstance(vtx, LUTVertex) and any(e.desig.dst.name.endswith("cout") for e in out_edges)
+			if carry or (len(out_edges) == 0 and not isinstance(vtx, LUTVertex)):
+				seeds.add(vtx.index)
+			
+			if not carry and any(g in allele_sources or g in lut_inputs for g in vertex_genes.get(vtx.index, [])):
+				continue
+			
+			srcs = tuple(sorted({e.src.index for e in vtx.in_edges if usable(e)}))
+			if len(srcs) > 0:
+				fixed_sources[vtx.index] = srcs
+		
+		return DigestGraph(
+			tuple(sorted(seeds)),
+			tuple(free_genes),
+			{v: tuple(g) for v, g in vertex_genes.items()},
+			fixed_sources,
+			allele_sources,
+			lut_inputs,
+		)
+	
 	@staticmethod
 	def get_colbufctrl_coordinates(rep: InterRep) -> List[IcecraftColBufCtrl]:
+		adj = rep.adjacency()
+		edges = list(rep.iter_edges())
 		coords = set()
 		for index in range(8):
 			# global network is the same for every tile -> doesn't matter which one
@@ -509,7 +836,10 @@ class IcecraftRepGen(RepresentationGenerator):
 			
 			# tiles from out edges
 			# in edges are not relevant as far as seen in valid bitstreams
-			glb_tiles = set(e.desig.src.tile for e in glb_vtx.iter_out_edges() if e.available and e.dst.available)
+			out_edges = adj.out_edges_of(glb_vtx.index)
+			out_edges = out_edges[adj.edge_available[out_edges] & adj.vertex_available[adj.edge_dst[out_edges]]]
+			# the global network has a designation in every tile, so the tile is taken from the edge
+			glb_tiles = set(edges[i].desig.src.tile for i in out_edges)
 			
 			cbc_tiles = get_colbufctrl(glb_tiles)
 			coords.update([IcecraftColBufCtrl.from_tile(t, index) for t in cbc_tiles])
@@ -520,7 +850,7 @@ class IcecraftRepGen(RepresentationGenerator):
 	def get_colbufctrl_config(coords: Iterable[IcecraftColBufCtrl]) -> List[IndexedItem]:
 		cbc_conf = []
 		for cbc_coord in coords:
-			item_assemblage = get_config_items(cbc_coord.tile)
+			item_assemblage = get_tile_config_items(cbc_coord.tile)
 			cbc_conf.append(item_assemblage.col_buf_ctrl[cbc_coord.z])
 		return cbc_conf
 	
@@ -559,7 +889,8 @@ class IcecraftRepGen(RepresentationGenerator):
 	def create_genes(
 		cls,
 		rep: InterRep,
-		config_map: Mapping[IcecraftPosition, ConfigAssemblage]
+		config_map: Mapping[IcecraftPosition, ConfigAssemblage],
+		processes: int=1,
 	) -> List[Gene]:
 		"""returns genes"""
 		
@@ -608,6 +939,7 @@ class IcecraftRepGen(RepresentationGenerator):
 		single_genes = cls.create_tile_genes(
 			single_tile_vertices,
 			config_map,
+			processes,
 		)
 		genes.extend(single_genes)
 		
@@ -617,17 +949,13 @@ class IcecraftRepGen(RepresentationGenerator):
 	def create_tile_genes(
 		cls,
 		single_tile_vertices: Iterable[Vertex],
-		config_map: Mapping[IcecraftPosition, ConfigAssemblage]
+		config_map: Mapping[IcecraftPosition, ConfigAssemblage],
+		processes: int=1,
 	) -> List[Gene]:
 		"""returns genes"""
+		global _TILE_JOB
 		genes = []
 		
-		def empty_if_missing(dictionary, key):
-			try:
-				return dictionary[key]
-			except KeyError:
-				return []
-		
 		# sort vertices by tile
 		single_tile_map = {}
 		for vtx in single_tile_vertices:
@@ -640,23 +968,49 @@ class IcecraftRepGen(RepresentationGenerator):
 		tiles = set(single_tile_map)
 		tiles.update(config_map)
 		
-		for tile in sorted(tiles):
-			# tile confs
-			for tile_conf in config_map[tile].tile:
-				if tile_conf.kind in ("NegClk", ):
-					tmp_gene = cls.create_all_allele_gene(tile_conf)
-				else:
-					raise ValueError(f"Unsupported tile config '{tile_conf.kind}'")
+		tiles = sorted(tiles)
+		
+		pool = fork_pool(min(processes, len(tiles)))
+		if pool is None:
+			gene_lists = [cls.genes_for_tile(t, single_tile_map.get(t, []), config_map[t]) for t in tiles]
+		else:
+			_TILE_JOB = (single_tile_map, config_map)
+			try:
+				with pool:
+					# results are returned in the order of the tiles
+					gene_lists = pool.map(_tile_genes_worker, tiles)
+			finally:
+				_TILE_JOB = None
+		
+		for tile_genes in gene_lists:
+			genes.extend(tile_genes)
+		
+		return genes
+	
+	@classmethod
+	def genes_for_tile(
+		cls,
+		tile: IcecraftPosition,
+		tile_vertices: Iterable[Vertex],
+		tile_assemblage: ConfigAssemblage
+	) -> List[Gene]:
+		"""Genes of the tile config items and of the vertices that only belong to the tile"""
+		genes = []
+		# tile confs
+		for tile_conf in tile_assemblage.tile:
+			if tile_conf.kind in ("NegClk", ):
+				tmp_gene = cls.create_all_allele_gene(tile_conf)
+			else:
+				raise ValueError(f"Unsupported tile config '{tile_conf.kind}'")
 				
-				genes.append(tmp_gene)
-			
-			# vertices that only belong to this tile
-			for vtx in empty_if_missing(single_tile_map, tile):
-				tmp_genes = vtx.get_genes()
-				for gene in tmp_genes:
-					assert len(gene.alleles) > 0, f"gene {gene.bit_positions} has no alleles"
-					genes.append(gene)
+			genes.append(tmp_gene)
 			
+		# vertices that only belong to this tile
+		for vtx in tile_vertices:
+			tmp_genes = vtx.get_genes()
+			for gene in tmp_genes:
+				assert len(gene.alleles) > 0, f"gene {gene.bit_positions} has no alleles"
+				genes.append(gene)
 		
 		return genes
 	
@@ -4,6 +4,7 @@ from typing import List, Union
 from .ice_board import FPGABoard, FPGAManager
 
 from domain.interfaces import TargetDevice, TargetManager, TargetConfiguration
+from domain.profiling import PROFILER
 
 HX8K_BOARD = "ICE40HX8K-B-EVN"
 
@@ -36,8 +37,10 @@ class IcecraftDevice(TargetDevice):
 	
 	def configure(self, configuration: TargetConfiguration) -> None:
 		# just use the configuration as if it was for the correct device
-		bitstream = configuration.get_bitstream(opt=self._fast)
-		self._device.flash_bitstream(bitstream)
+		with PROFILER.section("bitstream"):
+			bitstream = configuration.get_bitstream(opt=self._fast)
+		with PROFILER.section("flash"):
+			self._device.flash_bitstream(bitstream)
 	
 	def read_bytes(self, size: int) -> bytes:
 		return self._device.uart.read(size)
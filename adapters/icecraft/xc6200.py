@@ -6,7 +6,7 @@ from typing import Dict, List, Mapping
 
 from domain.interfaces import RepresentationGenerator
 from domain.model import Chromosome
-from domain.request_model import ResponseObject, RequestObject, Parameter
+from domain.request_model import ResponseObject, RequestObject, Parameter, set_req_defaults
 
 from adapters.icecraft.representation import IcecraftRep, IcecraftRepGen
 from adapters.icecraft.misc import IcecraftPosition, IcecraftBitPosition, IcecraftResource,\
@@ -67,21 +67,24 @@ class XC6200RepGen(RepresentationGenerator):
 		("local_g3_2", "lutff_2/in_3"), ("local_g3_2", "lutff_3/in_2")
 	]
 	
-	def __init__(self) -> None:
+	def __init__(self, processes: int=1) -> None:
+		self._processes = processes
 		self._parameters = {"__call__": [
 			Parameter("tiles", IcecraftPosition, multiple=True),
 			Parameter("in_ports", XC6200Port, default=[], multiple=True),
 			#Parameter("include_resources", IcecraftResource, default=[], multiple=True),
 			#Parameter("include_connections", IcecraftResCon, default=[], multiple=True),
 			#Parameter("output_lutffs", IcecraftLUTPosition, multiple=True),
+			Parameter("prune_no_viable_src", bool, default=False),
 		]}
 		
 	@property
 	def parameters(self) -> Mapping[str, Parameter]:
 		return self._parameters
 	
+	@set_req_defaults
 	def __call__(self, request: RequestObject) -> ResponseObject:
-		rep_gen = IcecraftRepGen()
+		rep_gen = IcecraftRepGen(self._processes)
 		#TODO: check all tile are logic tiles
 		tile_set = set(request.tiles)
 		
@@ -142,6 +145,9 @@ class XC6200RepGen(RepresentationGenerator):
 		]
 		req["output_lutffs"] = []
 		req["lut_functions"] = []
+		# the outputs are implicit, so only resources without a viable source can be pruned
+		req["prune_no_viable_src"] = request.prune_no_viable_src
+		req["prune_no_viable_dst"] = False
 		req["gene_constraints"] = [
 			# NegClk
 			IcecraftGeneConstraint((IcecraftBitPosition(TILE_ALL_LOGIC, TILE_ALL_LOGIC, 0, 0), ), ((False, ), )),
@@ -0,0 +1,160 @@
+from types import TracebackType
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple, Type
+
+import numpy as np
+
+from domain.data_sink import DataSink
+from domain.model import Chromosome
+
+class LineageRecorder(DataSink):
+	"""Collect new chromosomes and the alterations that created them and write them as blocks
+	
+	Meant to be passed as data sink to GenChromo and Individual.wrap_alteration instead of the sink of the EA. Instead
+	of one write per chromosome and alteration, flush writes all records collected since the last flush with one write
+	per kind:
+	- chromos: chromo_id and allele_indices of the new chromosomes
+	- crossover: in and out with two entries per row and generation
+	- mutation: parent, child and generation of the mutations that altered a chromosome
+	Records of other sources are passed on to the sink unchanged.
+	
+	In delta mode a new chromosome whose parent is tracked is written as the genes it differs in from that parent
+	instead of all allele indices:
+	- delta: chromo_id, base and end; base is the parent, end the end offset of the changed genes in delta_genes
+	- delta_genes: gene and value of the changed genes of all deltas, one row per gene
+	A chromosome is written in full if no parent is tracked, if it differs in more than half of the genes or if the
+	chain of deltas to the next full chromosome would become longer than snapshot_interval.
+	"""
+	def __init__(self, sink: DataSink, prefix: str="LineageRecorder", delta: bool=False, snapshot_interval: int=16
+		) -> None:
+		self._sink = sink
+		self._prefix = prefix
+		self._chromos: List[Tuple[int, Tuple[int, ...]]] = []
+		self._crossover: List[Tuple[List[int], List[int], int]] = []
+		self._mutation: List[Tuple[int, int, int]] = []
+		self._delta = delta
+		self._snapshot_interval = snapshot_interval
+		# chromosomes deltas can refer to: identifier -> allele indices and number of deltas to the full chromosome
+		self._known: Dict[int, Tuple[np.ndarray, int]] = {}
+		# number of gene rows written to delta_genes so far
+		self._delta_end = 0
+	
+	@property
+	def pending(self) -> int:
+		"""Number of records waiting for the next flush"""
+		return len(self._chromos) + len(self._crossover) + len(self._mutation)
+	
+	def track(self, chromos: Iterable[Chromosome]) -> None:
+		"""Set the chromosomes the deltas of the next flush can refer to, e.g. the current population
+		
+		Chromosomes that were not written by this recorder have to be stored in full by other means. Does nothing if
+		not in delta mode.
+		"""
+		if not self._delta:
+			return
+		
+		known = {}
+		for chromo in chromos:
+			try:
+				known[chromo.identifier] = self._known[chromo.identifier]
+			except KeyError:
+				known[chromo.identifier] = (np.array(chromo.allele_indices, dtype=np.int64), 0)
+		self._known = known
+	
+	def write(self, source: str, data_dict: Mapping[str, Any]) -> None:
+		if source == "GenChromo.perform":
+			chromo = data_dict["return"].chromosome
+			self._chromos.append((chromo.identifier, chromo.allele_indices))
+		elif source == "Individual.wrap.cxOnePoint":
+			self._crossover.append((data_dict["in"], data_dict["out"], data_dict["generation"]))
+		elif source == "Individual.wrap.mutUniformInt":
+			parent, = data_dict["in"]
+			child, = data_dict["out"]
+			# like the write map of single mutations, only alterations are recorded
+			if parent != child:
+				self._mutation.append((parent, child, data_dict["generation"]))
+		else:
+			self._sink.write(source, data_dict)
+	
+	def flush(self) -> None:
+		"""Write the collected records; kinds without records are skipped"""
+		full = self._split_deltas() if self._delta else self._chromos
+		if len(full) > 0:
+			self._sink.write(f"{self._prefix}.chromos", {
+				"chromo_id": np.array([c for c, _ in full], dtype=np.uint64),
+				"allele_indices": np.array([a for _, a in full], dtype=np.int64),
+			})
+		self._chromos = []
+		
+		if len(self._crossover) > 0:
+			self._sink.write(f"{self._prefix}.crossover", {
+				"in": np.array([i for i, _, _ in self._crossover], dtype=np.uint64),
+				"out": np.array([o for _, o, _ in self._crossover], dtype=np.uint64),
+				"generation": np.array([g for _, _, g in self._crossover], dtype=np.uint64),
+			})
+			self._crossover = []
+		
+		if len(self._mutation) > 0:
+			self._sink.write(f"{self._prefix}.mutation", {
+				"parent": np.array([p for p, _, _ in self._mutation], dtype=np.uint64),
+				"child": np.array([c for _, c, _ in self._mutation], dtype=np.uint64),
+				"generation": np.array([g for _, _, g in self._mutation], dtype=np.uint64),
+			})
+			self._mutation = []
+	
+	def _split_deltas(self) -> List[Tuple[int, Tuple[int, ...]]]:
+		"""Write the collected chromosomes that can be stored as delta and return the ones to store in full"""
+		# the alterations are still pending, so the parents of all new chromosomes are known
+		parents = {}
+		for (a, b), (c, d), _ in self._crossover:
+			if c not in (a, b):
+				parents[c] = (a, b)
+			if d not in (a, b):
+				parents[d] = (b, a)
+		parents.update((c, (p, )) for p, c, _ in self._mutation)
+		
+		full = []
+		delta = []
+		for chromo_id, allele_indices in self._chromos:
+			alleles = np.array(allele_indices, dtype=np.int64)
+			best = None
+			for parent in parents.get(chromo_id, tuple()):
+				try:
+					base_alleles, depth = self._known[parent]
+				except KeyError:
+					continue
+				genes = np.flatnonzero(base_alleles != alleles)
+				if best is None or len(genes) < len(best[1]):
+					best = (parent, genes, depth+1)
+			
+			if best is None or best[2] > self._snapshot_interval or 2*len(best[1]) > len(alleles):
+				full.append((chromo_id, allele_indices))
+				self._known[chromo_id] = (alleles, 0)
+			else:
+				delta.append((chromo_id, best[0], best[1], alleles[best[1]]))
+				self._known[chromo_id] = (alleles, best[2])
+		
+		if len(delta) > 0:
+			end = self._delta_end + np.cumsum([len(g) for _, _, g, _ in delta])
+			self._delta_end = int(end[-1])
+			self._sink.write(f"{self._prefix}.delta", {
+				"chromo_id": np.array([c for c, _, _, _ in delta], dtype=np.uint64),
+				"base": np.array([b for _, b, _, _ in delta], dtype=np.uint64),
+				"end": end.astype(np.uint64),
+			})
+			genes = np.concatenate([g for _, _, g, _ in delta])
+			# children equal to their base in all genes have no rows
+			if len(genes) > 0:
+				self._sink.write(f"{self._prefix}.delta_genes", {
+					"gene": genes.astype(np.uint32),
+					"value": np.concatenate([v for _, _, _, v in delta]),
+				})
+		
+		return full
+	
+	def __exit__(self,
+		exc_type: Optional[Type[BaseException]],
+		exc_value: Optional[BaseException],
+		exc_traceback: Optional[TracebackType]
+	) -> bool:
+		self.flush()
+		return False
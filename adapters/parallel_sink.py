@@ -1,24 +1,289 @@
 import multiprocessing as mp
+import queue
+import threading
+import time
 
 from dataclasses import dataclass
+from multiprocessing.connection import Connection
 from types import TracebackType
-from typing import Any, Mapping, Optional, Type
+from typing import Any, Iterable, Mapping, Optional, Tuple, Type
+
+import numpy as np
 
 from domain.data_sink import DataSink
 
+try:
+	from multiprocessing.shared_memory import SharedMemory
+except ImportError:
+	# Python < 3.8; values are always pickled
+	SharedMemory = None
+
+# shared memory is only used by default if it is available
+DEFAULT_SHM_THRESHOLD = None if SharedMemory is None else 1<<16
+
+def require_shared_memory() -> None:
+	if SharedMemory is None:
+		raise RuntimeError("transferring values via shared memory requires Python 3.8 or newer; set shm_threshold to "
+			"None")
+
 @dataclass(frozen=True)
 class SinkDetails:
 	cls: Type[DataSink]
 	args: tuple
 	kwargs: dict
 
+@dataclass(frozen=True)
+class SharedPayload:
+	"""Handle of a large value that is transferred via shared memory instead of the queue"""
+	name: str
+	size: int
+	dtype: Optional[str]
+	shape: Optional[Tuple[int, ...]]
+
+@dataclass(frozen=True)
+class SlotHandle:
+	"""Handle of a value stored in a slot of a SharedRing"""
+	index: int
+	size: int
+	dtype: Optional[str]
+	shape: Optional[Tuple[int, ...]]
+
+class SharedRing:
+	"""Fixed number of equally sized slots in a single block of shared memory
+	
+	Free slots are handed out in the order they were released. A slot is released as soon as the reader loaded the
+	value, so the slots are reused in a ring like manner. If all slots are in use, storing a value waits up to timeout
+	seconds for a slot to be released, e.g. if the reader died.
+	
+	The SharedRing can be passed to Process instances created by the same multiprocessing context.
+	"""
+	def __init__(self, slot_count: int, slot_size: int, ctx: mp.context.BaseContext, timeout: float=1.0) -> None:
+		require_shared_memory()
+		self._slot_count = slot_count
+		self._slot_size = slot_size
+		self._timeout = timeout
+		self._shm = SharedMemory(create=True, size=slot_count*slot_size)
+		self._owner = True
+		self._free = ctx.Queue()
+		for index in range(slot_count):
+			self._free.put(index)
+	
+	def __getstate__(self) -> dict:
+		return {"slot_count": self._slot_count, "slot_size": self._slot_size, "timeout": self._timeout,
+			"name": self._shm.name, "free": self._free}
+	
+	def __setstate__(self, state: dict) -> None:
+		self._slot_count = state["slot_count"]
+		self._slot_size = state["slot_size"]
+		self._timeout = state["timeout"]
+		self._shm = SharedMemory(name=state["name"])
+		self._owner = False
+		self._free = state["free"]
+	
+	@property
+	def slot_count(self) -> int:
+		return self._slot_count
+	
+	@property
+	def slot_size(self) -> int:
+		return self._slot_size
+	
+	def _slot(self, index: int, size: int) -> memoryview:
+		start = index*self._slot_size
+		return self._shm.buf[start:start+size]
+	
+	def store(self, value: Any) -> Optional[SlotHandle]:
+		"""Copy an array or bytes to a free slot
+		
+		Return None if the value doesn't fit in a slot or no slot was released within the timeout.
+		"""
+		if isinstance(value, np.ndarray):
+			size = value.nbytes
+		else:
+			size = len(value)
+		
+		if size > self._slot_size:
+			return None
+		
+		try:
+			index = self._free.get(timeout=self._timeout)
+		except queue.Empty:
+			return None
+		slot = self._slot(index, size)
+		if isinstance(value, np.ndarray):
+			np.ndarray(value.shape, dtype=value.dtype, buffer=slot)[...] = value
+			handle = SlotHandle(index, size, value.dtype.str, value.shape)
+		else:
+			slot[:] = value
+			handle = SlotHandle(index, size, None, None)
+		slot.release()
+		
+		return handle
+	
+	def load(self, handle: SlotHandle) -> Any:
+		"""Copy the value out of the slot and release the slot"""
+		slot = self._slot(handle.index, handle.size)
+		try:
+			if handle.dtype is None:
+				res = bytes(slot)
+			else:
+				res = np.ndarray(handle.shape, dtype=handle.dtype, buffer=slot).copy()
+		finally:
+			slot.release()
+			self._free.put(handle.index)
+		
+		return res
+	
+	def close(self) -> None:
+		"""Detach from the shared memory; the creating instance also frees the shared memory"""
+		self._shm.close()
+		if self._owner:
+			self._shm.unlink()
+
+def share_value(value: Any, threshold: Optional[int], ring: Optional[SharedRing]=None) -> Any:
+	"""Move arrays and bytes of at least threshold bytes to shared memory and return a handle instead
+	
+	If a SharedRing is given, the value is stored in one of its slots. Values too large for a slot or for which no slot
+	was released in time get their own block of shared memory.
+	"""
+	if threshold is None:
+		return value
+	
+	if isinstance(value, np.ndarray):
+		if value.nbytes < threshold:
+			return value
+	elif isinstance(value, (bytes, bytearray)):
+		if len(value) < threshold:
+			return value
+	else:
+		return value
+	
+	if ring is not None:
+		handle = ring.store(value)
+		if handle is not None:
+			return handle
+	
+	require_shared_memory()
+	if isinstance(value, np.ndarray):
+		shm = SharedMemory(create=True, size=max(1, value.nbytes))
+		np.ndarray(value.shape, dtype=value.dtype, buffer=shm.buf)[...] = value
+		handle = SharedPayload(shm.name, value.nbytes, value.dtype.str, value.shape)
+	else:
+		shm = SharedMemory(create=True, size=max(1, len(value)))
+		shm.buf[:len(value)] = value
+		handle = SharedPayload(shm.name, len(value), None, None)
+	
+	shm.close()
+	return handle
+
+def unshare_value(value: Any, ring: Optional[SharedRing]=None) -> Any:
+	"""Restore a value moved to shared memory and release the shared memory"""
+	if isinstance(value, SlotHandle):
+		return ring.load(value)
+	
+	if not isinstance(value, SharedPayload):
+		return value
+	
+	shm = SharedMemory(name=value.name)
+	try:
+		if value.dtype is None:
+			res = bytes(shm.buf[:value.size])
+		else:
+			res = np.ndarray(value.shape, dtype=value.dtype, buffer=shm.buf).copy()
+	finally:
+		shm.close()
+		shm.unlink()
+	
+	return res
+
+def pack_data(
+	data_dict: Mapping[str, Any],
+	threshold: Optional[int],
+	ring: Optional[SharedRing]=None
+) -> Mapping[str, Any]:
+	"""Replace large values by shared memory handles
+	
+	Values of the data_dict and values of mappings in the data_dict (e.g. ResponseObject) are considered.
+	"""
+	if threshold is None:
+		return data_dict
+	
+	# the slots used by this data_dict are only released after it was sent, so waiting for more slots than the ring
+	# has would be in vain
+	slots_left = 0 if ring is None else ring.slot_count
+	
+	def pack_map(org: Mapping[str, Any], depth: int) -> Mapping[str, Any]:
+		nonlocal slots_left
+		res = {}
+		changed = False
+		for key, value in org.items():
+			if depth > 0 and isinstance(value, Mapping):
+				new_value = pack_map(value, depth-1)
+			else:
+				new_value = share_value(value, threshold, ring if slots_left > 0 else None)
+				if isinstance(new_value, SlotHandle):
+					slots_left -= 1
+			changed |= new_value is not value
+			res[key] = new_value
+		
+		if not changed:
+			return org
+		return type(org)(res)
+	
+	return pack_map(data_dict, 1)
+
+def unpack_data(data_dict: Mapping[str, Any], ring: Optional[SharedRing]=None) -> Mapping[str, Any]:
+	"""Inverse of pack_data"""
+	def unpack_map(org: Mapping[str, Any], depth: int) -> Mapping[str, Any]:
+		res = {}
+		changed = False
+		for key, value in org.items():
+			if depth > 0 and isinstance(value, Mapping):
+				new_value = unpack_map(value, depth-1)
+			else:
+				new_value = unshare_value(value, ring)
+			changed |= new_value is not value
+			res[key] = new_value
+		
+		if not changed:
+			return org
+		return type(org)(res)
+	
+	return unpack_map(data_dict, 1)
+
 class ParSubSink(DataSink):
-	"""DataSink with access to a ParallelSink, that can be passed to new Processes"""
-	def __init__(self, write_queue: mp.JoinableQueue) -> None:
+	"""DataSink with access to a ParallelSink, that can be passed to new Processes
+	
+	writer_end is readable as soon as the writer process ended, as the writer holds the only sending end of the
+	pipe. In that case write raises a RuntimeError instead of waiting for space in a full queue.
+	"""
+	def __init__(self,
+		write_queue: mp.JoinableQueue,
+		shm_threshold: Optional[int]=None,
+		ring: Optional[SharedRing]=None,
+		writer_end: Optional[Connection]=None,
+		timeout: float=1.0,
+	) -> None:
 		self._write_queue = write_queue
+		self._shm_threshold = shm_threshold
+		self._ring = ring
+		self._writer_end = writer_end
+		self._timeout = timeout
 	
 	def write(self, source: str, data_dict: Mapping[str, Any]) -> None:
-		self._write_queue.put((source, data_dict))
+		self._check_writer()
+		batch = [(source, pack_data(data_dict, self._shm_threshold, self._ring))]
+		
+		while True:
+			try:
+				self._write_queue.put(batch, timeout=self._timeout)
+				break
+			except queue.Full:
+				self._check_writer()
+	
+	def _check_writer(self) -> None:
+		if self._writer_end is not None and self._writer_end.poll():
+			raise RuntimeError("writer process of the ParallelSink ended")
 	
 	def __exit__(self,
 		exc_type: Optional[Type[BaseException]],
@@ -29,18 +294,77 @@ class ParSubSink(DataSink):
 
 class ParallelSink(DataSink):
 	"""Wraps around another DataSink and executes it in a separate process.
+	
+	Writes are collected in batches that are sent to the writer process if either batch_size writes are collected
+	or the first write of the batch is older than flush_interval seconds. A background thread sends batches that
+	reach flush_interval seconds without further writes. The queue holds at most max_queue batches
+	(0 for no limit); if the writer process falls behind, write blocks until there is space in the queue again.
+	Arrays and bytes of at least shm_threshold bytes are transferred via shared memory instead of being pickled. They
+	are stored in a SharedRing with slot_count slots of slot_size bytes; larger values get their own block of shared
+	memory. Writes from flush_sources are sent to the writer process immediately together with the pending batch.
+	If the writer process died, write and flush raise a RuntimeError instead of waiting for it. If stats_source is
+	given, the high water mark of the queue is written to it on exit. Shared memory requires Python 3.8 or newer; by
+	default it is only used if available.
 	"""
 	
-	def __init__(self, sink_type: Type[DataSink], sink_args: tuple=tuple(), sink_kwargs: dict={}) -> None:
+	def __init__(self,
+		sink_type: Type[DataSink],
+		sink_args: tuple=tuple(),
+		sink_kwargs: dict={},
+		batch_size: int=32,
+		flush_interval: float=1.0,
+		max_queue: int=1024,
+		shm_threshold: Optional[int]=DEFAULT_SHM_THRESHOLD,
+		slot_count: int=8,
+		slot_size: int=1<<20,
+		flush_sources: Iterable[str]=tuple(),
+		stats_source: Optional[str]=None,
+	) -> None:
+		if shm_threshold is not None:
+			require_shared_memory()
+		
 		self._sink_details = SinkDetails(sink_type, sink_args, sink_kwargs)
+		self._batch_size = batch_size
+		self._flush_interval = flush_interval
+		self._max_queue = max_queue
+		self._shm_threshold = shm_threshold
+		self._slot_count = slot_count
+		self._slot_size = slot_size
+		self._flush_sources = set(flush_sources)
+		self._stats_source = stats_source
+		self._ring = None
 		self._write_queue = None
 		self._process = None
+		self._writer_end = None
+		self._batch = []
+		self._batch_start = 0
+		self._high_water_mark = 0
+		# guards the batch against the flush thread
+		self._cond = threading.Condition()
+		self._closing = False
+		self._flush_thread = None
+	
+	@property
+	def high_water_mark(self) -> int:
+		"""Maximum number of batches waiting in the queue observed so far"""
+		return self._high_water_mark
 	
 	def __enter__(self) -> "ParallelSink":
 		ctx = mp.get_context("spawn")
-		self._write_queue = ctx.JoinableQueue()
-		self._process = ctx.Process(target=self.writer, args=(self._sink_details, self._write_queue))
+		self._write_queue = ctx.JoinableQueue(self._max_queue)
+		if self._shm_threshold is not None and self._slot_count > 0:
+			self._ring = SharedRing(self._slot_count, self._slot_size, ctx)
+		self._writer_end, send_end = ctx.Pipe(duplex=False)
+		self._process = ctx.Process(target=self.writer, args=(self._sink_details, self._write_queue, self._ring,
+			send_end))
 		self._process.start()
+		# only the writer holds the sending end, so the receiving end gets readable when the writer ended
+		send_end.close()
+		self._batch = []
+		self._high_water_mark = 0
+		self._closing = False
+		self._flush_thread = threading.Thread(target=self._flush_periodically, daemon=True)
+		self._flush_thread.start()
 		return self
 	
 	def __exit__(self,
@@ -48,17 +372,90 @@ class ParallelSink(DataSink):
 		exc_value: Optional[BaseException],
 		exc_traceback: Optional[TracebackType]
 	) -> bool:
-		self._write_queue.put(None)
-		self._write_queue.join()
+		with self._cond:
+			self._closing = True
+			self._cond.notify()
+		self._flush_thread.join()
+		self._flush_thread = None
+		
+		# a dead writer can't receive anything
+		if self._process.is_alive():
+			if self._stats_source is not None:
+				self.write(self._stats_source, {"high_water_mark": self._high_water_mark, "max_queue": self._max_queue})
+			self.flush()
+			self._write_queue.put(None)
+			self._write_queue.join()
 		self._process.join()
 		
+		if self._ring is not None:
+			self._ring.close()
+		self._writer_end.close()
+		
+		self._ring = None
 		self._write_queue = None
 		self._process = None
+		self._writer_end = None
 		
 		return False
 	
 	def write(self, source: str, data_dict: Mapping[str, Any]) -> None:
-		self._write_queue.put((source, data_dict))
+		self._check_writer()
+		packed = pack_data(data_dict, self._shm_threshold, self._ring)
+		
+		with self._cond:
+			if len(self._batch) == 0:
+				self._batch_start = time.perf_counter()
+				# start the timeout of the new batch
+				self._cond.notify()
+			self._batch.append((source, packed))
+			
+			# send shared memory handles immediately, else all slots of the ring could be blocked by the pending batch
+			if packed is not data_dict or source in self._flush_sources or len(self._batch) >= self._batch_size or\
+				time.perf_counter() - self._batch_start >= self._flush_interval:
+				self._send_batch()
+	
+	def flush(self) -> None:
+		"""Send all collected writes to the writer process"""
+		with self._cond:
+			self._send_batch()
+	
+	def _send_batch(self) -> None:
+		# requires the lock of _cond
+		if len(self._batch) == 0:
+			return
+		
+		while True:
+			try:
+				self._write_queue.put(self._batch, timeout=1.0)
+				break
+			except queue.Full:
+				self._check_writer()
+		self._batch = []
+		
+		try:
+			self._high_water_mark = max(self._high_water_mark, self._write_queue.qsize())
+		except NotImplementedError:
+			# qsize is not available on every platform, e.g. macOS
+			pass
+	
+	def _check_writer(self) -> None:
+		if not self._process.is_alive():
+			raise RuntimeError(f"writer process of the ParallelSink ended with exit code {self._process.exitcode}")
+	
+	def _flush_periodically(self) -> None:
+		"""Send the batch once it is flush_interval seconds old, also if no further write arrives"""
+		with self._cond:
+			while not self._closing:
+				if len(self._batch) == 0:
+					self._cond.wait()
+					continue
+				
+				remaining = self._batch_start + self._flush_interval - time.perf_counter()
+				if remaining > 0:
+					self._cond.wait(remaining)
+					continue
+				
+				self._send_batch()
 	
 	def get_sub(self) -> ParSubSink:
 		"""Return a DataSink that writes to the wrapped sink and can be passed to other processes
@@ -67,19 +464,24 @@ class ParallelSink(DataSink):
 		instances. To still use the wrapped DataSink from multiple Process instances, a process safe ParSubSink can
 		be created with this function.
 		"""
-		return ParSubSink(self._write_queue)
+		return ParSubSink(self._write_queue, self._shm_threshold, self._ring, self._writer_end)
 	
 	@staticmethod
-	def writer(sink_details: SinkDetails, write_queue: mp.JoinableQueue) -> None:
+	def writer(sink_details: SinkDetails, write_queue: mp.JoinableQueue, ring: Optional[SharedRing]=None,
+		send_end: Optional[Connection]=None) -> None:
+		"""Write the batches to the wrapped sink; send_end is kept open until the process ends"""
 		core_sink = sink_details.cls(*sink_details.args, **sink_details.kwargs)
 		
 		with core_sink:
 			while True:
-				item = write_queue.get()
-				if item is None:
+				batch = write_queue.get()
+				if batch is None:
 					break
 				
-				core_sink.write(*item)
+				for source, data_dict in batch:
+					core_sink.write(source, unpack_data(data_dict, ring))
 				write_queue.task_done()
-			
+		
+		if ring is not None:
+			ring.close()
 		write_queue.task_done()
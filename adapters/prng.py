@@ -11,6 +11,10 @@ class BuiltInPRNG(PRNG):
 	def get_state(self) -> Any:
 		return self._rng.getstate()
 	
+	def set_state(self, state: Any) -> None:
+		"""Restore a state returned by get_state, e.g. to resume a run"""
+		self._rng.setstate(state)
+	
 	def randint(self, a: int, b: int) -> int:
 		return self._rng.randint(a, b)
 	
@@ -0,0 +1,175 @@
+"""Persistent cache for generated representations"""
+
+import ast
+import hashlib
+import importlib.util
+import os
+import pickle
+import tempfile
+import zlib
+
+from types import ModuleType
+from typing import Any, Iterable, List, Mapping, Optional
+
+from domain.interfaces import RepresentationGenerator
+from domain.request_model import Parameter, RequestObject, ResponseObject
+
+def imported_modules(module_name: str, packages: Iterable[str]) -> List[str]:
+	"""Names of the modules a module imports directly or indirectly, restricted to the given packages
+	
+	The imports are read from the source; only the packages containing the modules are imported to locate them.
+	Modules imported at runtime, e.g. by importlib.import_module, are not found.
+	"""
+	prefixes = tuple(packages)
+	
+	def in_packages(name: str) -> bool:
+		return any(name == p or name.startswith(p+".") for p in prefixes)
+	
+	def source_path(name: str) -> Optional[str]:
+		try:
+			spec = importlib.util.find_spec(name)
+		except (ImportError, ValueError):
+			return None
+		if spec is None or spec.origin is None or not spec.origin.endswith(".py"):
+			return None
+		return spec.origin
+	
+	found = {}
+	pending = [module_name]
+	while pending:
+		name = pending.pop()
+		if name in found or not in_packages(name):
+			continue
+		path = source_path(name)
+		if path is None:
+			continue
+		found[name] = path
+		
+		is_pkg = os.path.basename(path) == "__init__.py"
+		with open(path, "rb") as src_file:
+			tree = ast.parse(src_file.read(), path)
+		for node in ast.walk(tree):
+			if isinstance(node, ast.Import):
+				pending.extend(a.name for a in node.names)
+			elif isinstance(node, ast.ImportFrom):
+				if node.level > 0:
+					base = name if is_pkg else name.rpartition(".")[0]
+					for _ in range(node.level-1):
+						base = base.rpartition(".")[0]
+					base = ".".join(filter(None, [base, node.module]))
+				else:
+					base = node.module
+				pending.append(base)
+				# imported names can be modules themselves
+				pending.extend(f"{base}.{a.name}" for a in node.names)
+	
+	return sorted(found)
+
+def source_digest(module: ModuleType, packages: Iterable[str], data_digests: Iterable[str]=tuple()) -> str:
+	"""Hash of the source of a module and the modules of the given packages it depends on
+	
+	data_digests: digests of data the module reads at runtime, e.g. a chip database
+	"""
+	sha = hashlib.sha256()
+	for name in imported_modules(module.__name__, packages):
+		sha.update(name.encode("utf-8"))
+		with open(importlib.util.find_spec(name).origin, "rb") as src_file:
+			sha.update(src_file.read())
+	for digest in data_digests:
+		sha.update(digest.encode("utf-8"))
+	
+	return sha.hexdigest()
+
+class CachedRepGen(RepresentationGenerator):
+	"""Wraps a RepresentationGenerator and stores the generated representations in a directory
+	
+	The cache is content-addressed: the file name is a hash of the type of the generator, the version and the values
+	of all parameters of the request, including the defaults. Other entries of the request are ignored. The version
+	should change whenever the generated representation might change, e.g. by using source_digest.
+	
+	Requests with values that have no stable representation, i.e. the repr contains a memory address, are not cached.
+	"""
+	SUFFIX = ".rep"
+	
+	def __init__(self, rep_gen: RepresentationGenerator, cache_dir: str, version: str="") -> None:
+		self._rep_gen = rep_gen
+		self._cache_dir = cache_dir
+		self._version = version
+		self._hits = 0
+		self._misses = 0
+	
+	@property
+	def parameters(self) -> Mapping[str, Iterable[Parameter]]:
+		return self._rep_gen.parameters
+	
+	@property
+	def hits(self) -> int:
+		return self._hits
+	
+	@property
+	def misses(self) -> int:
+		return self._misses
+	
+	def cache_key(self, request: RequestObject) -> Optional[str]:
+		"""Hash identifying the representation generated for a request; None if the request can't be cached"""
+		defaults = self._rep_gen.default_parameters["__call__"]
+		parts = [type(self._rep_gen).__qualname__, self._version]
+		for param in sorted(self._rep_gen.parameters["__call__"], key=lambda p: p.name):
+			try:
+				value = request[param.name]
+			except KeyError:
+				value = defaults[param.name]
+			
+			if param.multiple:
+				value = tuple(value)
+			text = repr(value)
+			if " at 0x" in text:
+				return None
+			parts.append(f"{param.name}={text}")
+		
+		return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()
+	
+	def cache_path(self, key: str) -> str:
+		return os.path.join(self._cache_dir, key+self.SUFFIX)
+	
+	def __call__(self, request: RequestObject) -> ResponseObject:
+		key = self.cache_key(request)
+		if key is None:
+			self._misses += 1
+			return self._rep_gen(request)
+		
+		path = self.cache_path(key)
+		try:
+			rep = self.load(path)
+			self._hits += 1
+			return ResponseObject(representation=rep)
+		except (FileNotFoundError, EOFError, pickle.UnpicklingError, zlib.error):
+			# missing or broken entry
+			pass
+		
+		self._misses += 1
+		res = self._rep_gen(request)
+		self.store(path, res.representation)
+		
+		return res
+	
+	@staticmethod
+	def load(path: str) -> Any:
+		with open(path, "rb") as cache_file:
+			return pickle.loads(zlib.decompress(cache_file.read()))
+	
+	@staticmethod
+	def store(path: str, rep: Any) -> None:
+		"""Write the representation atomically, so concurrent runs never read partial files"""
+		cache_dir = os.path.dirname(path) or "."
+		os.makedirs(cache_dir, exist_ok=True)
+		data = zlib.compress(pickle.dumps(rep, protocol=pickle.HIGHEST_PROTOCOL))
+		
+		fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+		try:
+			with os.fdopen(fd, "wb") as tmp_file:
+				tmp_file.write(data)
+			os.replace(tmp_path, path)
+		except BaseException:
+			os.remove(tmp_path)
+			raise
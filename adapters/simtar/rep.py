@@ -33,6 +33,14 @@ class SimtarRep(Representation):
 	
 	def iter_genes(self) -> Iterable[Gene]:
 		yield from self._genes
+	
+	def phenotype_digest(self, chromo: Chromosome) -> bytes:
+		"""Digest of the phenotype of a chromosome; the LUT entries are masked if the target is not active"""
+		bits = self.decoded_bits(chromo)
+		if not bits.get(SimtarBitPos(16), True):
+			# inactive target has a constant output
+			return b"inactive"
+		return super().phenotype_digest(chromo)
 
 
 class SimtarRepGen(RepresentationGenerator):
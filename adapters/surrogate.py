@@ -0,0 +1,83 @@
+from typing import Dict, Sequence, Tuple
+
+import numpy as np
+
+from domain.interfaces import Representation
+from domain.model import Chromosome
+
+class RidgeSurrogate:
+	"""Predict the fitness of chromosomes by ridge regression over one-hot encoded allele indices
+	
+	The model is trained on the max_samples most recently added chromosomes. It only predicts after it was fitted
+	with at least min_samples chromosomes.
+	"""
+	def __init__(self, allele_counts: Sequence[int], alpha: float=1.0, min_samples: int=20, max_samples: int=1000
+		) -> None:
+		self._offsets = np.concatenate(([0], np.cumsum(allele_counts)[:-1])).astype(np.int64)
+		self._dim = int(sum(allele_counts))
+		self._alpha = alpha
+		self._min_samples = min_samples
+		self._max_samples = max_samples
+		# chromosome identifier -> allele indices and fitness; ordered from the oldest to the newest
+		self._samples: Dict[int, Tuple[Tuple[int, ...], float]] = {}
+		self._weights = None
+		self._intercept = 0.0
+	
+	@classmethod
+	def from_rep(cls, rep: Representation, **kwargs) -> "RidgeSurrogate":
+		return cls([len(g.alleles) for g in rep.iter_genes()], **kwargs)
+	
+	@property
+	def ready(self) -> bool:
+		"""True iff the model was fitted and can predict"""
+		return self._weights is not None
+	
+	@property
+	def sample_count(self) -> int:
+		return len(self._samples)
+	
+	def add(self, chromo: Chromosome, fitness: float) -> None:
+		"""Add a measured chromosome to the training data; a new fitness value replaces the old one"""
+		self._samples.pop(chromo.identifier, None)
+		self._samples[chromo.identifier] = (chromo.allele_indices, fitness)
+		while len(self._samples) > self._max_samples:
+			del self._samples[next(iter(self._samples))]
+	
+	def encode(self, alleles: np.ndarray) -> np.ndarray:
+		"""One-hot encoding of a 2D array of allele indices"""
+		res = np.zeros((len(alleles), self._dim), dtype=np.float32)
+		res[np.arange(len(alleles))[:, np.newaxis], self._offsets + alleles] = 1
+		return res
+	
+	def fit(self) -> None:
+		"""Fit the model to the training data; does nothing if there are less than min_samples samples"""
+		if len(self._samples) < max(1, self._min_samples):
+			return
+		
+		alleles = np.array([a for a, _ in self._samples.values()], dtype=np.int64).reshape(len(self._samples), -1)
+		fitness = np.array([f for _, f in self._samples.values()], dtype=np.float64)
+		
+		x = self.encode(alleles)
+		x_mean = x.mean(axis=0)
+		y_mean = fitness.mean()
+		x -= x_mean
+		y = fitness - y_mean
+		
+		# solve the smaller of the two equivalent systems
+		if len(y) <= self._dim:
+			gram = (x @ x.T).astype(np.float64)
+			dual = np.linalg.solve(gram + self._alpha*np.eye(len(y)), y)
+			weights = x.T.astype(np.float64) @ dual
+		else:
+			gram = (x.T @ x).astype(np.float64)
+			weights = np.linalg.solve(gram + self._alpha*np.eye(self._dim), x.T.astype(np.float64) @ y)
+		
+		self._weights = weights
+		self._intercept = y_mean - x_mean.astype(np.float64) @ weights
+	
+	def predict(self, alleles: np.ndarray) -> np.ndarray:
+		"""Predict the fitness for each row of a 2D array of allele indices"""
+		if not self.ready:
+			raise ValueError("surrogate has to be fitted before it can predict")
+		
+		return self._weights[self._offsets + alleles].sum(axis=1) + self._intercept
@@ -13,3 +13,26 @@ class SimpleUID(UniqueID):
 	
 	def exclude(self, ids: Iterable[int]) -> None:
 		self._counter = max(self._counter, max(ids)+1)
+
+class StridedUID(UniqueID):
+	"""Generate the IDs start, start+stride, start+2*stride, ...
+	
+	Instances with the same stride and different start values in the range [0, stride) never generate the same ID,
+	e.g. for independent processes writing to the same DataSink.
+	"""
+	def __init__(self, start: int, stride: int) -> None:
+		if not 0 <= start < stride:
+			raise ValueError(f"start has to be in [0, {stride}), got {start}")
+		self._start = start
+		self._stride = stride
+		self._counter = start
+	
+	def get_id(self) -> int:
+		uid = self._counter
+		self._counter += self._stride
+		return uid
+	
+	def exclude(self, ids: Iterable[int]) -> None:
+		min_id = max(ids) + 1
+		if min_id > self._counter:
+			self._counter = min_id + (self._start - min_id) % self._stride
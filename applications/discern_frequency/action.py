@@ -1,5 +1,7 @@
+import json
 import numpy as np
 import os
+import random
 import re
 import subprocess
 import sys
@@ -7,8 +9,7 @@ import time
 
 from argparse import Namespace
 from contextlib import ExitStack
-from copy import deepcopy
-from dataclasses import asdict, dataclass, field
+from dataclasses import asdict, dataclass, field, replace
 from datetime import datetime, timezone
 from enum import auto, Enum
 from statistics import mean, median, stdev
@@ -20,31 +21,37 @@ import h5py
 import applications.discern_frequency.write_map_util as write_map_util
 
 from adapters.embed_driver import FixedEmbedDriver
-from adapters.deap.simple_ea import EvalMode, Individual, SimpleEA
+from adapters.deap.island_ea import IslandModel, IslandSetup
+from adapters.deap.simple_ea import EvalMode, Individual, PRNGSource, SimpleEA
+from adapters.deap.steady_state_ea import SteadyStateEA
 from adapters.dummies import DummyDriver
 from adapters.gear.rigol import FloatCheck, IntCheck, OsciDS1102E, SetupCmd
 from adapters.hdf5_sink import compose, HDF5Sink, IgnoreValue, MetaEntry, MetaEntryMap, ParamAim, ParamAimMap
-from adapters.icecraft import CarryData, IcecraftBitPosition, IcecraftDevice, IcecraftPosition, IcecraftPosTransLibrary,\
-	IcecraftRep, XC6200RepGen,IcecraftManager, IcecraftRawConfig, PartConf, XC6200Port, XC6200Direction, XC6200Cell
+from adapters.icecraft import IcecraftDevice, IcecraftPosition, IcecraftPosTransLibrary,\
+	IcecraftRep, XC6200RepGen,IcecraftManager, IcecraftRawConfig, XC6200Port, XC6200Direction, XC6200Cell
+from adapters.icecraft.chip_data import chip_db_digest
 from adapters.input_gen import RandIntGen
 from adapters.minvia import MinviaDriver
-from adapters.icecraft.misc import IcecraftLUTPosition
 from adapters.mcu_drv_mtr import MCUDrvMtr
 from adapters.parallel_collector import CollectorDetails, InitDetails, ParallelCollector
 from adapters.parallel_sink import ParallelSink
 from adapters.pop_init import GivenPop, RandomPop
 from adapters.prng import BuiltInPRNG
+from adapters.rep_cache import CachedRepGen, source_digest
 from adapters.simple_sink import TextfileSink
+from adapters.surrogate import RidgeSurrogate
 from adapters.temp_meter import TempMeter
 from adapters.unique_id import SimpleUID
 from applications.discern_frequency.hdf5_content import ContentType, get_content_type
 from applications.discern_frequency.hdf5_desc import add_meta
 from applications.discern_frequency.misc import DriverType
-from applications.discern_frequency.read_hdf5_util import data_from_key, get_chromo_bits, read_carry_enable_bits, read_carry_enable_values, read_chromosome, read_fitness_chromo_id, read_generation, read_habitat, read_osci_setup, read_rep, read_s_t_index
+from applications.discern_frequency.read_hdf5_util import ChromosomeReader, data_from_key, DatasetTail, get_chromo_bits, open_hdf5, read_carry_enable_bits, read_carry_enable_values, read_checkpoint, read_chromosome, read_fitness_chromo_id, read_generation, read_habitat, read_osci_setup, read_rep, read_s_t_index, read_surrogate_samples
 from applications.discern_frequency.s_t_comb import lexicographic_combinations
+from applications.discern_frequency.sweep import create_runs, create_workers, parse_argv, SweepScheduler,\
+	write_index
 from domain.data_sink import DataSink
 from domain.interfaces import Driver, FitnessFunction, InputData, InputGen, Meter, OutputData, PRNG, TargetDevice, \
-TargetManager
+TargetManager, UniqueID
 from domain.model import AlleleAll, Chromosome, Gene
 from domain.request_model import ResponseObject, RequestObject, Parameter, ParameterValues
 from domain.use_cases import DecTarget, ExInfoCallable, GenChromo, Measure, MeasureFitness
@@ -75,66 +82,69 @@ def tiles_from_corners(min_pos: Tuple[int, int], max_pos: Tuple[int, int]) -> Li
 	return res
 
 # generate representation
-def create_xc6200_rep(min_pos: Tuple[int, int], max_pos: Tuple[int, int], in_port: XC6200Port) -> IcecraftRep:
-	rep_gen = XC6200RepGen()
+def create_xc6200_rep(min_pos: Tuple[int, int], max_pos: Tuple[int, int], in_port: XC6200Port,
+	cache_dir: Optional[str]=None, processes: int=1, prune: bool=False) -> IcecraftRep:
+	"""Generate the representation; if a cache directory is given, the representation is loaded from there if
+	available
+	
+	processes: number of processes for the work that is independent for each tile
+	prune: mark resources that can't be driven as unused, i.e. remove their genes from the chromosome
+	"""
+	rep_gen = XC6200RepGen(processes)
+	if cache_dir is not None:
+		version = source_digest(sys.modules[type(rep_gen).__module__], ["adapters", "domain"], [chip_db_digest()])
+		rep_gen = CachedRepGen(rep_gen, cache_dir, version)
 	
 	tiles = tiles_from_corners(min_pos, max_pos)
 	# output ports are implicit as they depend on which neigh_op nets the habitat takes from the evolved region
-	req = RequestObject(tiles=tiles, in_ports=[in_port])
+	req = RequestObject(tiles=tiles, in_ports=[in_port], prune_no_viable_src=prune)
 	
 	bef = time.perf_counter()
-	rep = rep_gen(req).representation
+	res = rep_gen(req)
 	aft = time.perf_counter()
-	print(f"rep gen took {aft-bef} s, {sum(g.alleles.size_in_bits() for g in rep.genes)} bits")
+	rep = res.representation
+	if "prune_stats" in res:
+		stats = res.prune_stats
+		print(f"pruned {stats.vertices} vertices, {stats.edges} edges, {stats.genes} genes, {stats.bits} bits")
+	print(f"rep gen took {aft-bef:.2f} s with {processes} processes, {sum(g.alleles.size_in_bits() for g in rep.genes)} "
+		"bits")
 	
 	return rep
 
 
-# move representation to other tiles
-def move_rep(rep: IcecraftRep, x_offset: int, y_offset: int, config: IcecraftRawConfig) -> IcecraftRep:
-	# currently no support for colbufctrl
-	if len(rep.colbufctrl):
-		raise ValueError("Can't relocate colbuctrl")
-	# check tile type
-	# move coordinates
-	def move_pos(org_pos):
-		new_pos = IcecraftPosition(org_pos.x+x_offset, org_pos.y+y_offset)
-		if config.get_tile_type(org_pos) != config.get_tile_type(new_pos):
-			raise ValueError(f"Can't move {config.get_tile_type(org_bit.tile())} to {config.get_tile_type(new_pos)}")
-		
-		return new_pos
-	
-	def move_bit(org_bit):
-		new_pos = move_pos(org_bit.tile)
-		return IcecraftBitPosition.from_tile(new_pos, org_bit.group, org_bit.index)
-	
-	def move_gene(org_gene):
-		return Gene(
-			tuple(move_bit(b) for b in org_gene.bit_positions),
-			deepcopy(org_gene.alleles),
-			org_gene.description
-		)
+def add_digest_graph(hdf5_file: h5py.File, rep: IcecraftRep, cache_dir: Optional[str]=None, processes: int=1
+	) -> IcecraftRep:
+	"""Add the structure for IcecraftRep.phenotype_digest to a representation read from a file
 	
-	def move_lut_pos(org_lut_pos):
-		new_pos = move_pos(org_lut_pos.tile)
-		return IcecraftLUTPosition.from_tile(new_pos, org_lut_pos.z)
-	
-	def move_part_conf(org_pc):
-		new_bits = tuple(move_bit(b) for b in org_pc.bits)
-		return PartConf(new_bits, deepcopy(org_pc.values))
-	
-	def move_carry_data(org_cd):
-		ce = tuple(move_bit(b) for b in org_cd.carry_enable)
-		cu = [move_part_conf(p) for p in org_cd.carry_use]
-		return CarryData(org_cd.lut_index, ce, cu)
+	The structure is taken from the representation generated for the area and input port of the file. If the genes
+	differ, e.g. as the representation generator changed since the file was written, rep is returned unchanged.
+	"""
+	try:
+		min_pos = tuple(int(v) for v in data_from_key(hdf5_file, "habitat.area.min"))
+		max_pos = tuple(int(v) for v in data_from_key(hdf5_file, "habitat.area.max"))
+		in_pos = IcecraftPosition(*(int(v) for v in data_from_key(hdf5_file, "habitat.in_port.pos")))
+		in_port = XC6200Port(in_pos, XC6200Direction[data_from_key(hdf5_file, "habitat.in_port.dir")])
+	except KeyError:
+		print("Warning: area of the representation not found; phenotypes only match for identical configurations")
+		return rep
 	
-	genes = [move_gene(g) for g in rep.genes]
-	constant = [move_gene(g) for g in rep.constant]
-	output = [move_lut_pos(l) for l in rep.output]
+	try:
+		prune = bool(data_from_key(hdf5_file, "rep.prune_unreachable"))
+	except KeyError:
+		# written before pruning was available
+		prune = False
 	
-	carry_data = {move_pos(k): {i: move_carry_data(c) for i, c in v.items()} for k, v in rep.carry_data.items()}
+	gen_rep = create_xc6200_rep(min_pos, max_pos, in_port, cache_dir, processes, prune)
+	if list(gen_rep.genes) != list(rep.genes):
+		print("Warning: generated representation differs; phenotypes only match for identical configurations")
+		return rep
 	
-	return IcecraftRep(genes, constant, [], output, carry_data)
+	return replace(rep, digest_graph=gen_rep.digest_graph)
+
+
+# move representation to other tiles
+def move_rep(rep: IcecraftRep, x_offset: int, y_offset: int, config: IcecraftRawConfig) -> IcecraftRep:
+	return rep.relocate(x_offset, y_offset, config.get_tile_type)
 
 
 def create_meter_setup() -> SetupCmd:
@@ -283,6 +293,12 @@ class EASetup:
 	crossover_prob: Optional[float] = None
 	mutation_prob: Optional[float] = None
 	eval_mode: Optional[EvalMode] = None
+	vectorized: bool = False
+	screen_ratio: Optional[float] = None
+	reeval_budget: int = 2
+	phenotype_reuse: bool = False
+	lineage: bool = False
+	delta_chromos: bool = False
 
 def create_preprocessing_fpga(meter: Meter, meter_setup: SetupCmd, cal_data: CalibrationData) -> Callable[[OutputData], OutputData]:
 	convert = meter.raw_to_volt_func()
@@ -450,6 +466,31 @@ def create_dummy_setup(sub_count: int, write_map: ParamAimMap, metadata: MetaEnt
 	return measure_setup
 
 
+@dataclass(frozen=True)
+class DummyIslandFactory:
+	"""Create an island with a dummy measurement setup in the process of the island; picklable for IslandModel"""
+	rep: IcecraftRep
+	habitat_filename: str
+	sub_count: int = 25
+	
+	def __call__(self, island: int, seed: int, uid_gen: UniqueID, data_sink: DataSink, stack: ExitStack
+		) -> IslandSetup:
+		# entries of the write map are created by the main process
+		measure_setup = create_dummy_setup(self.sub_count, {}, {})
+		measure_uc = Measure(measure_setup.driver, measure_setup.meter, data_sink)
+		
+		hab_config = IcecraftRawConfig.create_from_filename(self.habitat_filename)
+		self.rep.prepare_config(hab_config)
+		adapter_setup = create_adapter_setup(seed)
+		
+		dec_uc = DecTarget(self.rep, hab_config, measure_setup.target, extract_info=extract_carry_enable)
+		mf_uc = MeasureFitness(dec_uc, measure_uc, adapter_setup.fit_func, adapter_setup.input_gen,
+			prep=measure_setup.preprocessing, data_sink=data_sink)
+		popi = RandomPop(self.rep, uid_gen, adapter_setup.prng, data_sink)
+		
+		return IslandSetup(self.rep, mf_uc, popi, checkpoint_src=PRNGSource(adapter_setup.prng))
+
+
 def setup_from_args_hdf5(args: Namespace, hdf5_file: h5py.File, stack: ExitStack, write_map: ParamAimMap,
 	metadata: MetaEntryMap) -> MeasureSetup:
 	"""create MeasureSetup from arguments and existing HDF5 file"""
@@ -507,6 +548,22 @@ def ea_from_args_hdf5(args: Namespace, hdf5_file: h5py.File) -> EASetup:
 	mode_name = args.eval_mode or data_from_key(hdf5_file, "ea.eval_mode")
 	res.eval_mode = EvalMode[mode_name]
 	
+	def from_hdf5(key, default):
+		# files of older versions don't contain all settings
+		try:
+			return data_from_key(hdf5_file, key)
+		except KeyError:
+			return default
+	
+	res.vectorized = getattr(args, "vectorized", False) or bool(from_hdf5("ea.vectorized", False))
+	screen_ratio = getattr(args, "screen_ratio", None) or from_hdf5("ea.screen_ratio", None)
+	res.screen_ratio = None if screen_ratio is None else float(screen_ratio)
+	reeval_budget = getattr(args, "reeval_budget", None)
+	res.reeval_budget = int(from_hdf5("ea.reeval_budget", 2) if reeval_budget is None else reeval_budget)
+	res.phenotype_reuse = getattr(args, "phenotype_reuse", False) or bool(from_hdf5("ea.phenotype_reuse", False))
+	res.lineage = getattr(args, "lineage_blocks", False) or bool(from_hdf5("ea.lineage", False))
+	res.delta_chromos = getattr(args, "delta_chromos", False) or bool(from_hdf5("ea.delta_chromos", False))
+	
 	return res
 
 
@@ -519,10 +576,11 @@ def create_fit_func() -> FitnessFunction:
 	return FreqSumFF(5, 5)
 
 
-def create_adapter_setup() -> AdapterSetup:
+def create_adapter_setup(seed: Optional[int]=None) -> AdapterSetup:
+	"""seed: seed of the PRNG; None -> current time"""
 	setup = AdapterSetup()
 	
-	setup.seed = int(datetime.utcnow().timestamp())
+	setup.seed = int(datetime.utcnow().timestamp()) if seed is None else seed
 	setup.prng = BuiltInPRNG(setup.seed)
 	
 	setup.fit_func = create_fit_func()
@@ -570,6 +628,34 @@ def copy_meta(hdf5_file: h5py.File, metadata: MetaEntryMap, key_list: Iterable[s
 		add_meta(metadata, key, value)
 
 
+def create_ea_sink(write_map: ParamAimMap, metadata: MetaEntryMap, hdf5_filename: str, swmr: bool=False
+	) -> ParallelSink:
+	"""Create the sink for an EA run
+	
+	The HDF5 file is flushed after each checkpoint, so the run can be resumed from the last complete generation if
+	the process is terminated unexpectedly. In SWMR mode the file can be read, e.g. by info --follow, while the run
+	is still in progress; SWMR mode starts after the first checkpoint, so the parameters of the EA are stored as
+	attributes before.
+	"""
+	checkpoint_sources = ["SimpleEA.checkpoint", "IslandEA.checkpoint"]
+	return ParallelSink(HDF5Sink, (write_map, metadata, hdf5_filename),
+		{"checkpoint_sources": checkpoint_sources, "swmr": swmr}, flush_sources=checkpoint_sources,
+		stats_source="ParallelSink.queue")
+
+def check_plain_ea_args(args: Namespace, name: str, multi_setup: bool) -> None:
+	"""Raise ValueError if args contain options the EA variant given by name doesn't support
+	
+	multi_setup: the EA requires more than one measurement setup; only supported with dummies
+	"""
+	unsupported = [n for n in ["screen_ratio", "phenotype_reuse", "vectorized", "profile", "profile_table",
+		"lineage_blocks", "delta_chromos"] if getattr(args, n, None)]
+	if EvalMode[args.eval_mode] == EvalMode.ADAPTIVE:
+		unsupported.append("eval_mode ADAPTIVE")
+	if multi_setup and not args.dummy:
+		unsupported.append("real hardware")
+	if len(unsupported) > 0:
+		raise ValueError(f"{name} doesn't support {', '.join(unsupported)}")
+
 def run(args: Namespace) -> None:
 	# prepare
 	pkg_path = os.path.dirname(os.path.abspath(__file__))
@@ -578,18 +664,47 @@ def run(args: Namespace) -> None:
 	pop_size = args.pop_size
 	
 	rec_temp = args.temperature is not None
+	islands = getattr(args, "islands", 1)
+	steady_state = getattr(args, "steady_state", False)
+	stations = getattr(args, "stations", 1)
+	if islands > 1 and steady_state:
+		raise ValueError("islands and steady state can't be combined")
+	if islands > 1:
+		check_plain_ea_args(args, "islands", True)
+	if steady_state:
+		# every child is evaluated once, so the other evaluation modes make no difference
+		check_plain_ea_args(args, "steady state", stations > 1)
+	elif stations > 1:
+		raise ValueError("multiple stations require steady state")
+	
 	in_port = XC6200Port(IcecraftPosition(int(args.in_port[0]), int(args.in_port[1])), XC6200Direction[args.in_port[2]])
-	rep = create_xc6200_rep(tuple(args.area[:2]), tuple(args.area[2:]), in_port)
+	prune = getattr(args, "prune_unreachable", False)
+	rep = create_xc6200_rep(tuple(args.area[:2]), tuple(args.area[2:]), in_port, getattr(args, "rep_cache", None),
+		getattr(args, "processes", 1), prune)
 	chromo_bits = 16
 	
 	#sink = TextfileSink("tmp.out.txt")
-	write_map, metadata = write_map_util.create_for_run(rep, pop_size, chromo_bits, rec_temp)
+	write_map, metadata = write_map_util.create_for_run(rep, pop_size, chromo_bits, rec_temp,
+		stations if steady_state else None)
 	add_version(metadata)
+	screen_ratio = getattr(args, "screen_ratio", None)
+	if screen_ratio is not None:
+		write_map_util.add_surrogate(write_map, metadata)
+	if EvalMode[args.eval_mode] == EvalMode.ADAPTIVE:
+		write_map_util.add_reeval(write_map, metadata)
+	phenotype_reuse = getattr(args, "phenotype_reuse", False)
+	if phenotype_reuse:
+		write_map_util.add_reuse(write_map, metadata)
+	if getattr(args, "profile", False) or getattr(args, "profile_table", False):
+		write_map_util.add_profile(write_map, metadata)
+	if getattr(args, "delta_chromos", False):
+		write_map_util.add_delta_chromos(write_map, metadata, chromo_bits)
 	
 	add_meta(metadata, "habitat.in_port.pos", args.in_port[:2])
 	add_meta(metadata, "habitat.in_port.dir", args.in_port[2])
 	add_meta(metadata, "habitat.area.min", args.area[:2])
 	add_meta(metadata, "habitat.area.max", args.area[2:])
+	add_meta(metadata, "rep.prune_unreachable", prune)
 	
 	if args.out_port:
 		# can access without setdefault as it is set above
@@ -619,9 +734,14 @@ def run(args: Namespace) -> None:
 			
 			measure_setup = create_measure_setup(setup_info, stack, write_map, metadata)
 		
+		if islands > 1:
+			write_map_util.add_island(write_map, metadata, args.migrants)
+		
+		write_map_util.set_shard_len(write_map, write_map_util.BULK_KEYS, getattr(args, "shard_len", None))
+		
 		cur_date = datetime.now(timezone.utc)
 		hdf5_filename = args.output or f"evo-{cur_date.strftime('%Y%m%d-%H%M%S')}.h5"
-		sink = ParallelSink(HDF5Sink, (write_map, metadata, hdf5_filename))
+		sink = create_ea_sink(write_map, metadata, hdf5_filename, getattr(args, "swmr", False))
 		
 		stack.enter_context(sink)
 		
@@ -637,8 +757,20 @@ def run(args: Namespace) -> None:
 		sink.write("habitat", {
 			"text": hab_config.to_text(),
 		})
+		
+		if islands > 1:
+			model = IslandModel(DummyIslandFactory(rep, args.habitat), islands, sink, args.migration_interval,
+				args.migrants, args.sync_migration)
+			seed = create_adapter_setup(getattr(args, "seed", None)).seed
+			model.run(pop_size, args.generations, args.crossover_prob, args.mutation_prob, EvalMode[args.eval_mode],
+				seed)
+			return
+		
 		rep.prepare_config(hab_config)
-		adapter_setup = create_adapter_setup()
+		adapter_setup = create_adapter_setup(getattr(args, "seed", None))
+		if getattr(args, "seed", None) is not None:
+			# DEAP uses random directly
+			random.seed(adapter_setup.seed)
 		
 		dec_uc = DecTarget(rep, hab_config, measure_setup.target, extract_info=extract_carry_enable)
 		mf_uc = MeasureFitness(dec_uc, measure_uc, adapter_setup.fit_func, adapter_setup.input_gen, prep=measure_setup.preprocessing, data_sink=sink)
@@ -646,7 +778,30 @@ def run(args: Namespace) -> None:
 		uid_gen = SimpleUID()
 		popi = RandomPop(rep, uid_gen, adapter_setup.prng, sink)
 		
-		ea = SimpleEA(rep, mf_uc, uid_gen, popi, sink)
+		if steady_state:
+			station_list = [mf_uc]
+			for _ in range(stations-1):
+				# own configuration, as decoding modifies it
+				station_config = IcecraftRawConfig.create_from_filename(args.habitat)
+				rep.prepare_config(station_config)
+				station_setup = create_dummy_setup(25, {}, {})
+				station_dec = DecTarget(rep, station_config, station_setup.target, extract_info=extract_carry_enable)
+				station_mea = Measure(station_setup.driver, station_setup.meter, sink)
+				station_list.append(MeasureFitness(station_dec, station_mea, adapter_setup.fit_func,
+					adapter_setup.input_gen, prep=station_setup.preprocessing, data_sink=sink))
+			
+			ea = SteadyStateEA(rep, station_list, uid_gen, popi, sink, checkpoint_src=PRNGSource(adapter_setup.prng))
+			ea.run(pop_size, args.generations*pop_size, args.crossover_prob, args.mutation_prob)
+			
+			sink.write("prng", {"seed": adapter_setup.seed, "final_state": adapter_setup.prng.get_state()})
+			return
+		
+		surrogate = None if screen_ratio is None else RidgeSurrogate.from_rep(rep, min_samples=2*pop_size)
+		ea = SimpleEA(rep, mf_uc, uid_gen, popi, sink, checkpoint_src=PRNGSource(adapter_setup.prng),
+			vectorized=getattr(args, "vectorized", False), surrogate=surrogate, screen_ratio=screen_ratio or 1.0,
+			reeval_budget=getattr(args, "reeval_budget", 2), phenotype_reuse=phenotype_reuse,
+			profile=getattr(args, "profile", False), print_profile=getattr(args, "profile_table", False),
+			lineage=getattr(args, "lineage_blocks", False), delta_chromos=getattr(args, "delta_chromos", False))
 		
 		ea.run(pop_size, args.generations, args.crossover_prob, args.mutation_prob, EvalMode[args.eval_mode])
 		
@@ -692,7 +847,8 @@ def remeasure(args: Namespace) -> None:
 		
 		# copy simple metadata
 		copy_meta(hdf5_file, metadata, ["habitat.con", "freq_gen.con", "habitat.in_port.pos", "habitat.in_port.dir",
-			"habitat.out_port.pos", "habitat.out_port.dir", "habitat.area.min", "habitat.area.max"])
+			"habitat.out_port.pos", "habitat.out_port.dir", "habitat.area.min", "habitat.area.max",
+			"rep.prune_unreachable"])
 		
 		# prepare setup
 		measure_setup = setup_from_args_hdf5(args, hdf5_file, stack, write_map, metadata)
@@ -764,6 +920,14 @@ def restart(args: Namespace) -> None:
 		# write to sink
 		chromo_bits = get_chromo_bits(hdf5_file)
 		write_map, metadata = write_map_util.create_for_run(rep, ea_setup.pop_size, chromo_bits, rec_temp)
+		if ea_setup.eval_mode == EvalMode.ADAPTIVE:
+			write_map_util.add_reeval(write_map, metadata)
+		if getattr(args, "profile", False) or getattr(args, "profile_table", False):
+			write_map_util.add_profile(write_map, metadata)
+		if getattr(args, "delta_chromos", False):
+			write_map_util.add_delta_chromos(write_map, metadata, chromo_bits)
+		if getattr(args, "phenotype_reuse", False):
+			write_map_util.add_reuse(write_map, metadata)
 		
 		# org filename
 		add_meta(metadata, "re.org", args.data_file)
@@ -791,10 +955,12 @@ def restart(args: Namespace) -> None:
 		# prepare setup
 		measure_setup = setup_from_args_hdf5(args, hdf5_file, stack, write_map, metadata)
 		
+		write_map_util.set_shard_len(write_map, write_map_util.BULK_KEYS, getattr(args, "shard_len", None))
+		
 		# prepare sink
 		cur_date = datetime.now(timezone.utc)
 		hdf5_filename = args.output or f"restart-{cur_date.strftime('%Y%m%d-%H%M%S')}.h5"
-		sink = ParallelSink(HDF5Sink, (write_map, metadata, hdf5_filename))
+		sink = create_ea_sink(write_map, metadata, hdf5_filename, getattr(args, "swmr", False))
 		stack.enter_context(sink)
 		
 		for prms in measure_setup.sink_writes:
@@ -825,13 +991,138 @@ def restart(args: Namespace) -> None:
 		uid_gen.exclude(known_chromos)
 		popi = GivenPop(fst_pop)
 		
-		ea = SimpleEA(rep, mf_uc, uid_gen, popi, sink)
+		ea = SimpleEA(rep, mf_uc, uid_gen, popi, sink, checkpoint_src=PRNGSource(adapter_setup.prng),
+			reeval_budget=getattr(args, "reeval_budget", 2), profile=getattr(args, "profile", False),
+			print_profile=getattr(args, "profile_table", False), lineage=getattr(args, "lineage_blocks", False),
+			delta_chromos=getattr(args, "delta_chromos", False), phenotype_reuse=getattr(args, "phenotype_reuse", False))
 		
 		ea.run(ea_setup.pop_size, ea_setup.generations, ea_setup.crossover_prob, ea_setup.mutation_prob,
 			ea_setup.eval_mode)
 		
 		sink.write("prng", {"seed": adapter_setup.seed, "final_state": adapter_setup.prng.get_state()})
 
+def resume(args: Namespace) -> None:
+	"""Continue an interrupted run from its last checkpoint
+	
+	In contrast to restart, the fitness values of the population, the statistics of adaptive re-evaluation and phenotype
+	reuse, the training data of the surrogate and the state of the random number generators are taken from the
+	checkpoint, so the run continues as if it was never interrupted. The settings of the EA are taken from the file
+	unless given in args.
+	"""
+	with ExitStack() as stack:
+		
+		# extract information from HDF5 file
+		hdf5_file = open_hdf5(args.data_file)
+		stack.enter_context(hdf5_file)
+		
+		checkpoint = read_checkpoint(hdf5_file)
+		
+		# measure temperature?
+		rec_temp, temp_sn = temp_from_args_hdf5(args, hdf5_file)
+		
+		# habitat
+		hab_config = read_habitat(hdf5_file)
+		
+		# ea_setup
+		ea_setup = ea_from_args_hdf5(args, hdf5_file)
+		if not args.generations:
+			ea_setup.generations = int(data_from_key(hdf5_file, "ea.gen_count")) - checkpoint.generation
+		
+		# rep
+		rep = read_rep(hdf5_file, no_carry=False)
+		if ea_setup.phenotype_reuse:
+			rep = add_digest_graph(hdf5_file, rep, getattr(args, "rep_cache", None), getattr(args, "processes", 1))
+		
+		# write to sink
+		chromo_bits = get_chromo_bits(hdf5_file)
+		write_map, metadata = write_map_util.create_for_run(rep, ea_setup.pop_size, chromo_bits, rec_temp)
+		if ea_setup.screen_ratio is not None:
+			write_map_util.add_surrogate(write_map, metadata)
+		if ea_setup.eval_mode == EvalMode.ADAPTIVE:
+			write_map_util.add_reeval(write_map, metadata)
+		if getattr(args, "profile", False) or getattr(args, "profile_table", False):
+			write_map_util.add_profile(write_map, metadata)
+		if ea_setup.delta_chromos:
+			write_map_util.add_delta_chromos(write_map, metadata, chromo_bits)
+		if ea_setup.phenotype_reuse:
+			write_map_util.add_reuse(write_map, metadata)
+		
+		# org filename
+		add_meta(metadata, "re.org", args.data_file)
+		add_meta(metadata, "re.gen", checkpoint.generation)
+		
+		add_version(metadata)
+		
+		# copy simple metadata
+		copy_meta(hdf5_file, metadata, ["habitat.con", "freq_gen.con", "habitat.in_port.pos", "habitat.in_port.dir",
+			"habitat.out_port.pos", "habitat.out_port.dir", "habitat.area.min", "habitat.area.max",
+			"rep.prune_unreachable"])
+		
+		# prepare setup
+		measure_setup = setup_from_args_hdf5(args, hdf5_file, stack, write_map, metadata)
+		
+		write_map_util.set_shard_len(write_map, write_map_util.BULK_KEYS, getattr(args, "shard_len", None))
+		
+		# prepare sink
+		cur_date = datetime.now(timezone.utc)
+		hdf5_filename = args.output or f"resume-{cur_date.strftime('%Y%m%d-%H%M%S')}.h5"
+		sink = create_ea_sink(write_map, metadata, hdf5_filename, getattr(args, "swmr", False))
+		stack.enter_context(sink)
+		
+		for prms in measure_setup.sink_writes:
+			sink.write(*prms)
+		
+		# chromosomes
+		chromo_reader = ChromosomeReader(hdf5_file)
+		phenotype_origins = []
+		if ea_setup.phenotype_reuse:
+			phenotype_origins = [chromo_reader.read(i) for i in checkpoint.phenotype_origins]
+		written = set()
+		for chromo in checkpoint.population + phenotype_origins:
+			if chromo.identifier in written:
+				continue
+			written.add(chromo.identifier)
+			sink.write("GenChromo.perform", {"return": ResponseObject(chromosome=chromo)})
+		# habitat
+		sink.write("habitat", {"text": hab_config.to_text()})
+		rep.prepare_config(hab_config)
+		
+		if rec_temp:
+			start_temp(temp_sn, stack, sink)
+		
+		measure_uc = Measure(measure_setup.driver, measure_setup.meter, sink)
+		dec_uc = DecTarget(rep, hab_config, measure_setup.target, extract_info=extract_carry_enable)
+		
+		adapter_setup = create_adapter_setup()
+		adapter_setup.prng.set_state(checkpoint.prng_state)
+		random.setstate(checkpoint.random_state)
+		
+		mf_uc = MeasureFitness(dec_uc, measure_uc, adapter_setup.fit_func, adapter_setup.input_gen, prep=measure_setup.preprocessing, data_sink=sink)
+		
+		uid_gen = SimpleUID()
+		# chromosomes created after the checkpoint may have statistics, too
+		uid_gen.exclude(chromo_reader.identifiers)
+		popi = GivenPop(checkpoint.population)
+		
+		surrogate = None
+		if ea_setup.screen_ratio is not None:
+			surrogate = RidgeSurrogate.from_rep(rep, min_samples=2*ea_setup.pop_size)
+			for chromo, fit in read_surrogate_samples(hdf5_file, checkpoint.generation):
+				surrogate.add(chromo, fit)
+			surrogate.fit()
+		
+		ea = SimpleEA(rep, mf_uc, uid_gen, popi, sink, checkpoint_src=PRNGSource(adapter_setup.prng),
+			vectorized=ea_setup.vectorized, surrogate=surrogate, screen_ratio=ea_setup.screen_ratio or 1.0,
+			reeval_budget=ea_setup.reeval_budget, phenotype_reuse=ea_setup.phenotype_reuse,
+			profile=getattr(args, "profile", False), print_profile=getattr(args, "profile_table", False),
+			lineage=ea_setup.lineage, delta_chromos=ea_setup.delta_chromos)
+		ea.restore(checkpoint.fit_stats, phenotype_origins)
+		
+		ea.run(ea_setup.pop_size, ea_setup.generations, ea_setup.crossover_prob, ea_setup.mutation_prob,
+			ea_setup.eval_mode, checkpoint.fitness)
+		
+		sink.write("prng", {"seed": adapter_setup.seed, "final_state": adapter_setup.prng.get_state()})
+
 def clamp(args: Namespace) -> None:
 	repeat = args.repeat
 	
@@ -1185,7 +1476,68 @@ def generation_info(hdf5_file: h5py.File, gen_index: int=-1):
 	# top 3 chromosomes
 
 
+def follow_run(hdf5_file: h5py.File, interval: float, rounds: Optional[int]=None, out: TextIO=sys.stdout) -> None:
+	"""Print fitness values and temperatures as soon as they are written to the file
+	
+	Polling stops when the checkpoint of the last generation was read.
+	
+	rounds: maximum number of polls; None for polling until the run finished or interrupted
+	"""
+	tail = DatasetTail(hdf5_file, ["fitness.generation", "fitness.value", "temp.value", "ea.checkpoint.generation"])
+	try:
+		gen_count = int(data_from_key(hdf5_file, "ea.gen_count"))
+	except KeyError:
+		# not known before the end of the run
+		gen_count = None
+	gen = None
+	poll_nr = 0
+	try:
+		while rounds is None or poll_nr < rounds:
+			if poll_nr > 0:
+				time.sleep(interval)
+			poll_nr += 1
+			
+			new = tail.poll()
+			if len(new.get("fitness.generation", [])):
+				gen = int(new["fitness.generation"][-1])
+			
+			parts = []
+			fit = new.get("fitness.value", [])
+			if len(fit):
+				parts.append(f"{len(fit)} new fitness values, highest {np.max(fit):.6f}")
+			temp = new.get("temp.value", [])
+			if len(temp):
+				parts.append(f"temperature {float(temp[-1]):.1f} °C")
+			
+			if len(parts):
+				print(f"generation {gen}: {'; '.join(parts)}", file=out)
+			
+			checkpoints = new.get("ea.checkpoint.generation", [])
+			if gen_count is not None and len(checkpoints) and checkpoints[-1] >= gen_count:
+				print(f"run finished after generation {gen_count}", file=out)
+				break
+	except KeyboardInterrupt:
+		pass
+
+def open_swmr(filename: str, interval: float) -> h5py.File:
+	"""Open a file for reading while it is written
+	
+	The writer starts SWMR mode only after the first checkpoint, so opening is retried until it succeeds.
+	"""
+	while True:
+		try:
+			return h5py.File(filename, "r", swmr=True)
+		except OSError:
+			if not os.path.exists(filename):
+				raise
+			time.sleep(interval)
+
 def info(args: Namespace) -> None:
+	if getattr(args, "follow", False):
+		with open_swmr(args.data_file, args.interval) as hdf5_file:
+			follow_run(hdf5_file, args.interval)
+		return
+	
 	with h5py.File(args.data_file, "r") as hdf5_file:
 		cont_typ = get_content_type(hdf5_file)
 		print(f"file contains data from {cont_typ.name}")
@@ -1194,6 +1546,65 @@ def info(args: Namespace) -> None:
 			generation_info(hdf5_file, args.index)
 		
 
+def run_summary(hdf5_file: h5py.File) -> Dict[str, Any]:
+	"""Summary fitness statistics of an EA run"""
+	fit = data_from_key(hdf5_file, "fitness.value")[:]
+	chromo_ids = data_from_key(hdf5_file, "fitness.chromo_id")[:]
+	pops = data_from_key(hdf5_file, "ea.pop")
+	
+	res = {"generations": len(pops)-1, "evaluations": len(fit)}
+	if len(fit) == 0:
+		return res
+	
+	best = int(np.argmax(fit))
+	res["best_fitness"] = float(fit[best])
+	res["best_chromo_id"] = int(chromo_ids[best])
+	
+	# last measured fitness of the final population; chromosomes that were not measured are left out
+	last_fit = dict(zip(chromo_ids.tolist(), fit.tolist()))
+	final = [last_fit[c] for c in pops[-1].tolist() if c in last_fit]
+	if len(final) > 0:
+		res["final_best"] = max(final)
+		res["final_mean"] = mean(final)
+	
+	return res
+
+def sweep(args: Namespace) -> None:
+	with open(args.spec, "r") as spec_file:
+		spec = json.load(spec_file)
+	
+	cur_date = datetime.now(timezone.utc)
+	output_dir = args.output_dir or f"sweep-{cur_date.strftime('%Y%m%d-%H%M%S')}"
+	index_filename = args.output or os.path.join(output_dir, "index.csv")
+	seed = int(cur_date.timestamp()) if args.seed is None else args.seed
+	
+	# global arguments of the sweep that apply to all runs
+	shared = ["--freq-gen-type", args.freq_gen_type]
+	if args.rep_cache:
+		shared.extend(["--rep-cache", args.rep_cache])
+	workers = create_workers(args.station or [], args.dummy_workers, shared)
+	scheduler = SweepScheduler(workers)
+	runs = create_runs(spec, output_dir, seed)
+	
+	# invalid arguments should fail before any run starts
+	for run in runs:
+		parse_argv(workers[0].args+run.argv)
+	
+	os.makedirs(output_dir, exist_ok=True)
+	print(f"{len(runs)} runs on {len(workers)} workers, seed {seed}")
+	scheduler.run(runs)
+	
+	summaries = {}
+	for run in runs:
+		if run.exitcode != 0:
+			print(f"run {run.index} failed")
+			continue
+		with open_hdf5(run.output) as hdf5_file:
+			summaries[run.index] = run_summary(hdf5_file)
+	
+	write_index(index_filename, runs, summaries)
+	print(f"index written to {index_filename}")
+
 def spectrum(args: Namespace) -> None:
 	pkg_path = os.path.dirname(os.path.abspath(__file__))
 	
@@ -2,9 +2,17 @@ import argparse
 
 from adapters.deap.simple_ea import EvalMode
 
-from .action import clamp, explain, extract, ExtractTarget, info, OutFormat, remeasure, restart, run, spectrum
+from .action import clamp, explain, extract, ExtractTarget, info, OutFormat, remeasure, restart, resume, run, spectrum,\
+	sweep
 from .misc import DriverType
 
+def ratio(value: str) -> float:
+	"""Argument type for fractions in (0, 1]"""
+	res = float(value)
+	if not 0 < res <= 1:
+		raise argparse.ArgumentTypeError(f"has to be in (0, 1], got {value}")
+	return res
+
 def create_arg_parser():
 	arg_parser = argparse.ArgumentParser(fromfile_prefix_chars="@")
 	
@@ -16,6 +24,10 @@ def create_arg_parser():
 	arg_parser.add_argument("-o", "--output", type=str, help="name of the output file")
 	arg_parser.add_argument("--dummy", action="store_true", help="use dummies instead of real hardware")
 	arg_parser.add_argument("--freq-gen-type", default="FPGA", type=str, choices=[d.name for d in DriverType], help="")
+	arg_parser.add_argument("--rep-cache", type=str, help="directory to cache generated representations in; speeds up "
+		"the start of runs with the same evolvable area")
+	arg_parser.add_argument("--processes", type=int, default=1, help="number of processes for generating the "
+		"representation; the work for each tile is distributed over them")
 	
 	sub_parsers = arg_parser.add_subparsers()
 	run_parser = sub_parsers.add_parser("run", help="run an EA")
@@ -25,6 +37,8 @@ def create_arg_parser():
 		" corner points", metavar=("X_MIN", "Y_MIN", "X_MAX", "Y_MAX"))
 	run_parser.add_argument("--in-port", nargs=3, type=str, required=True, help="input port for the frequency signal to"
 		" the evolvable area", metavar=("X", "Y", "DIR"))
+	run_parser.add_argument("--prune-unreachable", action="store_true", help="remove resources that can't be driven "
+		"from the representation; shortens the chromosome")
 	run_parser.add_argument("--out-port", nargs=3, type=str, help="output port for the signal from the evolvable area",
 		metavar=("X", "Y", "DIR"))
 	run_parser.add_argument("--pop-size", type=int, required=True, help="size of the population")
@@ -33,7 +47,38 @@ def create_arg_parser():
 		" place")
 	run_parser.add_argument("--mutation-prob", type=float, required=True, help="probability that a mutation takes"
 		" place")
-	run_parser.add_argument("--eval-mode", default="NEW", type=str, choices=[e.name for e in EvalMode], help="which individuals in each generation are evaluated; NEW -> ones without fitness value; ELITE -> without fitness value and elites; ALL -> all")
+	run_parser.add_argument("--eval-mode", default="NEW", type=str, choices=[e.name for e in EvalMode], help="which individuals in each generation are evaluated; NEW -> ones without fitness value; ELITE -> without fitness value and elites; ALL -> all; ADAPTIVE -> without fitness value and up to REEVAL_BUDGET ones whose fitness is uncertain relative to the elite")
+	run_parser.add_argument("--reeval-budget", default=2, type=int, help="maximum number of repeated "
+		"evaluations per generation for eval mode ADAPTIVE")
+	run_parser.add_argument("--vectorized", action="store_true", help="apply selection, crossover and mutation to "
+		"the whole population with NumPy")
+	run_parser.add_argument("--profile", action="store_true", help="write the time spent in decoding, configuring, "
+		"measuring etc. for each generation")
+	run_parser.add_argument("--profile-table", action="store_true", help="also print the times of each generation "
+		"as table; implies --profile")
+	run_parser.add_argument("--lineage-blocks", action="store_true", help="write new chromosomes, crossovers and "
+		"mutations once per generation as blocks instead of one write each")
+	run_parser.add_argument("--delta-chromos", action="store_true", help="write new chromosomes as the genes they "
+		"differ in from their parent with periodic full snapshots; implies --lineage-blocks")
+	run_parser.add_argument("--phenotype-reuse", action="store_true", help="don't measure new chromosomes that "
+		"have the same phenotype as an already measured chromosome, but reuse its fitness; genes of multiplexers and LUTs "
+		"that can't influence an output are ignored")
+	run_parser.add_argument("--screen-ratio", type=ratio, help="fraction of the new chromosomes of each generation "
+		"that is evaluated; the others are rejected based on the prediction of a surrogate trained on the measured "
+		"fitness values")
+	run_parser.add_argument("--steady-state", action="store_true", help="run an asynchronous steady-state EA that "
+		"evaluates GENERATIONS*POP_SIZE children, each replacing the chromosome with the lowest fitness")
+	run_parser.add_argument("--stations", type=int, default=1, help="number of measurement stations the steady-state "
+		"EA evaluates children on in parallel; more than one requires --dummy")
+	run_parser.add_argument("--islands", type=int, default=1, help="number of islands with their own population, "
+		"each run in its own process; the best chromosomes migrate between the islands; requires --dummy")
+	run_parser.add_argument("--migration-interval", type=int, default=5, help="number of generations between "
+		"migrations of an island model")
+	run_parser.add_argument("--migrants", type=int, default=1, help="number of chromosomes each island sends per "
+		"migration")
+	run_parser.add_argument("--sync-migration", action="store_true", help="wait for the migrants of the previous "
+		"island, so runs of an island model with the same seed are reproducible")
+	run_parser.add_argument("--seed", type=int, help="seed for the random number generators; default: current time")
 	run_parser.add_argument("--habitat", type=str, required=True, help="ASC file of the base configuration for the "
 		"target FPGA; provides the periphery of the evolved area")
 	run_parser.add_argument("--habitat-con", type=str, help="description of the connections of the habitat")
@@ -41,6 +86,26 @@ def create_arg_parser():
 		" ASC format")
 	run_parser.add_argument("--freq-gen-con", type=str, help="description of the connections of the frequency "
 		"generator")
+	run_storage = run_parser.add_mutually_exclusive_group()
+	run_storage.add_argument("--shard-len", type=int, help="store measurements and temperatures in sidecar files "
+		"with at most SHARD_LEN entries each; the main file links them as a single dataset")
+	run_storage.add_argument("--swmr", action="store_true", help="write the output file in single writer multiple "
+		"reader mode, so the run can be watched with info --follow")
+	
+	sweep_parser = sub_parsers.add_parser("sweep", help="run an EA for every combination of parameters in a sweep "
+		"spec, distributed over multiple measurement setups")
+	sweep_parser.set_defaults(function=sweep)
+	
+	sweep_parser.add_argument("--spec", type=str, required=True, help="JSON file with the run arguments common to all "
+		"runs and the grid of parameters to sweep; see applications.discern_frequency.sweep")
+	sweep_parser.add_argument("--station", nargs=3, type=str, action="append", help="serial numbers of a measurement "
+		"setup; can be given multiple times", metavar=("TARGET", "METER", "GENERATOR"))
+	sweep_parser.add_argument("--dummy-workers", type=int, default=0, help="number of workers using dummies instead of "
+		"real hardware")
+	sweep_parser.add_argument("--output-dir", type=str, help="directory for the output files of the runs; the "
+		"index of the runs is written to index.csv in it unless --output is given")
+	sweep_parser.add_argument("--seed", type=int, help="seed the seeds of runs without seed in the grid are derived "
+		"from; default: current time")
 	
 	rem_parser = sub_parsers.add_parser("remeasure", help="repeat measurement of an individual")
 	rem_parser.set_defaults(function=remeasure)
@@ -63,13 +128,70 @@ def create_arg_parser():
 		" place")
 	restart_parser.add_argument("--mutation-prob", type=float, help="probability that a mutation takes"
 		" place")
-	restart_parser.add_argument("--eval-mode", type=str, choices=[e.name for e in EvalMode], help="which individuals in each generation are evaluated; NEW -> ones without fitness value; ELITE -> without fitness value and elites; ALL -> all")
+	restart_parser.add_argument("--eval-mode", type=str, choices=[e.name for e in EvalMode], help="which individuals in each generation are evaluated; NEW -> ones without fitness value; ELITE -> without fitness value and elites; ALL -> all; ADAPTIVE -> without fitness value and up to REEVAL_BUDGET ones whose fitness is uncertain relative to the elite")
+	restart_parser.add_argument("--reeval-budget", default=2, type=int, help="maximum number of repeated "
+		"evaluations per generation for eval mode ADAPTIVE")
+	restart_parser.add_argument("--profile", action="store_true", help="write the time spent in decoding, configuring, "
+		"measuring etc. for each generation")
+	restart_parser.add_argument("--profile-table", action="store_true", help="also print the times of each generation "
+		"as table; implies --profile")
+	restart_parser.add_argument("--lineage-blocks", action="store_true", help="write new chromosomes, crossovers and "
+		"mutations once per generation as blocks instead of one write each")
+	restart_parser.add_argument("--delta-chromos", action="store_true", help="write new chromosomes as the genes they "
+		"differ in from their parent with periodic full snapshots; implies --lineage-blocks")
+	restart_parser.add_argument("--phenotype-reuse", action="store_true", help="don't measure new chromosomes that "
+		"have the same phenotype as an already measured chromosome, but reuse its fitness; as the representation is read "
+		"from the file, only chromosomes that decode to identical configurations are detected")
 	restart_parser.add_argument("--freq-gen", type=str, help="configuration file of the frequency generator;"
 		" ASC format")
 	restart_parser.add_argument("--offset", nargs=2, type=int, help="offset to move the the evolvable area",
 		metavar=("X", "Y"))
 	restart_parser.add_argument("--habitat", type=str, help="ASC file of the base configuration for the target FPGA; "
 		"provides the periphery of the evolvable area")
+	restart_storage = restart_parser.add_mutually_exclusive_group()
+	restart_storage.add_argument("--shard-len", type=int, help="store measurements and temperatures in sidecar files "
+		"with at most SHARD_LEN entries each; the main file links them as a single dataset")
+	restart_storage.add_argument("--swmr", action="store_true", help="write the output file in single writer multiple "
+		"reader mode, so the run can be watched with info --follow")
+	
+	resume_parser = sub_parsers.add_parser("resume", help="continue an interrupted EA run from its last checkpoint")
+	resume_parser.set_defaults(function=resume)
+	
+	resume_parser.add_argument("-d", "--data-file", type=str, required=True, help="HDF5 file containing the original data")
+	resume_parser.add_argument("--generations", type=int, help="number of generations; default: remaining generations"
+		" of the original run")
+	resume_parser.add_argument("--crossover-prob", type=float, help="probability that a crossover takes"
+		" place")
+	resume_parser.add_argument("--mutation-prob", type=float, help="probability that a mutation takes"
+		" place")
+	resume_parser.add_argument("--eval-mode", type=str, choices=[e.name for e in EvalMode], help="which individuals in each generation are evaluated; NEW -> ones without fitness value; ELITE -> without fitness value and elites; ALL -> all; ADAPTIVE -> without fitness value and up to REEVAL_BUDGET ones whose fitness is uncertain relative to the elite")
+	resume_parser.add_argument("--reeval-budget", type=int, help="maximum number of repeated evaluations per "
+		"generation for eval mode ADAPTIVE; default: value of the original run")
+	resume_parser.add_argument("--vectorized", action="store_true", help="apply selection, crossover and mutation to "
+		"the whole population with NumPy; always set if set for the original run")
+	resume_parser.add_argument("--screen-ratio", type=ratio, help="fraction of the new chromosomes of each generation "
+		"that is evaluated; the others are rejected based on the prediction of a surrogate trained on the measured "
+		"fitness values; default: value of the original run")
+	resume_parser.add_argument("--profile", action="store_true", help="write the time spent in decoding, configuring, "
+		"measuring etc. for each generation")
+	resume_parser.add_argument("--profile-table", action="store_true", help="also print the times of each generation "
+		"as table; implies --profile")
+	resume_parser.add_argument("--lineage-blocks", action="store_true", help="write new chromosomes, crossovers and "
+		"mutations once per generation as blocks instead of one write each; always set if set for the original run")
+	resume_parser.add_argument("--delta-chromos", action="store_true", help="write new chromosomes as the genes they "
+		"differ in from their parent with periodic full snapshots; implies --lineage-blocks; always set if set for the "
+		"original run")
+	resume_parser.add_argument("--phenotype-reuse", action="store_true", help="don't measure new chromosomes that "
+		"have the same phenotype as an already measured chromosome, but reuse its fitness; as the representation is read "
+		"from the file, only chromosomes that decode to identical configurations are detected unless the representation "
+		"can be generated again; always set if set for the original run")
+	resume_parser.add_argument("--freq-gen", type=str, help="configuration file of the frequency generator;"
+		" ASC format")
+	resume_storage = resume_parser.add_mutually_exclusive_group()
+	resume_storage.add_argument("--shard-len", type=int, help="store measurements and temperatures in sidecar files "
+		"with at most SHARD_LEN entries each; the main file links them as a single dataset")
+	resume_storage.add_argument("--swmr", action="store_true", help="write the output file in single writer multiple "
+		"reader mode, so the run can be watched with info --follow")
 	
 	clamp_parser = sub_parsers.add_parser("clamp", help="iteratively set function unit to fixed output")
 	clamp_parser.set_defaults(function=clamp)
@@ -93,6 +215,10 @@ def create_arg_parser():
 	
 	info_parser.add_argument("-d", "--data-file", type=str, required=True, help="HDF5 file")
 	info_parser.add_argument("-i", "--index", type=int, default=-1, help="index of the generation info is shown for")
+	info_parser.add_argument("--follow", action="store_true", help="continuously show new fitness values and "
+		"temperatures of a run that is still in progress; requires a file written with --swmr")
+	info_parser.add_argument("--interval", type=float, default=2.0, help="seconds between checks for new data in "
+		"follow mode")
 	
 	spectrum_parser = sub_parsers.add_parser("spectrum", help="measure average voltage over multiple frequencies")
 	spectrum_parser.set_defaults(function=spectrum)
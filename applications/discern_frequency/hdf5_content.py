@@ -50,7 +50,8 @@ ENTRIES_RE = ExpEntries(["re.org"])
 ENTRIES_DESC = ExpEntries(["habitat.out_port.pos", "habitat.out_port.dir"])
 
 ENTRIES_REP = ExpEntries(["rep.carry_data.desc", "rep.output", "rep.colbufctrl.bits",
-	"rep.colbufctrl.indices", "rep.desc", "rep.genes.desc", "rep.const.desc"], [FormEntry("rep.carry_data.lut", None),
+	"rep.colbufctrl.indices", "rep.desc", "rep.genes.desc", "rep.const.desc", "rep.prune_unreachable"],
+	[FormEntry("rep.carry_data.lut", None),
 	FormEntry("rep.carry_data.enable", None), FormEntry("rep.carry_data.bits", None),
 	FormEntry("rep.carry_data.values", None), FormEntry("rep.genes", None, True), FormEntry("rep.const", None, True)])
 
@@ -76,7 +77,11 @@ ENTRIES_EA = ExpEntries(["fitness.generation", "fitness.generation.desc", "ea.po
 	"ea.crossover.in", "ea.crossover.out", "ea.crossover.generation", "ea.crossover.generation.desc",
 	"ea.mutation.desc", "ea.mutation.parent", "ea.mutation.child", "ea.mutation.generation",
 	"ea.mutation.generation.desc", "ea.pop_size", "ea.gen_count", "ea.crossover_prob", "ea.mutation_prob",
-	"ea.eval_mode", ], [
+	"ea.eval_mode", "ea.vectorized", "ea.lineage", "ea.delta_chromos", "ea.checkpoint.desc", "ea.checkpoint.generation",
+	"ea.checkpoint.generation.desc"], [
+	FormEntry("ea.checkpoint.rand.version", [FormData(["random_"]), FormData(["prng_"])]),
+	FormEntry("ea.checkpoint.rand.state", [FormData(["random_"]), FormData(["prng_"])]),
+	FormEntry("ea.checkpoint.rand.gauss", [FormData(["random_"]), FormData(["prng_"])]),
 	FormEntry("rand.version", [FormData(["random_initial_"]), FormData(["random_final_"]), FormData(["prng_final_"])]),
 	FormEntry("rand.state", [FormData(["random_initial_"]), FormData(["random_final_"]), FormData(["prng_final_"])]),
 	FormEntry("rand.gauss", [FormData(["random_initial_"]), FormData(["random_final_"]), FormData(["prng_final_"])]),
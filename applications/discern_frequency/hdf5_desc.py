@@ -11,7 +11,7 @@ from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Tu
 
 from adapters.hdf5_sink import chain_funcs, HDF5Sink, MetaEntry, MetaEntryMap, ParamAim
 from adapters.icecraft import CarryData, IcecraftRep
-from applications.discern_frequency.misc import ignore_same
+from applications.discern_frequency.misc import ignore_same, none_to_nan, none_to_negative
 
 
 class HDF5Desc(NamedTuple):
@@ -41,6 +41,14 @@ HDF5_DICT = {# simple placeholders like {} are allowed, formatting instructions
 	"chromo.indices": HDF5Desc("dyn", "chromosome", "individual", False,
 		alter=chain_funcs([itemgetter(0), attrgetter("chromosome"), attrgetter("allele_indices")])),
 	"chromo.indices.desc": HDF5Desc(str, "description", "individual/chromosome"),
+	"chromo.island": HDF5Desc("uint16", "island", "individual", False),
+	"chromo.delta.desc": HDF5Desc(str, "description", "individual/delta"),
+	"chromo.delta.id": HDF5Desc("uint64", "chromo_id", "individual/delta", False),
+	"chromo.delta.base": HDF5Desc("uint64", "base", "individual/delta", False),
+	"chromo.delta.end": HDF5Desc("uint64", "end", "individual/delta", False),
+	"chromo.delta.gene": HDF5Desc("uint32", "gene", "individual/delta", False),
+	# type has to be derived from representation
+	"chromo.delta.value": HDF5Desc("dyn", "value", "individual/delta", False),
 	"git_commit": HDF5Desc(str, "git_commit", "/"),
 	"python": HDF5Desc(str, "python_version", "/"),
 	"rand.seed": HDF5Desc("int64", r"{}seed", "/"),
@@ -52,6 +60,9 @@ HDF5_DICT = {# simple placeholders like {} are allowed, formatting instructions
 	"ea.crossover_prob": HDF5Desc("float64", "crossover_prob"),
 	"ea.mutation_prob": HDF5Desc("float64", "mutation_prob"),
 	"ea.eval_mode": HDF5Desc(str, "eval_mode", alter=chain_funcs([itemgetter(0), attrgetter("name")])),
+	"ea.vectorized": HDF5Desc(bool, "vectorized"),
+	"ea.lineage": HDF5Desc(bool, "lineage"),
+	"ea.delta_chromos": HDF5Desc(bool, "delta_chromos"),
 	"ea.pop": HDF5Desc("uint64", "population", "/", False, None),
 	"ea.pop.desc": HDF5Desc(str, "description", "population"),
 	"ea.crossover.desc": HDF5Desc(str, "description", "crossover"),
@@ -66,6 +77,90 @@ HDF5_DICT = {# simple placeholders like {} are allowed, formatting instructions
 		itemgetter(0)])),
 	"ea.mutation.generation": HDF5Desc("uint64", "generation", "mutation", False, alter=ignore_same),
 	"ea.mutation.generation.desc": HDF5Desc(str, "description", "mutation/generation"),
+	"ea.checkpoint.desc": HDF5Desc(str, "description", "checkpoint"),
+	"ea.checkpoint.generation": HDF5Desc("uint64", "generation", "checkpoint", False),
+	"ea.checkpoint.generation.desc": HDF5Desc(str, "description", "checkpoint/generation"),
+	"ea.checkpoint.rand.version": HDF5Desc("int64", r"{}version", "checkpoint", False,
+		alter=chain_funcs([itemgetter(0), itemgetter(0)])),
+	"ea.checkpoint.rand.state": HDF5Desc("int64", r"{}mt_state", "checkpoint", False, (625, ),
+		alter=chain_funcs([itemgetter(0), itemgetter(1)])),
+	"ea.checkpoint.rand.gauss": HDF5Desc("float64", r"{}next_gauss", "checkpoint", False,
+		alter=chain_funcs([itemgetter(0), itemgetter(2), none_to_nan])),
+	"ea.screen_ratio": HDF5Desc("float64", "screen_ratio"),
+	"ea.surrogate.desc": HDF5Desc(str, "description", "surrogate"),
+	"ea.surrogate.generation": HDF5Desc("uint64", "generation", "surrogate", False),
+	"ea.surrogate.chromo_id": HDF5Desc("uint64", "chromo_id", "surrogate", False),
+	"ea.surrogate.predicted": HDF5Desc("float64", "predicted", "surrogate", False),
+	"ea.surrogate.measured": HDF5Desc("float64", "measured", "surrogate", False),
+	"ea.surrogate.evaluated": HDF5Desc(bool, "evaluated", "surrogate", False),
+	"ea.reeval_budget": HDF5Desc("uint64", "reeval_budget"),
+	"ea.reeval.desc": HDF5Desc(str, "description", "reeval"),
+	"ea.reeval.generation": HDF5Desc("uint64", "generation", "reeval", False),
+	"ea.reeval.chromo_id": HDF5Desc("uint64", "chromo_id", "reeval", False),
+	"ea.reeval.fitness": HDF5Desc("float64", "fitness", "reeval", False),
+	"ea.reeval.mean": HDF5Desc("float64", "mean", "reeval", False),
+	"ea.reeval.count": HDF5Desc("uint64", "count", "reeval", False),
+	"ea.reeval.threshold": HDF5Desc("float64", "threshold", "reeval", False),
+	"ea.phenotype_reuse": HDF5Desc(bool, "phenotype_reuse"),
+	"ea.reuse.desc": HDF5Desc(str, "description", "reuse"),
+	"ea.reuse.generation": HDF5Desc("uint64", "generation", "reuse", False),
+	"ea.reuse.chromo_id": HDF5Desc("uint64", "chromo_id", "reuse", False),
+	"ea.reuse.phenotype_of": HDF5Desc("uint64", "phenotype_of", "reuse", False),
+	"ea.reuse.fitness": HDF5Desc("float64", "fitness", "reuse", False),
+	"ea.fit_stats.desc": HDF5Desc(str, "description", "fit_stats"),
+	"ea.fit_stats.generation": HDF5Desc("uint64", "generation", "fit_stats", False),
+	"ea.fit_stats.chromo_id": HDF5Desc("uint64", "chromo_id", "fit_stats", False),
+	"ea.fit_stats.count": HDF5Desc("uint64", "count", "fit_stats", False),
+	"ea.fit_stats.mean": HDF5Desc("float64", "mean", "fit_stats", False),
+	"ea.fit_stats.m2": HDF5Desc("float64", "m2", "fit_stats", False),
+	"ea.profile.desc": HDF5Desc(str, "description", "profile"),
+	"ea.profile.generation": HDF5Desc("uint64", "generation", "profile", False),
+	"ea.profile.wall": HDF5Desc("float64", "wall", "profile", False),
+	"ea.profile.variation": HDF5Desc("float64", "variation", "profile", False),
+	"ea.profile.decode": HDF5Desc("float64", "decode", "profile", False),
+	"ea.profile.configure": HDF5Desc("float64", "configure", "profile", False),
+	"ea.profile.bitstream": HDF5Desc("float64", "bitstream", "profile", False),
+	"ea.profile.flash": HDF5Desc("float64", "flash", "profile", False),
+	"ea.profile.drive": HDF5Desc("float64", "drive", "profile", False),
+	"ea.profile.measure": HDF5Desc("float64", "measure", "profile", False),
+	"ea.profile.osci_wait": HDF5Desc("float64", "osci_wait", "profile", False),
+	"ea.profile.transfer": HDF5Desc("float64", "transfer", "profile", False),
+	"ea.profile.preprocessing": HDF5Desc("float64", "preprocessing", "profile", False),
+	"ea.profile.fitness": HDF5Desc("float64", "fitness", "profile", False),
+	"ea.profile.sink": HDF5Desc("float64", "sink", "profile", False),
+	"ea.eval_count": HDF5Desc("uint64", "eval_count"),
+	"ea.stations": HDF5Desc("uint64", "stations"),
+	"ea.crossover.evaluation": HDF5Desc("uint64", "evaluation", "crossover", False),
+	"ea.mutation.evaluation": HDF5Desc("uint64", "evaluation", "mutation", False, alter=ignore_same),
+	"ea.steady.desc": HDF5Desc(str, "description", "steady_state"),
+	"ea.steady.chromo_id": HDF5Desc("uint64", "chromo_id", "steady_state", False),
+	"ea.steady.fitness": HDF5Desc("float64", "fitness", "steady_state", False),
+	"ea.steady.station": HDF5Desc("uint16", "station", "steady_state", False),
+	"ea.steady.submit_time": HDF5Desc("float64", "submit_time", "steady_state", False),
+	"ea.steady.start_time": HDF5Desc("float64", "start_time", "steady_state", False),
+	"ea.steady.end_time": HDF5Desc("float64", "end_time", "steady_state", False),
+	"ea.steady.replaced": HDF5Desc("int64", "replaced", "steady_state", False, alter=chain_funcs([itemgetter(0),
+		none_to_negative])),
+	"ea.steady.busy": HDF5Desc("float64", "busy", "steady_state"),
+	"ea.steady.wall": HDF5Desc("float64", "wall", "steady_state"),
+	"ea.pop_island": HDF5Desc("uint16", "population_island", "/", False),
+	"ea.crossover.island": HDF5Desc("uint16", "island", "crossover", False),
+	"ea.mutation.island": HDF5Desc("uint16", "island", "mutation", False, alter=ignore_same),
+	"ea.checkpoint.island": HDF5Desc("uint16", "island", "checkpoint", False),
+	"ea.migration.desc": HDF5Desc(str, "description", "migration"),
+	"ea.migration.island_count": HDF5Desc("uint16", "island_count", "migration"),
+	"ea.migration.seed": HDF5Desc("int64", "seed", "migration"),
+	"ea.migration.island_seeds": HDF5Desc("uint64", "island_seeds", "migration"),
+	"ea.migration.interval": HDF5Desc("uint64", "interval", "migration"),
+	"ea.migration.migrant_count": HDF5Desc("uint64", "migrant_count", "migration"),
+	"ea.migration.synchronous": HDF5Desc(bool, "synchronous", "migration"),
+	"ea.migration.generation": HDF5Desc("uint64", "generation", "migration", False),
+	"ea.migration.island": HDF5Desc("uint16", "island", "migration", False),
+	"ea.migration.sent": HDF5Desc("uint64", "sent", "migration", False),
+	"ea.migration.received": HDF5Desc("uint64", "received", "migration", False),
+	"ea.migration.origin": HDF5Desc("uint16", "origin", "migration", False),
+	"ea.migration.received_count": HDF5Desc("uint64", "received_count", "migration", False,
+		alter=chain_funcs([itemgetter(0), len])),
 	"fitness.chromo_id": HDF5Desc("uint64", "chromo_id", "fitness", False,
 		alter=chain_funcs([itemgetter(0), attrgetter("identifier")])),
 	"fitness.chromo_id.desc": HDF5Desc(str, "description", "fitness/chromo_id"),
@@ -87,6 +182,10 @@ HDF5_DICT = {# simple placeholders like {} are allowed, formatting instructions
 	"fitness.slow_sum.desc": HDF5Desc(str, "description", "fitness/slow_sum"),
 	"fitness.generation": HDF5Desc("uint64", "generation", "fitness", False),
 	"fitness.generation.desc": HDF5Desc(str, "description", "fitness/generation"),
+	"fitness.evaluation": HDF5Desc("uint64", "evaluation", "fitness", False),
+	"fitness.evaluation.desc": HDF5Desc(str, "description", "fitness/evaluation"),
+	"fitness.island": HDF5Desc("uint16", "island", "fitness", False),
+	"fitness.measure_island": HDF5Desc("uint16", "measure_island", "fitness", False),
 	"fitness.measurement": HDF5Desc(None, "measurement", "fitness", False),
 	"fitness.measurement.desc": HDF5Desc(str, "description", "fitness/measurement"),
 	"fitness.driver_type": HDF5Desc(str, "driver_type", "fitness/measurement", alter=attrgetter("name")),
@@ -115,6 +214,7 @@ HDF5_DICT = {# simple placeholders like {} are allowed, formatting instructions
 		alter=chain_funcs([partial(map, methodcaller("to_ints")), list])),
 	"carry_enable.desc": HDF5Desc(str, "description", "fitness/carry_enable"),
 	"re.org": HDF5Desc(str, "original_filename" "/"),
+	"re.gen": HDF5Desc("uint64", "resumed_generation", "/"),
 	"rep.carry_data.lut": HDF5Desc("uint8", "lut_index", r"mapping/carry_data/carry_data_{}"),
 	"rep.carry_data.enable": HDF5Desc("uint16", "carry_enable", r"mapping/carry_data/carry_data_{}"),
 	"rep.carry_data.bits": HDF5Desc("uint16", r"carry_use_{}_bits", r"mapping/carry_data/carry_data_{}"),
@@ -126,11 +226,14 @@ HDF5_DICT = {# simple placeholders like {} are allowed, formatting instructions
 	"rep.genes.desc": HDF5Desc(str, "description", "mapping/genes"),
 	"rep.const": HDF5Desc(None, "gene{}", "mapping/constant", False),
 	"rep.const.desc": HDF5Desc(str, "description", "mapping/constant"),
+	"rep.prune_unreachable": HDF5Desc(bool, "prune_unreachable", "mapping"),
 	"rep.output":  HDF5Desc("uint16", "output_lutff", "mapping", alter=chain_funcs([partial(map, astuple), list])),
 	"rep.colbufctrl.bits": HDF5Desc("uint16", "colbufctrl_bits", "mapping",
 		alter=chain_funcs([partial(map, chain_funcs([attrgetter("bits"), partial(map, astuple), list])), list])),
 	"rep.colbufctrl.indices": HDF5Desc("uint16", "colbufctrl_index", "mapping",
 		alter=chain_funcs([partial(map, attrgetter("index")), list])),
+	"sink.high_water_mark": HDF5Desc("uint64", "queue_high_water_mark", "/"),
+	"sink.max_queue": HDF5Desc("uint64", "queue_size", "/"),
 	"temp.desc": HDF5Desc(str, "description", "temperature"),
 	"temp.value": HDF5Desc("float16", "celsius", "temperature", False, alter=chain_funcs([itemgetter(0),
 		attrgetter("measurement"), itemgetter(0)])),
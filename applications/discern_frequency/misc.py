@@ -18,3 +18,22 @@ def ignore_same(x: list) -> Any:
 	if x[0] == x[1]:
 		raise IgnoreValue()
 	return x[-1]
+
+def none_to_nan(x: Any) -> Any:
+	"""replace None by NaN, e.g. for storing an optional float value in a dataset"""
+	if x is None:
+		return float("nan")
+	return x
+
+def none_to_negative(x: Any) -> Any:
+	"""replace None by -1, e.g. for storing an optional identifier in a signed integer dataset"""
+	if x is None:
+		return -1
+	return x
+
+def pad_list(x: list, length: int, fill: Any=0) -> list:
+	"""extend the first element of x to length entries by fill, e.g. for storing lists of varying length in a dataset"""
+	values = list(x[0])
+	if len(values) > length:
+		raise ValueError(f"expected at most {length} entries, got {len(values)}")
+	return values + [fill]*(length-len(values))
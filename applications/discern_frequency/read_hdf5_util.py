@@ -1,8 +1,11 @@
-from typing import Any, List, Tuple, Union
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
 
 import h5py
 import numpy as np
 
+from adapters.deap.simple_ea import EvalMode, FitnessStats
 from adapters.icecraft import CarryData, CarryDataMap, IcecraftBitPosition, IcecraftLUTPosition, IcecraftRawConfig,\
 	IcecraftRep, IndexedItem, PartConf
 from adapters.gear.rigol import FloatCheck, IntCheck, OsciDS1102E, SetupCmd
@@ -10,6 +13,31 @@ from adapters.hdf5_sink import HDF5Sink
 from applications.discern_frequency.hdf5_desc import HDF5Desc, HDF5_DICT
 from domain.model import Chromosome
 
+@dataclass
+class Checkpoint:
+	"""State of an evolutionary run after a complete generation"""
+	generation: int
+	population: List[Chromosome]
+	fitness: Dict[int, float]
+	random_state: tuple
+	prng_state: tuple
+	# statistics of the fitness values by chromosome identifier; only written for adaptive re-evaluation and
+	# phenotype reuse
+	fit_stats: Dict[int, FitnessStats]
+	# identifiers of the measured chromosomes that didn't reuse a fitness, in order of their first measurement
+	phenotype_origins: List[int]
+
+def open_hdf5(filename: str) -> h5py.File:
+	"""Open a HDF5 file for reading
+	
+	Files that are still written or were not closed properly, e.g. due to a crash, in SWMR mode can only be opened in
+	SWMR mode.
+	"""
+	try:
+		return h5py.File(filename, "r")
+	except OSError:
+		return h5py.File(filename, "r", swmr=True)
+
 
 def data_from_desc(hdf5_file: h5py.File, desc: HDF5Desc) -> Any:
 	grp = hdf5_file[desc.h5_path]
@@ -29,16 +57,72 @@ def read_habitat(hdf5_file: h5py.File) -> IcecraftRawConfig:
 	hab_text = hab_data[:].tobytes().decode(encoding="utf-8")
 	return IcecraftRawConfig.from_text(hab_text)
 
-def read_chromosome(hdf5_file: h5py.File, identifier: int) -> Chromosome:
-	id_desc = HDF5_DICT["chromo.id"]
-	idx_desc = HDF5_DICT["chromo.indices"]
-	try:
-		chromo_index = np.where(data_from_desc(hdf5_file, id_desc)[:] == identifier)[0][0]
-	except IndexError:
-		raise ValueError(f"Chromosome {identifier} not found.")
+class ChromosomeReader:
+	"""Read chromosomes stored in full or as delta to a base chromosome
 	
-	allele_indices = tuple(int(i) for i in data_from_desc(hdf5_file, idx_desc)[chromo_index])
-	return Chromosome(int(identifier), allele_indices)
+	The identifiers are indexed once, so reading a chromosome stored in full takes constant time and reading a delta
+	takes time proportional to the number of deltas to the next full chromosome. The allele indices of the
+	cache_size most recently read chromosomes are cached, so chromosomes sharing bases, e.g. of the same generation,
+	are reconstructed quickly.
+	"""
+	def __init__(self, hdf5_file: h5py.File, cache_size: int=4096) -> None:
+		self._indices = data_from_key(hdf5_file, "chromo.indices")
+		ids = data_from_key(hdf5_file, "chromo.id")[:]
+		# keep the first occurrence of an identifier
+		self._full = {c: i for i, c in reversed(list(enumerate(ids.tolist())))}
+		try:
+			delta_ids = data_from_key(hdf5_file, "chromo.delta.id")[:]
+			self._base = data_from_key(hdf5_file, "chromo.delta.base")[:]
+			self._end = data_from_key(hdf5_file, "chromo.delta.end")[:]
+			self._gene = data_from_key(hdf5_file, "chromo.delta.gene")[:]
+			self._value = data_from_key(hdf5_file, "chromo.delta.value")[:]
+		except KeyError:
+			# written without deltas
+			delta_ids = []
+		self._delta = {c: i for i, c in enumerate(np.asarray(delta_ids).tolist())}
+		self._cache_size = cache_size
+		self._cache: OrderedDict[int, np.ndarray] = OrderedDict()
+	
+	def read(self, identifier: int) -> Chromosome:
+		identifier = int(identifier)
+		# follow the bases until a cached or full chromosome
+		chain = []
+		cur = identifier
+		while cur not in self._cache and cur not in self._full:
+			try:
+				pos = self._delta[cur]
+			except KeyError:
+				raise ValueError(f"Chromosome {identifier} not found.")
+			chain.append((cur, pos))
+			cur = int(self._base[pos])
+		
+		if cur in self._cache:
+			alleles = self._cache[cur]
+			self._cache.move_to_end(cur)
+		else:
+			alleles = self._indices[self._full[cur]].astype(np.int64)
+			self._add(cur, alleles)
+		
+		for cur, pos in reversed(chain):
+			start = self._end[pos-1] if pos > 0 else 0
+			alleles = alleles.copy()
+			alleles[self._gene[start:self._end[pos]]] = self._value[start:self._end[pos]]
+			self._add(cur, alleles)
+		
+		return Chromosome(identifier, tuple(int(i) for i in alleles))
+	
+	@property
+	def identifiers(self) -> Set[int]:
+		"""Identifiers of all stored chromosomes"""
+		return set(self._full) | set(self._delta)
+	
+	def _add(self, identifier: int, alleles: np.ndarray) -> None:
+		self._cache[identifier] = alleles
+		while len(self._cache) > self._cache_size:
+			self._cache.popitem(last=False)
+
+def read_chromosome(hdf5_file: h5py.File, identifier: int) -> Chromosome:
+	return ChromosomeReader(hdf5_file).read(identifier)
 
 def read_s_t_index(hdf5_file: h5py.File, fit_index: int) -> int:
 	desc = HDF5_DICT["fitness.st"]
@@ -52,7 +136,7 @@ def read_carry_enable_values(hdf5_file: h5py.File, fit_index: int) -> List[bool]
 def read_carry_enable_bits(hdf5_file: h5py.File) -> List[IcecraftBitPosition]:
 	desc = HDF5_DICT["carry_enable.bits"]
 	raw = data_from_desc(hdf5_file, desc)
-	return [IcecraftBitPosition(*c) for c in raw]
+	return [IcecraftBitPosition.interned(*c) for c in raw]
 
 def get_with_index(hdf5_file: h5py.File, desc: HDF5Desc, index: int) -> Union[h5py.Group, h5py.AttributeManager]:
 	"""Returns group or attributes when formating path with an index"""
@@ -78,7 +162,7 @@ def read_carry_use(hdf5_file: h5py.File, cd_index) -> List[PartConf]:
 		
 		val_raw = val_grp[val_desc.h5_name.format(pc_index)].tolist()
 		
-		res.append(PartConf(tuple(IcecraftBitPosition(*c) for c in bit_raw), tuple(val_raw)))
+		res.append(PartConf(tuple(IcecraftBitPosition.interned(*c) for c in bit_raw), tuple(val_raw)))
 		
 		pc_index += 1
 	
@@ -97,7 +181,7 @@ def read_rep_carry_data(hdf5_file: h5py.File) -> CarryDataMap:
 			break
 		
 		enable_raw = ena_grp[ena_desc.h5_name].tolist()
-		enable = tuple(IcecraftBitPosition(*c) for c in enable_raw)
+		enable = tuple(IcecraftBitPosition.interned(*c) for c in enable_raw)
 		lut_index = get_with_index(hdf5_file, lut_desc, cd_index)[lut_desc.h5_name].item()
 		
 		carry_data = CarryData(lut_index, enable, read_carry_use(hdf5_file, cd_index))
@@ -122,7 +206,7 @@ def read_rep_colbufctrl(hdf5_file: h5py.File) -> Tuple[IndexedItem, ]:
 	if len(bit_raw) != len(idx_raw):
 		raise ValueError(f"number of bits and indices don't match: {len(bit_raw)} != {len(idx_raw)}")
 	
-	return [IndexedItem(tuple(IcecraftBitPosition(*p) for p in b), "ColBufCtrl", i)
+	return [IndexedItem(tuple(IcecraftBitPosition.interned(*p) for p in b), "ColBufCtrl", i)
 		for b, i in zip(bit_raw.tolist(), idx_raw.tolist())]
 
 def read_rep(hdf5_file: h5py.File, no_carry: bool=False) -> IcecraftRep:
@@ -133,8 +217,8 @@ def read_rep(hdf5_file: h5py.File, no_carry: bool=False) -> IcecraftRep:
 	gene_desc = HDF5_DICT["rep.genes"]
 	const_desc = HDF5_DICT["rep.const"]
 	
-	genes = HDF5Sink.extract_genes(hdf5_file[gene_desc.h5_path], IcecraftBitPosition, gene_desc.h5_name.format(""))
-	const = HDF5Sink.extract_genes(hdf5_file[const_desc.h5_path], IcecraftBitPosition, const_desc.h5_name.format(""))
+	genes = HDF5Sink.extract_genes(hdf5_file[gene_desc.h5_path], IcecraftBitPosition.interned, gene_desc.h5_name.format(""))
+	const = HDF5Sink.extract_genes(hdf5_file[const_desc.h5_path], IcecraftBitPosition.interned, const_desc.h5_name.format(""))
 	
 	colbufctrl = read_rep_colbufctrl(hdf5_file)
 	
@@ -157,12 +241,258 @@ def get_chromo_bits(hdf5_file: h5py.File) -> int:
 	size = data_from_desc(hdf5_file, desc).dtype.itemsize
 	return size * 8
 
-def read_generation(hdf5_file: h5py.File, gen_index: int) -> List[Chromosome]:
+def read_generation(hdf5_file: h5py.File, gen_index: int, island: Optional[int]=None) -> List[Chromosome]:
+	"""Read a generation; for an island model the generation of the given island"""
 	pops = data_from_key(hdf5_file, "ea.pop")
-	gen = [read_chromosome(hdf5_file, i) for i in pops[gen_index]]
+	if island is not None:
+		pops = pops[:][data_from_key(hdf5_file, "ea.pop_island")[:] == island]
+	reader = ChromosomeReader(hdf5_file)
+	gen = [reader.read(i) for i in pops[gen_index]]
 	
 	return gen
 
+class Lineage:
+	"""Index of the parents of each chromosome created by crossover or mutation
+	
+	Built from the crossover and mutation datasets, independent of whether they were written per alteration or in
+	blocks. Looking up the parents of a chromosome takes constant time, so the ancestry takes time proportional to
+	the number of ancestors. Chromosomes of the initial population have no parents.
+	"""
+	def __init__(self, parents: Dict[int, Tuple[int, ...]]) -> None:
+		self._parents = parents
+	
+	@classmethod
+	def from_hdf5(cls, hdf5_file: h5py.File) -> "Lineage":
+		parents = {}
+		
+		cx_in = data_from_key(hdf5_file, "ea.crossover.in")[:]
+		cx_out = data_from_key(hdf5_file, "ea.crossover.out")[:]
+		for (a, b), (c, d) in zip(cx_in.tolist(), cx_out.tolist()):
+			# children equal to a parent are no new chromosomes; the parent providing the head comes first
+			if c not in (a, b):
+				parents[c] = (a, b)
+			if d not in (a, b):
+				parents[d] = (b, a)
+		
+		mut_parent = data_from_key(hdf5_file, "ea.mutation.parent")[:]
+		mut_child = data_from_key(hdf5_file, "ea.mutation.child")[:]
+		parents.update((c, (p, )) for p, c in zip(mut_parent.tolist(), mut_child.tolist()))
+		
+		return cls(parents)
+	
+	def parents(self, identifier: int) -> Tuple[int, ...]:
+		return self._parents.get(identifier, tuple())
+	
+	def ancestry(self, identifier: int, max_depth: Optional[int]=None) -> Dict[int, Tuple[int, ...]]:
+		"""Map the chromosome and each of its ancestors to their parents
+		
+		max_depth: number of generations of alterations to go back; None -> up to the initial population
+		"""
+		res = {}
+		todo = [identifier]
+		depth = 0
+		while todo and (max_depth is None or depth <= max_depth):
+			next_todo = []
+			for cur in todo:
+				if cur in res:
+					continue
+				res[cur] = self.parents(cur)
+				next_todo.extend(res[cur])
+			todo = next_todo
+			depth += 1
+		
+		return res
+	
+	def lineage(self, identifier: int) -> List[int]:
+		"""Chromosomes on the path from the initial population to the chromosome, always following the first parent"""
+		res = [identifier]
+		while True:
+			parents = self.parents(res[-1])
+			if len(parents) == 0:
+				break
+			res.append(parents[0])
+		
+		res.reverse()
+		return res
+
+class DatasetTail:
+	"""Read only the entries appended to datasets since the last poll
+	
+	Meant for files that are still written in SWMR mode. The datasets are refreshed instead of reopening the file, so
+	only the new entries are read.
+	"""
+	def __init__(self, hdf5_file: h5py.File, keys: Iterable[str]) -> None:
+		self._datasets = {}
+		for key in keys:
+			try:
+				self._datasets[key] = data_from_key(hdf5_file, key)
+			except KeyError:
+				# e.g. no temperature recorded
+				pass
+		self._positions = {key: 0 for key in self._datasets}
+	
+	@property
+	def keys(self) -> List[str]:
+		return list(self._datasets)
+	
+	def poll(self) -> Dict[str, np.ndarray]:
+		"""Return the new entries for each key"""
+		res = {}
+		for key, ds in self._datasets.items():
+			ds.refresh()
+			pos = self._positions[key]
+			end = ds.shape[0]
+			res[key] = ds[pos:end]
+			self._positions[key] = end
+		
+		return res
+
+def read_rng_state(hdf5_file: h5py.File, prefix: str, index: int) -> tuple:
+	"""Read the state of a random.Random instance stored at a checkpoint"""
+	def read(key):
+		desc = HDF5_DICT[key]
+		return hdf5_file[desc.h5_path][desc.h5_name.format(prefix)][index]
+	
+	gauss = float(read("ea.checkpoint.rand.gauss"))
+	return (
+		int(read("ea.checkpoint.rand.version")),
+		tuple(int(s) for s in read("ea.checkpoint.rand.state")),
+		None if np.isnan(gauss) else gauss
+	)
+
+@dataclass
+class FitnessHistory:
+	"""Fitness values known after a generation, see replay_fitness"""
+	generation: int = -1
+	# fitness of the EA is the mean of all measurements
+	adaptive: bool = False
+	# last fitness value of each chromosome, measured or reused
+	values: Dict[int, float] = field(default_factory=dict)
+	# chromosome identifier -> identifier of the chromosome whose fitness values it reused
+	phenotype_of: Dict[int, int] = field(default_factory=dict)
+	# statistics of the fitness values by identifier of the chromosome that was measured
+	stats: Dict[int, FitnessStats] = field(default_factory=dict)
+	# identifiers of the measured chromosomes that didn't reuse a fitness, in order of their first measurement
+	origins: List[int] = field(default_factory=list)
+	
+	def fitness(self, identifier: int) -> float:
+		"""Fitness the EA assigned to a chromosome; raises KeyError for chromosomes without fitness"""
+		org_id = self.phenotype_of.get(identifier, identifier)
+		if self.adaptive and org_id in self.stats:
+			return self.stats[org_id].mean
+		return self.values[identifier]
+	
+	def fit_stats(self) -> Dict[int, FitnessStats]:
+		"""Statistics by chromosome identifier; chromosomes sharing a phenotype share the instance"""
+		res = dict(self.stats)
+		res.update({i: self.stats[o] for i, o in self.phenotype_of.items() if o in self.stats})
+		return res
+
+def read_rows(hdf5_file: h5py.File, prefix: str, names: Iterable[str]) -> List[np.ndarray]:
+	"""Read the datasets prefix.name; empty arrays if they don't exist"""
+	names = list(names)
+	try:
+		return [data_from_key(hdf5_file, f"{prefix}.{n}")[:] for n in names]
+	except KeyError:
+		return [np.zeros(0) for _ in names]
+
+def replay_fitness(hdf5_file: h5py.File, last_gen: Optional[int]=None) -> Iterator[FitnessHistory]:
+	"""Replay the fitness values of a run generation by generation up to last_gen
+	
+	The same instance is updated and yielded after each generation. Chromosomes that reused the fitness of a
+	chromosome with the same phenotype get the reused value unless they were measured later. With adaptive
+	re-evaluation, the fitness is the mean of the statistics written with the checkpoints.
+	"""
+	try:
+		adaptive = EvalMode[data_from_key(hdf5_file, "ea.eval_mode")] == EvalMode.ADAPTIVE
+	except KeyError:
+		adaptive = False
+	if last_gen is None:
+		last_gen = len(data_from_key(hdf5_file, "ea.pop")) - 1
+	
+	# all datasets are written in the order of the generations
+	fit_rows = read_rows(hdf5_file, "fitness", ["generation", "chromo_id", "value"])
+	reuse_rows = read_rows(hdf5_file, "ea.reuse", ["generation", "chromo_id", "phenotype_of", "fitness"])
+	stats_rows = read_rows(hdf5_file, "ea.fit_stats", ["generation", "chromo_id", "count", "mean", "m2"])
+	
+	history = FitnessHistory(adaptive=adaptive)
+	measured = set()
+	starts = [0, 0, 0]
+	for gen in range(last_gen+1):
+		ends = [int(np.searchsorted(r[0], gen, side="right")) for r in (fit_rows, reuse_rows, stats_rows)]
+		
+		for _, chromo_id, org_id, value in zip(*[r[starts[1]:ends[1]] for r in reuse_rows]):
+			history.phenotype_of[int(chromo_id)] = int(org_id)
+			history.values[int(chromo_id)] = float(value)
+		
+		for _, chromo_id, value in zip(*[r[starts[0]:ends[0]] for r in fit_rows]):
+			chromo_id = int(chromo_id)
+			history.values[chromo_id] = float(value)
+			if chromo_id not in measured and chromo_id not in history.phenotype_of:
+				history.origins.append(chromo_id)
+			measured.add(chromo_id)
+		
+		for _, chromo_id, count, mean, m2 in zip(*[r[starts[2]:ends[2]] for r in stats_rows]):
+			org_id = history.phenotype_of.get(int(chromo_id), int(chromo_id))
+			history.stats[org_id] = FitnessStats(int(count), float(mean), float(m2))
+		
+		starts = ends
+		history.generation = gen
+		yield history
+
+def read_checkpoint(hdf5_file: h5py.File, index: int=-1) -> Checkpoint:
+	"""Read the checkpoint at index
+	
+	The fitness of the population is taken from replay_fitness. Data written after the checkpoint, e.g. fitness values
+	of an incomplete generation, is ignored.
+	"""
+	gens = data_from_key(hdf5_file, "ea.checkpoint.generation")
+	if len(gens) == 0:
+		raise ValueError("No checkpoint found.")
+	# negative indices refer to the last entries
+	index = range(len(gens))[index]
+	generation = int(gens[index])
+	
+	population = read_generation(hdf5_file, generation)
+	
+	for history in replay_fitness(hdf5_file, generation):
+		pass
+	fitness = {}
+	for chromo in population:
+		try:
+			fitness[chromo.identifier] = history.fitness(chromo.identifier)
+		except KeyError:
+			pass
+	
+	return Checkpoint(
+		generation,
+		population,
+		fitness,
+		read_rng_state(hdf5_file, "random_", index),
+		read_rng_state(hdf5_file, "prng_", index),
+		history.fit_stats(),
+		list(history.origins),
+	)
+
+def read_surrogate_samples(hdf5_file: h5py.File, generation: int) -> List[Tuple[Chromosome, float]]:
+	"""Chromosomes and fitness values in the order a surrogate was trained with them up to generation
+	
+	Each generation, the population is added with its current fitness. Chromosomes without known fitness, e.g. from
+	before an earlier resume, are skipped.
+	"""
+	pops = data_from_key(hdf5_file, "ea.pop")
+	reader = ChromosomeReader(hdf5_file)
+	samples = []
+	for history in replay_fitness(hdf5_file, generation):
+		for chromo_id in pops[history.generation].tolist():
+			try:
+				fit = history.fitness(chromo_id)
+			except KeyError:
+				continue
+			samples.append((reader.read(chromo_id), fit))
+	
+	return samples
+
 def read_osci_setup(hdf5_file: h5py.File) -> SetupCmd:
 	#TODO: add value to HDF5Desc
 	attrs = hdf5_file["fitness/measurement"].attrs
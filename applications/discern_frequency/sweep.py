@@ -0,0 +1,190 @@
+"""Run an EA for every combination of parameters, distributed over multiple measurement setups
+
+A sweep spec is a JSON file like
+	{
+		"args": ["--area", "13", "17", "16", "20", "--in-port", "14", "17", "RIGHT", "--habitat", "nhabitat.asc",
+			"--generations", "100"],
+		"grid": {"pop-size": [10, 20], "crossover-prob": [0.7], "mutation-prob": [0.05, 0.1], "seed": [1, 2, 3]}
+	}
+args holds the arguments of the run subcommand common to all runs, grid maps run options without the leading dashes
+to the values to sweep. Each combination of values is one run. Runs without a seed in the grid get a seed derived
+from the seed of the sweep, so every run can be reproduced.
+
+Each worker, i.e. a measurement setup given by serial numbers or a dummy setup, executes one run at a time in its
+own process. The workers take the next pending run as soon as they are done, so faster setups execute more runs.
+"""
+
+import csv
+import itertools
+import multiprocessing as mp
+import queue
+import time
+import traceback
+
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Sequence
+
+import numpy as np
+
+@dataclass
+class Worker:
+	"""Measurement setup that executes one run at a time"""
+	name: str
+	# global arguments selecting the setup, e.g. serial numbers or --dummy
+	args: List[str] = field(default_factory=list)
+
+@dataclass
+class SweepRun:
+	index: int
+	params: Dict[str, Any]
+	output: str
+	# arguments of the run without the ones of the worker
+	argv: List[str]
+	worker: Optional[str] = None
+	# None -> not finished
+	exitcode: Optional[int] = None
+	duration: float = 0.0
+
+# executes the complete argument list of a run; has to be picklable, e.g. a module level function
+RunExecutor = Callable[[List[str]], None]
+
+def expand_grid(grid: Mapping[str, Sequence[Any]]) -> List[Dict[str, Any]]:
+	"""All combinations of the values of the grid; the last option changes fastest"""
+	return [dict(zip(grid, values)) for values in itertools.product(*grid.values())]
+
+def option_args(params: Mapping[str, Any]) -> List[str]:
+	"""Command line arguments for options without leading dashes
+	
+	True adds a flag, False and None leave the option out and lists provide multiple values.
+	"""
+	res = []
+	for name, value in params.items():
+		if value is False or value is None:
+			continue
+		res.append(f"--{name}")
+		if value is True:
+			continue
+		if isinstance(value, (list, tuple)):
+			res.extend(str(v) for v in value)
+		else:
+			res.append(str(value))
+	
+	return res
+
+def run_seeds(seed: int, count: int) -> List[int]:
+	"""Derive independent seeds for the runs from a single seed"""
+	return [int(s.generate_state(1)[0]) for s in np.random.SeedSequence(seed).spawn(count)]
+
+def create_runs(spec: Mapping[str, Any], output_dir: str, seed: int) -> List[SweepRun]:
+	combinations = expand_grid(spec.get("grid", {}))
+	seeds = run_seeds(seed, len(combinations))
+	
+	runs = []
+	for index, (params, run_seed) in enumerate(zip(combinations, seeds)):
+		params = {**params}
+		params.setdefault("seed", run_seed)
+		output = f"{output_dir}/run-{index:03d}.h5"
+		argv = ["-o", output, "run"] + [str(a) for a in spec.get("args", [])] + option_args(params)
+		runs.append(SweepRun(index, params, output, argv))
+	
+	return runs
+
+def create_workers(stations: Iterable[Sequence[str]], dummy_count: int, shared: List[str]=[]) -> List[Worker]:
+	"""Workers for measurement setups given by target, meter and generator serial numbers and for dummy setups
+	
+	shared: global arguments passed to all workers
+	"""
+	workers = [Worker(f"station-{t}", ["-t", t, "-m", m, "-g", g]+shared) for t, m, g in stations]
+	workers.extend(Worker(f"dummy-{i}", ["--dummy"]+shared) for i in range(dummy_count))
+	return workers
+
+def parse_argv(argv: List[str]):
+	# imported here as the actions import this module
+	from applications.discern_frequency.cli import create_arg_parser
+	return create_arg_parser().parse_args(argv)
+
+def execute_argv(argv: List[str]) -> None:
+	args = parse_argv(argv)
+	args.function(args)
+
+def work(worker: Worker, tasks: mp.Queue, results: mp.Queue, execute: RunExecutor) -> None:
+	"""Execute runs until None is received"""
+	while True:
+		task = tasks.get()
+		if task is None:
+			break
+		
+		index, argv = task
+		print(f"{worker.name}: start run {index}")
+		start = time.perf_counter()
+		try:
+			execute(worker.args+argv)
+			exitcode = 0
+		except (Exception, SystemExit):
+			# a failed run doesn't stop the worker
+			traceback.print_exc()
+			exitcode = 1
+		results.put((index, worker.name, exitcode, time.perf_counter()-start))
+
+class SweepScheduler:
+	"""Distribute runs over workers, each in its own process"""
+	def __init__(self, workers: List[Worker], execute: RunExecutor=execute_argv, poll_interval: float=1.0) -> None:
+		if len(workers) < 1:
+			raise ValueError("at least one worker is required")
+		
+		self._workers = workers
+		self._execute = execute
+		self._poll_interval = poll_interval
+	
+	def run(self, runs: List[SweepRun]) -> None:
+		"""Execute the runs and set worker, exitcode and duration of each run
+		
+		Runs that were not finished, e.g. as the process of the worker crashed, keep None as exitcode.
+		"""
+		ctx = mp.get_context("spawn")
+		tasks = ctx.Queue()
+		results = ctx.Queue()
+		for run in runs:
+			tasks.put((run.index, run.argv))
+		for _ in self._workers:
+			tasks.put(None)
+		
+		processes = [ctx.Process(target=work, args=(w, tasks, results, self._execute)) for w in self._workers]
+		for proc in processes:
+			proc.start()
+		
+		by_index = {r.index: r for r in runs}
+		pending = len(runs)
+		while pending > 0:
+			try:
+				index, worker, exitcode, duration = results.get(timeout=self._poll_interval)
+			except queue.Empty:
+				# stop waiting if all workers are gone; results are put before a worker ends
+				if all(not p.is_alive() for p in processes) and results.empty():
+					break
+				continue
+			run = by_index[index]
+			run.worker = worker
+			run.exitcode = exitcode
+			run.duration = duration
+			pending -= 1
+		
+		for proc in processes:
+			proc.join()
+
+def write_index(filename: str, runs: List[SweepRun], summaries: Mapping[int, Mapping[str, Any]]={}) -> None:
+	"""Write a CSV file with one row per run: output file, worker, exit code, parameters and summary"""
+	rows = []
+	for run in runs:
+		row = {"index": run.index, "output": run.output, "worker": run.worker, "exitcode": run.exitcode,
+			"duration": f"{run.duration:.1f}"}
+		row.update(run.params)
+		row.update(summaries.get(run.index, {}))
+		rows.append(row)
+	
+	# columns in order of appearance
+	fieldnames = list(dict.fromkeys(k for r in rows for k in r))
+	with open(filename, "w", newline="") as csv_file:
+		writer = csv.DictWriter(csv_file, fieldnames)
+		writer.writeheader()
+		writer.writerows(rows)
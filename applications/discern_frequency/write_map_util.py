@@ -2,7 +2,7 @@
 
 import re
 
-from dataclasses import astuple, dataclass, field
+from dataclasses import astuple, dataclass, field, replace
 from functools import partial
 from operator import attrgetter, itemgetter, methodcaller
 from typing import Any, Dict, Iterable, List, Optional, Tuple
@@ -13,6 +13,8 @@ from adapters.gear.rigol import FloatCheck, IntCheck, SetupCmd
 from adapters.hdf5_sink import chain_funcs, compose, MetaEntry, MetaEntryMap, ParamAim, ParamAimMap
 from adapters.icecraft import IcecraftRep
 from applications.discern_frequency.hdf5_desc import add_rep, add_meta, HDF5_DICT, pa_gen
+from applications.discern_frequency.misc import pad_list
+from domain.profiling import SECTIONS
 
 
 def extend_dict_list(org: Dict[Any, list], new: Dict[Any, list]) -> None:
@@ -53,8 +55,21 @@ def create_base(rep: IcecraftRep, chromo_bits: 16) -> Tuple[ParamAimMap, MetaEnt
 	write_map = {
 		"RandomChromo.perform": chromo_aim,
 		"GenChromo.perform": chromo_aim,
+		# blocks of chromosomes collected by LineageRecorder
+		"LineageRecorder.chromos": [
+			pa_gen(
+				"chromo.indices", ["allele_indices"], data_type=f"uint{chromo_bits}", shape=(len(rep.genes), ),
+				alter=itemgetter(0), comp_opt=9, shuffle=True
+			),
+			pa_gen("chromo.id", ["chromo_id"], alter=itemgetter(0), comp_opt=9, shuffle=True),
+		],
 		"habitat": [pa_gen("habitat", ["text"], alter=partial(compose, funcs=[itemgetter(0), partial(bytearray,
 			encoding="utf-8")]), comp_opt=9),],
+		# written by the ParallelSink on exit
+		"ParallelSink.queue": [
+			pa_gen("sink.high_water_mark", ["high_water_mark"]),
+			pa_gen("sink.max_queue", ["max_queue"]),
+		],
 	}
 	
 	metadata = {}
@@ -195,6 +210,9 @@ def add_ea(write_map: ParamAimMap, metadata: MetaEntryMap, pop_size: int) -> Non
 			pa_gen("ea.crossover_prob", ["crossover_prob"]),
 			pa_gen("ea.mutation_prob", ["mutation_prob"]),
 			pa_gen("ea.eval_mode", ["eval_mode"]),
+			pa_gen("ea.vectorized", ["vectorized"]),
+			pa_gen("ea.lineage", ["lineage"]),
+			pa_gen("ea.delta_chromos", ["delta_chromos"]),
 		],
 		"SimpleEA.random_initial": create_rng_aim("state", "random_initial_"),
 		"SimpleEA.random_final": create_rng_aim("state", "random_final_"),
@@ -211,6 +229,18 @@ def add_ea(write_map: ParamAimMap, metadata: MetaEntryMap, pop_size: int) -> Non
 			pa_gen("ea.mutation.child", ["in", "out"], comp_opt=9, shuffle=True),
 			pa_gen("ea.mutation.generation", ["in", "out", "generation"], comp_opt=9, shuffle=True),
 		],
+		# blocks of alterations collected by LineageRecorder
+		"LineageRecorder.crossover": [
+			pa_gen(f"ea.crossover.{n}", [n], comp_opt=9, shuffle=True) for n in ["in", "out", "generation"]
+		],
+		"LineageRecorder.mutation": [
+			pa_gen(f"ea.mutation.{n}", [n], alter=itemgetter(0), comp_opt=9, shuffle=True) for n in ["parent", "child",
+				"generation"]
+		],
+		"SimpleEA.checkpoint": [
+			pa_gen("ea.checkpoint.generation", ["generation"]),
+		] + [pa_gen(f"ea.checkpoint.rand.{k}", [n], name_args=[p]) for n, p in [("state", "random_"),
+			("prng_state", "prng_")] for k in ["version", "state", "gauss"]],
 		"prng": [pa_gen("rand.seed", ["seed"], name_args=["prng_"])] + create_rng_aim("final_state", "prng_final_"),
 	}
 	
@@ -223,10 +253,200 @@ def add_ea(write_map: ParamAimMap, metadata: MetaEntryMap, pop_size: int) -> Non
 		"i from generation i-1")
 	add_meta(metadata, "ea.pop.desc", "IDs of the chromosomes included in each generation")
 	add_meta(metadata, "fitness.generation.desc", "generation in which the fitness was evaluated")
+	add_meta(metadata, "ea.checkpoint.desc", "state required to resume the run after a complete generation; "
+		"random_* is the state of the random module, prng_* the state of the PRNG for the input data")
+	add_meta(metadata, "ea.checkpoint.generation.desc", "last complete generation")
 	
 	extend_dict_list(write_map, ea_map)
 
 
+def add_steady_state(write_map: ParamAimMap, metadata: MetaEntryMap, pop_size: int, stations: int) -> None:
+	"""Add the entries for a steady-state evolutionary algorithm to an existing HDF5Sink write map
+	
+	Replaces add_ea; the fitness values and alterations are assigned to the number of evaluations instead of a
+	generation.
+	"""
+	write_map.setdefault("MeasureFitness.perform", []).append(pa_gen("fitness.evaluation", ["evaluation"], comp_opt=9,
+		shuffle=True))
+	
+	ea_map = {
+		"SteadyStateEA.ea_params": [
+			pa_gen("ea.pop_size", ["pop_size"]),
+			pa_gen("ea.eval_count", ["eval_count"]),
+			pa_gen("ea.crossover_prob", ["crossover_prob"]),
+			pa_gen("ea.mutation_prob", ["mutation_prob"]),
+			pa_gen("ea.stations", ["stations"]),
+		],
+		"SteadyStateEA.random_initial": create_rng_aim("state", "random_initial_"),
+		"SteadyStateEA.random_final": create_rng_aim("state", "random_final_"),
+		"SteadyStateEA.init": [pa_gen("ea.pop", ["pop"], shape=(pop_size, ), shuffle=True)],
+		# the population after each evaluation follows from the initial population and the replaced chromosomes
+		"SteadyStateEA.eval": [
+			pa_gen(f"ea.steady.{n}", [n], comp_opt=9, shuffle=True) for n in ["chromo_id", "fitness", "station",
+				"submit_time", "start_time", "end_time", "replaced"]
+		],
+		"SteadyStateEA.utilization": [
+			pa_gen("ea.steady.busy", ["busy"]),
+			pa_gen("ea.steady.wall", ["wall"]),
+		],
+		"Individual.wrap.cxOnePoint": [
+			pa_gen("ea.crossover.in", ["in"], comp_opt=9, shuffle=True),
+			pa_gen("ea.crossover.out", ["out"], comp_opt=9, shuffle=True),
+			pa_gen("ea.crossover.evaluation", ["evaluation"], comp_opt=9, shuffle=True),
+		],
+		"Individual.wrap.mutUniformInt": [
+			pa_gen("ea.mutation.parent", ["out", "in"], comp_opt=9, shuffle=True),
+			pa_gen("ea.mutation.child", ["in", "out"], comp_opt=9, shuffle=True),
+			pa_gen("ea.mutation.evaluation", ["in", "out", "evaluation"], comp_opt=9, shuffle=True),
+		],
+		"prng": [pa_gen("rand.seed", ["seed"], name_args=["prng_"])] + create_rng_aim("final_state", "prng_final_"),
+	}
+	
+	add_meta(metadata, "ea.steady.desc", f"asynchronous steady-state EA evaluating children on {stations} "
+		"measurement stations; each child replaces the chromosome with the lowest fitness, replaced is -1 if only the "
+		"fitness of a chromosome already in the population or of the initial population was evaluated; busy is the "
+		"time in s each station measured, wall the elapsed time")
+	add_meta(metadata, "fitness.evaluation.desc", "number of evaluated children when the fitness was evaluated")
+	add_meta(metadata, "ea.mutation.desc", "IDs of chromosomes resulting from mutation; only alterations are recorded")
+	add_meta(metadata, "ea.crossover.desc", "IDs of the chromosomes participating in and resulting from crossover")
+	add_meta(metadata, "ea.pop.desc", "IDs of the chromosomes of the initial population")
+	
+	extend_dict_list(write_map, ea_map)
+
+
+def add_surrogate(write_map: ParamAimMap, metadata: MetaEntryMap) -> None:
+	"""Add the entries for the surrogate-assisted pre-screening of an evolutionary algorithm"""
+	write_map.setdefault("SimpleEA.ea_params", []).append(pa_gen("ea.screen_ratio", ["screen_ratio"]))
+	write_map["SimpleEA.surrogate"] = [
+		pa_gen(f"ea.surrogate.{n}", [n], comp_opt=9, shuffle=True) for n in ["generation", "chromo_id", "predicted",
+			"measured", "evaluated"]
+	]
+	
+	add_meta(metadata, "ea.surrogate.desc", "fitness of new chromosomes predicted by a ridge regression surrogate; only "
+		"the chromosomes with the highest prediction are evaluated, measured is NaN for the others")
+
+
+def add_reeval(write_map: ParamAimMap, metadata: MetaEntryMap) -> None:
+	"""Add the entries for the adaptive re-evaluation of an evolutionary algorithm"""
+	write_map.setdefault("SimpleEA.ea_params", []).append(pa_gen("ea.reeval_budget", ["reeval_budget"]))
+	write_map["SimpleEA.reeval"] = [
+		pa_gen(f"ea.reeval.{n}", [n], comp_opt=9, shuffle=True) for n in ["generation", "chromo_id", "fitness", "mean",
+			"count", "threshold"]
+	]
+	
+	add_meta(metadata, "ea.reeval.desc", "repeated evaluations of chromosomes whose confidence interval contains the "
+		"boundary between elite and the rest of the population; mean and count include the repeated evaluation")
+	add_fit_stats(write_map, metadata)
+
+
+def add_reuse(write_map: ParamAimMap, metadata: MetaEntryMap) -> None:
+	"""Add the entries for the reuse of fitness values of chromosomes with the same phenotype"""
+	write_map.setdefault("SimpleEA.ea_params", []).append(pa_gen("ea.phenotype_reuse", ["phenotype_reuse"]))
+	write_map["SimpleEA.reuse"] = [
+		pa_gen(f"ea.reuse.{n}", [n], comp_opt=9, shuffle=True) for n in ["generation", "chromo_id", "phenotype_of",
+			"fitness"]
+	]
+	
+	add_meta(metadata, "ea.reuse.desc", "chromosomes that were not measured as they have the same phenotype as an "
+		"already measured chromosome; fitness is the mean of the fitness values measured so far")
+	add_fit_stats(write_map, metadata)
+
+
+def add_fit_stats(write_map: ParamAimMap, metadata: MetaEntryMap) -> None:
+	"""Add the entries for the statistics of the fitness values required to resume a run"""
+	if "SimpleEA.fit_stats" in write_map:
+		# required by both adaptive re-evaluation and phenotype reuse
+		return
+	
+	write_map["SimpleEA.fit_stats"] = [
+		pa_gen(f"ea.fit_stats.{n}", [n], comp_opt=9, shuffle=True) for n in ["generation", "chromo_id", "count", "mean",
+			"m2"]
+	]
+	
+	add_meta(metadata, "ea.fit_stats.desc", "count, mean and sum of squared deviations of the fitness values of the "
+		"chromosomes whose values changed since the previous checkpoint; chromosomes sharing a phenotype share the "
+		"values")
+
+
+def add_profile(write_map: ParamAimMap, metadata: MetaEntryMap) -> None:
+	"""Add the entries for the time spent in the profiled sections of each generation"""
+	write_map["SimpleEA.profile"] = [
+		pa_gen(f"ea.profile.{n}", [n], comp_opt=9, shuffle=True) for n in ("generation", "wall")+SECTIONS
+	]
+	
+	add_meta(metadata, "ea.profile.desc", "time in s spent in each profiled section per generation; sections may be "
+		"nested, e.g. bitstream and flash are part of configure, osci_wait and transfer are part of measure; wall is "
+		"the elapsed time of the generation")
+
+
+def add_delta_chromos(write_map: ParamAimMap, metadata: MetaEntryMap, chromo_bits: 16) -> None:
+	"""Add the entries for chromosomes stored as delta to a base chromosome"""
+	write_map["LineageRecorder.delta"] = [
+		pa_gen(f"chromo.delta.{n}", [m], comp_opt=9, shuffle=True) for n, m in [("id", "chromo_id"), ("base", "base"),
+			("end", "end")]
+	]
+	write_map["LineageRecorder.delta_genes"] = [
+		pa_gen("chromo.delta.gene", ["gene"], comp_opt=9, shuffle=True),
+		pa_gen("chromo.delta.value", ["value"], data_type=f"uint{chromo_bits}", comp_opt=9, shuffle=True),
+	]
+	
+	add_meta(metadata, "chromo.delta.desc", "chromosomes stored as the genes they differ in from the base chromosome; "
+		"the changed genes of the i-th chromosome are gene[end[i-1]:end[i]] with the allele indices "
+		"value[end[i-1]:end[i]], all other allele indices are the ones of the base chromosome")
+
+
+def add_island(write_map: ParamAimMap, metadata: MetaEntryMap, migrant_count: int) -> None:
+	"""Add the entries for an island model to an existing HDF5Sink write map
+	
+	IslandEA writes the same data as SimpleEA plus the index of the island, so the entries of SimpleEA are moved to
+	IslandEA and the sources written by all islands get an island dataset next to their data. Has to be called after
+	all other entries of the EA and the measurement were added.
+	"""
+	for source in [s for s in write_map if s.startswith("SimpleEA.")]:
+		aim_list = write_map.pop(source)
+		if source in ("SimpleEA.random_initial", "SimpleEA.random_final"):
+			# the islands would overwrite each others attributes; the island seeds define the initial states
+			continue
+		write_map["IslandEA"+source[len("SimpleEA"):]] = aim_list
+	
+	island_aims = {
+		"RandomChromo.perform": pa_gen("chromo.island", ["island"]),
+		"GenChromo.perform": pa_gen("chromo.island", ["island"]),
+		"Measure.perform": pa_gen("fitness.measure_island", ["island"], comp_opt=9, shuffle=True),
+		"MeasureFitness.perform": pa_gen("fitness.island", ["island"], comp_opt=9, shuffle=True),
+		"IslandEA.gen": pa_gen("ea.pop_island", ["island"]),
+		"Individual.wrap.cxOnePoint": pa_gen("ea.crossover.island", ["island"], comp_opt=9, shuffle=True),
+		"Individual.wrap.mutUniformInt": pa_gen("ea.mutation.island", ["in", "out", "island"], comp_opt=9,
+			shuffle=True),
+		"IslandEA.checkpoint": pa_gen("ea.checkpoint.island", ["island"]),
+	}
+	for source, aim in island_aims.items():
+		if source in write_map:
+			# don't append, the lists of RandomChromo and GenChromo are shared
+			write_map[source] = write_map[source] + [aim]
+	
+	write_map["IslandEA.migrate"] = [
+		pa_gen("ea.migration.generation", ["generation"]),
+		pa_gen("ea.migration.island", ["island"]),
+		pa_gen("ea.migration.sent", ["sent"], shape=(migrant_count, )),
+		pa_gen("ea.migration.received_count", ["received"]),
+	] + [pa_gen(f"ea.migration.{n}", [n], shape=(migrant_count, ), alter=partial(pad_list, length=migrant_count))
+		for n in ["received", "origin"]]
+	write_map["IslandModel.params"] = [
+		pa_gen("ea.migration.island_count", ["island_count"]),
+		pa_gen("ea.migration.seed", ["seed"]),
+		pa_gen("ea.migration.island_seeds", ["island_seeds"]),
+		pa_gen("ea.migration.interval", ["migration_interval"]),
+		pa_gen("ea.migration.migrant_count", ["migrant_count"]),
+		pa_gen("ea.migration.synchronous", ["synchronous"]),
+	]
+	
+	add_meta(metadata, "ea.migration.desc", "island model with one population per island connected in a ring; every "
+		"interval generations each island sends its migrant_count best chromosomes to the next island; received and "
+		"origin hold the immigrants and the island they came from, only the first received_count entries are valid; "
+		"the island datasets of the other groups tell which island wrote each entry")
+
+
 def add_clamp(write_map: ParamAimMap, metadata: MetaEntryMap) -> None:
 	add_meta(metadata, "clamp.desc", "Iteratively set function units to fixed value if this does not impair the "
 		"fitness")
@@ -245,13 +465,34 @@ def add_clamp(write_map: ParamAimMap, metadata: MetaEntryMap) -> None:
 	]
 
 
-def create_for_run(rep: IcecraftRep, pop_size: int, chromo_bits: 16, temp: bool=True) -> Tuple[ParamAimMap,
-	MetaEntryMap]:
-	"""Create HDF5Sink write map for running a full evolutionary algorithm"""
+# datasets that grow fast enough to justify distributing them over sidecar files
+BULK_KEYS = ["fitness.measurement", "temp.value"]
+
+def set_shard_len(write_map: ParamAimMap, keys: Iterable[str], shard_len: Optional[int]) -> None:
+	"""Store the entries of the datasets given by keys in sidecar files with shard_len entries each
+	
+	The main file links the sidecar files by a virtual dataset, so readers still see a single dataset.
+	"""
+	locations = {(HDF5_DICT[k].h5_path, HDF5_DICT[k].h5_name) for k in keys}
+	for source, aim_list in write_map.items():
+		write_map[source] = [
+			replace(pa, shard_len=shard_len) if (pa.h5_path, pa.h5_name) in locations else pa for pa in aim_list
+		]
+
+
+def create_for_run(rep: IcecraftRep, pop_size: int, chromo_bits: 16, temp: bool=True, stations: Optional[int]=None
+	) -> Tuple[ParamAimMap, MetaEntryMap]:
+	"""Create HDF5Sink write map for running a full evolutionary algorithm
+	
+	stations: number of measurement stations of a steady-state EA; None -> generational EA
+	"""
 	write_map, metadata = create_base(rep, chromo_bits)
 	if temp:
 		add_temp(write_map, metadata)
-	add_ea(write_map, metadata, pop_size)
+	if stations is None:
+		add_ea(write_map, metadata, pop_size)
+	else:
+		add_steady_state(write_map, metadata, pop_size, stations)
 	add_measure(write_map, metadata, rep)
 	
 	return write_map, metadata
@@ -5,6 +5,9 @@ from typing import Tuple
 
 class BitPos(ABC):
 	"""Position of a bit."""
+	# no instance dict, so subclasses can use __slots__
+	__slots__ = ()
+	
 	@abstractmethod
 	def to_ints(self) -> Tuple[int, ...]:
 		raise NotImplementedError()
@@ -5,6 +5,7 @@ from contextlib import AbstractContextManager
 from dataclasses import dataclass
 from typing import Any, Callable, Mapping, Tuple
 
+from domain.profiling import PROFILER
 from domain.request_model import create_get_req
 
 class DataSink(AbstractContextManager):
@@ -24,7 +25,8 @@ class DataSinkUser(ABC):
 	def write_to_sink(self, sub_name: str, data_dict: Mapping[str, Any]) -> None:
 		if self.data_sink is None:
 			return
-		self.data_sink.write(f"{self.prefix}.{sub_name}", data_dict)
+		with PROFILER.section("sink"):
+			self.data_sink.write(f"{self.prefix}.{sub_name}", data_dict)
 
 def sink_request(func: Callable) -> Callable:
 	"""Decorator for functions with request parameter to send request to a DataSink
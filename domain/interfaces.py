@@ -1,7 +1,9 @@
+import hashlib
+
 from abc import ABC, abstractmethod, abstractproperty
 from contextlib import AbstractContextManager
 from types import TracebackType
-from typing import Any, Callable, Iterable, List, Mapping, Optional, Sequence, Tuple, Type, Union
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple, Type, Union
 
 from domain.base_structures import BitPos
 from domain.data_sink import DataSink, DataSinkUser
@@ -9,7 +11,7 @@ from domain.model import InputData, OutputData, Chromosome, Gene
 from domain.request_model import ResponseObject, RequestObject, ParameterValues, ParameterUser, Parameter
 
 class ElementPosition(ABC):
-	pass
+	__slots__ = ()
 
 class TargetConfiguration(ABC):
 	@abstractmethod
@@ -194,6 +196,22 @@ class Representation(ABC):
 	def iter_genes(self) -> Iterable[Gene]:
 		raise NotImplementedError()
 	
+	def decoded_bits(self, chromo: Chromosome) -> Dict[BitPos, bool]:
+		"""Values of the bits set by decoding a chromosome, in the order they are first set"""
+		bits = {}
+		for gene, allele_index in zip(self.iter_genes(), chromo.allele_indices):
+			bits.update(zip(gene.bit_positions, gene.alleles[allele_index].values))
+		return bits
+	
+	def phenotype_digest(self, chromo: Chromosome) -> bytes:
+		"""Digest of the phenotype of a chromosome
+		
+		Chromosomes with the same digest result in the same phenotype. By default the digest covers the values of all
+		bits set by decoding, i.e. it only detects chromosomes that decode to identical configurations. Representations
+		that know which bits are masked by others should leave them out.
+		"""
+		return hashlib.blake2b(bytes(self.decoded_bits(chromo).values()), digest_size=16).digest()
+	
 
 class RepresentationGenerator(ParameterUser):
 	"""Interface for generation of a representation """
@@ -0,0 +1,82 @@
+"""Timing of named code sections, aggregated until collected
+
+The use cases and the adapters for the hardware time their sections with the process wide PROFILER. It does nothing
+until it is enabled, e.g. by an EA that collects the times after each generation.
+"""
+
+import threading
+import time
+
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Dict, Iterator, Mapping
+
+# sections timed by the use cases and adapters, in the order of a measurement; sections may be nested, e.g.
+# bitstream and flash are part of configure and osci_wait and transfer are part of measure
+SECTIONS = (
+	"variation",
+	"decode",
+	"configure",
+	"bitstream",
+	"flash",
+	"drive",
+	"measure",
+	"osci_wait",
+	"transfer",
+	"preprocessing",
+	"fitness",
+	"sink",
+)
+
+@dataclass
+class SectionStats:
+	total: float = 0.0
+	count: int = 0
+
+class Profiler:
+	"""Accumulate the time spent in named sections
+	
+	Thread safe; sections running in parallel threads all count, so the sum of a section can exceed the wall time.
+	"""
+	def __init__(self) -> None:
+		self.enabled = False
+		self._lock = threading.Lock()
+		self._stats: Dict[str, SectionStats] = {}
+	
+	@contextmanager
+	def section(self, name: str) -> Iterator[None]:
+		if not self.enabled:
+			yield
+			return
+		
+		start = time.perf_counter()
+		try:
+			yield
+		finally:
+			self.add(name, time.perf_counter()-start)
+	
+	def add(self, name: str, duration: float) -> None:
+		with self._lock:
+			stats = self._stats.setdefault(name, SectionStats())
+			stats.total += duration
+			stats.count += 1
+	
+	def collect(self) -> Dict[str, SectionStats]:
+		"""Return the times accumulated since the last call and start over"""
+		with self._lock:
+			res = self._stats
+			self._stats = {}
+		return res
+
+PROFILER = Profiler()
+
+def format_profile(stats: Mapping[str, SectionStats], wall: float) -> str:
+	"""Table of the accumulated times; wall is the elapsed time the shares refer to"""
+	names = [s for s in SECTIONS if s in stats] + sorted(set(stats) - set(SECTIONS))
+	lines = [f"{'section':<14}{'total [s]':>11}{'count':>8}{'mean [ms]':>11}{'share':>8}"]
+	for name in names:
+		cur = stats[name]
+		share = cur.total/wall if wall > 0 else 0
+		lines.append(f"{name:<14}{cur.total:>11.3f}{cur.count:>8d}{1000*cur.total/cur.count:>11.2f}{share:>8.1%}")
+	lines.append(f"{'wall':<14}{wall:>11.3f}")
+	return "\n".join(lines)
@@ -7,6 +7,7 @@ from typing import Any, Dict, Iterable, Mapping, NewType, Optional, Callable
 
 from domain.data_sink import DataSink, DataSinkUser, sink_request
 from domain.model import OutputData, Chromosome
+from domain.profiling import PROFILER
 from domain.interfaces import DataSink, Driver, EvoAlgo, FitnessFunction, MeasureTimeout, Meter, Preprocessing, \
 	PreprocessingLibrary, PosTrans, PosTransLibrary, PRNG, RepresentationGenerator, Representation, TargetConfiguration, \
 	TargetManager, UniqueID, TargetDevice, InputGen
@@ -61,12 +62,14 @@ class Measure(UseCase):
 		while True:
 			attempt += 1
 			res = self._meter.prepare(request)
-			res.update(self._driver.drive(request))
+			with PROFILER.section("drive"):
+				res.update(self._driver.drive(request))
 			
 			# create aware datetime object; utcnow would create naive datetime object
 			cur_time = datetime.datetime.now(datetime.timezone.utc)
 			try:
-				res.update(self._meter.measure(request))
+				with PROFILER.section("measure"):
+					res.update(self._meter.measure(request))
 			except MeasureTimeout:
 				print(f"Got timeout on attempt {attempt}")
 				if attempt <= request.retry:
@@ -99,9 +102,11 @@ class DecTarget(UseCase):
 	
 	@sink_request
 	def perform(self, request: RequestObject) -> ResponseObject:
-		self._rep.decode(self._habitat, request.chromosome)
+		with PROFILER.section("decode"):
+			self._rep.decode(self._habitat, request.chromosome)
 		#self._habitat.write_asc(f"tmp.{request.chromosome.identifier}.asc")
-		self._target.configure(self._habitat)
+		with PROFILER.section("configure"):
+			self._target.configure(self._habitat)
 		res = ResponseObject(configuration=deepcopy(self._habitat))
 		if self._extract_info:
 			res.update(self._extract_info(self._rep, self._habitat, request.chromosome))
@@ -155,9 +160,11 @@ class MeasureFitness(UseCase):
 		mea_res = self._measure_uc(req)
 		res.update(mea_res)
 		res["raw_measurement"] = req["raw_measurement"] = res.measurement
-		res["measurement"] = req["measurement"] = self._prep(res.measurement)
+		with PROFILER.section("preprocessing"):
+			res["measurement"] = req["measurement"] = self._prep(res.measurement)
 		
-		res.update(self._fit_func.compute(req))
+		with PROFILER.section("fitness"):
+			res.update(self._fit_func.compute(req))
 		
 		return res
 
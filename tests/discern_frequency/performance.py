@@ -9,7 +9,6 @@
 
 import datetime
 import os
-import pickle
 import sys
 
 from contextlib import ExitStack
@@ -27,10 +26,11 @@ sys.path.append(
 import applications.discern_frequency
 import applications.discern_frequency.write_map_util as write_map_util
 
-from adapters.deap.simple_ea import SimpleEA
+from adapters.deap.simple_ea import PRNGSource, SimpleEA
 from adapters.dummies import DummyDriver
 from adapters.hdf5_sink import compose, HDF5Sink, ParamAim
-from adapters.icecraft import IcecraftManager, IcecraftRawConfig, IcecraftRep, IcecraftStormConfig
+from adapters.icecraft import IcecraftManager, IcecraftPosition, IcecraftRawConfig, IcecraftRep, IcecraftStormConfig,\
+	XC6200Direction, XC6200Port
 from adapters.parallel_collector import CollectorDetails, InitDetails, ParallelCollector
 from adapters.parallel_sink import ParallelSink
 from adapters.pop_init import RandomPop
@@ -44,18 +44,12 @@ from tests.mocks import RandomMeter
 
 LOCAL_PATH = os.path.dirname(os.path.abspath(__file__))
 APP_PATH = os.path.dirname(os.path.abspath(applications.discern_frequency.__file__))
-REP_FILENAME = "rep.pkl"
+REP_CACHE_DIR = os.path.join(LOCAL_PATH, "rep_cache")
 
-def pickle_rep(filename: str) -> None:
-	rep = create_xc6200_rep((10, 23), (19, 32))
-	with open(filename, "wb") as pkl_file:
-		pickle.dump(rep, pkl_file)
-
-def unpickle_rep(filename: str) -> IcecraftRep:
-	with open(filename, "rb") as pkl_file:
-		rep = pickle.load(pkl_file)
-	
-	return rep
+def cached_rep() -> IcecraftRep:
+	"""Generate the representation once, later calls load it from the cache"""
+	in_port = XC6200Port(IcecraftPosition(10, 23), XC6200Direction.lft)
+	return create_xc6200_rep((10, 23), (19, 32), in_port, REP_CACHE_DIR)
 
 def get_temp_details(sink: ParallelSink) -> CollectorDetails:
 	return CollectorDetails(
@@ -102,7 +96,7 @@ def run_algo(rep: IcecraftRep) -> None:
 			uid_gen = SimpleUID()
 			popi = RandomPop(rep, uid_gen, adapter_setup.prng, sink)
 			
-			ea = SimpleEA(rep, mf_uc, uid_gen, popi, sink)
+			ea = SimpleEA(rep, mf_uc, uid_gen, popi, sink, checkpoint_src=PRNGSource(ada_setup.prng))
 			
 			ea.run(pop_size, 8, 0.7, 0.001756)
 			#ea.run(50, 600, 0.7, 0.001756)
@@ -111,6 +105,5 @@ def run_algo(rep: IcecraftRep) -> None:
 
 
 if __name__ == "__main__":
-	#pickle_rep(REP_FILENAME)
-	rep = unpickle_rep(REP_FILENAME)
+	rep = cached_rep()
 	run_algo(rep)
@@ -1,18 +1,24 @@
+import io
 import os
 
 from argparse import Namespace
 from contextlib import ExitStack
+from operator import itemgetter
 from unittest import skip, TestCase
 from unittest.mock import MagicMock
 
 import h5py
 
 from adapters.dummies import DummyDriver
+from adapters.hdf5_sink import HDF5Sink, virtual_source_files
 from adapters.icecraft import IcecraftPosition, IcecraftRawConfig, IcecraftRepGen
 from adapters.minvia import MinviaDriver
-from applications.discern_frequency.action import extract_carry_enable, FreqSumFF, remeasure, run, setup_from_args_hdf5
+from applications.discern_frequency.action import extract_carry_enable, follow_run, FreqSumFF, remeasure, resume,\
+	run, run_summary, setup_from_args_hdf5
+from applications.discern_frequency.hdf5_desc import pa_gen
 from applications.discern_frequency.hdf5_content import ENTRIES_REMEASURE, ENTRIES_RUN, missing_hdf5_entries,\
 	unknown_hdf5_entries
+from applications.discern_frequency.read_hdf5_util import data_from_key, read_checkpoint
 from domain.model import Chromosome, InputData, OutputData
 from domain.request_model import ResponseObject, RequestObject
 
@@ -86,11 +92,151 @@ class ActionTest(TestCase):
 		
 		self.delete([out_filename])
 	
-	def run_dummy(self, out_filename):
-		# delete previous results
+	def test_run_dummy_sharded(self):
+		out_filename = "tmp.test_run_dummy_sharded.h5"
+		self.run_dummy(out_filename, shard_len=4)
+		
+		self.check_hdf5(out_filename)
+		with h5py.File(out_filename, "r") as hdf5_file:
+			meas = hdf5_file["fitness/measurement"]
+			self.assertTrue(meas.is_virtual)
+			self.assertEqual(hdf5_file["fitness/value"].shape[0], meas.shape[0])
+			sidecar_files = virtual_source_files(meas)
+		
+		self.assertGreater(len(sidecar_files), 1)
+		self.delete([out_filename]+sidecar_files)
+	
+	def test_run_dummy_pruned(self):
+		out_filename = "tmp.test_run_dummy_pruned.h5"
+		self.run_dummy(out_filename, prune_unreachable=True)
+		
+		self.check_hdf5(out_filename)
+		with h5py.File(out_filename, "r") as hdf5_file:
+			self.assertTrue(data_from_key(hdf5_file, "rep.prune_unreachable"))
+		
+		self.delete([out_filename])
+	
+	def test_run_dummy_islands(self):
+		out_filename = "tmp.test_run_dummy_islands.h5"
+		self.run_dummy(out_filename, islands=2, migration_interval=1, migrants=1, sync_migration=True, seed=3)
+		
+		with h5py.File(out_filename, "r") as hdf5_file:
+			self.assertEqual(2, data_from_key(hdf5_file, "ea.migration.island_count"))
+			self.assertEqual([0, 0, 0, 1, 1, 1], sorted(data_from_key(hdf5_file, "ea.migration.island")[:]))
+			# initial population and 3 generations per island
+			self.assertEqual([0]*4+[1]*4, sorted(data_from_key(hdf5_file, "ea.pop_island")[:]))
+			self.assertEqual(len(data_from_key(hdf5_file, "fitness.value")), len(data_from_key(hdf5_file,
+				"fitness.island")))
+		
 		self.delete([out_filename])
+	
+	def test_run_dummy_steady_state(self):
+		out_filename = "tmp.test_run_dummy_steady_state.h5"
+		self.run_dummy(out_filename, steady_state=True, stations=2)
+		
+		with h5py.File(out_filename, "r") as hdf5_file:
+			self.assertEqual(2, data_from_key(hdf5_file, "ea.stations"))
+			# initial population and 3*5 children
+			self.assertEqual(5+15, len(data_from_key(hdf5_file, "ea.steady.chromo_id")))
+			self.assertEqual(len(data_from_key(hdf5_file, "fitness.value")), len(data_from_key(hdf5_file,
+				"fitness.evaluation")))
+		
+		self.delete([out_filename])
+	
+	def test_run_summary(self):
+		hdf5_filename = "tmp.test_run_summary.h5"
+		self.delete([hdf5_filename])
+		
+		write_map = {
+			"fit": [pa_gen(f"fitness.{n}", [n], alter=itemgetter(0)) for n in ["value", "chromo_id"]],
+			"gen": [pa_gen("ea.pop", ["pop"], shape=(3, ))],
+		}
+		with HDF5Sink(write_map, filename=hdf5_filename) as sink:
+			for chromo_id, value in [(1, 0.5), (2, 0.25), (3, 0.75)]:
+				sink.write("fit", {"value": value, "chromo_id": chromo_id})
+			sink.write("gen", {"pop": [1, 2, 3]})
+			for chromo_id, value in [(3, 0.25), (4, 0.5)]:
+				sink.write("fit", {"value": value, "chromo_id": chromo_id})
+			# 5 was not measured
+			sink.write("gen", {"pop": [3, 4, 5]})
+		
+		with h5py.File(hdf5_filename, "r") as hdf5_file:
+			res = run_summary(hdf5_file)
+		
+		self.assertEqual({"generations": 1, "evaluations": 5, "best_fitness": 0.75, "best_chromo_id": 3, "final_best": 0.5,
+			"final_mean": 0.375}, res)
+		
+		self.delete([hdf5_filename])
+	
+	def test_follow_run(self):
+		hdf5_filename = "tmp.test_follow_run.h5"
+		self.delete([hdf5_filename])
+		
+		write_map = {
+			"params": [pa_gen("ea.gen_count", ["gen_count"])],
+			"fit": [pa_gen(f"fitness.{n}", [n], alter=itemgetter(0)) for n in ["value", "generation"]],
+			"check": [pa_gen("ea.checkpoint.generation", ["generation"])],
+		}
+		with HDF5Sink(write_map, filename=hdf5_filename, checkpoint_sources=["check"], swmr=True) as sink:
+			sink.write("params", {"gen_count": 1})
+			for gen in range(2):
+				sink.write("fit", {"value": 0.5, "generation": gen})
+				sink.write("check", {"generation": gen})
+			
+			with h5py.File(hdf5_filename, "r", swmr=True) as hdf5_file:
+				out = io.StringIO()
+				# returns without a limit on the rounds
+				follow_run(hdf5_file, 0.01, out=out)
+		
+		self.assertIn("run finished", out.getvalue())
+		
+		self.delete([hdf5_filename])
+	
+	def test_run_resume_dummy(self):
+		run_filename = "tmp.test_run_resume_dummy.run.h5"
+		out_filename = "tmp.test_run_resume_dummy.resume.h5"
+		self.run_dummy(run_filename)
+		self.delete([out_filename])
+		
+		with h5py.File(run_filename, "r") as hdf5_file:
+			checkpoint = read_checkpoint(hdf5_file, 1)
+			self.assertEqual(1, checkpoint.generation)
+			self.assertEqual(5, len(checkpoint.population))
+			# eval mode ALL -> every chromosome was evaluated in generation 1
+			self.assertEqual({c.identifier for c in checkpoint.population}, set(checkpoint.fitness))
+			
+			checkpoint = read_checkpoint(hdf5_file)
+			self.assertEqual(3, checkpoint.generation)
 		
 		args = Namespace(
+			output = out_filename,
+			dummy = True,
+			temperature = None,
+			freq_gen_type = None,
+			data_file = run_filename,
+			generations = 2,
+			crossover_prob = None,
+			mutation_prob = None,
+			eval_mode = "NEW",
+		)
+		resume(args)
+		
+		self.check_hdf5(out_filename)
+		with h5py.File(out_filename, "r") as hdf5_file:
+			self.assertEqual(3, data_from_key(hdf5_file, "re.gen"))
+			self.assertEqual(2, data_from_key(hdf5_file, "ea.gen_count"))
+			pop = data_from_key(hdf5_file, "ea.pop")
+			# the initial population has known fitness values and is not evaluated again
+			self.assertEqual([c.identifier for c in checkpoint.population], list(pop[0]))
+			self.assertTrue(all(g > 0 for g in data_from_key(hdf5_file, "fitness.generation")))
+		
+		self.delete([run_filename, out_filename])
+	
+	def run_dummy(self, out_filename, **kwargs):
+		# delete previous results
+		self.delete([out_filename])
+		
+		args = Namespace(**kwargs,
 			output = out_filename,
 			dummy = True,
 			temperature = None,
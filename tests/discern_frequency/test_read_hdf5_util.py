@@ -1,4 +1,5 @@
 import os
+import random
 import re
 
 from dataclasses import astuple, dataclass, field
@@ -8,18 +9,33 @@ from typing import Dict, Iterable, List, Optional
 from unittest import TestCase
 
 import h5py
+import numpy as np
 
+from adapters.deap.island_ea import IslandModel
+from adapters.deap.simple_ea import EvalMode, PRNGSource, SimpleEA
+from adapters.deap.steady_state_ea import SteadyStateEA
 from adapters.hdf5_sink import chain_funcs, compose, HDF5Sink, MetaEntry, ParamAim
 from adapters.icecraft import CarryData, CarryDataMap, IcecraftBitPosition, IcecraftLUTPosition, IcecraftPosition,\
 	IcecraftRawConfig, IndexedItem, PartConf
+from adapters.pop_init import GivenPop, RandomPop
+from adapters.parallel_sink import ParallelSink
+from adapters.prng import BuiltInPRNG
+from adapters.simtar import SimtarRepGen
+from adapters.surrogate import RidgeSurrogate
+from adapters.unique_id import SimpleUID
 from applications.discern_frequency.hdf5_desc import add_carry_data, add_meta, add_rep, HDF5_DICT, pa_gen
 from applications.discern_frequency.read_hdf5_util import read_chromosome, read_habitat, read_s_t_index,\
 	read_rep_carry_data, read_carry_enable_bits, read_carry_enable_values, read_rep_colbufctrl, read_rep_output,\
-	read_rep, read_fitness_chromo_id, get_chromo_bits
+	read_rep, read_fitness_chromo_id, get_chromo_bits, ChromosomeReader, DatasetTail, Lineage, read_checkpoint,\
+	read_generation, read_rows, read_surrogate_samples, data_from_key
 from applications.discern_frequency.hdf5_content import ExpEntries, FormData, FormEntry, missing_hdf5_entries
+from applications.discern_frequency.write_map_util import add_delta_chromos, add_ea, add_island, add_reeval,\
+	add_reuse, add_steady_state, add_surrogate
 from domain.model import Chromosome
+from domain.request_model import RequestObject, ResponseObject
 
 from tests.icecraft.data.rep_data import EXP_REP
+from tests.test_island_ea import create_island
 
 from tests.discern_frequency.common import del_files, TEST_DATA_DIR
 
@@ -81,6 +97,45 @@ class WriteReadHDF5Test(TestCase):
 				
 				del_files([hdf5_filename])
 	
+	def test_write_read_delta_chromosome(self):
+		hdf5_filename = "tmp.test_write_read_delta_chromosome.h5"
+		del_files([hdf5_filename])
+		
+		write_map = {"LineageRecorder.chromos": [
+			pa_gen("chromo.indices", ["allele_indices"], data_type="uint16", shape=(4, ), alter=itemgetter(0)),
+			pa_gen("chromo.id", ["chromo_id"], alter=itemgetter(0)),
+		]}
+		add_delta_chromos(write_map, {}, 16)
+		
+		exp = [Chromosome(1, (2, 5, 1, 9)), Chromosome(2, (2, 5, 3, 9)), Chromosome(3, (0, 5, 3, 8)),
+			Chromosome(4, (2, 5, 1, 9)), Chromosome(5, (0, 5, 3, 7))]
+		with HDF5Sink(write_map, filename=hdf5_filename) as sink:
+			sink.write("LineageRecorder.chromos", {"chromo_id": np.array([1], dtype=np.uint64),
+				"allele_indices": np.array([[2, 5, 1, 9]])})
+			# 2 and 4 based on 1, 3 based on 2, 5 based on 3; 4 equals 1
+			sink.write("LineageRecorder.delta", {"chromo_id": np.array([2, 3, 4], dtype=np.uint64),
+				"base": np.array([1, 2, 1], dtype=np.uint64), "end": np.array([1, 3, 3], dtype=np.uint64)})
+			sink.write("LineageRecorder.delta_genes", {"gene": np.array([2, 0, 3], dtype=np.uint32),
+				"value": np.array([3, 0, 8])})
+			sink.write("LineageRecorder.delta", {"chromo_id": np.array([5], dtype=np.uint64),
+				"base": np.array([3], dtype=np.uint64), "end": np.array([4], dtype=np.uint64)})
+			sink.write("LineageRecorder.delta_genes", {"gene": np.array([3], dtype=np.uint32),
+				"value": np.array([7])})
+		
+		with h5py.File(hdf5_filename, "r") as hdf5_file:
+			dut = ChromosomeReader(hdf5_file, cache_size=2)
+			for chromo in reversed(exp):
+				with self.subTest(chromo=chromo):
+					self.assertEqual(chromo, dut.read(chromo.identifier))
+			# again, partly from cache
+			self.assertEqual(exp, [dut.read(c.identifier) for c in exp])
+			self.assertEqual(exp[2], read_chromosome(hdf5_file, 3))
+			
+			with self.assertRaises(ValueError):
+				dut.read(6)
+				
+		del_files([hdf5_filename])
+	
 	def test_write_read_s_t_index(self):
 		exp = 173
 		
@@ -262,3 +317,300 @@ class WriteReadHDF5Test(TestCase):
 		
 		del_files([hdf5_filename])
 	
+	def test_dataset_tail(self):
+		hdf5_filename = "tmp.test_dataset_tail.h5"
+		del_files([hdf5_filename])
+		
+		write_map = {
+			"fit": [pa_gen("fitness.value", ["fit"], alter=itemgetter(0)), pa_gen("fitness.generation", ["gen"])],
+		}
+		
+		with HDF5Sink(write_map, filename=hdf5_filename, swmr=True, flush_interval=0) as sink:
+			sink.write("fit", {"fit": 0.5, "gen": 0})
+			
+			with h5py.File(hdf5_filename, "r", swmr=True) as hdf5_file:
+				dut = DatasetTail(hdf5_file, ["fitness.value", "fitness.generation", "temp.value"])
+				# temperature not recorded
+				self.assertEqual(["fitness.value", "fitness.generation"], dut.keys)
+				
+				res = dut.poll()
+				self.assertEqual([0.5], list(res["fitness.value"]))
+				self.assertEqual([0], list(res["fitness.generation"]))
+				
+				res = dut.poll()
+				self.assertEqual(0, len(res["fitness.value"]))
+				
+				sink.write("fit", {"fit": 0.7, "gen": 1})
+				sink.write("fit", {"fit": 0.2, "gen": 1})
+				res = dut.poll()
+				self.assertEqual([0.7, 0.2], list(res["fitness.value"]))
+				self.assertEqual([1, 1], list(res["fitness.generation"]))
+		
+		del_files([hdf5_filename])
+	
+	def test_lineage(self):
+		hdf5_filename = "tmp.test_lineage.h5"
+		del_files([hdf5_filename])
+		
+		write_map = {}
+		add_ea(write_map, {}, 4)
+		
+		# single alterations and blocks end up in the same datasets
+		with HDF5Sink(write_map, filename=hdf5_filename) as sink:
+			sink.write("Individual.wrap.cxOnePoint", {"in": [1, 2], "out": [5, 6], "generation": 1})
+			sink.write("LineageRecorder.mutation", {"parent": np.array([5], dtype=np.uint64), "child": np.array([7],
+				dtype=np.uint64), "generation": np.array([1], dtype=np.uint64)})
+			sink.write("LineageRecorder.crossover", {"in": np.array([[7, 3]], dtype=np.uint64), "out": np.array(
+				[[7, 8]], dtype=np.uint64), "generation": np.array([2], dtype=np.uint64)})
+			sink.write("Individual.wrap.mutUniformInt", {"in": [8], "out": [8], "generation": 2})
+			sink.write("Individual.wrap.mutUniformInt", {"in": [6], "out": [9], "generation": 2})
+		
+		with h5py.File(hdf5_filename, "r") as hdf5_file:
+			dut = Lineage.from_hdf5(hdf5_file)
+		
+		self.assertEqual((1, 2), dut.parents(5))
+		self.assertEqual((2, 1), dut.parents(6))
+		self.assertEqual((3, 7), dut.parents(8))
+		self.assertEqual((6, ), dut.parents(9))
+		# initial population
+		self.assertEqual(tuple(), dut.parents(1))
+		
+		self.assertEqual([1, 5, 7], dut.lineage(7))
+		self.assertEqual([3, 8], dut.lineage(8))
+		self.assertEqual({8: (3, 7), 3: (), 7: (5, ), 5: (1, 2), 1: (), 2: ()}, dut.ancestry(8))
+		self.assertEqual({8: (3, 7), 3: (), 7: (5, )}, dut.ancestry(8, 1))
+		
+		del_files([hdf5_filename])
+	
+	def test_read_checkpoint_reuse(self):
+		hdf5_filename = "tmp.test_read_checkpoint_reuse.h5"
+		del_files([hdf5_filename])
+		
+		write_map = {
+			"chromos": [
+				pa_gen("chromo.indices", ["allele_indices"], data_type="uint8", shape=(2, ), alter=itemgetter(0)),
+				pa_gen("chromo.id", ["chromo_id"], alter=itemgetter(0)),
+			],
+			"fit": [pa_gen(f"fitness.{n}", [n], alter=itemgetter(0)) for n in ["generation", "chromo_id", "value"]],
+		}
+		add_ea(write_map, {}, 2)
+		add_reuse(write_map, {})
+		rng_state = (3, tuple(range(625)), None)
+		
+		with HDF5Sink(write_map, filename=hdf5_filename) as sink:
+			sink.write("chromos", {"allele_indices": np.array([[0, 1], [1, 1], [1, 0], [0, 0]], dtype=np.uint8),
+				"chromo_id": np.array([1, 2, 3, 4], dtype=np.uint64)})
+			sink.write("SimpleEA.gen", {"pop": [1, 2]})
+			sink.write("fit", {"generation": 0, "chromo_id": 1, "value": 0.5})
+			sink.write("fit", {"generation": 0, "chromo_id": 2, "value": 0.25})
+			sink.write("SimpleEA.checkpoint", {"generation": 0, "state": rng_state, "prng_state": rng_state})
+			sink.write("SimpleEA.gen", {"pop": [1, 3]})
+			# 3 has the same phenotype as 2
+			sink.write("SimpleEA.reuse", {"generation": 1, "chromo_id": 3, "phenotype_of": 2, "fitness": 0.25})
+			sink.write("SimpleEA.checkpoint", {"generation": 1, "state": rng_state, "prng_state": rng_state})
+			sink.write("SimpleEA.gen", {"pop": [3, 4]})
+			# measured after the checkpoint
+			sink.write("fit", {"generation": 2, "chromo_id": 3, "value": 0.75})
+		
+		with h5py.File(hdf5_filename, "r") as hdf5_file:
+			res = read_checkpoint(hdf5_file)
+		
+		self.assertEqual(1, res.generation)
+		self.assertEqual({1: 0.5, 3: 0.25}, res.fitness)
+		
+		del_files([hdf5_filename])
+	
+	def test_resume(self):
+		hdf5_filenames = [f"tmp.test_resume.{n}.h5" for n in ["full", "part", "resumed"]]
+		del_files(hdf5_filenames)
+		
+		rep = SimtarRepGen()(RequestObject(always_active=False)).representation
+		pop_size = 6
+		chromo_aim = [
+			pa_gen("chromo.indices", ["return"], data_type="uint16", shape=(len(list(rep.iter_genes())), )),
+			pa_gen("chromo.id", ["return"]),
+		]
+		write_map = {
+			"RandomChromo.perform": chromo_aim,
+			"GenChromo.perform": chromo_aim,
+			"fit": [pa_gen(f"fitness.{n}", [n], alter=itemgetter(0)) for n in ["generation", "chromo_id", "value"]],
+		}
+		add_ea(write_map, {}, pop_size)
+		add_surrogate(write_map, {})
+		add_reeval(write_map, {})
+		add_reuse(write_map, {})
+		
+		def run_ea(hdf5_filename, gen_count, prng, uid_gen, popi, surrogate, checkpoint=None, origins=[]):
+			with HDF5Sink(write_map, filename=hdf5_filename) as sink:
+				def mf_uc(request):
+					# noisy, so re-evaluations and their statistics matter
+					chromo = request.chromosome
+					fit = sum(chromo.allele_indices) + prng.randint(0, 100)/25
+					sink.write("fit", {"generation": request.generation, "chromo_id": chromo.identifier, "value": fit})
+					return ResponseObject(fitness=fit)
+				
+				if popi is None:
+					popi = RandomPop(rep, uid_gen, prng, sink)
+				dut = SimpleEA(rep, mf_uc, uid_gen, popi, sink, checkpoint_src=PRNGSource(prng), vectorized=True,
+					surrogate=surrogate, screen_ratio=0.5, reeval_budget=2, phenotype_reuse=True)
+				init_fitness = {}
+				if checkpoint is not None:
+					# like action.resume
+					for chromo in {c.identifier: c for c in checkpoint.population+origins}.values():
+						sink.write("GenChromo.perform", {"return": ResponseObject(chromosome=chromo)})
+					dut.restore(checkpoint.fit_stats, origins)
+					init_fitness = checkpoint.fitness
+				dut.run(pop_size, gen_count, 0.7, 0.3, EvalMode.ADAPTIVE, init_fitness)
+		
+		def create_surrogate():
+			return RidgeSurrogate.from_rep(rep, min_samples=2*pop_size)
+		
+		# uninterrupted
+		random.seed(3)
+		run_ea(hdf5_filenames[0], 6, BuiltInPRNG(4), SimpleUID(), None, create_surrogate())
+		# interrupted after 3 generations
+		random.seed(3)
+		run_ea(hdf5_filenames[1], 3, BuiltInPRNG(4), SimpleUID(), None, create_surrogate())
+		
+		with h5py.File(hdf5_filenames[1], "r") as hdf5_file:
+			checkpoint = read_checkpoint(hdf5_file)
+			reader = ChromosomeReader(hdf5_file)
+			origins = [reader.read(i) for i in checkpoint.phenotype_origins]
+			surrogate = create_surrogate()
+			for chromo, fit in read_surrogate_samples(hdf5_file, checkpoint.generation):
+				surrogate.add(chromo, fit)
+			surrogate.fit()
+			uid_gen = SimpleUID()
+			uid_gen.exclude(reader.identifiers)
+		
+		self.assertEqual(3, checkpoint.generation)
+		self.assertGreater(len(checkpoint.fit_stats), 0)
+		self.assertTrue(surrogate.ready)
+		
+		random.setstate(checkpoint.random_state)
+		prng = BuiltInPRNG()
+		prng.set_state(checkpoint.prng_state)
+		run_ea(hdf5_filenames[2], 3, prng, uid_gen, GivenPop(checkpoint.population), surrogate, checkpoint, origins)
+		
+		def read_run(hdf5_filename, first_gen):
+			with h5py.File(hdf5_filename, "r") as hdf5_file:
+				pops = [read_generation(hdf5_file, g) for g in range(first_gen, first_gen+4)]
+				rows = {p: read_rows(hdf5_file, p, ["generation", "chromo_id", n]) for p, n in [("fitness", "value"),
+					("ea.reuse", "phenotype_of"), ("ea.reeval", "mean")]}
+			
+			# entries of the generations after the checkpoint
+			return pops, {p: [(int(g)-first_gen, int(i), v) for g, i, v in zip(*r) if g > first_gen] for p, r in
+				rows.items()}
+		
+		exp_pops, exp_rows = read_run(hdf5_filenames[0], 3)
+		res_pops, res_rows = read_run(hdf5_filenames[2], 0)
+		
+		self.assertGreater(len(exp_rows["fitness"]), 0)
+		self.assertEqual(exp_pops, res_pops)
+		self.assertEqual(exp_rows, res_rows)
+		
+		del_files(hdf5_filenames)
+	
+	def test_island(self):
+		hdf5_filename = "tmp.test_island.h5"
+		del_files([hdf5_filename])
+		
+		rep = SimtarRepGen()(RequestObject(always_active=False)).representation
+		chromo_aim = [
+			pa_gen("chromo.indices", ["return"], data_type="uint16", shape=(len(list(rep.iter_genes())), )),
+			pa_gen("chromo.id", ["return"]),
+		]
+		write_map = {
+			"RandomChromo.perform": chromo_aim,
+			"GenChromo.perform": chromo_aim,
+		}
+		add_ea(write_map, {}, 4)
+		add_island(write_map, {}, 2)
+		
+		sink = ParallelSink(HDF5Sink, (write_map, {}, hdf5_filename))
+		with sink:
+			dut = IslandModel(create_island, 3, sink, 2, 2, True)
+			dut.run(4, 4, 0.7, 0.5, EvalMode.NEW, 11)
+		
+		with h5py.File(hdf5_filename, "r") as hdf5_file:
+			self.assertEqual(3, data_from_key(hdf5_file, "ea.migration.island_count"))
+			self.assertEqual(IslandModel.island_seeds(11, 3), list(data_from_key(hdf5_file,
+				"ea.migration.island_seeds")))
+			self.assertEqual(4, data_from_key(hdf5_file, "ea.pop_size"))
+			
+			# identifiers are assigned strided by island
+			ids = data_from_key(hdf5_file, "chromo.id")[:]
+			self.assertEqual(list(ids%3), list(data_from_key(hdf5_file, "chromo.island")[:]))
+			
+			for island in range(3):
+				pops = [read_generation(hdf5_file, g, island) for g in range(5)]
+				for pop in pops:
+					self.assertEqual(4, len(pop))
+				# initial population
+				self.assertEqual({island}, {c.identifier%3 for c in pops[0]})
+			
+			gens, islands, counts, received, origins = read_rows(hdf5_file, "ea.migration", ["generation", "island",
+				"received_count", "received", "origin"])
+			self.assertEqual(6, len(gens))
+			self.assertEqual([2, 2, 2, 4, 4, 4], sorted(gens))
+			self.assertEqual([0, 0, 1, 1, 2, 2], sorted(islands))
+			for island, count, rec, org in zip(islands, counts, received, origins):
+				# immigrants come from the previous island of the ring
+				prev = (int(island)-1)%3
+				self.assertEqual([prev]*count, list(org[:count]))
+				self.assertEqual([prev]*count, [int(r)%3 for r in rec[:count]])
+		
+		del_files([hdf5_filename])
+
+	def test_steady_state(self):
+		hdf5_filename = "tmp.test_steady_state.h5"
+		del_files([hdf5_filename])
+		
+		rep = SimtarRepGen()(RequestObject(always_active=False)).representation
+		pop_size = 4
+		eval_count = 10
+		chromo_aim = [
+			pa_gen("chromo.indices", ["return"], data_type="uint16", shape=(len(list(rep.iter_genes())), )),
+			pa_gen("chromo.id", ["return"]),
+		]
+		write_map = {
+			"RandomChromo.perform": chromo_aim,
+			"GenChromo.perform": chromo_aim,
+		}
+		add_steady_state(write_map, {}, pop_size, 2)
+		
+		def station(request):
+			return ResponseObject(fitness=sum(request.chromosome.allele_indices))
+		
+		random.seed(5)
+		with HDF5Sink(write_map, filename=hdf5_filename) as sink:
+			uid_gen = SimpleUID()
+			dut = SteadyStateEA(rep, [station, station], uid_gen, RandomPop(rep, uid_gen, BuiltInPRNG(5), sink), sink)
+			dut.run(pop_size, eval_count, 0.7, 0.3)
+		
+		with h5py.File(hdf5_filename, "r") as hdf5_file:
+			self.assertEqual(2, data_from_key(hdf5_file, "ea.stations"))
+			self.assertEqual(2, len(data_from_key(hdf5_file, "ea.steady.busy")))
+			pop = [int(i) for i in data_from_key(hdf5_file, "ea.pop")[0]]
+			rows = read_rows(hdf5_file, "ea.steady", ["chromo_id", "fitness", "station", "replaced"])
+			evaluations = read_rows(hdf5_file, "ea.mutation", ["evaluation"])[0]
+		
+		self.assertEqual(pop_size+eval_count, len(rows[0]))
+		self.assertEqual({0, 1}, set(rows[2]))
+		self.assertGreater(len(evaluations), 0)
+		self.assertLessEqual(max(evaluations), eval_count)
+		
+		# replay the replacements
+		fitness = {}
+		for chromo_id, fit, _, replaced in zip(*rows):
+			fitness[int(chromo_id)] = fit
+			if replaced < 0:
+				continue
+			self.assertEqual(min(fitness[i] for i in pop), fitness[replaced])
+			pop[pop.index(replaced)] = int(chromo_id)
+		
+		self.assertEqual(pop_size, len(pop))
+		self.assertTrue(all(i in fitness for i in pop))
+		
+		del_files([hdf5_filename])
+
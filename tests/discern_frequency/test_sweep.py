@@ -0,0 +1,98 @@
+import csv
+import json
+import os
+import shutil
+
+from unittest import TestCase
+
+from applications.discern_frequency.sweep import create_runs, create_workers, expand_grid, option_args,\
+	SweepRun, SweepScheduler, Worker, write_index
+
+def record_argv(argv):
+	"""Write the arguments to the output file of the run; fails for a population size of 0"""
+	if "--pop-size" in argv and argv[argv.index("--pop-size")+1] == "0":
+		raise ValueError("invalid population size")
+	with open(argv[argv.index("-o")+1], "w") as out_file:
+		json.dump(argv, out_file)
+
+class SweepTest(TestCase):
+	def setUp(self):
+		self.output_dir = "tmp.SweepTest"
+		os.makedirs(self.output_dir, exist_ok=True)
+	
+	def tearDown(self):
+		shutil.rmtree(self.output_dir, ignore_errors=True)
+	
+	def test_expand_grid(self):
+		res = expand_grid({"pop-size": [4, 8], "mutation-prob": [0.1, 0.2, 0.3]})
+		self.assertEqual(6, len(res))
+		self.assertEqual({"pop-size": 4, "mutation-prob": 0.1}, res[0])
+		self.assertEqual({"pop-size": 4, "mutation-prob": 0.2}, res[1])
+		self.assertEqual({"pop-size": 8, "mutation-prob": 0.3}, res[5])
+		
+		self.assertEqual([{}], expand_grid({}))
+	
+	def test_option_args(self):
+		res = option_args({"pop-size": 4, "vectorized": True, "lineage-blocks": False, "out-port": [3, 4, "UP"],
+			"seed": None})
+		self.assertEqual(["--pop-size", "4", "--vectorized", "--out-port", "3", "4", "UP"], res)
+	
+	def test_create_runs(self):
+		spec = {"args": ["--generations", 5], "grid": {"pop-size": [4, 8], "seed": [3]}}
+		res = create_runs(spec, "out", 7)
+		self.assertEqual([0, 1], [r.index for r in res])
+		self.assertEqual(["out/run-000.h5", "out/run-001.h5"], [r.output for r in res])
+		self.assertEqual(["-o", "out/run-000.h5", "run", "--generations", "5", "--pop-size", "4", "--seed", "3"],
+			res[0].argv)
+		
+		# derived seeds are reproducible and differ between runs
+		spec = {"grid": {"pop-size": [4, 8]}}
+		res = create_runs(spec, "out", 7)
+		seeds = [r.params["seed"] for r in res]
+		self.assertNotEqual(seeds[0], seeds[1])
+		self.assertEqual(seeds, [r.params["seed"] for r in create_runs(spec, "out", 7)])
+		self.assertNotEqual(seeds, [r.params["seed"] for r in create_runs(spec, "out", 8)])
+	
+	def test_create_workers(self):
+		res = create_workers([("T1", "M1", "G1")], 2, ["--rep-cache", "cache"])
+		self.assertEqual(["station-T1", "dummy-0", "dummy-1"], [w.name for w in res])
+		self.assertEqual(["-t", "T1", "-m", "M1", "-g", "G1", "--rep-cache", "cache"], res[0].args)
+		self.assertEqual(["--dummy", "--rep-cache", "cache"], res[2].args)
+	
+	def test_scheduler(self):
+		spec = {"args": ["--generations", "2"], "grid": {"pop-size": [0, 4, 6, 8, 10]}}
+		runs = create_runs(spec, self.output_dir, 5)
+		workers = [Worker("a", ["-t", "A"]), Worker("b", ["--dummy"])]
+		
+		dut = SweepScheduler(workers, record_argv, 0.1)
+		dut.run(runs)
+		
+		self.assertEqual([1, 0, 0, 0, 0], [r.exitcode for r in runs])
+		for run in runs[1:]:
+			with self.subTest(index=run.index):
+				self.assertIn(run.worker, ["a", "b"])
+				with open(run.output, "r") as out_file:
+					argv = json.load(out_file)
+				self.assertEqual(next(w.args for w in workers if w.name == run.worker)+run.argv, argv)
+	
+	def test_no_worker(self):
+		with self.assertRaises(ValueError):
+			SweepScheduler([])
+	
+	def test_write_index(self):
+		runs = [
+			SweepRun(0, {"pop-size": 4, "seed": 1}, "run-000.h5", [], "a", 0, 2.5),
+			SweepRun(1, {"pop-size": 8, "seed": 2}, "run-001.h5", [], "b", 1, 0.5),
+			SweepRun(2, {"pop-size": 8, "seed": 3}, "run-002.h5", []),
+		]
+		filename = os.path.join(self.output_dir, "index.csv")
+		write_index(filename, runs, {0: {"best_fitness": 0.75}})
+		
+		with open(filename, "r", newline="") as csv_file:
+			rows = list(csv.DictReader(csv_file))
+		
+		self.assertEqual(3, len(rows))
+		self.assertEqual({"index": "0", "output": "run-000.h5", "worker": "a", "exitcode": "0", "duration": "2.5",
+			"pop-size": "4", "seed": "1", "best_fitness": "0.75"}, rows[0])
+		self.assertEqual("", rows[1]["best_fitness"])
+		self.assertEqual("", rows[2]["exitcode"])
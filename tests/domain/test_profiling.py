@@ -0,0 +1,65 @@
+import threading
+import time
+
+from unittest import TestCase
+
+from domain.profiling import format_profile, Profiler, SectionStats
+
+class ProfilerTest(TestCase):
+	def test_disabled(self):
+		dut = Profiler()
+		with dut.section("a"):
+			pass
+		self.assertEqual({}, dut.collect())
+	
+	def test_section(self):
+		dut = Profiler()
+		dut.enabled = True
+		for _ in range(3):
+			with dut.section("a"):
+				with dut.section("b"):
+					time.sleep(0.001)
+		
+		res = dut.collect()
+		self.assertEqual({"a", "b"}, set(res))
+		self.assertEqual(3, res["a"].count)
+		self.assertGreaterEqual(res["a"].total, res["b"].total)
+		self.assertGreaterEqual(res["b"].total, 0.003)
+		# collect starts over
+		self.assertEqual({}, dut.collect())
+	
+	def test_exception(self):
+		dut = Profiler()
+		dut.enabled = True
+		with self.assertRaises(ValueError):
+			with dut.section("a"):
+				raise ValueError()
+		
+		self.assertEqual(1, dut.collect()["a"].count)
+	
+	def test_threads(self):
+		dut = Profiler()
+		dut.enabled = True
+		def work():
+			for _ in range(1000):
+				dut.add("a", 1.0)
+		
+		threads = [threading.Thread(target=work) for _ in range(4)]
+		for thread in threads:
+			thread.start()
+		for thread in threads:
+			thread.join()
+		
+		self.assertEqual(SectionStats(4000.0, 4000), dut.collect()["a"])
+	
+	def test_format_profile(self):
+		res = format_profile({"other": SectionStats(0.5, 1), "decode": SectionStats(1.0, 4)}, 2.0)
+		lines = res.split("\n")
+		
+		self.assertEqual(4, len(lines))
+		# known sections first
+		self.assertTrue(lines[1].startswith("decode"))
+		self.assertIn("250.00", lines[1])
+		self.assertIn("50.0%", lines[1])
+		self.assertTrue(lines[2].startswith("other"))
+		self.assertTrue(lines[3].startswith("wall"))
@@ -2,14 +2,16 @@ import unittest
 import sys
 import re
 import functools
+import os
 from dataclasses import astuple
 from multiprocessing import Pool
+from unittest.mock import patch
 
 sys.path.append("/usr/local/bin")
 import icebox
 
 import adapters.icecraft.chip_data as chip_data
-from adapters.icecraft.chip_data_utils import UNCONNECTED_NAME
+from adapters.icecraft.chip_data_utils import text_digest, UNCONNECTED_NAME, write_compact_chip_data
 from adapters.icecraft.misc import IcecraftPosition
 
 def get_names(segs):
@@ -447,6 +449,30 @@ class ChipDataTest(unittest.TestCase):
 			with self.subTest(tiles=tile):
 				self.generic_get_config_items_test(ic, tile)
 	
+	def test_config_items_cache(self):
+		tile = IcecraftPosition(16, 17)
+		other = IcecraftPosition(16, 18)
+		self.assertEqual(chip_data.tile_to_config_kind_index[tile], chip_data.tile_to_config_kind_index[other])
+		
+		res = chip_data.get_config_items(tile)
+		again = chip_data.get_config_items(tile)
+		self.assertIsNot(res, again)
+		self.assertEqual(res, again)
+		self.assertIs(res.connection, again.connection)
+		
+		# changing the returned assemblage doesn't alter the cache
+		res.tile = tuple()
+		self.assertNotEqual(tuple(), chip_data.get_config_items(tile).tile)
+		
+		# same kind -> same items, relocated
+		res_other = chip_data.get_config_items(other)
+		self.assertEqual(len(again.connection), len(res_other.connection))
+		for item, other_item in zip(again.connection, res_other.connection):
+			self.assertEqual(item.dst_net, other_item.dst_net)
+			self.assertEqual(item.src_nets, other_item.src_nets)
+			self.assertEqual([(b.group, b.index) for b in item.bits], [(b.group, b.index) for b in other_item.bits])
+			self.assertTrue(all(b.tile == other for b in other_item.bits))
+	
 	def check_uniqueness(self, iterable):
 		self.assertEqual(len(iterable), len(set(iterable)))
 	
@@ -500,3 +526,41 @@ class ChipDataTest(unittest.TestCase):
 		#print("#########")
 		#print(sorted(name_set))
 		self.assertEqual(exp_names, name_set)
+	
+	def test_use_compact_db(self):
+		module_path = "tmp.ChipDataTest.py"
+		compact_path = "tmp.ChipDataTest.npz"
+		text = "seg_kinds = []\n"
+		
+		def check(exp):
+			chip_data.use_compact_db.cache_clear()
+			with patch.object(chip_data, "COMPACT_DB_PATH", compact_path),\
+				patch.object(chip_data, "chip_db_module_path", return_value=module_path):
+				self.assertEqual(exp, chip_data.use_compact_db())
+		
+		try:
+			with open(module_path, "w") as module_file:
+				module_file.write(text)
+			write_compact_chip_data(compact_path, {"seg_kinds": []}, text_digest(text))
+			check(True)
+			
+			# newer module with the same content
+			npz_time = os.path.getmtime(compact_path)
+			os.utime(module_path, (npz_time+10, npz_time+10))
+			check(True)
+			
+			# regenerated module
+			with open(module_path, "w") as module_file:
+				module_file.write("seg_kinds = [1]\n")
+			os.utime(module_path, (npz_time+10, npz_time+10))
+			check(False)
+			
+			os.remove(compact_path)
+			check(False)
+		finally:
+			for path in [module_path, compact_path]:
+				try:
+					os.remove(path)
+				except FileNotFoundError:
+					pass
+			chip_data.use_compact_db.cache_clear()
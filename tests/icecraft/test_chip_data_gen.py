@@ -1,5 +1,6 @@
 import unittest
 import copy
+import os
 import sys
 import unittest.mock as mock
 
@@ -90,6 +91,57 @@ class ChipDataGenTest(unittest.TestCase):
 		#  check drivers
 		self.check_drivers(self.org_seg_kinds, self.org_drv_kinds, seg_kinds, drv_kinds)
 	
+	def test_parallel_extraction(self):
+		mock_ic = self.create_mock_iceconfig()
+		tiles = list(self.org_config_dict)
+		exp_seg = chip_data_gen.get_seg_kinds_and_drivers(mock_ic, self.all_segs)
+		exp_config = chip_data_gen.get_config_data(mock_ic, tiles)
+		
+		res_seg = chip_data_gen.get_seg_kinds_and_drivers(mock_ic, self.all_segs, processes=2)
+		res_config = chip_data_gen.get_config_data(mock_ic, tiles, processes=2)
+		
+		self.assertEqual(exp_seg, res_seg)
+		self.assertEqual(exp_config, res_config)
+	
+	def test_tile_cache(self):
+		mock_ic = self.create_mock_iceconfig()
+		tiles = list(self.org_config_dict)
+		tile_cache = chip_data_gen.TileCache()
+		exp = chip_data_gen.get_config_data(mock_ic, tiles, tile_cache=tile_cache)
+		self.assertEqual(len(tiles), tile_cache.misses)
+		call_count = mock_ic.tile_has_entry.call_count
+		
+		# only the changed tile is processed again
+		self.org_config_dict = copy.deepcopy(self.org_config_dict)
+		self.org_config_dict[(1, 1)].pop()
+		res = chip_data_gen.get_config_data(mock_ic, tiles, tile_cache=tile_cache)
+		self.assertEqual(len(tiles)-1, tile_cache.hits)
+		self.assertEqual(call_count+1, mock_ic.tile_has_entry.call_count)
+		self.assertEqual(exp[1], res[1])
+		changed = [i for i, (e, r) in enumerate(zip(exp[0], res[0])) if e != r]
+		self.assertEqual([(1, 1)], [t for i in changed for t in res[1][i]])
+		
+		self.assertEqual(res, chip_data_gen.get_config_data(mock_ic, tiles))
+		
+		# stored results are only used for the same version
+		filename = "tmp.ChipDataGenTest.pkl"
+		try:
+			tile_cache = chip_data_gen.TileCache(filename, "v1")
+			chip_data_gen.get_config_data(mock_ic, tiles, tile_cache=tile_cache)
+			tile_cache.save()
+			
+			tile_cache = chip_data_gen.TileCache(filename, "v1")
+			chip_data_gen.get_config_data(mock_ic, tiles, tile_cache=tile_cache)
+			self.assertEqual(len(tiles), tile_cache.hits)
+			
+			tile_cache = chip_data_gen.TileCache(filename, "v2")
+			chip_data_gen.get_config_data(mock_ic, tiles, tile_cache=tile_cache)
+			self.assertEqual(0, tile_cache.hits)
+		finally:
+			os.remove(filename)
+		
+		self.assertEqual(chip_data_gen.extractor_version(), chip_data_gen.extractor_version())
+	
 	def test_sort_net_data(self):
 		# sort
 		srt_seg_kinds, srt_tile_map, srt_drv_kinds = chip_data_gen.sort_net_data(self.org_seg_kinds, self.org_tile_map, self.org_drv_kinds)
@@ -1,3 +1,4 @@
+import os
 import unittest
 
 import adapters.icecraft.chip_data_utils as chip_data_utils
@@ -43,3 +44,24 @@ class ChipDataUtilsTest(unittest.TestCase):
 		res = chip_data_utils.get_net_data_for_tile(self.seg_kinds, self.drv_kinds, self.tile_pos, self.seg_refs)
 		self.assertEqual(set(self.nets), set(res))
 
+	def test_compact_chip_data(self):
+		filename = "tmp.ChipDataUtilsTest.npz"
+		sections = {
+			"seg_kinds": self.seg_kinds,
+			"drv_kinds": self.drv_kinds,
+			"seg_tile_map": {self.tile_pos: self.seg_refs},
+		}
+		try:
+			chip_data_utils.write_compact_chip_data(filename, sections)
+			for name, exp in sections.items():
+				with self.subTest(name=name):
+					self.assertEqual(exp, chip_data_utils.read_compact_chip_data(filename, name))
+			
+			with self.assertRaises(KeyError):
+				chip_data_utils.read_compact_chip_data(filename, "config_kinds")
+			
+			digest = chip_data_utils.read_compact_chip_data(filename, chip_data_utils.DIGEST_SECTION)
+			chip_data_utils.write_compact_chip_data(filename, {**sections, "drv_kinds": self.drv_kinds[:1]})
+			self.assertNotEqual(digest, chip_data_utils.read_compact_chip_data(filename, chip_data_utils.DIGEST_SECTION))
+		finally:
+			os.remove(filename)
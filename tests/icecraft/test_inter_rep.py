@@ -8,8 +8,10 @@ import pdb
 from typing import NamedTuple, Iterable, Mapping, Union, Callable, List, Tuple, Optional
 from dataclasses import fields, dataclass
 
+import numpy as np
+
 from adapters.icecraft import IcecraftPosition, IcecraftBitPosition, IcecraftNetPosition, IcecraftLUTPosition
-from adapters.icecraft.inter_rep import InterRep, VertexDesig, EdgeDesig, Edge, SourceGroup, Vertex, ConVertex, LUTVertex, LUTBits
+from adapters.icecraft.inter_rep import InterRep, VertexDesig, EdgeDesig, Edge, SourceGroup, Vertex, ConVertex, LUTVertex, LUTBits, NameIndex, literal_prefix, name_matcher
 from adapters.icecraft.chip_data import ConfigAssemblage
 from adapters.icecraft.chip_data_utils import NetData, ElementInterface, UNCONNECTED_NAME
 from adapters.icecraft.config_item import ConnectionItem, IndexedItem
@@ -230,6 +232,37 @@ class TestSourceGroup(unittest.TestCase):
 			with self.assertRaises(AssertionError):
 				dut = SourceGroup(other_bits, dst_desig, edge_map)
 
+class TestNameIndex(unittest.TestCase):
+	NAMES = ["LUT#1", "LUT#10", "LUT#2", "NET#a.b", "NET#lutff_1/in_1", "NET#lutff_10/in_1", "NET#out", "NET#wire_out"]
+	PATTERNS = [
+		"", "LUT#1", "LUT#1$", "^LUT#1", r"NET\#lutff_1/in_1", r"NET#a\.b$", "NET#a.b", ".*out$", r"NET#lutff_\d/",
+		"NET#lutff_1/in_(1|2)", "never_seen"
+	]
+	
+	def test_literal_prefix(self):
+		self.assertEqual(("", False), literal_prefix(""))
+		self.assertEqual(("LUT#1", False), literal_prefix("^LUT#1"))
+		self.assertEqual(("LUT#1", True), literal_prefix("LUT#1$"))
+		self.assertEqual(("NET#a.b$", True), literal_prefix(r"NET\#a\.b\$$"))
+		for regex_str in [".*out$", r"NET#lutff_\d", "a|b", "a$b", "\\"]:
+			self.assertIsNone(literal_prefix(regex_str))
+	
+	def test_find(self):
+		dut = NameIndex()
+		for i, name in enumerate(self.NAMES):
+			dut.add(name, i)
+		dut.add("LUT#2", 100)
+		
+		for regex_str in self.PATTERNS:
+			with self.subTest(regex=regex_str):
+				exp = [i for i, n in enumerate(self.NAMES) if re.match(regex_str, n)]
+				if re.match(regex_str, "LUT#2"):
+					exp.append(100)
+				self.assertEqual(sorted(exp), sorted(dut.find(regex_str)))
+				
+				func = name_matcher(regex_str)
+				self.assertEqual([re.match(regex_str, n) is not None for n in self.NAMES], [func(n) for n in self.NAMES])
+
 class TestInterRep(unittest.TestCase):
 	def add_con_config(self, config_map=None):
 		if config_map is None:
@@ -579,6 +612,99 @@ class TestInterRep(unittest.TestCase):
 		
 		self.assertEqual(set(e.desig for e in dut.iter_edges()), all_desigs)
 	
+	def test_find_vertices(self):
+		dut = InterRep(NET_DATA, self.add_con_config(self.add_lut_config()))
+		
+		for regex_str in ["", "NET#out$", "NET#", "LUT#1", r".*span_\d", "never_seen"]:
+			for tile in set(d.tile for v in dut.iter_vertices() for d in v.desigs):
+				with self.subTest(regex=regex_str, tile=tile):
+					exp = [v for v in dut.get_vertices_of_tile(tile) for d in v.desigs if d.tile == tile and re.match(regex_str, d.name)]
+					res = dut.find_vertices(tile, regex_str)
+					self.assertEqual(len(exp), len(res))
+					self.assertEqual(set(id(v) for v in exp), set(id(v) for v in res))
+		
+		self.assertEqual([], dut.find_vertices(IcecraftPosition(100, 100), ""))
+	
+	def test_find_edges(self):
+		dut = InterRep(NET_DATA, self.add_con_config(self.add_lut_config()))
+		
+		for regex_str in ["", "NET#short_span_2$", "NET#", "LUT#", "never_seen"]:
+			for tile in set(e.desig.dst.tile for e in dut.iter_edges()):
+				with self.subTest(regex=regex_str, tile=tile):
+					exp = set(e.desig for e in dut.get_edges_of_tile(tile) if re.match(regex_str, e.desig.dst.name))
+					res = [e.desig for e in dut.find_edges(tile, regex_str)]
+					self.assertEqual(len(exp), len(res))
+					self.assertEqual(exp, set(res))
+		
+		self.assertEqual([], dut.find_edges(IcecraftPosition(100, 100), ""))
+	
+	def test_adjacency(self):
+		dut = InterRep(NET_DATA, self.add_con_config(self.add_lut_config()))
+		vertices = list(dut.iter_vertices())
+		edges = list(dut.iter_edges())
+		edges[0].available = False
+		vertices[1].used = False
+		
+		res = dut.adjacency()
+		self.assertEqual(len(vertices), res.vertex_count)
+		self.assertEqual(len(edges), res.edge_count)
+		for index, vtx in enumerate(vertices):
+			self.assertEqual(index, vtx.index)
+			self.assertEqual([e.index for e in vtx.iter_out_edges()], list(res.out_edges_of(index)))
+			self.assertEqual([e.index for e in vtx.iter_in_edges()], list(res.in_edges_of(index)))
+		
+		for index, edge in enumerate(edges):
+			self.assertEqual(index, edge.index)
+			self.assertEqual(edge.src.index, res.edge_src[index])
+			self.assertEqual(edge.dst.index, res.edge_dst[index])
+		
+		self.assertEqual([v.available for v in vertices], list(res.vertex_available))
+		self.assertEqual([v.used for v in vertices], list(res.vertex_used))
+		self.assertEqual([e.available for e in edges], list(res.edge_available))
+		self.assertEqual([e.used for e in edges], list(res.edge_used))
+		
+		# flags are a snapshot, the structure is reused
+		edges[0].available = True
+		self.assertFalse(res.edge_available[0])
+		self.assertTrue(dut.adjacency().edge_available[0])
+		self.assertIs(res.edge_src, dut.adjacency().edge_src)
+	
+	def test_reachable(self):
+		dut = InterRep(NET_DATA, self.add_con_config(self.add_lut_config()))
+		vertices = list(dut.iter_vertices())
+		edges = list(dut.iter_edges())
+		adj = dut.adjacency()
+		
+		def exp_reachable(seeds, edge_mask, forward):
+			reached = set(seeds)
+			stack = list(seeds)
+			while len(stack) > 0:
+				vtx = vertices[stack.pop()]
+				for edge in (vtx.iter_out_edges() if forward else vtx.iter_in_edges()):
+					nxt = (edge.dst if forward else edge.src).index
+					if edge_mask[edge.index] and nxt not in reached:
+						reached.add(nxt)
+						stack.append(nxt)
+			return reached
+		
+		all_edges = np.ones(len(edges), dtype=bool)
+		some_edges = np.arange(len(edges)) % 3 != 0
+		for seeds, edge_mask in [([], all_edges), ([0], all_edges), ([0, 3, 8], all_edges), ([0, 3, 8], some_edges),
+			(list(range(len(vertices))), some_edges)]:
+			for forward in (True, False):
+				with self.subTest(seeds=seeds, forward=forward):
+					res = adj.reachable(np.array(seeds, dtype=int), edge_mask, forward)
+					self.assertEqual(exp_reachable(seeds, edge_mask, forward), set(np.flatnonzero(res)))
+	
+	def test_edge_vertices(self):
+		dut = InterRep(NET_DATA, self.add_con_config(self.add_lut_config()))
+		
+		for edge in dut.iter_edges():
+			self.assertIs(dut.get_vertex(edge.desig.src), edge.src)
+			self.assertIs(dut.get_vertex(edge.desig.dst), edge.dst)
+			# the index is not part of the comparison
+			self.assertEqual(Edge(dut, edge.desig), edge)
+	
 	# add LUT truth table, create LUTVertex
 	@staticmethod
 	def check_consistency(test_case, rep):
@@ -1,5 +1,12 @@
+import copy
+import gc
+import pickle
 import unittest
 
+from dataclasses import FrozenInstanceError
+
+import adapters.icecraft.misc as misc
+
 from adapters.icecraft import IcecraftPosition, IcecraftBitPosition, IcecraftLUTPosition,\
 IcecraftColBufCtrl, IcecraftNetPosition, IcecraftConnection
 
@@ -49,6 +56,51 @@ class IcecraftBitPositionTest(unittest.TestCase):
 		
 		dut = IcecraftBitPosition.from_tile(IcecraftPosition(x, y), group, index)
 		self.check_values(dut, x, y, group, index)
+	
+	def test_interned(self):
+		dut = IcecraftBitPosition.interned(3, 4, 5, 6)
+		self.check_values(dut, 3, 4, 5, 6)
+		self.assertIs(dut, IcecraftBitPosition.interned(3, 4, 5, 6))
+		self.assertEqual(IcecraftBitPosition(3, 4, 5, 6), dut)
+		self.assertIsNot(dut, IcecraftBitPosition.interned(3, 4, 5, 7))
+		
+		# subclasses have their own instances
+		class SubBitPosition(IcecraftBitPosition):
+			__slots__ = ()
+		
+		sub = SubBitPosition.interned(3, 4, 5, 6)
+		self.assertIsInstance(sub, SubBitPosition)
+		self.assertIs(dut, IcecraftBitPosition.interned(3, 4, 5, 6))
+		
+		# unused instances are dropped
+		count = len(misc._BIT_POSITIONS)
+		res = IcecraftBitPosition.interned(300, 400, 500, 600)
+		self.assertEqual(count+1, len(misc._BIT_POSITIONS))
+		del res
+		gc.collect()
+		self.assertEqual(count, len(misc._BIT_POSITIONS))
+	
+	def test_unpickle_interned(self):
+		# e.g. genes created by worker processes are pickled
+		dut = IcecraftBitPosition.interned(3, 4, 5, 6)
+		
+		for src in (dut, IcecraftBitPosition(3, 4, 5, 6)):
+			res = pickle.loads(pickle.dumps(src))
+			self.assertIs(dut, res)
+		
+		res = pickle.loads(pickle.dumps((dut, IcecraftBitPosition(3, 4, 5, 6))))
+		self.assertIs(dut, res[0])
+		self.assertIs(dut, res[1])
+	
+	def test_slots(self):
+		dut = IcecraftBitPosition(3, 4, 5, 6)
+		self.assertFalse(hasattr(dut, "__dict__"))
+		with self.assertRaises(FrozenInstanceError):
+			dut.x = 2
+		
+		for res in (pickle.loads(pickle.dumps(dut)), copy.copy(dut), copy.deepcopy(dut)):
+			self.assertEqual(dut, res)
+			self.assertEqual(hash(dut), hash(res))
 
 class IcecraftLUTPositionTest(unittest.TestCase):
 	dut_cls = IcecraftLUTPosition
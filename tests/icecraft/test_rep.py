@@ -4,7 +4,7 @@ from copy import deepcopy
 from typing import Dict, List, NamedTuple
 from unittest import TestCase
 
-from adapters.icecraft import IcecraftBitPosition, IcecraftPosition, IcecraftRawConfig
+from adapters.icecraft import IcecraftBitPosition, IcecraftLUTPosition, IcecraftPosition, IcecraftRawConfig
 from adapters.icecraft.ice_board.device_data import SPECS_BY_ASC
 from adapters.icecraft.inter_rep import PartConf
 from adapters.icecraft.representation import IcecraftRep
@@ -50,6 +50,33 @@ class IcecraftRepTest(TestCase):
 				
 				self.check_ones(config, tc.ones, tile_to_dim)
 	
+	def test_relocate(self):
+		get_tile_type = IcecraftRawConfig.create_empty().get_tile_type
+		move = lambda t: IcecraftPosition(t.x+2, t.y)
+		dut = EXP_REP.relocate(2, 0, get_tile_type)
+		
+		# allele sequences are shared
+		for org, res in zip(EXP_REP.genes, dut.genes):
+			self.assertIs(org.alleles, res.alleles)
+		self.assertEqual([move(c.bits[0].tile) for c in EXP_REP.colbufctrl], [c.bits[0].tile for c in dut.colbufctrl])
+		self.assertEqual([IcecraftLUTPosition(18, 18, 5)], list(dut.output))
+		self.assertEqual({move(t) for t in EXP_REP.carry_data}, set(dut.carry_data))
+		
+		tile_to_dim = self.get_tile_to_dim()
+		for tc in ENCODE_DATA:
+			config = IcecraftRawConfig.create_empty()
+			with self.subTest(desc=tc.desc):
+				dut.decode(config, tc.chromo)
+				self.check_ones(config, {move(t): o for t, o in tc.ones.items()}, tile_to_dim)
+		
+		# moved tiles are controlled by another ColBufCtrl tile
+		with self.assertRaises(ValueError):
+			EXP_REP.relocate(0, 1)
+		
+		# logic tile to RAM tile
+		with self.assertRaises(ValueError):
+			EXP_REP.relocate(9, 0, get_tile_type)
+	
 	def test_set_carry_enable(self):
 		tile_15 = IcecraftPosition(15, 17)
 		tile_16 = IcecraftPosition(16, 17)
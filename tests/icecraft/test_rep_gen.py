@@ -3,14 +3,14 @@ import re
 import copy
 import itertools
 import pdb
-from typing import NamedTuple, Iterable, List, Mapping, Callable, Tuple, Union, Dict, NewType
+from typing import NamedTuple, Iterable, List, Mapping, Callable, Optional, Tuple, Union, Dict, NewType
 from enum import Enum, auto
 from dataclasses import dataclass, field, astuple
 
 import adapters.icecraft as icecraft
-from adapters.icecraft import IcecraftPosition, IcecraftBitPosition, IcecraftNetPosition, IcecraftColBufCtrl, LUTFunction
+from adapters.icecraft import IcecraftPosition, IcecraftBitPosition, IcecraftNetPosition, IcecraftColBufCtrl, IcecraftLUTPosition, LUTFunction
 from domain.request_model import RequestObject
-from domain.model import Gene
+from domain.model import Gene, Chromosome
 from domain.allele_sequence import AlleleList, AlleleAll, AllelePow, Allele
 from adapters.icecraft.chip_data import ConfigAssemblage, get_config_items, get_net_data
 from adapters.icecraft.chip_data_utils import NetData, ElementInterface, SegEntryType, UNCONNECTED_NAME
@@ -78,6 +78,12 @@ class IcecraftRepGenTest(unittest.TestCase):
 		
 		self.assertEqual(EXP_REP, res.representation)
 	
+	def test_example_parallel(self):
+		dut = icecraft.IcecraftRepGen(processes=2)
+		res = dut(GEN_REQUEST)
+		
+		self.assertEqual(EXP_REP, res.representation)
+	
 	def parse_gene(self, raw_gene, desc=""):
 		tile = IcecraftPosition(*raw_gene[0])
 		
@@ -349,6 +355,46 @@ class IcecraftRepGenTest(unittest.TestCase):
 					vtx = rep.get_vertex(desig)
 					self.assertEqual(exp, vtx.ext_src, f"Wrong for {desig}")
 	
+	def test_prune_unreachable(self):
+		class PruneData(NamedTuple):
+			desc: str
+			unavailable: List[SegEntryType]
+			no_viable_src: bool
+			output_lutffs: Optional[List[IcecraftLUTPosition]]
+			exp_unused: List[SegEntryType]
+		
+		long_spans = [(5, 0, "long_span_1"), (5, 3, "long_span_2"), (8, 0, "long_span_3"), (5, 0, "long_span_4")]
+		long_drivers = [(x, y, UNCONNECTED_NAME) for x, y in [(5, 3), (8, 3), (8, 0), (5, 0), (7, 0)]] + [(7, 0, "out")]
+		short_span_area = [(4, 2, "short_span_1"), (4, 1, "short_span_2"), (4, 2, "out"), (4, 2, UNCONNECTED_NAME)]
+		test_data = [
+			PruneData("nothing to prune", [], True, None, []),
+			PruneData("short spans without source", [(4, 2, UNCONNECTED_NAME), (4, 2, "out")], True, None,
+				[(4, 2, "short_span_1"), (4, 1, "short_span_2")]),
+			PruneData("loop of long spans without source", long_drivers, True, None, long_spans),
+			PruneData("no path to output", [], False, [IcecraftLUTPosition(2, 3, 0)],
+				[(2, 3, "lut_out"), (2, 3, "empty_out")] + long_spans + long_drivers + short_span_area),
+		]
+		
+		for td in test_data:
+			with self.subTest(desc=td.desc):
+				rep = InterRep(NET_DATA, self.add_con_config(self.add_lut_config()))
+				for seg in td.unavailable:
+					rep.get_vertex(VertexDesig.from_seg_entry(seg)).available = False
+				exp_unused = [rep.get_vertex(VertexDesig.from_seg_entry(s)) for s in td.exp_unused]
+				
+				res = icecraft.IcecraftRepGen.prune_unreachable(rep, td.no_viable_src, td.output_lutffs)
+				
+				self.assertEqual(len(exp_unused), res.vertices)
+				self.assertEqual(sum(v.bit_count for v in exp_unused), res.bits)
+				for vtx in rep.iter_vertices():
+					self.assertEqual(not any(v is vtx for v in exp_unused), vtx.used, f"{vtx.desigs[0]}")
+				
+				unused_edges = [e for e in rep.iter_edges() if not e.used]
+				self.assertEqual(len(unused_edges), res.edges)
+				for edge in rep.iter_edges():
+					if edge.src.available and edge.dst.available and (not edge.src.used or not edge.dst.used):
+						self.assertFalse(edge.used)
+	
 	def test_create_regex_condition_vertex(self):
 		all_segs = [n.segment[0] for n in NET_DATA]
 		all_tiles = sorted(set(IcecraftPosition(*s[:2]) for n in NET_DATA for s in n.segment))
@@ -765,6 +811,63 @@ class IcecraftRepGenTest(unittest.TestCase):
 			else:
 				self.assertEqual(1, len(carry_7.carry_use))
 	
+	def test_phenotype_digest(self):
+		class DigestData(NamedTuple):
+			desc: str
+			# gene description -> allele values
+			base: Mapping[str, Tuple[bool, ...]]
+			# description of the changed gene and values
+			changed: Tuple[str, Tuple[bool, ...]]
+			exp_same: bool
+		
+		config_map = self.add_con_config(self.add_lut_config())
+		rep = InterRep(NET_DATA, config_map)
+		all_genes = IcecraftRepGen.create_genes(rep, config_map)
+		const_genes, genes, _ = IcecraftRepGen.sort_genes(all_genes)
+		output = IcecraftLUTPosition(2, 3, 0)
+		digest_graph = IcecraftRepGen.get_digest_graph(rep, genes, [output])
+		dut = icecraft.IcecraftRep(genes, const_genes, [], [output], {}, digest_graph)
+		
+		desc_index = {g.description: i for i, g in enumerate(genes)}
+		internal = "(2, 3) NET#internal"
+		internal_2 = "(2, 3) NET#internal_2"
+		wire_in = "(0, 3) NET#wire_in_1"
+		truth_table = "(2, 3) LUT#0 TruthTable"
+		long_span = "(5, 0) NET#long_span_4"
+		in_0 = (False, True, False, True)
+		in_and = (False, False, False, True)
+		
+		def chromo(base: Mapping[str, Tuple[bool, ...]], changed: Tuple[str, Tuple[bool, ...]]=None) -> Chromosome:
+			values = dict(base)
+			if changed is not None:
+				values[changed[0]] = changed[1]
+			allele_indices = [0]*len(genes)
+			for desc, vals in values.items():
+				index = desc_index[desc]
+				allele_indices[index] = genes[index].alleles.values_index(vals)
+			return Chromosome(0, tuple(allele_indices))
+		
+		test_data = [
+			DigestData("long span drives nothing", {truth_table: in_and}, (long_span, (True, False)), True),
+			DigestData("unused input", {truth_table: in_0}, (internal_2, (True, True)), True),
+			DigestData("used input", {truth_table: in_and}, (internal_2, (True, True)), False),
+			DigestData("selected source", {truth_table: in_0}, (internal, (True, False)), False),
+			DigestData("source of unselected wire", {truth_table: in_0, internal: (True, False)}, (wire_in, (True, False)), True),
+			DigestData("source of selected wire", {truth_table: in_0, internal: (True, True)}, (wire_in, (True, False)), False),
+			DigestData("truth table", {truth_table: in_0}, (truth_table, in_and), False),
+			DigestData("DFF of output LUT", {}, ("(2, 3) LUT#0 DffEnable", (True, )), False),
+		]
+		
+		for td in test_data:
+			with self.subTest(desc=td.desc):
+				base_digest = dut.phenotype_digest(chromo(td.base))
+				res = dut.phenotype_digest(chromo(td.base, td.changed))
+				self.assertEqual(td.exp_same, base_digest == res)
+		
+		with self.subTest(desc="relocated"):
+			moved = dut.relocate(0, 0)
+			self.assertEqual(dut.phenotype_digest(chromo({})), moved.phenotype_digest(chromo({})))
+	
 	def test_get_colbufctrl_coordinates(self):
 		net_data_glb = [NetData(tuple(
 			[(0, i, "padin_1")]+[(x, y, f"glb_netwk_{i}") for x in range(1, 33) for y in range(1, 33)]
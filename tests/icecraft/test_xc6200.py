@@ -671,6 +671,16 @@ class TestXC6200(unittest.TestCase):
 
 			self.check_xc6200_representation(res.representation)
 
+		with self.subTest(desc="prune"):
+			self.assertNotIn("prune_stats", res)
+			gene_count = len(res.representation.genes)
+			req["prune_no_viable_src"] = True
+
+			res = dut(req)
+
+			self.assertIn("prune_stats", res)
+			self.assertGreaterEqual(gene_count, len(res.representation.genes))
+
 	@staticmethod
 	def find_routes(need, rep):
 		src_vtx = rep.get_vertex(need.src)
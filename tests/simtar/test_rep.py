@@ -57,6 +57,22 @@ class SimtarRepTest(TestCase):
 			
 			self.assertEqual(exp_list, res)
 	
+	def test_phenotype_digest(self):
+		dut = self.create(False)
+		
+		self.assertEqual(dut.phenotype_digest(Chromosome(0, (3, 1))), dut.phenotype_digest(Chromosome(1, (3, 1))))
+		self.assertNotEqual(dut.phenotype_digest(Chromosome(0, (3, 1))), dut.phenotype_digest(Chromosome(1, (4, 1))))
+		# LUT is masked if the target is not active
+		self.assertEqual(dut.phenotype_digest(Chromosome(0, (3, 0))), dut.phenotype_digest(Chromosome(1, (4, 0))))
+		self.assertNotEqual(dut.phenotype_digest(Chromosome(0, (0, 0))), dut.phenotype_digest(Chromosome(1, (0, 1))))
+	
+	def test_decoded_bits(self):
+		dut = self.create(True)
+		res = dut.decoded_bits(Chromosome(0, (1, )))
+		
+		self.assertEqual([SimtarBitPos(i) for i in range(16)], list(res))
+		self.assertEqual(list(next(dut.iter_genes()).alleles[1].values), list(res.values()))
+	
 	def test_iter_genes(self):
 		mock_genes = [MagicMock for _ in range(3)]
 		dut = SimtarRep(mock_genes, [])
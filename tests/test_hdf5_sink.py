@@ -11,7 +11,7 @@ from unittest import TestCase
 from typing import Any, Callable, Iterable, List, Mapping, NamedTuple, Tuple
 
 from adapters.icecraft import IcecraftBitPosition
-from adapters.hdf5_sink import chain_funcs, compose, HDF5Sink, IgnoreValue, noop, ParamAim
+from adapters.hdf5_sink import chain_funcs, compose, HDF5Sink, IgnoreValue, MetaEntry, noop, ParamAim
 from domain.allele_sequence import Allele, AlleleAll, AlleleList, AllelePow
 from domain.base_structures import BitPos
 from domain.model import Gene
@@ -317,3 +317,159 @@ class HDF5SinkTest(TestCase):
 				# check
 				self.assertEqual(exp, res)
 	
+	
+	def delete_sidecar_files(self, dut, ds_path, count):
+		for index in range(count):
+			try:
+				os.remove(dut.sidecar_name(ds_path, index))
+			except FileNotFoundError:
+				pass
+	
+	@staticmethod
+	def write_and_crash(filename, values, checkpoint_count):
+		write_map = {
+			"src": [ParamAim(["v"], "uint8", "values", "data", False)],
+			"cp": [ParamAim(["gen"], "uint64", "generation", "checkpoint", False)],
+		}
+		metadata = {"data": [MetaEntry("desc", "crash test")]}
+		sink = HDF5Sink(write_map, metadata, filename=filename, mode="w", checkpoint_sources=["cp"])
+		sink.__enter__()
+		for v in values[:checkpoint_count]:
+			sink.write("src", {"v": v})
+		sink.write("cp", {"gen": 1})
+		for v in values[checkpoint_count:]:
+			sink.write("src", {"v": v})
+		# terminate without closing the file
+		os._exit(0)
+	
+	def test_checkpoint_flush(self):
+		values = list(range(10))
+		ctx = mp.get_context("spawn")
+		pro = ctx.Process(target=self.write_and_crash, args=(self.filename, values, 6))
+		pro.start()
+		pro.join()
+		self.assertEqual(0, pro.exitcode)
+		
+		with h5py.File(self.filename, "r") as h5_file:
+			self.assertEqual("crash test", h5_file["data"].attrs["desc"])
+			self.assertEqual([1], list(h5_file["checkpoint/generation"][:]))
+			# everything written up to the checkpoint has to be there
+			self.assertEqual(values[:6], list(h5_file["data/values"][:6]))
+	
+	@staticmethod
+	def write_sharded_and_crash(filename, values):
+		write_map = {
+			"src": [ParamAim(["v"], "uint8", "values", "data", False, shard_len=3)],
+			"cp": [ParamAim(["gen"], "uint64", "generation", "checkpoint", False)],
+		}
+		sink = HDF5Sink(write_map, filename=filename, mode="w", checkpoint_sources=["cp"])
+		sink.__enter__()
+		for v in values:
+			sink.write("src", {"v": v})
+		sink.write("cp", {"gen": 1})
+		# terminate without closing the files
+		os._exit(0)
+	
+	def test_sharded_checkpoint_flush(self):
+		values = list(range(5))
+		dut = HDF5Sink({}, filename=self.filename)
+		self.delete_sidecar_files(dut, "data/values", 2)
+		ctx = mp.get_context("spawn")
+		pro = ctx.Process(target=self.write_sharded_and_crash, args=(self.filename, values))
+		pro.start()
+		pro.join()
+		self.assertEqual(0, pro.exitcode)
+		
+		# the virtual dataset follows the last sidecar file without being recreated
+		with h5py.File(self.filename, "r") as h5_file:
+			self.assertEqual(values, list(h5_file["data/values"][:]))
+		
+		self.delete_sidecar_files(dut, "data/values", 2)
+	
+	def test_swmr(self):
+		write_map = {
+			"src": [ParamAim(["v"], "uint8", "values", "data", False)],
+			"attr": [ParamAim(["a"], "uint8", "attr_value", "data")],
+		}
+		metadata = {"data": [MetaEntry("desc", "swmr test")]}
+		
+		with HDF5Sink(write_map, metadata, filename=self.filename, mode="w", swmr=True, flush_interval=0) as dut:
+			dut.write("src", {"v": 1})
+			dut.write("attr", {"a": 5})
+			
+			with h5py.File(self.filename, "r", swmr=True) as h5_file:
+				self.assertEqual("swmr test", h5_file["data"].attrs["desc"])
+				ds = h5_file["data/values"]
+				self.assertEqual([1], list(ds[:]))
+				
+				dut.write("src", {"v": 2})
+				ds.refresh()
+				self.assertEqual([1, 2], list(ds[:]))
+		
+		with h5py.File(self.filename, "r") as h5_file:
+			self.assertEqual([1, 2], list(h5_file["data/values"][:]))
+			# attributes are written on close
+			self.assertEqual(5, h5_file["data"].attrs["attr_value"])
+		
+		sharded_map = {"src": [ParamAim(["v"], "uint8", "values", "data", False, shard_len=3)]}
+		with self.assertRaises(ValueError):
+			HDF5Sink(sharded_map, filename=self.filename, mode="w", swmr=True)
+	
+	def test_swmr_after_checkpoint(self):
+		write_map = {
+			"src": [ParamAim(["v"], "uint8", "values", "data", False)],
+			"attr": [ParamAim(["a"], "uint8", "attr_value", "data")],
+			"check": [ParamAim(["g"], "uint8", "generation", "checkpoint", False)],
+		}
+		
+		with HDF5Sink(write_map, filename=self.filename, mode="w", checkpoint_sources=["check"], swmr=True,
+			flush_interval=0) as dut:
+			dut.write("attr", {"a": 5})
+			dut.write("src", {"v": 1})
+			dut.write("check", {"g": 0})
+			dut.write("attr", {"a": 6})
+			
+			with h5py.File(self.filename, "r", swmr=True) as h5_file:
+				# written before SWMR mode started
+				self.assertEqual(5, h5_file["data"].attrs["attr_value"])
+				self.assertEqual([1], list(h5_file["data/values"][:]))
+		
+		with h5py.File(self.filename, "r") as h5_file:
+			self.assertEqual(6, h5_file["data"].attrs["attr_value"])
+	
+	def test_write_sharded(self):
+		write_map = {"src": [
+			ParamAim(["v"], "uint8", "meas", "data", False, shape=(4, ), shard_len=3),
+			ParamAim(["v"], "uint8", "plain", "data", False, shape=(4, )),
+		]}
+		metadata = {"data/meas": [MetaEntry("desc", "sharded"), MetaEntry("count", 5, "uint8")]}
+		exp = np.array([[i]*4 for i in range(5)]+[[9]*4]*3+[[7]*4], dtype="uint8")
+		
+		dut = HDF5Sink(write_map, metadata, filename=self.filename, mode="w")
+		self.delete_sidecar_files(dut, "data/meas", 4)
+		with dut:
+			for i in range(5):
+				dut.write("src", {"v": exp[i]})
+			# multiple entries at once spanning two sidecar files
+			dut.write("src", {"v": exp[5:8]})
+		
+		# continue in append mode
+		with HDF5Sink(write_map, {}, filename=self.filename, mode="a") as dut:
+			dut.write("src", {"v": exp[8]})
+		
+		for index in range(3):
+			self.assertTrue(os.path.exists(dut.sidecar_name("data/meas", index)))
+		self.assertFalse(os.path.exists(dut.sidecar_name("data/meas", 3)))
+		
+		with h5py.File(self.filename, "r") as h5_file:
+			ds = h5_file["data/meas"]
+			self.assertTrue(ds.is_virtual)
+			self.assertEqual(exp.shape, ds.shape)
+			self.assertTrue(np.array_equal(exp, ds[:]))
+			self.assertEqual("sharded", ds.attrs["desc"])
+			self.assertEqual(np.dtype("uint8"), ds.attrs.get_id("count").dtype)
+			
+			self.assertFalse(h5_file["data/plain"].is_virtual)
+			self.assertTrue(np.array_equal(exp, h5_file["data/plain"][:]))
+		
+		self.delete_sidecar_files(dut, "data/meas", 4)
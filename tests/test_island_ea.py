@@ -0,0 +1,164 @@
+import os
+import pickle
+import queue
+
+from contextlib import ExitStack
+from unittest import TestCase
+
+from adapters.deap.island_ea import IslandEA, IslandModel, IslandSetup, Migrant
+from adapters.deap.simple_ea import EvalMode, Individual, PRNGSource
+from adapters.embed_driver import FixedEmbedDriver
+from adapters.embed_meter import FixedEmbedMeter
+from adapters.fitness import ReduceFF
+from adapters.input_gen import SeqGen
+from adapters.parallel_sink import ParallelSink
+from adapters.pop_init import RandomPop
+from adapters.prng import BuiltInPRNG
+from adapters.simtar import SimtarConfig, SimtarDev, SimtarRepGen
+from adapters.unique_id import StridedUID
+from domain.data_sink import DataSink
+from domain.interfaces import UniqueID
+from domain.model import Chromosome, InputData, OutputData
+from domain.request_model import RequestObject
+from domain.use_cases import DecTarget, Measure, MeasureFitness
+
+from tests.mocks import MockDataSink
+from tests.test_parallel_sink import PickleSink
+
+def create_island(island: int, seed: int, uid_gen: UniqueID, data_sink: DataSink, stack: ExitStack) -> IslandSetup:
+	rep = SimtarRepGen()(RequestObject(always_active=False)).representation
+	def icb():
+		for gene in rep.iter_genes():
+			yield from gene.bit_positions
+	rep.iter_carry_bits = icb
+	
+	habitat = SimtarConfig()
+	rep.prepare_config(habitat)
+	target = SimtarDev()
+	dec_uc = DecTarget(rep, habitat, target)
+	
+	mea_uc = Measure(FixedEmbedDriver(target, "B"), FixedEmbedMeter(target, 1, "B"), data_sink=data_sink)
+	prep = lambda a: OutputData(([float(v) for v in a]*10)[:10])
+	gen = SeqGen([InputData([i]) for i in range(16)])
+	mf_uc = MeasureFitness(dec_uc, mea_uc, ReduceFF(lambda a, b: a+b), gen, prep=prep)
+	
+	prng = BuiltInPRNG(seed)
+	popi = RandomPop(rep, uid_gen, prng, data_sink)
+	return IslandSetup(rep, mf_uc, popi, prep, PRNGSource(prng))
+
+class StridedUIDTest(TestCase):
+	def test_get_id(self):
+		duts = [StridedUID(i, 3) for i in range(3)]
+		ids = [d.get_id() for _ in range(4) for d in duts]
+		self.assertEqual(list(range(12)), ids)
+	
+	def test_exclude(self):
+		dut = StridedUID(1, 4)
+		dut.exclude([2, 10])
+		self.assertEqual(13, dut.get_id())
+		dut.exclude([3])
+		self.assertEqual(17, dut.get_id())
+	
+	def test_invalid_start(self):
+		for start in [-1, 3]:
+			with self.subTest(start=start):
+				with self.assertRaises(ValueError):
+					StridedUID(start, 3)
+
+class IslandEATest(TestCase):
+	def create_dut(self, inbox, outbox, synchronous=False):
+		sink = MockDataSink()
+		uid_gen = StridedUID(0, 2)
+		setup = create_island(0, 3, uid_gen, sink, None)
+		dut = IslandEA(setup.rep, setup.measure_fit_uc, uid_gen, setup.pop_init, sink, 0, inbox, outbox, 2, 2,
+			synchronous, setup.prep)
+		return dut, sink
+	
+	def test_migrate(self):
+		inbox = queue.Queue()
+		outbox = queue.Queue()
+		dut, sink = self.create_dut(inbox, outbox)
+		
+		pop = []
+		for i, fit in enumerate([3, 1, 2, 0]):
+			indi = Individual(Chromosome(2*i, (0, )))
+			indi.fitness.values = (fit, )
+			pop.append(indi)
+		
+		with self.subTest(desc="no migration"):
+			self.assertIs(pop, dut.migrate(pop, None, 3))
+			self.assertTrue(outbox.empty())
+		
+		with self.subTest(desc="migration"):
+			inbox.put([Migrant(Chromosome(1, (1, )), (7, ), 1, 2), Migrant(Chromosome(0, (0, )), (3, ), 1, 2)])
+			inbox.put([Migrant(Chromosome(3, (1, )), (0.5, ), 1, 2), Migrant(Chromosome(5, (1, )), (2.5, ), 1, 2)])
+			res = dut.migrate(pop, None, 2)
+			
+			self.assertEqual([0, 4], [m.chromo.identifier for m in outbox.get_nowait()])
+			# the two worst are replaced by the two best immigrants not in the population yet
+			self.assertEqual([0, 4, 1, 5], [i.chromo.identifier for i in res])
+			self.assertEqual([(3, ), (2, ), (7, ), (2.5, )], [i.fitness.values for i in res])
+			
+			data = [d for s, d in sink.write_list if s == "IslandEA.migrate"][0]
+			self.assertEqual([1, 5], data["received"])
+			self.assertEqual([1, 1], data["origin"])
+	
+	def test_run(self):
+		inbox = queue.Queue()
+		dut, sink = self.create_dut(inbox, inbox, True)
+		dut.run(4, 4, 0.7, 0.5, EvalMode.NEW)
+		
+		migrations = [d for s, d in sink.write_list if s == "IslandEA.migrate"]
+		self.assertEqual([2, 4], [m["generation"] for m in migrations])
+		# own migrants are already part of the population
+		for mig in migrations:
+			self.assertEqual([], mig["received"])
+
+class IslandModelTest(TestCase):
+	def setUp(self):
+		self.filename = "tmp.IslandModelTest.pkl"
+	
+	def tearDown(self):
+		try:
+			os.remove(self.filename)
+		except FileNotFoundError:
+			pass
+	
+	def run_model(self, island_count, seed):
+		sink = ParallelSink(PickleSink, (self.filename, ))
+		with sink:
+			dut = IslandModel(create_island, island_count, sink, 2, 1, True)
+			dut.run(4, 4, 0.7, 0.5, EvalMode.NEW, seed)
+		
+		with open(self.filename, "rb") as pickle_file:
+			return pickle.load(pickle_file)
+	
+	def test_island_seeds(self):
+		seeds = IslandModel.island_seeds(5, 3)
+		self.assertEqual(3, len(set(seeds)))
+		self.assertEqual(seeds, IslandModel.island_seeds(5, 3))
+		self.assertNotEqual(seeds, IslandModel.island_seeds(6, 3))
+	
+	def test_run(self):
+		writes = self.run_model(3, 11)
+		
+		# chromosome identifiers are unique across islands
+		chromos = [d["return"].chromosome for s, d in writes if s in ("GenChromo.perform", "RandomChromo.perform")]
+		ids = [c.identifier for c in chromos]
+		self.assertEqual(len(ids), len(set(ids)))
+		
+		gens = [d for s, d in writes if s == "IslandEA.gen"]
+		self.assertEqual({0, 1, 2}, {d["island"] for d in gens})
+		for island in range(3):
+			self.assertEqual(5, len([d for d in gens if d["island"] == island]))
+		
+		migrations = [d for s, d in writes if s == "IslandEA.migrate"]
+		self.assertEqual(6, len(migrations))
+		for mig in migrations:
+			self.assertEqual([(mig["island"]-1)%3]*len(mig["received"]), mig["origin"])
+		
+		# same seed, same result
+		def island_pops(writes):
+			return sorted((d["island"], d["pop"]) for s, d in writes if s == "IslandEA.gen")
+		
+		self.assertEqual(island_pops(writes), island_pops(self.run_model(3, 11)))
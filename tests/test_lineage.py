@@ -0,0 +1,102 @@
+import numpy as np
+
+from unittest import TestCase
+
+from adapters.lineage import LineageRecorder
+from domain.model import Chromosome
+from domain.request_model import ResponseObject
+
+from tests.mocks import MockDataSink
+
+class LineageRecorderTest(TestCase):
+	def setUp(self):
+		self.sink = MockDataSink()
+		self.dut = LineageRecorder(self.sink)
+	
+	def test_flush(self):
+		self.dut.write("GenChromo.perform", {"allele_indices": (1, 2), "return": ResponseObject(
+			chromosome=Chromosome(5, (1, 2)))})
+		self.dut.write("GenChromo.perform", {"allele_indices": (3, 0), "return": ResponseObject(
+			chromosome=Chromosome(6, (3, 0)))})
+		self.dut.write("Individual.wrap.cxOnePoint", {"in": [1, 2], "out": [5, 6], "generation": 1})
+		self.dut.write("Individual.wrap.mutUniformInt", {"in": [5], "out": [7], "generation": 1})
+		# unaltered chromosomes are no mutation
+		self.dut.write("Individual.wrap.mutUniformInt", {"in": [6], "out": [6], "generation": 1})
+		self.assertEqual([], self.sink.write_list)
+		self.assertEqual(4, self.dut.pending)
+		
+		self.dut.flush()
+		self.assertEqual(0, self.dut.pending)
+		res = dict(self.sink.write_list)
+		self.assertEqual(["LineageRecorder.chromos", "LineageRecorder.crossover", "LineageRecorder.mutation"],
+			[s for s, _ in self.sink.write_list])
+		
+		chromos = res["LineageRecorder.chromos"]
+		self.assertTrue(np.array_equal([5, 6], chromos["chromo_id"]))
+		self.assertTrue(np.array_equal([[1, 2], [3, 0]], chromos["allele_indices"]))
+		crossover = res["LineageRecorder.crossover"]
+		self.assertTrue(np.array_equal([[1, 2]], crossover["in"]))
+		self.assertTrue(np.array_equal([[5, 6]], crossover["out"]))
+		self.assertTrue(np.array_equal([1], crossover["generation"]))
+		mutation = res["LineageRecorder.mutation"]
+		self.assertEqual(([5], [7], [1]), tuple(mutation[n].tolist() for n in ["parent", "child", "generation"]))
+		
+		# nothing left to write
+		self.sink.clear()
+		self.dut.flush()
+		self.assertEqual([], self.sink.write_list)
+	
+	def test_pass_through(self):
+		self.dut.write("Measure.perform", {"a": 3})
+		self.assertEqual([("Measure.perform", {"a": 3})], self.sink.write_list)
+		self.assertEqual(0, self.dut.pending)
+	
+	def write_chromo(self, dut, chromo):
+		dut.write("GenChromo.perform", {"return": ResponseObject(chromosome=chromo)})
+	
+	def test_delta(self):
+		dut = LineageRecorder(self.sink, delta=True, snapshot_interval=2)
+		dut.track([Chromosome(1, (0, 0, 0, 0)), Chromosome(2, (1, 1, 1, 1))])
+		
+		# crossover child 3 is closer to its second parent
+		self.write_chromo(dut, Chromosome(3, (0, 1, 1, 1)))
+		self.write_chromo(dut, Chromosome(4, (1, 0, 0, 0)))
+		dut.write("Individual.wrap.cxOnePoint", {"in": [1, 2], "out": [3, 4], "generation": 1})
+		self.write_chromo(dut, Chromosome(5, (0, 1, 2, 1)))
+		dut.write("Individual.wrap.mutUniformInt", {"in": [3], "out": [5], "generation": 1})
+		# too many changed genes
+		self.write_chromo(dut, Chromosome(6, (1, 2, 3, 4)))
+		dut.write("Individual.wrap.mutUniformInt", {"in": [2], "out": [6], "generation": 1})
+		# parent not tracked
+		self.write_chromo(dut, Chromosome(7, (5, 5, 5, 5)))
+		dut.write("Individual.wrap.mutUniformInt", {"in": [9], "out": [7], "generation": 1})
+		dut.flush()
+		
+		res = dict(self.sink.write_list)
+		self.assertEqual([6, 7], res["LineageRecorder.chromos"]["chromo_id"].tolist())
+		delta = res["LineageRecorder.delta"]
+		self.assertEqual([3, 4, 5], delta["chromo_id"].tolist())
+		self.assertEqual([2, 1, 3], delta["base"].tolist())
+		self.assertEqual([1, 2, 3], delta["end"].tolist())
+		genes = res["LineageRecorder.delta_genes"]
+		self.assertEqual([0, 0, 2], genes["gene"].tolist())
+		self.assertEqual([0, 1, 2], genes["value"].tolist())
+		
+		# the end offsets continue and the chain of deltas is limited by the snapshot interval
+		self.sink.clear()
+		dut.track([Chromosome(5, (0, 1, 2, 1))])
+		self.write_chromo(dut, Chromosome(8, (0, 1, 2, 2)))
+		dut.write("Individual.wrap.mutUniformInt", {"in": [5], "out": [8], "generation": 2})
+		dut.flush()
+		
+		self.assertEqual(["LineageRecorder.chromos", "LineageRecorder.mutation"], [s for s, _ in self.sink.write_list])
+		self.assertEqual([8], self.sink.write_list[0][1]["chromo_id"].tolist())
+		
+		self.sink.clear()
+		dut.track([Chromosome(8, (0, 1, 2, 2))])
+		self.write_chromo(dut, Chromosome(10, (3, 1, 2, 2)))
+		dut.write("Individual.wrap.mutUniformInt", {"in": [8], "out": [10], "generation": 3})
+		dut.flush()
+		
+		delta = dict(self.sink.write_list)["LineageRecorder.delta"]
+		self.assertEqual(([10], [8], [4]), tuple(delta[n].tolist() for n in ["chromo_id", "base", "end"]))
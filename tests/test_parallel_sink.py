@@ -1,9 +1,89 @@
-from unittest import TestCase
+import multiprocessing as mp
+import os
+import pickle
+import time
 
-from adapters.parallel_sink import ParallelSink
+import numpy as np
+
+from types import TracebackType
+from typing import Any, Mapping, Optional, Type
+from unittest import skipIf, TestCase
+
+from adapters.parallel_sink import pack_data, ParallelSink, SharedMemory, SharedPayload, SharedRing, SlotHandle,\
+	unpack_data
 from adapters.dummies import DummyDataSink
+from domain.data_sink import DataSink
+from domain.request_model import ResponseObject
+
+from tests.mocks import MockDataSink
+
+class PickleSink(MockDataSink):
+	"""MockDataSink that stores the recorded writes in a file, so they can be checked from another process"""
+	def __init__(self, filename: str) -> None:
+		super().__init__()
+		self._filename = filename
+	
+	def __exit__(self,
+		exc_type: Optional[Type[BaseException]],
+		exc_value: Optional[BaseException],
+		exc_traceback: Optional[TracebackType]
+	) -> bool:
+		with open(self._filename, "wb") as pickle_file:
+			pickle.dump(self.write_list, pickle_file)
+		return False
+
+class AppendSink(DataSink):
+	"""Append the source of each write to a text file immediately"""
+	def __init__(self, filename: str) -> None:
+		self._filename = filename
+	
+	def write(self, source: str, data_dict: Mapping[str, Any]) -> None:
+		with open(self._filename, "a") as text_file:
+			text_file.write(f"{source}\n")
+	
+	def __exit__(self,
+		exc_type: Optional[Type[BaseException]],
+		exc_value: Optional[BaseException],
+		exc_traceback: Optional[TracebackType]
+	) -> bool:
+		return False
+
+class ExitSink(AppendSink):
+	"""Terminate the writer process at the first write"""
+	def write(self, source: str, data_dict: Mapping[str, Any]) -> None:
+		os._exit(3)
 
 class ParallelSinkTest(TestCase):
+	def setUp(self):
+		self.filename = "tmp.ParallelSinkTest.pkl"
+	
+	def tearDown(self):
+		try:
+			os.remove(self.filename)
+		except FileNotFoundError:
+			pass
+	
+	def read_writes(self):
+		with open(self.filename, "rb") as pickle_file:
+			return pickle.load(pickle_file)
+	
+	def test_flush_interval(self):
+		dut = ParallelSink(AppendSink, (self.filename, ), batch_size=100, flush_interval=0.1)
+		with dut:
+			dut.write("first", {})
+			# sent by the flush thread without further writes
+			for _ in range(50):
+				time.sleep(0.1)
+				if os.path.exists(self.filename):
+					break
+			with open(self.filename, "r") as text_file:
+				self.assertEqual("first\n", text_file.read())
+			
+			dut.write("second", {})
+		
+		with open(self.filename, "r") as text_file:
+			self.assertEqual("first\nsecond\n", text_file.read())
+	
 	def test_creation(self):
 		dut = ParallelSink(DummyDataSink)
 	
@@ -11,3 +91,149 @@ class ParallelSinkTest(TestCase):
 		dut = ParallelSink(DummyDataSink)
 		with dut:
 			dut.write("bla.bla", {"bla": 4})
+	
+	@skipIf(SharedMemory is None, "shared memory requires Python 3.8")
+	def test_pack_unpack(self):
+		arr = np.arange(100, dtype="uint8")
+		raw = bytes(range(100))
+		data = {"arr": arr, "raw": raw, "small": np.arange(3), "return": ResponseObject(measurement=arr)}
+		
+		packed = pack_data(data, 50)
+		self.assertIsInstance(packed["arr"], SharedPayload)
+		self.assertIsInstance(packed["raw"], SharedPayload)
+		self.assertIsInstance(packed["return"]["measurement"], SharedPayload)
+		self.assertIsInstance(packed["return"], ResponseObject)
+		self.assertIs(data["small"], packed["small"])
+		
+		res = unpack_data(packed)
+		self.assertTrue(np.array_equal(arr, res["arr"]))
+		self.assertEqual(arr.dtype, res["arr"].dtype)
+		self.assertEqual(raw, res["raw"])
+		self.assertTrue(np.array_equal(arr, res["return"].measurement))
+		
+		# no threshold -> nothing is moved
+		self.assertIs(data, pack_data(data, None))
+	
+	@skipIf(SharedMemory is None, "shared memory requires Python 3.8")
+	def test_batched_write(self):
+		exp = [(f"src.{i%3}", {"index": i, "arr": np.full(i, i, dtype="uint16")}) for i in range(100)]
+		for batch_size, max_queue, slot_count in [(1, 0, 0), (7, 2, 0), (200, 1, 0), (7, 2, 2), (200, 0, 1)]:
+			with self.subTest(batch_size=batch_size, max_queue=max_queue, slot_count=slot_count):
+				dut = ParallelSink(PickleSink, (self.filename, ), batch_size=batch_size, max_queue=max_queue,
+					shm_threshold=64, slot_count=slot_count, slot_size=128)
+				with dut:
+					for source, data in exp:
+						dut.write(source, data)
+				
+				if max_queue > 0:
+					self.assertLessEqual(dut.high_water_mark, max_queue)
+				
+				res = self.read_writes()
+				self.assertEqual(len(exp), len(res))
+				for (exp_src, exp_data), (res_src, res_data) in zip(exp, res):
+					self.assertEqual(exp_src, res_src)
+					self.assertEqual(exp_data["index"], res_data["index"])
+					self.assertTrue(np.array_equal(exp_data["arr"], res_data["arr"]))
+	
+	@skipIf(SharedMemory is None, "shared memory requires Python 3.8")
+	def test_sub_sink(self):
+		arr = np.arange(1000, dtype="uint8")
+		dut = ParallelSink(PickleSink, (self.filename, ), shm_threshold=64)
+		with dut:
+			sub = dut.get_sub()
+			sub.write("sub", {"arr": arr})
+		
+		res = self.read_writes()
+		self.assertEqual("sub", res[0][0])
+		self.assertTrue(np.array_equal(arr, res[0][1]["arr"]))
+	
+	@skipIf(SharedMemory is None, "shared memory requires Python 3.8")
+	def test_shared_ring(self):
+		dut = SharedRing(2, 100, mp.get_context("spawn"))
+		arr = np.arange(20, dtype="uint32")
+		raw = bytes(range(50))
+		
+		arr_handle = dut.store(arr)
+		raw_handle = dut.store(raw)
+		self.assertIsInstance(arr_handle, SlotHandle)
+		self.assertNotEqual(arr_handle.index, raw_handle.index)
+		# too large for a slot
+		self.assertIsNone(dut.store(bytes(101)))
+		
+		res = dut.load(arr_handle)
+		self.assertTrue(np.array_equal(arr, res))
+		self.assertEqual(arr.dtype, res.dtype)
+		self.assertEqual(raw, dut.load(raw_handle))
+		
+		# slots are reused in the order they were released
+		self.assertEqual(arr_handle.index, dut.store(raw).index)
+		self.assertEqual(raw_handle.index, dut.store(raw).index)
+		
+		dut.close()
+	
+	@skipIf(SharedMemory is None, "shared memory requires Python 3.8")
+	def test_ring_exhausted(self):
+		dut = SharedRing(2, 100, mp.get_context("spawn"), timeout=0.1)
+		raw = bytes(range(80))
+		
+		dut.store(raw)
+		dut.store(raw)
+		# no slot is released
+		self.assertIsNone(dut.store(raw))
+		
+		# more large values than slots in a single write
+		dut = SharedRing(2, 100, mp.get_context("spawn"), timeout=10)
+		start = time.perf_counter()
+		res = pack_data({"a": raw, "b": raw, "c": raw}, 64, dut)
+		self.assertLess(time.perf_counter()-start, 5)
+		self.assertIsInstance(res["a"], SlotHandle)
+		self.assertIsInstance(res["b"], SlotHandle)
+		self.assertIsInstance(res["c"], SharedPayload)
+		self.assertEqual(raw, unpack_data(res, dut)["c"])
+		
+		dut.close()
+	
+	def test_writer_died(self):
+		dut = ParallelSink(ExitSink, (self.filename, ), batch_size=1, max_queue=1)
+		with self.assertRaises(RuntimeError):
+			with dut:
+				for i in range(100):
+					dut.write("src", {"i": i})
+					time.sleep(0.05)
+	
+	def test_sub_sink_writer_died(self):
+		dut = ParallelSink(ExitSink, (self.filename, ), batch_size=1, max_queue=1)
+		with self.assertRaises(RuntimeError):
+			with dut:
+				sub = dut.get_sub()
+				for i in range(100):
+					sub.write("src", {"i": i})
+					time.sleep(0.05)
+	
+	def test_stats_source(self):
+		dut = ParallelSink(PickleSink, (self.filename, ), batch_size=1, max_queue=4, shm_threshold=None,
+			stats_source="stats")
+		with dut:
+			for i in range(10):
+				dut.write("src", {"i": i})
+		
+		res = self.read_writes()
+		self.assertEqual(11, len(res))
+		source, data = res[-1]
+		self.assertEqual("stats", source)
+		self.assertEqual(dut.high_water_mark, data["high_water_mark"])
+		self.assertEqual(4, data["max_queue"])
+	
+	@skipIf(SharedMemory is None, "shared memory requires Python 3.8")
+	def test_ring_sub_sink(self):
+		arr_list = [np.full(100, i, dtype="uint8") for i in range(20)]
+		dut = ParallelSink(PickleSink, (self.filename, ), shm_threshold=64, slot_count=2, slot_size=100)
+		with dut:
+			sub = dut.get_sub()
+			for arr in arr_list:
+				sub.write("sub", {"arr": arr})
+		
+		res = self.read_writes()
+		self.assertEqual(len(arr_list), len(res))
+		for exp, (_, data) in zip(arr_list, res):
+			self.assertTrue(np.array_equal(exp, data["arr"]))
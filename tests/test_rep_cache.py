@@ -0,0 +1,86 @@
+import os
+import shutil
+
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+import adapters.simtar.rep
+
+from adapters.rep_cache import CachedRepGen, imported_modules, source_digest
+from adapters.simtar import SimtarRepGen
+from domain.request_model import RequestObject
+
+class CachedRepGenTest(TestCase):
+	def setUp(self):
+		self.cache_dir = "tmp.CachedRepGenTest"
+		shutil.rmtree(self.cache_dir, ignore_errors=True)
+	
+	def tearDown(self):
+		shutil.rmtree(self.cache_dir, ignore_errors=True)
+	
+	def test_cache(self):
+		org = SimtarRepGen()
+		org_spy = MagicMock(wraps=org)
+		org_spy.parameters = org.parameters
+		org_spy.default_parameters = org.default_parameters
+		dut = CachedRepGen(org_spy, self.cache_dir, "v1")
+		
+		exp = org(RequestObject(always_active=False)).representation
+		res = dut(RequestObject(always_active=False)).representation
+		self.assertEqual(1, org_spy.call_count)
+		self.assertEqual(list(exp.iter_genes()), list(res.iter_genes()))
+		self.assertEqual(1, len(os.listdir(self.cache_dir)))
+		
+		# hit; unrelated entries of the request are ignored
+		res = dut(RequestObject(always_active=False, other=3)).representation
+		self.assertEqual(1, org_spy.call_count)
+		self.assertEqual(1, dut.hits)
+		self.assertEqual(list(exp.iter_genes()), list(res.iter_genes()))
+		
+		# default value is part of the key
+		self.assertEqual(dut.cache_key(RequestObject()), dut.cache_key(RequestObject(always_active=True)))
+		dut(RequestObject(always_active=True))
+		self.assertEqual(2, org_spy.call_count)
+		
+		# new instance uses the files
+		dut = CachedRepGen(org_spy, self.cache_dir, "v1")
+		dut(RequestObject(always_active=True))
+		self.assertEqual(2, org_spy.call_count)
+		
+		# other version -> miss
+		dut = CachedRepGen(org_spy, self.cache_dir, "v2")
+		dut(RequestObject(always_active=True))
+		self.assertEqual(3, org_spy.call_count)
+		self.assertEqual(3, len(os.listdir(self.cache_dir)))
+	
+	def test_broken_entry(self):
+		dut = CachedRepGen(SimtarRepGen(), self.cache_dir)
+		req = RequestObject(always_active=True)
+		os.makedirs(self.cache_dir)
+		with open(dut.cache_path(dut.cache_key(req)), "wb") as broken_file:
+			broken_file.write(b"broken")
+		
+		res = dut(req).representation
+		self.assertEqual(0, dut.hits)
+		self.assertEqual(1, len(list(res.iter_genes())))
+		
+		dut(req)
+		self.assertEqual(1, dut.hits)
+	
+	def test_imported_modules(self):
+		res = imported_modules("adapters.simtar.rep", ["adapters", "domain"])
+		# relative and absolute imports are followed, other packages are left out
+		self.assertIn("adapters.simtar.rep", res)
+		self.assertIn("adapters.simtar.pos", res)
+		self.assertIn("domain.allele_sequence", res)
+		self.assertNotIn("adapters.simtar.target", res)
+		self.assertFalse(any(n.startswith("numpy") for n in res))
+		
+		self.assertEqual(["adapters.simtar.rep"], imported_modules("adapters.simtar.rep", ["adapters.simtar.rep"]))
+	
+	def test_source_digest(self):
+		res = source_digest(adapters.simtar.rep, ["adapters", "domain"])
+		self.assertEqual(res, source_digest(adapters.simtar.rep, ["adapters", "domain"]))
+		# dependencies are part of the digest
+		self.assertNotEqual(res, source_digest(adapters.simtar.rep, ["adapters.simtar"]))
+		self.assertNotEqual(res, source_digest(adapters.simtar.rep, ["adapters", "domain"], ["chip_db"]))
@@ -1,20 +1,26 @@
+import math
+import random
+import statistics
+
 from dataclasses import dataclass
 from typing import Any, Callable, List, Mapping, Optional, Tuple
 from unittest import TestCase
 
-from adapters.deap.simple_ea import EvalMode, Individual, InfoSource, SimpleEA
+from adapters.deap.simple_ea import EvalMode, FitnessStats, Individual, InfoSource, PRNGSource, SimpleEA
 from adapters.embed_driver import FixedEmbedDriver
 from adapters.embed_meter import FixedEmbedMeter
 from adapters.fitness import ReduceFF
 from adapters.input_gen import SeqGen
 from adapters.simtar import SimtarConfig, SimtarDev, SimtarRepGen
-from adapters.pop_init import RandomPop
+from adapters.surrogate import RidgeSurrogate
+from adapters.pop_init import GivenPop, RandomPop
 from adapters.prng import BuiltInPRNG
 from adapters.unique_id import SimpleUID
 from domain.interfaces import Driver, FitnessFunction, InputGen, Meter, OutputData, PopulationInit, PRNG, \
 	Representation, TargetConfiguration, TargetDevice, UniqueID
 from domain.data_sink import DataSink
 from domain.model import Chromosome, InputData
+from domain.profiling import PROFILER, SECTIONS
 from domain.request_model import RequestObject
 from domain.use_cases import DecTarget, GenChromo, Measure, MeasureFitness
 
@@ -199,3 +205,279 @@ class SimpleEATest(TestCase):
 		dut = dut_data.dut
 		dut.run(5, 3, 0.7, 0.5, EvalMode.ALL)
 		#print(dut_data.sink.write_list)
+	
+	def test_checkpoint(self):
+		dut_data = self.create_dut_data()
+		dut = SimpleEA(dut_data.rep, dut_data.mf_uc, dut_data.uid_gen, dut_data.popi, dut_data.sink, dut_data.prep,
+			PRNGSource(dut_data.prng))
+		dut.run(5, 3, 0.7, 0.5, EvalMode.NEW)
+		
+		sources = [s for s, _ in dut_data.sink.write_list if s in ("SimpleEA.gen", "SimpleEA.checkpoint")]
+		self.assertEqual(["SimpleEA.gen", "SimpleEA.checkpoint"]*4, sources)
+		
+		checkpoints = [d for s, d in dut_data.sink.write_list if s == "SimpleEA.checkpoint"]
+		self.assertEqual(list(range(4)), [c["generation"] for c in checkpoints])
+		for cp in checkpoints:
+			self.assertIn("state", cp)
+			self.assertIn("prng_state", cp)
+		self.assertEqual(dut_data.prng.get_state(), checkpoints[-1]["prng_state"])
+	
+	def test_init_fitness(self):
+		dut_data = self.create_dut_data()
+		pop = dut_data.popi.init_pop(4)
+		init_fitness = {c.identifier: float(c.identifier) for c in pop[:3]}
+		dut_data.sink.clear()
+		
+		dut = SimpleEA(dut_data.rep, dut_data.mf_uc, dut_data.uid_gen, GivenPop(pop), dut_data.sink, dut_data.prep)
+		dut.run(4, 0, 0.7, 0.5, EvalMode.NEW, init_fitness)
+		
+		# only the chromosome without fitness value is evaluated
+		measure_count = len([s for s, _ in dut_data.sink.write_list if s == "Measure.perform"])
+		self.assertEqual(1, measure_count)
+	
+	def test_vectorized(self):
+		records = {}
+		for vectorized in [False, True]:
+			dut_data = self.create_dut_data()
+			dut = SimpleEA(dut_data.rep, dut_data.mf_uc, dut_data.uid_gen, dut_data.popi, dut_data.sink,
+				dut_data.prep, vectorized=vectorized)
+			dut.run(6, 4, 0.7, 0.5, EvalMode.NEW)
+			
+			records[vectorized] = [(s, d) for s, d in dut_data.sink.write_list if s.startswith("Individual.wrap.")]
+			created = {d["return"].chromosome.identifier for s, d in dut_data.sink.write_list if s in
+				("GenChromo.perform", "RandomChromo.perform")}
+			gen_pop = [d["pop"] for s, d in dut_data.sink.write_list if s == "SimpleEA.gen"]
+			
+			with self.subTest(vectorized=vectorized):
+				mut_records = [d for s, d in records[vectorized] if s == "Individual.wrap.mutUniformInt"]
+				self.assertEqual(4*5, len(mut_records))
+				for gen in range(1, 5):
+					# progeny of a generation is mutated in order
+					gen_mut = [d for d in mut_records if d["generation"] == gen]
+					self.assertEqual(gen_pop[gen][1:], [d["out"][0] for d in gen_mut])
+				
+				for source, data in records[vectorized]:
+					self.assertEqual(len(data["in"]), len(data["out"]))
+					self.assertTrue(set(data["out"]) <= created)
+		
+		# same kind of records
+		self.assertEqual({s for s, _ in records[False]}, {s for s, _ in records[True]})
+	
+	def test_surrogate(self):
+		dut_data = self.create_dut_data()
+		surrogate = RidgeSurrogate.from_rep(dut_data.rep, min_samples=6)
+		measured = set()
+		def mf_uc(request):
+			measured.add(request.chromosome.identifier)
+			return dut_data.mf_uc(request)
+		
+		dut = SimpleEA(dut_data.rep, mf_uc, dut_data.uid_gen, dut_data.popi, dut_data.sink, dut_data.prep,
+			surrogate=surrogate, screen_ratio=0.5)
+		dut.run(6, 4, 0.7, 0.5, EvalMode.NEW)
+		
+		records = [d for s, d in dut_data.sink.write_list if s == "SimpleEA.surrogate"]
+		self.assertGreater(len(records), 0)
+		for gen in {r["generation"] for r in records}:
+			gen_records = [r for r in records if r["generation"] == gen]
+			evaluated = [r for r in gen_records if r["evaluated"]]
+			# only the most promising half is evaluated
+			self.assertEqual(math.ceil(len(gen_records)/2), len(evaluated))
+			self.assertLessEqual(
+				max([r["predicted"] for r in gen_records if not r["evaluated"]], default=-math.inf),
+				min(r["predicted"] for r in evaluated)
+			)
+			for rec in gen_records:
+				self.assertEqual(rec["evaluated"], not math.isnan(rec["measured"]))
+		
+		# rejected chromosomes are neither evaluated nor part of the population
+		rejected = {r["chromo_id"] for r in records if not r["evaluated"]}
+		pops = {i for s, d in dut_data.sink.write_list if s == "SimpleEA.gen" for i in d["pop"]}
+		self.assertGreater(len(rejected), 0)
+		self.assertEqual(set(), rejected & measured)
+		self.assertTrue({r["chromo_id"] for r in records if r["evaluated"]} <= measured)
+		self.assertEqual(set(), rejected & pops)
+	
+		for ratio in [0, -0.5, 1.5]:
+			with self.subTest(ratio=ratio):
+				with self.assertRaises(ValueError):
+					SimpleEA(dut_data.rep, mf_uc, dut_data.uid_gen, dut_data.popi, dut_data.sink, screen_ratio=ratio)
+	
+	def test_fitness_stats(self):
+		values = [3.0, 5.0, 4.0, 8.0]
+		dut = FitnessStats()
+		self.assertTrue(math.isnan(dut.variance))
+		for i, val in enumerate(values, 1):
+			dut.add(val)
+			self.assertEqual(i, dut.count)
+			self.assertAlmostEqual(statistics.mean(values[:i]), dut.mean)
+			if i > 1:
+				self.assertAlmostEqual(statistics.variance(values[:i]), dut.variance)
+	
+	def test_adaptive(self):
+		dut_data = self.create_dut_data()
+		prng = random.Random(4)
+		measured = []
+		def noisy_mf_uc(request):
+			res = dut_data.mf_uc(request)
+			res["fitness"] = res.fitness + prng.gauss(0, 50)
+			measured.append((request.chromosome.identifier, res.fitness))
+			return res
+		
+		budget = 3
+		dut = SimpleEA(dut_data.rep, noisy_mf_uc, dut_data.uid_gen, dut_data.popi, dut_data.sink, dut_data.prep,
+			reeval_budget=budget)
+		dut.run(6, 4, 0.7, 0.5, EvalMode.ADAPTIVE)
+		
+		reevals = [d for s, d in dut_data.sink.write_list if s == "SimpleEA.reeval"]
+		self.assertGreater(len(reevals), 0)
+		for gen in range(5):
+			self.assertLessEqual(len([r for r in reevals if r["generation"] == gen]), budget)
+		
+		# every repeated measurement is recorded and the fitness is the mean of all measurements
+		for rec in reevals:
+			values = [f for i, f in measured if i == rec["chromo_id"]][:rec["count"]]
+			self.assertEqual(rec["count"], len(values))
+			self.assertAlmostEqual(statistics.mean(values), rec["mean"])
+			self.assertEqual(values[-1], rec["fitness"])
+		
+		self.assertEqual(len(measured), len({i for i, _ in measured}) + len(reevals))
+	
+	def test_phenotype_reuse(self):
+		for eval_mode in [EvalMode.NEW, EvalMode.ALL]:
+			with self.subTest(eval_mode=eval_mode):
+				dut_data = self.create_dut_data()
+				measured = []
+				def mf_uc(request):
+					measured.append(request.chromosome.identifier)
+					return dut_data.mf_uc(request)
+				
+				dut = SimpleEA(dut_data.rep, mf_uc, dut_data.uid_gen, dut_data.popi, dut_data.sink, dut_data.prep,
+					phenotype_reuse=True)
+				dut.run(8, 4, 0.7, 0.5, eval_mode)
+				
+				reuses = [d for s, d in dut_data.sink.write_list if s == "SimpleEA.reuse"]
+				# the active flag is random, so some chromosomes are inactive and share the phenotype
+				self.assertGreater(len(reuses), 0)
+				chromos = {d["return"].chromosome.identifier: d["return"].chromosome for s, d in
+					dut_data.sink.write_list if s in ("GenChromo.perform", "RandomChromo.perform")}
+				for rec in reuses:
+					self.assertNotIn(rec["chromo_id"], measured[:measured.index(rec["phenotype_of"])+1])
+					self.assertEqual(
+						dut_data.rep.phenotype_digest(chromos[rec["phenotype_of"]]),
+						dut_data.rep.phenotype_digest(chromos[rec["chromo_id"]])
+					)
+				
+				reused = {r["chromo_id"] for r in reuses}
+				if eval_mode == EvalMode.NEW:
+					self.assertEqual(set(), reused & set(measured))
+					# each phenotype is measured once
+					digests = [dut_data.rep.phenotype_digest(chromos[i]) for i in measured]
+					self.assertEqual(len(digests), len(set(digests)))
+				else:
+					# repeated evaluations are measured
+					pops = [d["pop"] for s, d in dut_data.sink.write_list if s == "SimpleEA.gen"]
+					later = {r["chromo_id"] for r in reuses if any(r["chromo_id"] in p for p in pops[r["generation"]+1:])}
+					self.assertGreater(len(later), 0)
+					self.assertTrue(later <= set(measured))
+	
+	def test_profile(self):
+		dut_data = self.create_dut_data()
+		dut = SimpleEA(dut_data.rep, dut_data.mf_uc, dut_data.uid_gen, dut_data.popi, dut_data.sink, dut_data.prep,
+			profile=True)
+		dut.run(4, 3, 0.7, 0.5, EvalMode.NEW)
+		
+		profiles = [d for s, d in dut_data.sink.write_list if s == "SimpleEA.profile"]
+		self.assertEqual(list(range(4)), [p["generation"] for p in profiles])
+		for prof in profiles:
+			self.assertTrue(set(SECTIONS) <= set(prof))
+			self.assertGreater(prof["sink"], 0)
+			self.assertLessEqual(prof["decode"], prof["wall"])
+		# the initial population is measured completely, later generations may contain no new chromosomes
+		for name in ["decode", "configure", "measure", "fitness"]:
+			self.assertGreater(profiles[0][name], 0)
+		self.assertEqual(0, profiles[0]["variation"])
+		for prof in profiles[1:]:
+			self.assertGreater(prof["variation"], 0)
+		
+		# profiler is only enabled during the run
+		self.assertFalse(PROFILER.enabled)
+		
+		with self.subTest(desc="disabled"):
+			dut_data = self.create_dut_data()
+			dut_data.dut.run(4, 1, 0.7, 0.5, EvalMode.NEW)
+			self.assertEqual([], [s for s, _ in dut_data.sink.write_list if s == "SimpleEA.profile"])
+	
+	def test_lineage(self):
+		records = {}
+		for lineage in [False, True]:
+			random.seed(13)
+			dut_data = self.create_dut_data()
+			popi = RandomPop(dut_data.rep, dut_data.uid_gen, BuiltInPRNG(5), dut_data.sink)
+			dut = SimpleEA(dut_data.rep, dut_data.mf_uc, dut_data.uid_gen, popi, dut_data.sink, dut_data.prep,
+				lineage=lineage)
+			dut.run(6, 4, 0.7, 0.5, EvalMode.NEW)
+			records[lineage] = dut_data.sink.write_list
+		
+		single = records[False]
+		blocks = records[True]
+		self.assertEqual([], [s for s, _ in blocks if s in ("GenChromo.perform", "Individual.wrap.cxOnePoint",
+			"Individual.wrap.mutUniformInt")])
+		# one block per generation
+		self.assertEqual(4, len([s for s, _ in blocks if s == "LineageRecorder.chromos"]))
+		
+		# same content
+		exp_chromos = [(d["return"].chromosome.identifier, d["return"].chromosome.allele_indices) for s, d in single
+			if s == "GenChromo.perform"]
+		res_chromos = [(i, tuple(a)) for s, d in blocks if s == "LineageRecorder.chromos" for i, a in
+			zip(d["chromo_id"].tolist(), d["allele_indices"].tolist())]
+		self.assertEqual(exp_chromos, res_chromos)
+		
+		exp_cx = [(d["in"], d["out"], d["generation"]) for s, d in single if s == "Individual.wrap.cxOnePoint"]
+		res_cx = [r for s, d in blocks if s == "LineageRecorder.crossover" for r in zip(d["in"].tolist(),
+			d["out"].tolist(), d["generation"].tolist())]
+		self.assertEqual(exp_cx, res_cx)
+		
+		exp_mut = [(d["in"][0], d["out"][0], d["generation"]) for s, d in single if s == "Individual.wrap.mutUniformInt"
+			and d["in"] != d["out"]]
+		res_mut = [r for s, d in blocks if s == "LineageRecorder.mutation" for r in zip(d["parent"].tolist(),
+			d["child"].tolist(), d["generation"].tolist())]
+		self.assertEqual(exp_mut, res_mut)
+		
+		# the EA itself is not affected
+		self.assertEqual([d["pop"] for s, d in single if s == "SimpleEA.gen"], [d["pop"] for s, d in blocks if s ==
+			"SimpleEA.gen"])
+	
+	def test_delta_chromos(self):
+		records = {}
+		for delta_chromos in [False, True]:
+			random.seed(13)
+			dut_data = self.create_dut_data()
+			popi = RandomPop(dut_data.rep, dut_data.uid_gen, BuiltInPRNG(5), dut_data.sink)
+			dut = SimpleEA(dut_data.rep, dut_data.mf_uc, dut_data.uid_gen, popi, dut_data.sink, dut_data.prep,
+				delta_chromos=delta_chromos)
+			dut.run(6, 4, 0.7, 0.5, EvalMode.NEW)
+			records[delta_chromos] = dut_data.sink.write_list
+		
+		exp = {d["return"].chromosome.identifier: d["return"].chromosome.allele_indices for s, d in records[False] if s
+			in ("RandomChromo.perform", "GenChromo.perform")}
+		
+		# reconstruct the chromosomes from the full ones and the deltas
+		res = {d["return"].chromosome.identifier: d["return"].chromosome.allele_indices for s, d in records[True] if s
+			== "RandomChromo.perform"}
+		deltas = [d for s, d in records[True] if s == "LineageRecorder.delta"]
+		gene_rows = [r for s, d in records[True] if s == "LineageRecorder.delta_genes" for r in zip(d["gene"].tolist(),
+			d["value"].tolist())]
+		self.assertLess(0, len(deltas))
+		start = 0
+		for s, d in records[True]:
+			if s == "LineageRecorder.chromos":
+				res.update((i, tuple(a)) for i, a in zip(d["chromo_id"].tolist(), d["allele_indices"].tolist()))
+			elif s == "LineageRecorder.delta":
+				for chromo_id, base, end in zip(d["chromo_id"].tolist(), d["base"].tolist(), d["end"].tolist()):
+					allele_indices = list(res[base])
+					for gene, value in gene_rows[start:end]:
+						allele_indices[gene] = value
+					res[chromo_id] = tuple(allele_indices)
+					start = end
+		
+		self.assertEqual(exp, res)
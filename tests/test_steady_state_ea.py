@@ -0,0 +1,86 @@
+import time
+
+from unittest import TestCase
+
+from adapters.deap.steady_state_ea import EvalCountSource, SteadyStateEA
+from domain.request_model import RequestObject, ResponseObject
+
+from tests import test_simple_ea
+
+class SlowStation:
+	"""Wraps a MeasureFitness and delays every measurement"""
+	def __init__(self, mf_uc, delay):
+		self._mf_uc = mf_uc
+		self._delay = delay
+	
+	def __call__(self, request: RequestObject) -> ResponseObject:
+		time.sleep(self._delay)
+		return self._mf_uc(request)
+
+class SteadyStateEATest(TestCase):
+	def create_dut_data(self, station_count, delay=0):
+		# every station has its own target
+		sea_test = test_simple_ea.SimpleEATest()
+		dut_data = sea_test.create_dut_data()
+		stations = [dut_data.mf_uc]
+		for _ in range(station_count-1):
+			stations.append(sea_test.create_dut_data().mf_uc)
+		if delay > 0:
+			stations = [SlowStation(s, delay) for s in stations]
+		
+		dut = SteadyStateEA(dut_data.rep, stations, dut_data.uid_gen, dut_data.popi, dut_data.sink, dut_data.prep)
+		return dut, dut_data
+	
+	def test_run(self):
+		dut, dut_data = self.create_dut_data(1)
+		dut.run(5, 12, 0.7, 0.5)
+		
+		evals = [d for s, d in dut_data.sink.write_list if s == "SteadyStateEA.eval"]
+		# initial population and children
+		self.assertEqual(5+12, len(evals))
+		for cur in evals[5:]:
+			self.assertEqual(5, len(cur["pop"]))
+			if cur["replaced"] is not None:
+				self.assertNotIn(cur["replaced"], cur["pop"])
+				self.assertIn(cur["chromo_id"], cur["pop"])
+			self.assertLessEqual(cur["submit_time"], cur["start_time"])
+			self.assertLessEqual(cur["start_time"], cur["end_time"])
+		
+		fitness = {e["chromo_id"]: e["fitness"] for e in evals}
+		init_best = max(fitness[i] for i in evals[4]["pop"])
+		final_best = max(fitness[i] for i in evals[-1]["pop"])
+		self.assertLessEqual(init_best, final_best)
+	
+	def test_stations(self):
+		dut, dut_data = self.create_dut_data(3, 0.02)
+		dut.run(4, 12, 0.7, 0.5)
+		
+		evals = [d for s, d in dut_data.sink.write_list if s == "SteadyStateEA.eval"]
+		self.assertEqual({0, 1, 2}, {e["station"] for e in evals})
+		
+		# measurements of different stations overlap in time
+		intervals = sorted((e["start_time"], e["end_time"]) for e in evals)
+		self.assertTrue(any(n[0] < p[1] for p, n in zip(intervals, intervals[1:])))
+		
+		util = [d for s, d in dut_data.sink.write_list if s == "SteadyStateEA.utilization"][0]
+		self.assertEqual(3, len(util["busy"]))
+	
+	def test_unchanged_child(self):
+		dut, dut_data = self.create_dut_data(1)
+		pop = dut._init_pop(4)
+		for i, indi in enumerate(pop):
+			indi.fitness.values = (i, )
+		toolbox = dut.create_toolbox(0, EvalCountSource(0))
+		
+		# neither crossover nor mutation -> copy of a parent
+		child = dut.create_child(pop, toolbox, 0, dut.rank_probabilities(len(pop)))
+		self.assertFalse(any(p is child for p in pop))
+		self.assertFalse(child.fitness.valid)
+		parent = [p for p in pop if p.chromo.identifier == child.chromo.identifier][0]
+		self.assertTrue(parent.fitness.valid)
+		
+		# measured again -> fitness of the parent is updated
+		child.fitness.values = (10, )
+		self.assertIsNone(dut.insert(pop, child))
+		self.assertEqual((10, ), parent.fitness.values)
+		self.assertFalse(any(p is child for p in pop))
@@ -0,0 +1,62 @@
+import numpy as np
+
+from unittest import TestCase
+
+from adapters.surrogate import RidgeSurrogate
+from domain.model import Chromosome
+
+class RidgeSurrogateTest(TestCase):
+	def setUp(self):
+		self.rng = np.random.default_rng(3)
+		self.allele_counts = [2, 3, 4, 2]
+		# additive fitness with one contribution per allele
+		self.contrib = [self.rng.normal(size=c) for c in self.allele_counts]
+	
+	def create_samples(self, count):
+		alleles = np.stack([self.rng.integers(0, c, size=count) for c in self.allele_counts], axis=1)
+		fitness = np.array([sum(self.contrib[g][a] for g, a in enumerate(row)) for row in alleles])
+		return alleles, fitness
+	
+	def add_samples(self, dut, alleles, fitness, start=0):
+		for i, (row, fit) in enumerate(zip(alleles, fitness)):
+			dut.add(Chromosome(start+i, tuple(row.tolist())), fit)
+	
+	def test_not_ready(self):
+		dut = RidgeSurrogate(self.allele_counts, min_samples=5)
+		self.assertFalse(dut.ready)
+		with self.assertRaises(ValueError):
+			dut.predict(np.zeros((1, 4), dtype=np.int64))
+		
+		alleles, fitness = self.create_samples(4)
+		self.add_samples(dut, alleles, fitness)
+		dut.fit()
+		self.assertFalse(dut.ready)
+	
+	def test_predict(self):
+		alleles, fitness = self.create_samples(200)
+		test_alleles, test_fitness = self.create_samples(50)
+		
+		# fewer samples than features uses the dual, more samples the primal form
+		for count in [8, 200]:
+			with self.subTest(count=count):
+				dut = RidgeSurrogate(self.allele_counts, alpha=1e-3, min_samples=5)
+				self.add_samples(dut, alleles[:count], fitness[:count])
+				dut.fit()
+				self.assertTrue(dut.ready)
+				
+				res = dut.predict(alleles[:count])
+				self.assertEqual((count, ), res.shape)
+				self.assertTrue(np.allclose(fitness[:count], res, atol=0.05))
+		
+		res = dut.predict(test_alleles)
+		self.assertTrue(np.allclose(test_fitness, res, atol=0.05))
+	
+	def test_max_samples(self):
+		dut = RidgeSurrogate(self.allele_counts, max_samples=10)
+		alleles, fitness = self.create_samples(15)
+		self.add_samples(dut, alleles, fitness)
+		self.assertEqual(10, dut.sample_count)
+		
+		# a new fitness value replaces the old one
+		dut.add(Chromosome(14, tuple(alleles[0].tolist())), 2.0)
+		self.assertEqual(10, dut.sample_count)
@@ -0,0 +1,72 @@
+import numpy as np
+
+from unittest import TestCase
+
+from adapters.deap.vector_ops import cx_one_point, mut_uniform_int, sel_roulette
+
+class VectorOpsTest(TestCase):
+	def setUp(self):
+		self.rng = np.random.default_rng(7)
+	
+	def test_sel_roulette(self):
+		weights = np.array([0.1, 0.4, 0.2, 0.3])
+		res = sel_roulette(weights, 40000, self.rng)
+		
+		self.assertEqual((40000, ), res.shape)
+		freq = np.bincount(res, minlength=4)/len(res)
+		self.assertTrue(np.allclose(weights, freq, atol=0.01), f"{freq}")
+		
+		# zero weight is never selected
+		res = sel_roulette(np.array([0.0, 1.0, 0.0]), 100, self.rng)
+		self.assertTrue(np.all(res == 1))
+	
+	def test_cx_one_point(self):
+		size = 6
+		org = np.stack([np.full(size, i) for i in range(9)])
+		
+		with self.subTest(desc="no crossover"):
+			pop = org.copy()
+			mated = cx_one_point(pop, 0.0, self.rng)
+			self.assertEqual((4, ), mated.shape)
+			self.assertFalse(np.any(mated))
+			self.assertTrue(np.array_equal(org, pop))
+		
+		with self.subTest(desc="crossover"):
+			cx_points = []
+			for _ in range(500):
+				pop = org.copy()
+				mated = cx_one_point(pop, 1.0, self.rng)
+				self.assertTrue(np.all(mated))
+				# odd row is left alone
+				self.assertTrue(np.array_equal(org[-1], pop[-1]))
+				for i in range(0, 8, 2):
+					cx = np.count_nonzero(pop[i] == org[i])
+					self.assertTrue(np.array_equal(org[i][:cx], pop[i][:cx]))
+					self.assertTrue(np.array_equal(org[i+1][cx:], pop[i][cx:]))
+					self.assertTrue(np.array_equal(org[i+1][:cx], pop[i+1][:cx]))
+					self.assertTrue(np.array_equal(org[i][cx:], pop[i+1][cx:]))
+					cx_points.append(cx)
+			# cut points are uniformly distributed in [1, size-1], like tools.cxOnePoint
+			freq = np.bincount(cx_points, minlength=size)/len(cx_points)
+			self.assertEqual(0, freq[0])
+			self.assertTrue(np.allclose(freq[1:], 1/(size-1), atol=0.03), f"{freq}")
+	
+	def test_mut_uniform_int(self):
+		up = np.array([0, 1, 3, 7])
+		org = np.zeros((5000, 4), dtype=np.int64)
+		
+		with self.subTest(desc="no mutation"):
+			pop = org.copy()
+			changed = mut_uniform_int(pop, 0, up, 0.0, self.rng)
+			self.assertFalse(np.any(changed))
+			self.assertTrue(np.array_equal(org, pop))
+		
+		with self.subTest(desc="mutation"):
+			pop = org.copy()
+			changed = mut_uniform_int(pop, 0, up, 0.5, self.rng)
+			self.assertTrue(np.all(pop <= up))
+			self.assertTrue(np.all(pop >= 0))
+			self.assertTrue(np.array_equal(np.any(pop != org, axis=1), changed))
+			# an allele index is changed with probability indpb*up/(up+1)
+			freq = np.count_nonzero(pop != org, axis=0)/len(pop)
+			self.assertTrue(np.allclose(0.5*up/(up+1), freq, atol=0.03), f"{freq}")